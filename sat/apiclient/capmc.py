@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2019-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2019-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,12 +25,18 @@
 Client for querying the Cray Advanced Platform Monitoring and Control (CAPMC) API
 """
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 from sat.apiclient.gateway import APIError, APIGatewayClient
 
 LOGGER = logging.getLogger(__name__)
 
+# The maximum number of xnames to include in a single request to CAPMC
+CAPMC_MAX_XNAMES_PER_REQUEST = 500
+# The maximum number of requests to make to CAPMC at the same time
+CAPMC_MAX_CONCURRENT_REQUESTS = 4
+
 
 class CAPMCError(APIError):
     """An error occurred in CAPMC."""
@@ -71,7 +77,9 @@ class CAPMCError(APIError):
 class CAPMCClient(APIGatewayClient):
     base_resource_path = 'capmc/capmc/v1/'
 
-    def __init__(self, *args, suppress_warnings=False, **kwargs):
+    def __init__(self, *args, suppress_warnings=False,
+                 max_xnames_per_request=CAPMC_MAX_XNAMES_PER_REQUEST,
+                 max_concurrent_requests=CAPMC_MAX_CONCURRENT_REQUESTS, **kwargs):
         """Initialize the CAPMCClient.
 
         Args:
@@ -81,14 +89,57 @@ class CAPMCClient(APIGatewayClient):
                 state. As an example, this is useful when waiting for a BMC or
                 node controller to be powered on since CAPMC will fail to query
                 the power status until it is powered on.
+            max_xnames_per_request (int): the maximum number of xnames to
+                include in a single request. Larger sets of xnames are split
+                into batches.
+            max_concurrent_requests (int): the maximum number of batches to
+                request at the same time.
             **kwargs: keyword args passed through to APIGatewayClient.__init__
         """
         self.suppress_warnings = suppress_warnings
+        self.max_xnames_per_request = max_xnames_per_request
+        self.max_concurrent_requests = max_concurrent_requests
         super().__init__(*args, **kwargs)
 
+    def _run_in_batches(self, func, xnames):
+        """Call a function on batches of the given xnames.
+
+        Batches are requested concurrently if there is more than one.
+
+        Args:
+            func (Callable): the function to call with each batch of xnames.
+                It should raise CAPMCError if the request for the batch fails.
+            xnames (list): the xnames (str) to split into batches.
+
+        Returns:
+            list: a list of tuples of (batch, result, err) for each batch,
+                where `result` is the return value of `func` and `err` is
+                the CAPMCError it raised, if any.
+        """
+        xnames = list(xnames)
+        batches = [xnames[i:i + self.max_xnames_per_request]
+                   for i in range(0, len(xnames), self.max_xnames_per_request)] or [[]]
+
+        def run_batch(batch):
+            try:
+                return batch, func(batch), None
+            except CAPMCError as err:
+                return batch, None, err
+
+        if len(batches) == 1:
+            return [run_batch(batches[0])]
+
+        LOGGER.debug('Making %s requests to CAPMC for %s xnames.', len(batches), len(xnames))
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrent_requests, len(batches))) as executor:
+            return list(executor.map(run_batch, batches))
+
     def set_xnames_power_state(self, xnames, power_state, force=False, recursive=False, prereq=False):
         """Set the power state of the given xnames.
 
+        If there are more than `max_xnames_per_request` xnames, they are
+        powered on or off in concurrent batches, and the failures from all
+        batches are combined in a single CAPMCError.
+
         Args:
             xnames (list): the xnames (str) to perform the power operation
                 against.
@@ -113,6 +164,42 @@ class CAPMCClient(APIGatewayClient):
         else:
             raise ValueError(f'Invalid power state {power_state} given. Must be "on" or "off".')
 
+        batch_results = self._run_in_batches(
+            lambda batch: self._set_batch_power_state(path, batch, power_state, force, recursive, prereq),
+            xnames
+        )
+        batch_errs = [(batch, err) for batch, _, err in batch_results if err is not None]
+        if not batch_errs:
+            return
+        if len(batch_results) == 1:
+            raise batch_errs[0][1]
+
+        # Combine the failures from all batches. When a whole batch failed, all
+        # of its xnames are reported as failing with the reason for the failure.
+        xname_errs = []
+        for batch, err in batch_errs:
+            if err.xname_errs:
+                xname_errs.extend(err.xname_errs)
+            else:
+                reason = str(err.__cause__) if err.__cause__ else err.message
+                xname_errs.extend({'e': -1, 'err_msg': reason, 'xname': xname} for xname in batch)
+        raise CAPMCError(f'Power {power_state} operation failed for xname(s).', xname_errs=xname_errs)
+
+    def _set_batch_power_state(self, path, xnames, power_state, force, recursive, prereq):
+        """Set the power state of a single batch of xnames.
+
+        Args:
+            path (str): the CAPMC API path to post to.
+            xnames (list): the xnames (str) to perform the power operation
+                against.
+            power_state, force, recursive, prereq: see set_xnames_power_state.
+
+        Returns:
+            None
+
+        Raises:
+            CAPMCError: if the power operation fails.
+        """
         params = {'xnames': xnames, 'force': force, 'recursive': recursive, 'prereq': prereq}
 
         try:
@@ -130,6 +217,37 @@ class CAPMCClient(APIGatewayClient):
     def get_xnames_power_state(self, xnames):
         """Get the power state of the given xnames from CAPMC.
 
+        If there are more than `max_xnames_per_request` xnames, their power
+        states are requested in concurrent batches and the results combined.
+
+        Args:
+            xnames (list): the xnames (str) to get power state for.
+
+        Returns:
+            dict: a dictionary whose keys are the power states and whose values
+                are lists of xnames in those power states.
+
+        Raises:
+            CAPMCError: if the request to get power state fails.
+        """
+        batch_results = self._run_in_batches(self._get_batch_power_state, xnames)
+        batch_errs = [(batch, err) for batch, _, err in batch_results if err is not None]
+        if batch_errs:
+            if len(batch_results) == 1:
+                raise batch_errs[0][1]
+            failed_xnames = [xname for batch, _ in batch_errs for xname in batch]
+            raise CAPMCError(f'Failed to get power state of xname(s): '
+                             f'{", ".join(failed_xnames)}') from batch_errs[0][1]
+
+        xnames_by_power_state = defaultdict(list)
+        for _, result, _ in batch_results:
+            for power_state, state_xnames in result.items():
+                xnames_by_power_state[power_state].extend(state_xnames)
+        return dict(xnames_by_power_state)
+
+    def _get_batch_power_state(self, xnames):
+        """Get the power state of a single batch of xnames from CAPMC.
+
         Args:
             xnames (list): the xnames (str) to get power state for.
 
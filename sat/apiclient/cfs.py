@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2019-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2019-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -29,12 +29,14 @@ import fnmatch
 from itertools import chain
 import logging
 import re
+import time
 import uuid
 
-from kubernetes.client import ApiException
+from kubernetes.client import ApiException, CoreV1Api
+from kubernetes.config import ConfigException
 
 from sat.apiclient.gateway import APIError, APIGatewayClient
-from sat.util import get_val_by_path
+from sat.util import get_kube_api_client, get_val_by_path
 
 LOGGER = logging.getLogger(__name__)
 
@@ -43,6 +45,29 @@ class CFSClient(APIGatewayClient):
     base_resource_path = 'cfs/v2/'
 
     MAX_SESSION_NAME_LENGTH = 45
+    # The maximum number of component IDs requested from CFS at once
+    COMPONENTS_PAGE_SIZE = 500
+
+    def __init__(self, *args, cache_configurations=False, cache_ttl=None, **kwargs):
+        """Create a new CFSClient.
+
+        Args:
+            *args: positional arguments passed to APIGatewayClient
+            cache_configurations (bool): if True, the configurations returned
+                by `get_configurations` are cached, and `get_configuration`
+                takes configurations from the cache.
+            cache_ttl (float or None): the time in seconds for which cached
+                configurations are used before being requested again. If None,
+                cached configurations are used until the cache is cleared.
+            **kwargs: keyword arguments passed to APIGatewayClient
+        """
+        super().__init__(*args, **kwargs)
+        self.cache_configurations = cache_configurations
+        self.cache_ttl = cache_ttl
+        # The configurations from the last request for all configurations,
+        # keyed by name, or None if they have not been requested or cached.
+        self._cached_configurations = None
+        self._configurations_fetch_time = None
 
     @staticmethod
     def get_valid_session_name(prefix='sat'):
@@ -86,22 +111,41 @@ class CFSClient(APIGatewayClient):
             APIError: if there is an issue getting configurations
         """
         try:
-            return self.get('configurations').json()
+            configurations = self.get('configurations').json()
         except APIError as err:
             raise APIError(f'Failed to get CFS configurations: {err}')
         except ValueError as err:
             raise APIError(f'Failed to parse JSON in response from CFS when getting '
                            f'CFS configurations: {err}')
 
+        if self.cache_configurations:
+            self._cached_configurations = {
+                configuration.get('name'): configuration for configuration in configurations
+            }
+            self._configurations_fetch_time = time.monotonic()
+        return configurations
+
+    def clear_configuration_cache(self):
+        """Clear the configurations cached by the last call to `get_configurations`."""
+        self._cached_configurations = None
+
     def get_configuration(self, name):
         """Get the CFS configuration
 
+        If configurations are cached and all configurations have been requested
+        with `get_configurations` within `cache_ttl` seconds, the configuration
+        is taken from that response when it is present.
+
         Args:
             name (str): the name of the CFS configuration
 
         Returns:
             dict: the CFS configuration
         """
+        if self._cached_configurations and name in self._cached_configurations:
+            if self.cache_ttl is None or time.monotonic() - self._configurations_fetch_time < self.cache_ttl:
+                return self._cached_configurations[name]
+
         try:
             return self.get('configurations', name).json()
         except APIError as err:
@@ -118,7 +162,105 @@ class CFSClient(APIGatewayClient):
             request_body (dict): the configuration data, which should have a
                 'layers' key.
         """
-        self.put('configurations', config_name, json=request_body)
+        response = self.put('configurations', config_name, json=request_body)
+        if self._cached_configurations is not None:
+            try:
+                self._cached_configurations[config_name] = response.json()
+            except ValueError:
+                self.clear_configuration_cache()
+
+    @staticmethod
+    def _project(item, fields):
+        """Get only the given fields of an item returned by CFS.
+
+        Args:
+            item (dict): the item returned by CFS
+            fields (Iterable of str or None): the fields to keep, or None to
+                keep all fields.
+
+        Returns:
+            dict: the item with only the given fields
+        """
+        if fields is None:
+            return item
+        return {field: item[field] for field in fields if field in item}
+
+    def iter_components(self, ids=None, status=None, enabled=None, config_name=None, fields=None):
+        """Iterate over the CFS components, filtered by CFS.
+
+        The filters are passed to CFS so that only the matching components are
+        returned by the API. If `ids` is given, the components are requested
+        in pages of at most COMPONENTS_PAGE_SIZE IDs. Only one page of
+        components is held in memory at a time, and if `fields` is given,
+        only those fields of each component are kept.
+
+        Args:
+            ids (Iterable of str or None): the IDs of the components to get,
+                or None to get all components.
+            status (str or None): if given, only get components with this
+                configuration status, e.g. 'configured' or 'failed'.
+            enabled (bool or None): if given, only get components which are
+                enabled or disabled.
+            config_name (str or None): if given, only get components with this
+                desired configuration.
+            fields (Iterable of str or None): if given, the fields to keep in
+                each component, e.g. 'id' and 'configurationStatus'.
+
+        Yields:
+            dict: the matching CFS components
+
+        Raises:
+            APIError: if there is a failure querying CFS or parsing the response
+        """
+        params = {}
+        if status is not None:
+            params['status'] = status
+        if enabled is not None:
+            params['enabled'] = str(enabled).lower()
+        if config_name is not None:
+            params['config_name'] = config_name
+
+        if ids is None:
+            pages = [params]
+        else:
+            ids = list(ids)
+            pages = [
+                dict(params, ids=','.join(ids[start:start + self.COMPONENTS_PAGE_SIZE]))
+                for start in range(0, len(ids), self.COMPONENTS_PAGE_SIZE)
+            ]
+
+        for page_params in pages:
+            try:
+                components = self.get('components', params=page_params).json()
+            except APIError as err:
+                raise APIError(f'Failed to get CFS components: {err}')
+            except ValueError as err:
+                raise APIError(f'Failed to parse JSON in response from CFS when getting '
+                               f'CFS components: {err}')
+
+            for component in components:
+                yield self._project(component, fields)
+
+    def get_sessions(self, tags=None):
+        """Get details for all sessions, optionally only those with the given tags.
+
+        Args:
+            tags (dict or None): if given, only get the sessions which have
+                all of these tags.
+
+        Returns:
+            list of dict: the details about the sessions
+        """
+        params = {}
+        if tags:
+            params['tags'] = ','.join(f'{key}={value}' for key, value in tags.items())
+        try:
+            return self.get('sessions', params=params).json()
+        except APIError as err:
+            raise APIError(f'Failed to get CFS sessions: {err}')
+        except ValueError as err:
+            raise APIError(f'Failed to parse JSON in response from CFS when getting '
+                           f'CFS sessions: {err}')
 
     def get_session(self, name):
         """Get details for a session.
@@ -137,7 +279,8 @@ class CFSClient(APIGatewayClient):
             raise APIError(f'Failed to parse JSON in response from CFS when getting '
                            f'CFS session {name}: {err}')
 
-    def create_image_customization_session(self, config_name, image_id, target_groups, image_name):
+    def create_image_customization_session(self, config_name, image_id, target_groups, image_name,
+                                           tags=None):
         """Create a new image customization session.
 
         The session name will be generated with self.get_valid_session_name.
@@ -150,6 +293,7 @@ class CFSClient(APIGatewayClient):
                 specified by `image_id`.
             image_name (str): the name of the image being created, used just
                 for logging purposes
+            tags (dict or None): the tags to give the session, if any
 
         Returns:
             CFSImageConfigurationSession: the created session
@@ -165,6 +309,8 @@ class CFSClient(APIGatewayClient):
                 ]
             }
         }
+        if tags:
+            request_body['tags'] = tags
         try:
             created_session = self.post('sessions', json=request_body).json()
         except APIError as err:
@@ -373,17 +519,30 @@ class CFSImageConfigurationSession:
         Raises:
             APIError: if there is a failure to get session status from the CFS API
         """
-        fail_msg = f'Failed to get updated session status for session {self.name}'
-
         try:
             session_details = self.cfs_client.get_session(self.name)
         except APIError as err:
-            raise APIError(f'{fail_msg}: {err}')
+            raise APIError(f'Failed to get updated session status for session {self.name}: {err}')
+
+        self.set_cfs_status(session_details)
+
+    def set_cfs_status(self, session_details):
+        """Set the status of this CFS session from its details from the CFS API
+
+        Args:
+            session_details (dict): the details about this session from the CFS API
+
+        Returns:
+            None
 
+        Raises:
+            APIError: if the details do not contain the status of the session
+        """
         try:
             self.data['status'] = session_details['status']
         except KeyError as err:
-            raise APIError(f'{fail_msg}: {err} key was missing in response from CFS.')
+            raise APIError(f'Failed to get updated session status for session {self.name}: '
+                           f'{err} key was missing in response from CFS.')
 
     def get_container_status_description(self, container_status):
         """Get a string representation of the container status
@@ -512,13 +671,32 @@ class CFSImageConfigurationSession:
             raise APIError(f'Failed to query Kubernetes for pod associated '
                            f'with CFS Kubernetes job {self.kube_job}: {err}')
 
-        try:
-            self.pod = pods.items[0]
-        except IndexError:
+        self.set_pod(pods.items[0] if pods.items else None)
+
+    def set_pod(self, pod):
+        """Set the pod for the Kubernetes job of this session and update container status
+
+        The statuses of the containers are only compared to their previous
+        statuses if the pod has changed since it was last set, according to
+        its resourceVersion.
+
+        Args:
+            pod (kubernetes.client.V1Pod or None): the pod for the Kubernetes
+                job, or None if it has not been created yet
+
+        Returns:
+            None
+        """
+        if pod is None:
             if not self.logged_pod_wait_msg:
                 LOGGER.info(f'Waiting for creation of Kubernetes pod associated with session {self.name}.')
                 self.logged_pod_wait_msg = True
-        else:
+            return
+
+        unchanged = (self.pod is not None and pod.metadata.resource_version is not None
+                     and pod.metadata.resource_version == self.pod.metadata.resource_version)
+        self.pod = pod
+        if not unchanged:
             self._update_container_status()
 
     def update_status(self, kube_client):
@@ -532,9 +710,133 @@ class CFSImageConfigurationSession:
         """
         self.update_cfs_status()
 
+        if self.has_kube_job():
+            self.update_pod_status(kube_client)
+
+    def has_kube_job(self):
+        """Check whether CFS has created the Kubernetes job for this session
+
+        A message is logged the first time this finds that the job has not
+        been created yet.
+
+        Returns:
+            bool: True if the session is no longer pending, False otherwise.
+        """
         if self.session_status == self.PENDING_VALUE:
             if not self.logged_job_wait_msg:
                 LOGGER.info(f'Waiting for CFS to create Kubernetes job associated with session {self.name}.')
                 self.logged_job_wait_msg = True
-        else:
-            self.update_pod_status(kube_client)
+            return False
+        return True
+
+
+class CFSSessionTracker:
+    """Tracks the status of many CFS image customization sessions at once
+
+    Instead of each session querying CFS for itself and Kubernetes for its
+    pod, update() gets all the tracked sessions with one CFS request and the
+    pods of all their Kubernetes jobs with one label-selected Kubernetes
+    request, and passes the status of each session and pod to that session.
+    Sessions are found in CFS by the tags in `tags`, which should be given to
+    each session created to be tracked.
+
+    Attributes:
+        cfs_client (sat.apiclient.cfs.CFSClient): the CFS API client
+        tags (dict): the tags to give the CFS sessions to be tracked
+        sessions (dict): the tracked sessions which have not completed,
+            keyed by session name
+    """
+    TAG_NAME = 'sat_session_tracker'
+
+    def __init__(self, cfs_client):
+        """Create a new CFSSessionTracker
+
+        Args:
+            cfs_client (sat.apiclient.cfs.CFSClient): the CFS API client
+        """
+        self.cfs_client = cfs_client
+        self.tags = {self.TAG_NAME: uuid.uuid4().hex}
+        self.sessions = {}
+
+    def add_session(self, session):
+        """Start tracking the given session
+
+        Args:
+            session (CFSImageConfigurationSession): the session to track
+
+        Returns:
+            None
+        """
+        self.sessions[session.name] = session
+
+    def update_cfs_status(self):
+        """Update the status of every tracked session from one query of the CFS API
+
+        Sessions which are not returned by the query, e.g. because they were
+        created without the tags, are queried individually.
+
+        Returns:
+            None
+
+        Raises:
+            APIError: if there is a failure to get session status from the CFS API
+        """
+        session_details_by_name = {session_details.get('name'): session_details
+                                   for session_details in self.cfs_client.get_sessions(tags=self.tags)}
+        for name, session in self.sessions.items():
+            if name in session_details_by_name:
+                session.set_cfs_status(session_details_by_name[name])
+            else:
+                session.update_cfs_status()
+
+    def update_pod_status(self):
+        """Update the pods of every tracked session from one query of the Kubernetes API
+
+        Returns:
+            None
+
+        Raises:
+            APIError: if there is a problem querying the Kubernetes API for
+                the pods of the sessions.
+        """
+        sessions_by_job = {session.kube_job: session for session in self.sessions.values()
+                           if session.has_kube_job()}
+        if not sessions_by_job:
+            return
+
+        label_selector = f'job-name in ({",".join(sorted(sessions_by_job))})'
+        try:
+            kube_client = CoreV1Api(get_kube_api_client())
+            pods = kube_client.list_namespaced_pod(CFSImageConfigurationSession.KUBE_NAMESPACE,
+                                                   label_selector=label_selector)
+        except ConfigException as err:
+            raise APIError(f'Unable to query Kubernetes for pods associated with '
+                           f'CFS sessions: {err}')
+        except ApiException as err:
+            raise APIError(f'Failed to query Kubernetes for pods associated with '
+                           f'CFS Kubernetes jobs: {err}')
+
+        pods_by_job = {(pod.metadata.labels or {}).get('job-name'): pod for pod in pods.items}
+        for job_name, session in sessions_by_job.items():
+            session.set_pod(pods_by_job.get(job_name))
+
+    def update(self):
+        """Update the status of every tracked session which has not completed
+
+        Sessions which have completed are no longer tracked once their final
+        status has been recorded.
+
+        Returns:
+            None
+
+        Raises:
+            APIError: if there is a failure to get the status of the sessions
+                from the CFS or Kubernetes APIs.
+        """
+        if not self.sessions:
+            return
+
+        self.update_cfs_status()
+        self.update_pod_status()
+        self.sessions = {name: session for name, session in self.sessions.items()
+                         if not session.complete}
@@ -460,6 +460,22 @@ class HSMClient(APIGatewayClient):
         """
         return self.get('Inventory', 'RedfishEndpoints', xname).json()
 
+    @handle_api_errors
+    def get_redfish_endpoints_inventory(self, xnames):
+        """Get the Redfish endpoint inventory for several components in one request.
+
+        Args:
+            xnames (Iterable[str]): the xnames to retrieve Redfish endpoints for
+
+        Returns:
+            list of dict: the Redfish endpoints which exist for the given xnames
+
+        Raises:
+            APIError: if there is a problem retrieving the Redfish endpoint inventory
+        """
+        return self.get('Inventory', 'RedfishEndpoints',
+                        params={'id': list(xnames)}).json()['RedfishEndpoints']
+
     @handle_api_errors
     def bulk_enable_components(self, components):
         """Bulk enable a set of components.
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,17 +25,21 @@
 Client for querying the Image Management Service (IMS) API
 """
 import base64
+from concurrent.futures import ThreadPoolExecutor
 import copy
 import datetime
 import hashlib
 import json
 import logging
+import math
 import os
 from tempfile import TemporaryDirectory
+import time
 import warnings
 
 import boto3
 from boto3.exceptions import Boto3Error
+from botocore.exceptions import BotoCoreError, ClientError
 from inflect import engine
 from kubernetes.client import ApiException, CoreV1Api
 from kubernetes.config import load_kube_config, ConfigException
@@ -50,16 +54,74 @@ from sat.util import get_val_by_path
 LOGGER = logging.getLogger(__name__)
 
 
+class IMSResourceCacheEntry:
+    """The cached list of IMS resources of one type, indexed by ID and name."""
+
+    def __init__(self, resources=None, error=None):
+        """Create a new IMSResourceCacheEntry.
+
+        Args:
+            resources (list of dict): the resources returned by IMS
+            error (APIError): the error raised when the resources could not be
+                obtained from IMS. If this is given, `resources` is ignored.
+        """
+        self.fetch_time = time.monotonic()
+        self.error = error
+        self.resources = resources if error is None else None
+        self.by_id = {}
+        self.by_name = {}
+        for resource in self.resources or []:
+            if 'id' in resource:
+                self.by_id[resource['id']] = resource
+            self.by_name.setdefault(resource.get('name'), []).append(resource)
+
+    def is_fresh(self, ttl):
+        """Get whether this entry is younger than the given TTL.
+
+        Args:
+            ttl (float or None): the time in seconds for which cached data is
+                valid, or None if cached data does not expire.
+
+        Returns:
+            bool: True if this entry may still be used, False otherwise
+        """
+        return ttl is None or time.monotonic() - self.fetch_time < ttl
+
+
 class IMSClient(APIGatewayClient):
     base_resource_path = 'ims/v3/'
     valid_resource_types = ('image', 'recipe', 'public-key')
     # The bucket for boot images created by IMS
     boot_images_bucket = 'boot-images'
+    # The maximum number of artifacts copied at the same time
+    max_concurrent_artifact_copies = 4
+    # Artifacts at least this large are copied in parts with a multipart upload
+    multipart_copy_threshold = 256 * 1024 ** 2
+    # The size of each part of a multipart copy, and the maximum number of
+    # parts of one artifact copied at the same time
+    multipart_copy_part_size = 128 * 1024 ** 2
+    max_concurrent_part_copies = 8
+    # The maximum number of parts allowed in a multipart upload by S3
+    max_multipart_parts = 10000
+
+    def __init__(self, *args, cache_ttl=None, **kwargs):
+        """Create a new IMSClient.
 
-    def __init__(self, *args, **kwargs):
+        Args:
+            *args: positional arguments passed to APIGatewayClient
+            cache_ttl (float or None): the time in seconds for which cached
+                IMS resources are used before being requested again. If None,
+                cached resources are used until the cache is cleared.
+            **kwargs: keyword arguments passed to APIGatewayClient
+        """
         super().__init__(*args, **kwargs)
-        # Dictionary to cache the list of different types of resources from IMS
+        self.cache_ttl = cache_ttl
+        # Cached lists of the different types of resources from IMS, keyed by
+        # resource type. Values are IMSResourceCacheEntry objects.
         self._cached_resources = {}
+        # Resources requested individually by ID, keyed by (resource type, ID).
+        # Values are tuples of the fetch time and the resource.
+        self._cached_single_resources = {}
         self.inflector = engine()
 
     @cached_property
@@ -124,39 +186,102 @@ class IMSClient(APIGatewayClient):
         except Boto3Error as err:
             raise APIError(f'Unable to get S3 resource: {err}')
 
-    def _get_resources_cached(self, resource_type):
-        """Get the resources of the given type from the cache or from IMS API if not cached.
+    def _get_fresh_cache_entry(self, resource_type):
+        """Get the cache entry for the given type of resource if it is still fresh.
+
+        Args:
+            resource_type (str): The type of the resource.
+
+        Returns:
+            IMSResourceCacheEntry or None: the cache entry for the resource
+                type, or None if the resources of that type are not cached or
+                the cached data has expired.
+        """
+        entry = self._cached_resources.get(resource_type)
+        if entry is None or not entry.is_fresh(self.cache_ttl):
+            return None
+        return entry
+
+    def _get_cache_entry(self, resource_type):
+        """Get the cache entry for the given type of resource, querying IMS if needed.
 
         Args:
             resource_type (str): The type of the resource to look for in IMS.
                 Must be one of `IMSClient.valid_resource_types`.
 
+        Returns:
+            IMSResourceCacheEntry: the cache entry for the resource type
+
         Raises:
-            APIError: if there is an issue getting the images or recipes
+            APIError: if there is an issue getting the resources
             ValueError: if given an invalid resource_type
         """
         if resource_type not in self.valid_resource_types:
             raise ValueError(f'IMS resource type must be one of {self.valid_resource_types}, '
                              f'got {resource_type}')
 
-        plural_resource = self.inflector.plural(resource_type)
-
-        fail_msg = f'Failed to get IMS {plural_resource}'
-        if plural_resource not in self._cached_resources:
+        entry = self._get_fresh_cache_entry(resource_type)
+        if entry is None:
+            plural_resource = self.inflector.plural(resource_type)
+            fail_msg = f'Failed to get IMS {plural_resource}'
             try:
-                resources = self.get(f'{resource_type}s').json()
+                entry = IMSResourceCacheEntry(resources=self.get(f'{resource_type}s').json())
             except APIError as err:
-                resources = APIError(f'{fail_msg}: {err}')
+                entry = IMSResourceCacheEntry(error=APIError(f'{fail_msg}: {err}'))
             except ValueError as err:
-                resources = APIError(f'{fail_msg} due to failure parsing JSON in response: {err}')
+                entry = IMSResourceCacheEntry(error=APIError(
+                    f'{fail_msg} due to failure parsing JSON in response: {err}'
+                ))
+            self._cached_resources[resource_type] = entry
 
-            self._cached_resources[plural_resource] = resources
+        if entry.error is not None:
+            raise entry.error
+        return entry
 
-        cached_value = self._cached_resources[plural_resource]
-        if isinstance(cached_value, Exception):
-            raise cached_value
-        else:
-            return cached_value
+    def _get_resources_cached(self, resource_type):
+        """Get the resources of the given type from the cache or from IMS API if not cached.
+
+        Args:
+            resource_type (str): The type of the resource to look for in IMS.
+                Must be one of `IMSClient.valid_resource_types`.
+
+        Raises:
+            APIError: if there is an issue getting the images or recipes
+            ValueError: if given an invalid resource_type
+        """
+        return self._get_cache_entry(resource_type).resources
+
+    def _get_resource_by_id(self, resource_type, resource_id):
+        """Get a single resource by its ID from the cache or from the IMS API.
+
+        The resource is taken from the cached list of resources of its type if
+        that list is fresh and contains it. Otherwise, it is requested from
+        IMS directly, and the response is cached for subsequent lookups.
+
+        Args:
+            resource_type (str): The type of the resource.
+            resource_id (str): The ID of the resource.
+
+        Returns:
+            dict: the resource
+
+        Raises:
+            APIError: if the request to IMS fails
+            ValueError: if the response from IMS is not valid JSON
+        """
+        entry = self._get_fresh_cache_entry(resource_type)
+        if entry is not None and resource_id in entry.by_id:
+            return entry.by_id[resource_id]
+
+        cached = self._cached_single_resources.get((resource_type, resource_id))
+        if cached is not None:
+            fetch_time, resource = cached
+            if self.cache_ttl is None or time.monotonic() - fetch_time < self.cache_ttl:
+                return resource
+
+        resource = self.get(f'{resource_type}s', resource_id).json()
+        self._cached_single_resources[(resource_type, resource_id)] = (time.monotonic(), resource)
+        return resource
 
     def clear_resource_cache(self, resource_type=None):
         """Clear the cached copy of the resources of the given type.
@@ -175,14 +300,20 @@ class IMSClient(APIGatewayClient):
 
         if resource_type is None:
             self._cached_resources = {}
-        elif resource_type in self._cached_resources:
-            del self._cached_resources[resource_type]
+            self._cached_single_resources = {}
+        else:
+            self._cached_resources.pop(resource_type, None)
+            self._cached_single_resources = {
+                key: value for key, value in self._cached_single_resources.items()
+                if key[0] != resource_type
+            }
 
     def get_matching_resources(self, resource_type, resource_id=None, **kwargs):
         """Get the resource(s) matching the given type and id or name.
 
         If neither `resource_id` nor `name` are specified, then return all the
-        resources of the given type.
+        resources of the given type. Lookups by `resource_id` or `name` are
+        answered from the cached resources when they are fresh.
 
         Args:
             resource_type (str): The type of the resource to look for in IMS.
@@ -210,16 +341,20 @@ class IMSClient(APIGatewayClient):
             fail_msg = f'{fail_msg} with id={resource_id}'
             try:
                 # Always return a list even when there's only one
-                return [self.get(f'{resource_type}s/{resource_id}').json()]
+                return [self._get_resource_by_id(resource_type, resource_id)]
             except APIError as err:
                 raise APIError(f'{fail_msg}: {err}')
             except ValueError as err:
                 raise APIError(f'{fail_msg} due to failure parsing JSON in response: {err}')
 
-        resources = self._get_resources_cached(resource_type)
+        entry = self._get_cache_entry(resource_type)
 
         if not kwargs:
-            return resources
+            return entry.resources
+
+        resources = entry.resources
+        if 'name' in kwargs:
+            resources = entry.by_name.get(kwargs['name'], [])
 
         return [resource for resource in resources
                 if all(resource.get(prop) == value
@@ -239,6 +374,7 @@ class IMSClient(APIGatewayClient):
             APIError: if there is a failure to create the public key in IMS
         """
         request_body = {'name': name, 'public_key': public_key}
+        self.clear_resource_cache(resource_type='public-key')
         try:
             return self.post('public-keys', json=request_body).json()
         except APIError as err:
@@ -270,6 +406,8 @@ class IMSClient(APIGatewayClient):
             'image_root_archive_name': image_name
         }
 
+        # The job creates a new image
+        self.clear_resource_cache(resource_type='image')
         try:
             return self.post('jobs', json=request_body).json()
         except APIError as err:
@@ -297,7 +435,7 @@ class IMSClient(APIGatewayClient):
             image_id (str): the image ID
         """
         try:
-            return self.get('images', image_id).json()
+            return self._get_resource_by_id('image', image_id)
         except APIError as err:
             raise APIError(f'Failed to get image {image_id}: {err}')
         except ValueError as err:
@@ -317,6 +455,7 @@ class IMSClient(APIGatewayClient):
                 response is not valid JSON
         """
         try:
+            self.clear_resource_cache(resource_type='image')
             return self.post('images', json={'name': name}).json()
         except APIError as err:
             raise APIError(f'Failed to create new empty image named {name}: {err}')
@@ -383,9 +522,129 @@ class IMSClient(APIGatewayClient):
                 raise APIError(f'Failed to parse JSON manifest file for image '
                                f'with id {image_id}: {err}')
 
+    def _multipart_copy_s3_object(self, source_bucket, source_key, dest_key, size, metadata):
+        """Copy a large S3 object to the boot images bucket in parts.
+
+        The parts are copied concurrently by S3 with UploadPartCopy requests.
+        If the copy fails, the multipart upload is aborted.
+
+        Args:
+            source_bucket (str): the bucket of the object to copy
+            source_key (str): the key of the object to copy
+            dest_key (str): the key of the new object in the boot images bucket
+            size (int): the size of the object to copy, in bytes
+            metadata (dict): the metadata of the new object
+
+        Returns:
+            str: the ETag of the new object
+
+        Raises:
+            Boto3Error, BotoCoreError, ClientError: if the copy fails
+        """
+        s3_client = self.s3_resource.meta.client
+        part_size = max(self.multipart_copy_part_size, math.ceil(size / self.max_multipart_parts))
+        upload_id = s3_client.create_multipart_upload(
+            Bucket=self.boot_images_bucket, Key=dest_key, Metadata=metadata
+        )['UploadId']
+
+        def copy_part(part_number):
+            first_byte = (part_number - 1) * part_size
+            last_byte = min(first_byte + part_size, size) - 1
+            response = s3_client.upload_part_copy(
+                Bucket=self.boot_images_bucket, Key=dest_key, UploadId=upload_id,
+                PartNumber=part_number, CopySourceRange=f'bytes={first_byte}-{last_byte}',
+                CopySource={'Bucket': source_bucket, 'Key': source_key}
+            )
+            return {'ETag': response['CopyPartResult']['ETag'], 'PartNumber': part_number}
+
+        num_parts = math.ceil(size / part_size)
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrent_part_copies, num_parts)) as executor:
+                parts = list(executor.map(copy_part, range(1, num_parts + 1)))
+            response = s3_client.complete_multipart_upload(
+                Bucket=self.boot_images_bucket, Key=dest_key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except (Boto3Error, BotoCoreError, ClientError):
+            try:
+                s3_client.abort_multipart_upload(Bucket=self.boot_images_bucket,
+                                                 Key=dest_key, UploadId=upload_id)
+            except (Boto3Error, BotoCoreError, ClientError) as err:
+                LOGGER.warning(f'Failed to abort multipart copy to {dest_key}: {err}')
+            raise
+
+        LOGGER.debug(f'Copied {source_key} to {dest_key} in {num_parts} parts')
+        return response.get('ETag')
+
+    def copy_manifest_artifact(self, artifact, new_image_id, new_name):
+        """Copy an artifact specified in a manifest to a location for use by a new image.
+
+        The size and metadata of the artifact are fetched with a single HEAD
+        request. Artifacts smaller than `multipart_copy_threshold` are copied
+        with a single CopyObject request, and larger ones are copied in parts.
+
+        Args:
+            artifact (dict): an artifact from an IMS image manifest
+            new_image_id (str): the image ID of the new manifest. This image ID
+                will be used in the s3 key for the new artifact.
+            new_name (str): the name of the new IMS image. This is placed in the
+                metadata of the artifact
+
+        Returns:
+            dict: the new artifact that refers to the copied artifact
+
+        Raises:
+            APIError: if unable to copy the artifact
+        """
+        old_artifact_path = get_val_by_path(artifact, 'link.path')
+        if not old_artifact_path:
+            raise APIError(f'Unable to copy artifact of {artifact.get("type", "unknown")} '
+                           f'type due to missing path')
+
+        old_artifact_bucket, old_artifact_key = self.split_s3_artifact_path(old_artifact_path)
+        artifact_name = os.path.basename(old_artifact_key)
+        new_artifact_key = f'{new_image_id}/{artifact_name}'
+
+        new_metadata = {
+            'x-shasta-ims-image-id': new_image_id,
+            'x-shasta-ims-image-name': new_name
+            # No applicable 'x-shasta-ims-job-id' metadata
+        }
+
+        try:
+            s3_client = self.s3_resource.meta.client
+            head = s3_client.head_object(Bucket=old_artifact_bucket, Key=old_artifact_key)
+            # md5sum is lost by REPLACE if we don't manually preserve it
+            md5sum = head.get('Metadata', {}).get('md5sum')
+            if md5sum:
+                new_metadata['md5sum'] = md5sum
+
+            size = head.get('ContentLength', 0)
+            if size >= self.multipart_copy_threshold:
+                etag = self._multipart_copy_s3_object(old_artifact_bucket, old_artifact_key,
+                                                      new_artifact_key, size, new_metadata)
+            else:
+                copy_result = s3_client.copy_object(
+                    Bucket=self.boot_images_bucket, Key=new_artifact_key,
+                    CopySource={'Bucket': old_artifact_bucket, 'Key': old_artifact_key},
+                    Metadata=new_metadata, MetadataDirective='REPLACE'
+                )
+                LOGGER.debug(f'Got response from copying S3 object: {copy_result}')
+                etag = get_val_by_path(copy_result, 'CopyObjectResult.ETag')
+        except (Boto3Error, BotoCoreError, ClientError) as err:
+            raise APIError(f'Failed to copy artifact {old_artifact_key} to {new_artifact_key}: {err}')
+
+        new_artifact = copy.deepcopy(artifact)
+        new_artifact['link']['etag'] = etag
+        new_artifact['link']['path'] = f's3://{self.boot_images_bucket}/{new_artifact_key}'
+        return new_artifact
+
     def copy_manifest_artifacts(self, manifest, new_image_id, new_name):
         """Copy artifacts specified in a manifest to a location for use by a new image.
 
+        Up to `max_concurrent_artifact_copies` artifacts are copied at the same
+        time.
+
         Args:
             manifest (dict): an IMS image manifest
             new_image_id (str): the image ID of the new manifest. This image ID
@@ -408,47 +667,27 @@ class IMSClient(APIGatewayClient):
                            f'{", ".join(t for t in unrecognized_types)}')
 
         new_artifacts = []
+        if old_artifacts:
+            # Get the S3 resource before starting threads so it is only created once
+            _ = self.s3_resource
 
-        for old_artifact in old_artifacts:
-            old_artifact_path = get_val_by_path(old_artifact, 'link.path')
-
-            if not old_artifact_path:
-                raise APIError(f'Unable to copy artifact of {old_artifact.get("type", "unknown")} '
-                               f'type due to missing path')
-
-            old_artifact_bucket, old_artifact_key = self.split_s3_artifact_path(old_artifact_path)
-            artifact_name = os.path.basename(old_artifact_key)
-            new_artifact_key = f'{new_image_id}/{artifact_name}'
-
-            try:
-                # TODO (CRAYSAT-926): Start verifying HTTPS requests
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+            # TODO (CRAYSAT-926): Start verifying HTTPS requests
+            # Warning filters are process-wide, so this applies to the worker threads too.
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+                num_workers = min(self.max_concurrent_artifact_copies, len(old_artifacts))
+                with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                    futures = [executor.submit(self.copy_manifest_artifact, artifact,
+                                               new_image_id, new_name)
+                               for artifact in old_artifacts]
 
-                    new_metadata = {
-                        'x-shasta-ims-image-id': new_image_id,
-                        'x-shasta-ims-image-name': new_name
-                        # No applicable 'x-shasta-ims-job-id' metadata
-                    }
-
-                    # md5sum is lost by REPLACE if we don't manually preserve it
-                    old_object = self.s3_resource.Object(old_artifact_bucket, old_artifact_key)
-                    md5sum = old_object.metadata.get('md5sum')
-                    if md5sum:
-                        new_metadata['md5sum'] = md5sum
-
-                    new_object = self.s3_resource.Object(self.boot_images_bucket, new_artifact_key)
-                    LOGGER.debug(f'Created new S3 object: {new_object}')
-                    copy_result = new_object.copy_from(CopySource=f'{old_artifact_bucket}/{old_artifact_key}',
-                                                       Metadata=new_metadata, MetadataDirective='REPLACE')
-                    LOGGER.debug(f'Got response from copying S3 object: {copy_result}')
-            except Boto3Error as err:
-                raise APIError(f'Failed to copy artifact {old_artifact_key} to {new_artifact_key}: {err}')
+            errors = [future.exception() for future in futures if future.exception()]
+            if errors:
+                for err in errors[1:]:
+                    LOGGER.error(str(err))
+                raise errors[0]
 
-            new_artifact = copy.deepcopy(old_artifact)
-            new_artifact['link']['etag'] = get_val_by_path(copy_result, 'CopyObjectResult.ETag')
-            new_artifact['link']['path'] = f's3://{self.boot_images_bucket}/{new_artifact_key}'
-            new_artifacts.append(new_artifact)
+            new_artifacts = [future.result() for future in futures]
 
         return {
             'artifacts': new_artifacts,
@@ -548,6 +787,7 @@ class IMSClient(APIGatewayClient):
                 'type': 's3'
             }
             try:
+                self.clear_resource_cache(resource_type='image')
                 self.patch('images', new_image_id, json={'link': new_image_link_info})
             except APIError:
                 raise APIError(f'Failed to update image manifest for new image with id {new_image_id}')
@@ -569,6 +809,7 @@ class IMSClient(APIGatewayClient):
         Raises:
             APIError: if the request to delete the image failed
         """
+        self.clear_resource_cache(resource_type='image')
         try:
             self.delete('images', image_id)
         except APIError as err:
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -31,18 +31,166 @@ Client for interacting with the Version Control Service (VCS).
 # improvement over the version used in cfs-config-util as it can accept a full
 # URL in addition to just the path to the config repo.
 
+import base64
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import os
 import subprocess
 from tempfile import NamedTemporaryFile
+from threading import Lock
 from urllib.parse import ParseResult, urlparse, urlunparse
 
+from kubernetes.client import CoreV1Api
+from kubernetes.client.rest import ApiException
+from kubernetes.config import ConfigException
+from urllib3.exceptions import MaxRetryError
+
 from sat.cached_property import cached_property
+from sat.util import get_kube_api_client
+
+LOGGER = logging.getLogger(__name__)
+
+# The maximum number of `git ls-remote` commands to run at the same time
+MAX_CONCURRENT_LS_REMOTE = 8
+# The Kubernetes secret containing the VCS password
+VCS_CREDENTIALS_SECRET = 'vcs-user-credentials'
+VCS_CREDENTIALS_NAMESPACE = 'services'
+# The environment variable through which the VCS password is passed to the
+# GIT_ASKPASS script. The environment of a process, unlike its command line,
+# is only readable by the user running it.
+VCS_PASSWORD_ENV_VAR = 'SAT_VCS_PASSWORD'
 
 
 class VCSError(Exception):
     """An error occurring during VCS access."""
 
 
+_VCS_PASSWORD = None
+_VCS_PASSWORD_LOCK = Lock()
+
+
+def get_vcs_password():
+    """Get the password of the VCS user from its Kubernetes secret.
+
+    The secret is only read the first time this is called.
+
+    Returns:
+        str: the VCS password.
+
+    Raises:
+        VCSError: if the password cannot be read from the secret.
+    """
+    global _VCS_PASSWORD
+    with _VCS_PASSWORD_LOCK:
+        if _VCS_PASSWORD is None:
+            try:
+                secret = CoreV1Api(get_kube_api_client()).read_namespaced_secret(
+                    VCS_CREDENTIALS_SECRET, VCS_CREDENTIALS_NAMESPACE
+                )
+                _VCS_PASSWORD = base64.b64decode(secret.data['vcs_password']).decode()
+            except (ApiException, ConfigException, MaxRetryError) as err:
+                raise VCSError(f'Unable to read VCS credentials from secret '
+                               f'{VCS_CREDENTIALS_SECRET}: {err}') from err
+            except (KeyError, TypeError, ValueError) as err:
+                raise VCSError(f'Unable to get VCS password from secret '
+                               f'{VCS_CREDENTIALS_SECRET}: {err}') from err
+        return _VCS_PASSWORD
+
+
+class RemoteRefsCache:
+    """A cache of the remote refs of VCS repositories.
+
+    Each repository is only queried with `git ls-remote` once. A failure to
+    query a repository is cached too, so that it is reported for each use of
+    the repository without querying it again.
+    """
+
+    def __init__(self):
+        self._refs_by_url = {}
+        self._url_locks = defaultdict(Lock)
+        self._lock = Lock()
+
+    def get_remote_refs(self, repo):
+        """Get the remote refs of a repository, querying it if not cached.
+
+        Args:
+            repo (VCSRepo): the repository to get the refs of.
+
+        Returns:
+            dict: mapping of remote refs to their corresponding commit hashes
+
+        Raises:
+            VCSError: if there is an error when git accesses VCS to enumerate
+                remote refs
+        """
+        url = repo.vcs_full_url
+        with self._lock:
+            url_lock = self._url_locks[url]
+
+        # Only one thread queries a given repository, and threads querying
+        # different repositories do not wait for each other.
+        with url_lock:
+            if url not in self._refs_by_url:
+                try:
+                    self._refs_by_url[url] = repo.fetch_remote_refs()
+                except VCSError as err:
+                    self._refs_by_url[url] = err
+
+        result = self._refs_by_url[url]
+        if isinstance(result, VCSError):
+            raise result
+        return result
+
+    def prefetch(self, repos, max_workers=MAX_CONCURRENT_LS_REMOTE):
+        """Query the remote refs of many repositories at the same time.
+
+        Failures are not raised here; they are raised when the refs of the
+        repository are used.
+
+        Args:
+            repos (Iterable[VCSRepo]): the repositories to query.
+            max_workers (int): the maximum number of repositories to query at
+                the same time.
+        """
+        repos_by_url = {repo.vcs_full_url: repo for repo in repos}
+        if not repos_by_url:
+            return
+
+        def get_refs_ignoring_errors(repo):
+            try:
+                self.get_remote_refs(repo)
+            except VCSError:
+                pass
+
+        LOGGER.debug('Getting remote refs of %d VCS repositories.', len(repos_by_url))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(repos_by_url))) as executor:
+            list(executor.map(get_refs_ignoring_errors, repos_by_url.values()))
+
+    def clear(self):
+        """Remove all the cached refs."""
+        with self._lock:
+            self._refs_by_url.clear()
+
+
+REMOTE_REFS_CACHE = RemoteRefsCache()
+
+
+def prefetch_remote_refs(repo_urls, max_workers=MAX_CONCURRENT_LS_REMOTE):
+    """Query the remote refs of the given repositories at the same time.
+
+    The refs are cached, so later calls to `VCSRepo.remote_refs` or
+    `VCSRepo.get_commit_hash_for_branch` for these repositories do not query
+    VCS again.
+
+    Args:
+        repo_urls (Iterable[str]): the URLs of the repositories.
+        max_workers (int): the maximum number of repositories to query at the
+            same time.
+    """
+    REMOTE_REFS_CACHE.prefetch([VCSRepo(url) for url in repo_urls], max_workers=max_workers)
+
+
 class VCSRepo:
     """Main client object for accessing VCS."""
     _default_username = os.environ.get('VCS_USERNAME', 'crayvcs')
@@ -64,10 +212,20 @@ class VCSRepo:
         else:
             self.username = username
 
+    @property
+    def vcs_full_url(self):
+        """str: the URL of the repo, including the username, used with git."""
+        user_netloc = f'{self.username}@{self.vcs_host}'
+        url_components = ParseResult(scheme='https', netloc=user_netloc, path=self.repo_path,
+                                     params='', query='', fragment='')
+        return urlunparse(url_components)
+
     @property
     def remote_refs(self):
         """Get the remote refs for a remote repo.
 
+        The refs are only queried from VCS once per process for each repo.
+
         Returns:
             dict: mapping of remote refs to their corresponding commit hashes
 
@@ -75,32 +233,32 @@ class VCSRepo:
             VCSError: if there is an error when git accesses VCS to enumerate
                 remote refs
         """
+        return REMOTE_REFS_CACHE.get_remote_refs(self)
 
-        user_netloc = f'{self.username}@{self.vcs_host}'
-        url_components = ParseResult(scheme='https', netloc=user_netloc, path=self.repo_path,
-                                     params='', query='', fragment='')
-        vcs_full_url = urlunparse(url_components)
-
-        # Get the password directly from k8s to avoid leaking it via the /proc
-        # filesystem.
-        # TODO (CRAYSAT-1214): cfs-config-util uses the Python kubernetes
-        # library (via a small `vcs-creds-helper` script) since kubectl isn't
-        # available in the cfs-config-util image. As part of CRAYSAT-1214, we
-        # probably want to figure out a consistent way to retrieve credentials
-        # regardless of whether kubectl is installed. An argument could be made
-        # that both approaches used are clunky in their own way, and perhaps
-        # there's a cleaner common solution for both.
+    def fetch_remote_refs(self):
+        """Query VCS for the remote refs of the repo with `git ls-remote`.
+
+        Returns:
+            dict: mapping of remote refs to their corresponding commit hashes
+
+        Raises:
+            VCSError: if there is an error when git accesses VCS to enumerate
+                remote refs
+        """
+        # The password is read from k8s once and passed to git through the
+        # environment of the GIT_ASKPASS script to avoid leaking it via the
+        # command lines in the /proc filesystem.
+        password = get_vcs_password()
         with NamedTemporaryFile(delete=False) as cred_helper_script:
-            cred_helper_script.write('#!/bin/bash\n'
-                                     'kubectl get secret -n services vcs-user-credentials '
-                                     '--template={{.data.vcs_password}} | base64 -d'.encode())
+            cred_helper_script.write(f'#!/bin/sh\n'
+                                     f'printf \'%s\\n\' "${VCS_PASSWORD_ENV_VAR}"\n'.encode())
 
         os.chmod(cred_helper_script.name, 0o700)  # Make executable by user
 
         env = dict(os.environ)
-        env.update(GIT_ASKPASS=cred_helper_script.name)
+        env.update({'GIT_ASKPASS': cred_helper_script.name, VCS_PASSWORD_ENV_VAR: password})
         try:
-            proc = subprocess.run(['git', 'ls-remote', vcs_full_url],
+            proc = subprocess.run(['git', 'ls-remote', self.vcs_full_url],
                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                                   env=env, check=True)
         except subprocess.CalledProcessError as err:
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -27,11 +27,12 @@ Implements the creation of CFS configurations from the input file.
 
 import logging
 
-from sat.apiclient import APIError, CFSClient
+from sat.apiclient import APIError
+from sat.apiclient.vcs import prefetch_remote_refs
 from sat.cli.bootprep.input.configuration import InputConfigurationLayer
 from sat.cli.bootprep.output import RequestDumper
 from sat.cli.bootprep.errors import ConfigurationCreateError
-from sat.session import SATSession
+from sat.cli.bootprep.state import CONFIGURATION_ITEM_TYPE, get_content_hash
 from sat.util import pester_choices
 
 LOGGER = logging.getLogger(__name__)
@@ -91,7 +92,121 @@ def handle_existing_configs(cfs_client, input_configs, args):
         return [config for config in input_configs if config.name not in existing_names]
 
 
-def create_configurations(instance, args):
+def layers_match(cfs_layers, input_layers):
+    """Check whether the layers of a configuration in CFS match the layers from the input.
+
+    CFS may add properties to the layers it stores, e.g. the commit which it
+    resolved from the branch of a layer, so only the properties which bootprep
+    sets on a layer are compared. The commit of a layer in CFS is not compared
+    if the input layer specifies a branch and no commit.
+
+    Args:
+        cfs_layers (list of dict): the layers of the configuration in CFS
+        input_layers (list of dict): the layers of the data which would be
+            passed to CFS to create the configuration
+
+    Returns:
+        bool: True if the layers match, False otherwise.
+    """
+    if len(cfs_layers) != len(input_layers):
+        return False
+
+    layer_properties = (set(InputConfigurationLayer.REQUIRED_CFS_PROPERTIES)
+                        | set(InputConfigurationLayer.OPTIONAL_CFS_PROPERTIES))
+    for cfs_layer, input_layer in zip(cfs_layers, input_layers):
+        compared_properties = set(layer_properties)
+        if 'branch' in input_layer and 'commit' not in input_layer:
+            compared_properties.discard('commit')
+        if any(cfs_layer.get(prop) != input_layer.get(prop) for prop in compared_properties):
+            return False
+
+    return True
+
+
+def remove_unchanged_configs(cfs_client, input_configs, state, dry_run):
+    """Remove configurations which are unchanged in CFS.
+
+    A configuration is unchanged if a configuration with its name exists in
+    CFS and its layers match the layers of the data that would be passed to
+    CFS to create it, which include the resolved commit hashes of its layers.
+    The content hashes of unchanged configurations are recorded in `state`,
+    so that the images which use them can be checked for changes.
+
+    Args:
+        cfs_client (CFSClient): The CFS API client
+        input_configs (list of sat.cli.bootprep.input.configuration.InputConfiguration):
+            the list of CFS configurations defined in the input instance.
+        state (sat.cli.bootprep.state.BootprepState): the recorded content
+            hashes of items created by bootprep.
+        dry_run (bool): whether this is a dry-run or not
+
+    Returns:
+        list of InputConfiguration: the configurations which are new or changed.
+
+    Raises:
+        ConfigurationCreateError: If unable to query CFS for existing configurations
+    """
+    try:
+        cfs_configs_by_name = {config.get('name'): config for config in cfs_client.get_configurations()}
+    except APIError as err:
+        raise ConfigurationCreateError(f'Failed to query CFS for existing configurations: {err}')
+
+    changed_configs = []
+    unchanged_names = []
+    for config in input_configs:
+        cfs_config = cfs_configs_by_name.get(config.name)
+        if cfs_config is not None:
+            try:
+                request_body = config.get_cfs_api_data()
+            except ConfigurationCreateError:
+                # The error is reported again when trying to create the configuration
+                request_body = None
+            if request_body is not None and layers_match(cfs_config.get('layers', []),
+                                                         request_body['layers']):
+                state.record(CONFIGURATION_ITEM_TYPE, config.name, get_content_hash(request_body))
+                unchanged_names.append(config.name)
+                continue
+        changed_configs.append(config)
+
+    if unchanged_names:
+        verb = ('will be', 'would be')[dry_run]
+        LOGGER.info(f'The following CFS configurations are unchanged in CFS and '
+                    f'{verb} skipped: {", ".join(unchanged_names)}')
+
+    return changed_configs
+
+
+def prefetch_branch_refs(input_configs):
+    """Query VCS for the refs of all repos with branches to resolve at once.
+
+    Each distinct repo used by a layer that specifies a branch is queried a
+    single time, and all of the repos are queried concurrently. The resulting
+    refs are cached, so resolving the branches of the layers afterward does
+    not need to query VCS again.
+
+    Args:
+        input_configs (list of sat.cli.bootprep.input.configuration.InputConfiguration):
+            the CFS configurations whose layer branches will be resolved.
+
+    Returns:
+        None
+    """
+    repo_urls = set()
+    for input_config in input_configs:
+        for layer in input_config.layers:
+            try:
+                if layer.branch is not None:
+                    repo_urls.add(layer.clone_url)
+            except ConfigurationCreateError:
+                # This error is reported when the layer's data is obtained
+                continue
+
+    if repo_urls:
+        LOGGER.debug(f'Querying VCS for branches of {len(repo_urls)} repositories')
+        prefetch_remote_refs(repo_urls)
+
+
+def create_configurations(instance, args, state=None):
     """Create the CFS configurations defined in the given instance.
 
     Args:
@@ -100,6 +215,11 @@ def create_configurations(instance, args):
             against the schema.
         args: The argparse.Namespace object containing the parsed arguments
             passed to the bootprep subcommand.
+        state (sat.cli.bootprep.state.BootprepState or None): the recorded
+            content hashes of items created by bootprep. If given, the content
+            hashes of the configurations are recorded in it, and configurations
+            which are unchanged in CFS are skipped unless `args.skip_unchanged`
+            is False or `args.overwrite_configs` is True.
 
     Returns:
         None
@@ -120,7 +240,14 @@ def create_configurations(instance, args):
 
     LOGGER.info(f'{create_verb} {len(input_configs)} CFS configuration(s)')
 
-    cfs_client = CFSClient(SATSession())
+    cfs_client = instance.cfs_client
+
+    if args.resolve_branches:
+        prefetch_branch_refs(input_configs)
+
+    if state is not None and args.skip_unchanged and not args.overwrite_configs:
+        input_configs = remove_unchanged_configs(cfs_client, input_configs, state, args.dry_run)
+
     configs_to_create = handle_existing_configs(cfs_client, input_configs, args)
     failed_configs = []
 
@@ -147,6 +274,11 @@ def create_configurations(instance, args):
                 LOGGER.error(f'Failed to create or update configuration '
                              f'{cfs_configuration.name}: {err}')
                 failed_configs.append(cfs_configuration)
+                continue
+
+        if state is not None:
+            # In a dry run, this is only recorded to determine which images would be rebuilt
+            state.record(CONFIGURATION_ITEM_TYPE, config_name, get_content_hash(request_body))
 
     if failed_configs:
         raise ConfigurationCreateError(f'Failed to create {len(failed_configs)} configuration(s)')
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -36,3 +36,23 @@ DOCS_ARCHIVE_FILE_NAME = f'{DOCS_ARCHIVE_NAME}.tar.gz'
 
 # Example file name generated by 'sat bootprep generate-example'
 EXAMPLE_FILE_NAME = 'example-bootprep-input.yaml'
+
+# Default maximum numbers of IMS image build jobs and CFS image customization
+# sessions which 'sat bootprep run' runs at the same time
+DEFAULT_MAX_CONCURRENT_IMAGE_BUILDS = 10
+DEFAULT_MAX_CONCURRENT_IMAGE_CUSTOMIZATIONS = 10
+
+# Time in seconds for which 'sat bootprep run' uses cached IMS resources
+IMS_RESOURCE_CACHE_TTL = 300
+
+# Time in seconds for which 'sat bootprep run' uses cached CFS configurations
+CFS_CONFIGURATION_CACHE_TTL = 300
+
+# File caching the bootprep schema after it has been loaded and checked
+DEFAULT_SCHEMA_CACHE_FILE = f'{os.getenv("HOME", "/root")}/.cache/sat/bootprep-schema.json'
+
+# The maximum number of schema validation errors reported for an input file
+DEFAULT_MAX_VALIDATION_ERRORS = 50
+
+# File recording the content hashes of the items created by 'sat bootprep run'
+DEFAULT_STATE_FILE = f'{os.getenv("HOME", "/root")}/.config/sat/bootprep/state.json'
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -49,18 +49,23 @@ class BootPrepValidationError(Exception):
 class ValidationErrorCollection(BootPrepValidationError):
     """A group of errors occurred validating the schema."""
 
-    def __init__(self, errors):
+    def __init__(self, errors, truncated=False):
         """Create a ValidationErrorCollection.
 
         Args:
             errors (Iterable of jsonschema.ValidationError): An iterable of the
                 errors that occurred.
+            truncated (bool): True if validation stopped before all errors
+                were found, False otherwise.
         """
         self.errors = [EnhancedValidationError(error) for error in errors]
+        self.truncated = truncated
 
     def __str__(self):
         ret = 'Input file is invalid with the following validation errors:\n'
         ret += indent('\n'.join([str(err) for err in self.errors]), NESTED_ERROR_INDENT)
+        if self.truncated:
+            ret += f'\nOnly the first {len(self.errors)} validation errors are shown.'
         return ret
 
 
@@ -27,7 +27,9 @@ Generate example input file by gathering info from the product catalog.
 from collections import namedtuple
 import logging
 
-from cray_product_catalog.query import ProductCatalog, ProductCatalogError
+from cray_product_catalog.query import ProductCatalogError
+
+from sat.product_catalog import get_product_catalog
 
 
 LOGGER = logging.getLogger(__name__)
@@ -71,7 +73,7 @@ def get_example_input_config_data(product_catalog, config_name, example_layers):
     data to the returned example input data.
 
     Args:
-        product_catalog (cray_product_catalog.query.ProductCatalog): the
+        product_catalog (sat.product_catalog.ProductCatalogSnapshot): the
             product catalog used to query for product data
         config_name (str): the name of the configuration to create
         example_layers (list of ExampleConfigLayer): the list of example layers
@@ -109,7 +111,7 @@ def get_example_cos_and_uan_configs(product_catalog):
     """Get input data for example COS and UAN CFS configurations.
 
     Args:
-        product_catalog (cray_product_catalog.query.ProductCatalog): the
+        product_catalog (sat.product_catalog.ProductCatalogSnapshot): the
             product catalog used to query for product data
 
     Returns:
@@ -124,7 +126,7 @@ def get_product_recipe_names(product_catalog, product_name):
     """Get the recipes provided by the given product.
 
     Args:
-        product_catalog (cray_product_catalog.query.ProductCatalog): the
+        product_catalog (sat.product_catalog.ProductCatalogSnapshot): the
             product catalog used to query for product data
         product_name (str): the name of the product for which to get recipes
 
@@ -201,7 +203,7 @@ def get_example_images_and_templates(product_catalog, product_name, config_name,
     """Get example image and session template data for a given product
 
     Args:
-        product_catalog (cray_product_catalog.query.ProductCatalog): the
+        product_catalog (sat.product_catalog.ProductCatalogSnapshot): the
             product catalog used to query for product data
         product_name (str): the name of the product to query for recipes from
             which to construct example image and session template input data
@@ -233,7 +235,7 @@ def get_example_cos_and_uan_images_session_templates(product_catalog):
     """Get input data for example COS and UAN images and session templates.
 
     Args:
-        product_catalog (cray_product_catalog.query.ProductCatalog): the
+        product_catalog (sat.product_catalog.ProductCatalogSnapshot): the
             product catalog used to query for product data
 
     Returns:
@@ -271,7 +273,7 @@ def get_example_cos_and_uan_data():
             generate example input data
     """
     try:
-        product_catalog = ProductCatalog()
+        product_catalog = get_product_catalog()
     except ProductCatalogError as err:
         raise BootprepExampleError(f'Failed to query product catalog to generate example data: {err}')
 
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -27,11 +27,17 @@ Implements the build and customization of IMS images from the input file.
 from collections import defaultdict, Counter
 import logging
 import math
+import time
 
-from sat.apiclient import APIError, CFSClient, IMSClient
+from sat.apiclient import APIError
+from sat.apiclient.cfs import CFSSessionTracker
+from sat.cli.bootprep.constants import (
+    DEFAULT_MAX_CONCURRENT_IMAGE_BUILDS,
+    DEFAULT_MAX_CONCURRENT_IMAGE_CUSTOMIZATIONS
+)
 from sat.cli.bootprep.errors import ImageCreateError
 from sat.cli.bootprep.public_key import get_ims_public_key_id
-from sat.session import SATSession
+from sat.cli.bootprep.state import CONFIGURATION_ITEM_TYPE, IMAGE_ITEM_TYPE, get_content_hash
 from sat.util import pester_choices
 from sat.waiting import (
     DependencyCycleError,
@@ -154,6 +160,123 @@ def handle_existing_images(ims_client, input_images, overwrite, skip, dry_run):
         return [image for image in input_images if image.name not in existing_input_names]
 
 
+def get_image_content_hashes(input_images, cfs_client, input_config_names, state):
+    """Get the content hash of each input image.
+
+    The content hash of an image covers the IMS id of its base recipe or
+    image, the content hash of its configuration, and its configuration group
+    names. If its base is another image in the input file, the content hash of
+    that image is used in place of an IMS id, so that changing an image also
+    changes every image built from it.
+
+    Args:
+        input_images (list of sat.cli.bootprep.input.image.InputImage): the
+            input images in the bootprep input instance
+        cfs_client (sat.apiclient.CFSClient): the CFS client to query for
+            configurations which are not defined in the input file
+        input_config_names (list of str): the names of the configurations
+            defined in the input file. Their content hashes are taken from
+            `state`, where they were recorded when they were created.
+        state (sat.cli.bootprep.state.BootprepState): the recorded content
+            hashes of items created by bootprep.
+
+    Returns:
+        dict: a mapping from each input image to its content hash, or to None
+            if its content hash could not be determined.
+    """
+    input_images_by_name = {input_image.name: input_image for input_image in input_images}
+    config_hashes = {}
+    image_hashes = {}
+
+    def get_config_hash(config_name):
+        if config_name not in config_hashes:
+            if config_name in input_config_names:
+                config_hashes[config_name] = state.get_hash(CONFIGURATION_ITEM_TYPE, config_name)
+            else:
+                try:
+                    layers = cfs_client.get_configuration(config_name).get('layers')
+                    config_hashes[config_name] = get_content_hash(layers)
+                except APIError:
+                    config_hashes[config_name] = None
+        return config_hashes[config_name]
+
+    def get_image_hash(image):
+        if image in image_hashes:
+            return image_hashes[image]
+        # Guards against circular dependencies, which find_image_dependencies reports
+        image_hashes[image] = None
+
+        base_image_name = image.ims_data.get('name')
+        if not image.base_is_recipe and 'id' not in image.ims_data \
+                and base_image_name in input_images_by_name:
+            base = {'input_image': get_image_hash(input_images_by_name[base_image_name])}
+        else:
+            try:
+                base = {image.base_resource_type: image.ims_base['id']}
+            except (ImageCreateError, KeyError):
+                base = {image.base_resource_type: None}
+
+        config_hash = get_config_hash(image.configuration) if image.configuration else ''
+        if None in base.values() or config_hash is None:
+            return None
+
+        image_hashes[image] = get_content_hash({
+            'base': base,
+            'configuration': config_hash,
+            'configuration_group_names': image.configuration_group_names
+        })
+        return image_hashes[image]
+
+    for input_image in input_images:
+        get_image_hash(input_image)
+
+    return image_hashes
+
+
+def remove_unchanged_images(ims_client, input_images, content_hashes, state, dry_run):
+    """Remove images which are unchanged since bootprep last created them.
+
+    An image is unchanged if the image which bootprep last created with its
+    name still exists in IMS and its content hash is the one recorded when it
+    was created.
+
+    Args:
+        ims_client (sat.apiclient.IMSClient): the IMS API client
+        input_images (list of sat.cli.bootprep.input.image.InputImage): the
+            input images in the bootprep input instance
+        content_hashes (dict): mapping from input images to content hashes as
+            returned by `get_image_content_hashes`
+        state (sat.cli.bootprep.state.BootprepState): the recorded content
+            hashes of items created by bootprep.
+        dry_run (bool): whether this is a dry-run or not
+
+    Returns:
+        list of InputImage: the images which are new or changed
+
+    Raises:
+        ImageCreateError: if unable to query IMS for existing images
+    """
+    ims_images_by_name = get_ims_images_by_name(ims_client)
+
+    changed_images = []
+    unchanged_names = []
+    for image in input_images:
+        record = state.get_record(IMAGE_ITEM_TYPE, image.name)
+        existing_ids = [ims_image.get('id') for ims_image in ims_images_by_name.get(image.name, [])]
+        if (state.is_unchanged(IMAGE_ITEM_TYPE, image.name, content_hashes.get(image))
+                and record.get('id') in existing_ids):
+            unchanged_names.append(image.name)
+        else:
+            changed_images.append(image)
+
+    if unchanged_names:
+        verb = ('will be', 'would be')[dry_run]
+        LOGGER.info(f'The following images are unchanged since they were last created '
+                    f'and {verb} skipped: {", ".join(unchanged_names)}')
+
+    return changed_images
+
+
 def find_image_dependencies(input_images):
     """Find and record any dependencies between images.
 
@@ -286,31 +409,222 @@ def validate_image_configurations(input_images, cfs_client, input_config_names,
                                f'input images')
 
 
+def get_critical_path_lengths(input_images):
+    """Get the length of the longest chain of dependent images for each image.
+
+    The length counts the image itself, so an image with no dependents has a
+    length of 1. Images with longer chains of dependents should be started
+    first because more work is waiting on them.
+
+    Args:
+        input_images (list of sat.cli.bootprep.input.image.InputImage): the
+            images with their dependencies already found by
+            `find_image_dependencies`.
+
+    Returns:
+        dict: a mapping from each image to the length of its longest chain of
+            dependent images.
+    """
+    lengths = {}
+
+    def get_length(image):
+        if image not in lengths:
+            lengths[image] = 1 + max((get_length(dependent) for dependent in image.dependents),
+                                     default=0)
+        return lengths[image]
+
+    for input_image in input_images:
+        get_length(input_image)
+
+    return lengths
+
+
 class ImageCreationGroupWaiter(DependencyGroupWaiter):
     """Kicks off image creation in IMS and waits for jobs to complete
 
     This will also handle creating jobs for dependent images once their
     dependencies have completed.
+
+    Images are queued for each stage of creation, which is the IMS image build
+    job followed by the CFS image customization session, and at most a given
+    number of images are in each stage at the same time. When a stage has a
+    free slot, the queued image with the longest chain of dependent images is
+    started first.
+
+    If a session tracker is given, the status of all the running CFS image
+    customization sessions is updated by it once per poll, rather than by
+    each image separately.
+
+    Attributes:
+        max_concurrent (dict): the maximum number of images in each stage at
+            the same time.
+        queued (dict): the images waiting for a free slot in each stage.
+        running (dict): the images currently in each stage.
+        stage_times (dict): mapping from each image to a dictionary mapping
+            from each stage of the image to a dictionary with the times at
+            which the image was 'queued', 'started' and 'finished' in the stage.
+        session_tracker (sat.apiclient.cfs.CFSSessionTracker or None): the
+            tracker of the CFS image customization sessions, if any.
+        session_tracker_failures (int): the number of consecutive failures
+            to update the session tracker.
     """
 
-    def __init__(self, members, timeout, poll_interval=10, retries=0):
+    BUILD_STAGE = 'IMS image build'
+    CUSTOMIZE_STAGE = 'CFS image customization'
+    STAGES = (BUILD_STAGE, CUSTOMIZE_STAGE)
+    # The number of consecutive failures to update the session tracker after
+    # which the images being customized fail
+    MAX_SESSION_TRACKER_FAILURES = 5
+
+    def __init__(self, members, timeout, poll_interval=10, retries=0,
+                 max_image_builds=DEFAULT_MAX_CONCURRENT_IMAGE_BUILDS,
+                 max_image_customizations=DEFAULT_MAX_CONCURRENT_IMAGE_CUSTOMIZATIONS,
+                 session_tracker=None):
         """Create a new ImageCreationWaiter
 
-        This just overrides the default for poll_interval from the superclass.
-
         Args:
             members (list of sat.cli.bootprep.input.image.InputImage): the list
-                of IMSImage objects without dependencies to create first.
+                of all IMSImage objects to create.
             timeout: See GroupWaiter docstring
             poll_interval: See GroupWaiter docstring
             retries: See GroupWaiter docstring
+            max_image_builds (int): the maximum number of IMS image build jobs
+                to run at the same time.
+            max_image_customizations (int): the maximum number of CFS image
+                customization sessions to run at the same time.
+            session_tracker (sat.apiclient.cfs.CFSSessionTracker or None): the
+                tracker to add CFS image customization sessions to.
+
+        Raises:
+            ValueError: if either maximum is less than one.
         """
+        if max_image_builds < 1 or max_image_customizations < 1:
+            raise ValueError('The maximum numbers of concurrent image builds and '
+                             'customizations must be at least one.')
+
         super().__init__(members, timeout, poll_interval, retries)
 
+        self.max_concurrent = {
+            self.BUILD_STAGE: max_image_builds,
+            self.CUSTOMIZE_STAGE: max_image_customizations
+        }
+        self.queued = {stage: set() for stage in self.STAGES}
+        self.running = {stage: set() for stage in self.STAGES}
+        self._reported_queued = {stage: set() for stage in self.STAGES}
+        self.stage_times = defaultdict(dict)
+        self.critical_path_lengths = get_critical_path_lengths(self.members)
+        self.session_tracker = session_tracker
+        self.session_tracker_failures = 0
+
     def condition_name(self):
         """str: the name of the condition being waited for"""
         return 'creation of IMS images'
 
+    def _queue_member(self, member, stage):
+        """Queue the given member to wait for a free slot in the given stage.
+
+        Args:
+            member (sat.cli.bootprep.input.image.InputImage): the image to queue
+            stage (str): the stage of image creation to queue it for
+
+        Returns:
+            None
+        """
+        self.queued[stage].add(member)
+        self.stage_times[member][stage] = {'queued': time.monotonic()}
+
+    def _finish_member_stage(self, member, stage):
+        """Record that the given member has finished the given stage, if it was in it.
+
+        Args:
+            member (sat.cli.bootprep.input.image.InputImage): the image
+            stage (str): the stage of image creation
+
+        Returns:
+            None
+        """
+        if member in self.running[stage]:
+            self.running[stage].remove(member)
+            self.stage_times[member][stage]['finished'] = time.monotonic()
+
+    def _start_member_stage(self, member, stage):
+        """Start the given stage for the given member.
+
+        Args:
+            member (sat.cli.bootprep.input.image.InputImage): the image
+            stage (str): the stage of image creation to start
+
+        Raises:
+            WaitingFailure: if the stage could not be started
+        """
+        if stage == self.BUILD_STAGE:
+            member.begin_image_create()
+        else:
+            try:
+                member.begin_image_configure(session_tracker=self.session_tracker)
+            except ImageCreateError as err:
+                raise WaitingFailure(str(err)) from err
+
+    def _launch_queued_members(self):
+        """Start queued members in each stage which has free slots.
+
+        Members with the longest chains of dependent images are started first,
+        followed by those which have been queued longest.
+
+        Returns:
+            None
+        """
+        for stage in self.STAGES:
+            free_slots = max(self.max_concurrent[stage] - len(self.running[stage]), 0)
+            to_launch = sorted(
+                self.queued[stage],
+                key=lambda m: (-self.critical_path_lengths.get(m, 1),
+                               self.stage_times[m][stage]['queued'])
+            )[:free_slots]
+            for member in to_launch:
+                self.queued[stage].remove(member)
+                self.stage_times[member][stage]['started'] = time.monotonic()
+                self.running[stage].add(member)
+                try:
+                    self._start_member_stage(member, stage)
+                except WaitingFailure as err:
+                    self._finish_member_stage(member, stage)
+                    self._member_failed(member, WaitingFailure(f'failed to start {stage}: {err}'))
+
+            for member in self.queued[stage] - self._reported_queued[stage]:
+                LOGGER.info(f'Image {member.name} is waiting for one of '
+                            f'{self.max_concurrent[stage]} slots for {stage}.')
+                self._reported_queued[stage].add(member)
+
+    def _begin_member(self, member):
+        """Queue the given member to be started once a slot is free.
+
+        Images whose base is an image rather than a recipe do not need to be
+        built by IMS, so they do not wait for a slot.
+
+        Args:
+            member (sat.cli.bootprep.input.image.InputImage): the image to begin
+
+        Returns:
+            None
+        """
+        if member in self.begun:
+            return
+
+        self.begun.add(member)
+        if member.base_is_recipe:
+            self._queue_member(member, self.BUILD_STAGE)
+        else:
+            try:
+                member.begin_image_create()
+            except WaitingFailure as err:
+                self._member_failed(member, err)
+
+    def pre_wait_action(self):
+        super().pre_wait_action()
+        self._launch_queued_members()
+        self.pending -= self.failed
+
     def member_has_completed(self, member):
         """Check whether the given IMSImage member has been created and/or configured
 
@@ -334,8 +648,105 @@ class ImageCreationGroupWaiter(DependencyGroupWaiter):
         except ImageCreateError as err:
             raise WaitingFailure(f'status check failed: {err}')
 
+    def _update_session_tracker(self):
+        """Update the status of the CFS sessions of images being customized.
+
+        If the status cannot be updated, the images being customized are
+        checked again at the next poll. Every image being customized fails
+        only if the status cannot be updated `MAX_SESSION_TRACKER_FAILURES`
+        times in a row.
+
+        Returns:
+            None
+        """
+        if self.session_tracker is None or not self.running[self.CUSTOMIZE_STAGE]:
+            return
+
+        try:
+            self.session_tracker.update()
+        except APIError as err:
+            self.session_tracker_failures += 1
+            if self.session_tracker_failures < self.MAX_SESSION_TRACKER_FAILURES:
+                LOGGER.warning(f'Failed to check status of CFS image customization sessions '
+                               f'({self.session_tracker_failures} of '
+                               f'{self.MAX_SESSION_TRACKER_FAILURES} attempts); '
+                               f'will check again: {err}')
+                return
+
+            for member in list(self.running[self.CUSTOMIZE_STAGE]):
+                self._finish_member_stage(member, self.CUSTOMIZE_STAGE)
+                self._member_failed(member, WaitingFailure(f'status check failed: {err}'))
+        else:
+            self.session_tracker_failures = 0
+
+    def members_have_completed(self, members):
+        """Check which images have completed, moving them through the stages.
+
+        Images waiting for a free slot are not checked. Images which finish
+        being built are queued for customization, if needed, and queued images
+        are started in any slots which are freed. The status of CFS sessions is
+        updated by the session tracker, if any, before the images are checked.
+
+        Args:
+            members (set): the images to check.
+
+        Returns:
+            set: the images which have completed.
+        """
+        self._launch_queued_members()
+        self._update_session_tracker()
+
+        completed = set()
+        for member in members:
+            if member in self.failed or any(member in queued for queued in self.queued.values()):
+                continue
 
-def create_images(instance, args):
+            try:
+                member_completed = self.member_has_completed(member)
+            except WaitingFailure as err:
+                self._member_failed(member, err)
+                member_completed = True
+
+            if member_completed or member.awaiting_image_configure:
+                self._finish_member_stage(member, self.BUILD_STAGE)
+            if member_completed:
+                self._finish_member_stage(member, self.CUSTOMIZE_STAGE)
+                if member not in self.failed:
+                    completed.add(member)
+            elif member.awaiting_image_configure and member not in self.running[self.CUSTOMIZE_STAGE]:
+                self._queue_member(member, self.CUSTOMIZE_STAGE)
+
+        self._launch_queued_members()
+        return completed
+
+    def get_queue_and_run_times(self, member):
+        """Get the time the given member spent waiting for slots and in stages.
+
+        Args:
+            member (sat.cli.bootprep.input.image.InputImage): the image
+
+        Returns:
+            tuple of (float, float): the total time, in seconds, the image
+                spent queued waiting for a free slot, and the total time it
+                spent running in stages.
+        """
+        now = time.monotonic()
+        queue_time = run_time = 0.0
+        for times in self.stage_times[member].values():
+            started = times.get('started')
+            queue_time += (started if started is not None else now) - times['queued']
+            if started is not None:
+                run_time += times.get('finished', now) - started
+        return queue_time, run_time
+
+    def post_wait_action(self):
+        for member in sorted(self.stage_times, key=lambda m: m.name):
+            queue_time, run_time = self.get_queue_and_run_times(member)
+            LOGGER.info(f'Image {member.name} waited {queue_time:.0f} seconds for '
+                        f'free slots and ran for {run_time:.0f} seconds.')
+
+
+def create_images(instance, args, state=None):
     """Create and customize IMS images defined in the given instance
 
     Args:
@@ -344,6 +755,11 @@ def create_images(instance, args):
             against the schema.
         args: The argparse.Namespace object containing the parsed arguments
             passed to the bootprep subcommand.
+        state (sat.cli.bootprep.state.BootprepState or None): the recorded
+            content hashes of items created by bootprep. If given, the content
+            hashes of the created images are recorded in it, and unchanged
+            images are skipped unless `args.skip_unchanged` is False or
+            `args.overwrite_images` is True.
 
     Returns: None
 
@@ -355,9 +771,9 @@ def create_images(instance, args):
         LOGGER.info('Given input did not define any IMS images')
         return
 
-    sat_session = SATSession()
-    ims_client = IMSClient(sat_session)
-    cfs_client = CFSClient(sat_session)
+    # Use the clients of the instance, which hold the data prefetched from IMS and CFS
+    ims_client = instance.ims_client
+    cfs_client = instance.cfs_client
 
     ims_public_key_id = get_ims_public_key_id(ims_client, public_key_id=args.public_key_id,
                                               public_key_file_path=args.public_key_file_path,
@@ -369,6 +785,15 @@ def create_images(instance, args):
         image.public_key_id = ims_public_key_id
 
     validate_unique_image_names(input_images)
+
+    content_hashes = {}
+    if state is not None:
+        content_hashes = get_image_content_hashes(input_images, cfs_client,
+                                                  instance.input_configuration_names, state)
+        if args.skip_unchanged and not args.overwrite_images:
+            input_images = remove_unchanged_images(ims_client, input_images, content_hashes,
+                                                   state, args.dry_run)
+
     images_to_create = handle_existing_images(ims_client, input_images, args.overwrite_images,
                                               args.skip_existing_images, args.dry_run)
 
@@ -379,8 +804,7 @@ def create_images(instance, args):
     create_verb = ('Creating', 'Would create')[args.dry_run]
     LOGGER.info(f'{create_verb} {len(images_to_create)} images.')
 
-    if not input_images:
-        LOGGER.info('Given input did not define any IMS images')
+    if not images_to_create:
         return
 
     # This can raise ImageCreateError if there are any cycles
@@ -402,9 +826,19 @@ def create_images(instance, args):
         return
 
     # Default to no timeout since it's unknown how long image creation could take
-    waiter = ImageCreationGroupWaiter(images_to_create, math.inf)
+    waiter = ImageCreationGroupWaiter(images_to_create, math.inf,
+                                      max_image_builds=args.max_concurrent_image_builds,
+                                      max_image_customizations=args.max_concurrent_image_customizations,
+                                      session_tracker=CFSSessionTracker(cfs_client))
     LOGGER.info('Creating images')
     waiter.wait_for_completion()
+
+    if state is not None:
+        for image in images_to_create:
+            if image.completed_successfully and content_hashes.get(image):
+                state.record(IMAGE_ITEM_TYPE, image.name, content_hashes[image],
+                             id=image.final_image_id)
+
     if waiter.failed:
         raise ImageCreateError(f'Creation of {len(waiter.failed)} images failed')
     else:
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -140,6 +140,21 @@ class BaseInputItem(Validatable, ABC):
     def __str__(self):
         return f'{self.description} named {self.name}'
 
+    def matches_existing_item(self, existing_item):
+        """Check whether an existing item with the same name has the content of this item.
+
+        The default implementation returns False, meaning the item is always
+        considered changed.
+
+        Args:
+            existing_item (dict): the API data of the existing item
+
+        Returns:
+            bool: True if the existing item is unchanged from this item,
+                False otherwise.
+        """
+        return False
+
     def add_items_to_delete(self, delete_list):
         """Add a list of items that should be deleted after this item is created.
 
@@ -265,7 +280,7 @@ class BaseInputItemCollection(ABC, Validatable):
                 f'{", ".join(non_unique_names)}'
             )
 
-    def handle_existing_items(self, overwrite_all, skip_all, dry_run):
+    def handle_existing_items(self, overwrite_all, skip_all, dry_run, skip_unchanged=False):
         """Handle any existing items that have the same name as this item.
 
         Sets `self.skipped_items` to the list of items that should be skipped
@@ -276,6 +291,8 @@ class BaseInputItemCollection(ABC, Validatable):
                 overwritten
             skip_all (bool): if True, all existing items should be skipped
             dry_run (bool): whether this is a dry-run or not
+            skip_unchanged (bool): if True, an existing item which matches
+                its input item is skipped without prompting.
 
         Returns:
             None
@@ -300,6 +317,12 @@ class BaseInputItemCollection(ABC, Validatable):
 
         for item in existing_input_items:
             conflicting_items = existing_items_by_name.get(item.name, [])
+            if (skip_unchanged and len(conflicting_items) == 1
+                    and item.matches_existing_item(conflicting_items[0])):
+                self.skipped_items.append(item)
+                LOGGER.info(f'The existing {item} is unchanged and {verb} skipped.')
+                continue
+
             count = len(conflicting_items)
             conflict_msg = (f'{count} {self.inflector.plural(self.item_class.description, count)} '
                             f'already {self.inflector.plural_verb("exists", count)} with the name {item.name}')
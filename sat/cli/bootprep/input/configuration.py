@@ -129,7 +129,7 @@ class InputConfigurationLayer(ABC):
         Args:
             layer_data (dict): The data for a layer, already validated against
                 the bootprep input file schema.
-            product_catalog (cray_product_catalog.query.ProductCatalog):
+            product_catalog (sat.product_catalog.ProductCatalogSnapshot):
                 the product catalog object
 
         Raises:
@@ -203,7 +203,7 @@ class ProductInputConfigurationLayer(InputConfigurationLayer):
 
         Args:
             layer_data (dict): the layer data from the input instance
-            product_catalog (cray_product_catalog.query.ProductCatalog or None):
+            product_catalog (sat.product_catalog.ProductCatalogSnapshot or None):
                 the product catalog object
         """
         super().__init__(layer_data)
@@ -223,7 +223,7 @@ class ProductInputConfigurationLayer(InputConfigurationLayer):
 
     @cached_property
     def matching_product(self):
-        """sat.software_inventory.products.InstalledProductVersion: the matching installed product"""
+        """cray_product_catalog.query.InstalledProductVersion: the matching installed product"""
         if self.product_catalog is None:
             raise ConfigurationCreateError(f'Product catalog data is not available.')
 
@@ -300,7 +300,7 @@ class InputConfiguration:
         Args:
             configuration_data (dict): The data for a configuration, already
                 validated against the bootprep input file schema.
-            product_catalog (cray_product_catalog.query.ProductCatalog):
+            product_catalog (sat.product_catalog.ProductCatalogSnapshot):
                 the product catalog object
 
         Raises:
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -60,6 +60,9 @@ class InputImage(DependencyGroupMember):
             once it is finished.
         image_configure_session (dict or None): the CFS session for customizing
             the image, if applicable.
+        session_tracker (sat.apiclient.cfs.CFSSessionTracker or None): the
+            tracker which updates the status of `image_configure_session`, or
+            None if the session updates its own status.
         image_create_success (bool): whether the image was successfully created
         image_configure_success (bool): whether the image was successfully
             configured
@@ -94,6 +97,7 @@ class InputImage(DependencyGroupMember):
         self.image_create_job = None
         self.finished_job_details = None
         self.image_configure_session = None
+        self.session_tracker = None
 
         # Set by image_create_complete and image_configure_complete properties
         self._image_create_complete = False
@@ -332,9 +336,15 @@ class InputImage(DependencyGroupMember):
         else:
             LOGGER.info(f'Not deleting failed {ims_job_description} to allow debugging')
 
-    def begin_image_configure(self):
+    def begin_image_configure(self, session_tracker=None):
         """Launch the CFS session to configure the image
 
+        Args:
+            session_tracker (sat.apiclient.cfs.CFSSessionTracker or None): if
+                given, the tracker to which the session is added. The tracker
+                must then be updated before each check of
+                `image_configure_complete`.
+
         Returns:
             None. Sets `self.image_configure_session` for querying status of session.
 
@@ -352,12 +362,27 @@ class InputImage(DependencyGroupMember):
 
         try:
             self.image_configure_session = self.cfs_client.create_image_customization_session(
-                self.configuration, self.image_id_to_configure, self.configuration_group_names, self.name)
+                self.configuration, self.image_id_to_configure, self.configuration_group_names, self.name,
+                tags=session_tracker.tags if session_tracker else None)
         except APIError as err:
             raise ImageCreateError(f'Failed to launch image customization CFS session: {err}')
 
+        if session_tracker:
+            session_tracker.add_session(self.image_configure_session)
+            self.session_tracker = session_tracker
+
         LOGGER.info(f'Created CFS session {session_name} to configure image {self.name}')
 
+    @property
+    def awaiting_image_configure(self):
+        """bool: True if the image was created and is waiting for its CFS session to be launched
+
+        This does not query IMS, so it reflects the status of image creation as
+        of the last access of `image_create_complete`.
+        """
+        return bool(self._image_create_complete and self.image_create_success
+                    and self.configuration and not self.image_configure_session)
+
     @property
     def image_configure_complete(self):
         """bool: True if the image has been configured
@@ -368,10 +393,12 @@ class InputImage(DependencyGroupMember):
         if self._image_configure_complete:
             return True
 
-        try:
-            self.image_configure_session.update_status(self.k8s_api)
-        except APIError as err:
-            raise ImageCreateError(str(err))
+        # A session tracker updates the status of all its sessions at once
+        if not self.session_tracker:
+            try:
+                self.image_configure_session.update_status(self.k8s_api)
+            except APIError as err:
+                raise ImageCreateError(str(err))
 
         self._image_configure_complete = self.image_configure_session.complete
         self.image_configure_success = self.image_configure_session.succeeded
@@ -442,7 +469,11 @@ class InputImage(DependencyGroupMember):
 
     @property
     def has_completed(self):
-        """Check whether image is complete, kicking off next stage if necessary
+        """Check whether image is complete
+
+        If the image needs to be configured, the CFS session is not launched
+        here. Once `awaiting_image_configure` is True, `begin_image_configure`
+        must be called to launch it.
 
         Returns:
             bool: True if the image creation and configuration is done or failed,
@@ -458,7 +489,10 @@ class InputImage(DependencyGroupMember):
                 return True
 
             if not self.image_configure_session:
-                # This properly handles whether configuration is needed or not
+                if self.configuration:
+                    # Waiting for begin_image_configure to launch the CFS session
+                    return False
+                # This marks configuration complete since none is needed
                 self.begin_image_configure()
 
             if self.image_configure_complete:
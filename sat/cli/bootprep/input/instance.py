@@ -47,7 +47,7 @@ class InputInstance:
                 requests to the IMS API
             bos_client (sat.apiclient.BOSClientCommon): the BOS API client to make
                 requests to the BOS API
-            product_catalog (cray_product_catalog.query.ProductCatalog):
+            product_catalog (sat.product_catalog.ProductCatalogSnapshot):
                 the product catalog object
         """
         self.instance_dict = instance_dict
@@ -33,6 +33,27 @@ from sat.cli.bootprep.errors import InputItemCreateError, InputItemValidateError
 from sat.util import get_val_by_path
 
 
+def data_is_subset(data, existing_data):
+    """Check whether the given data is contained in the existing data.
+
+    Dictionaries are compared recursively, so the existing data may contain
+    keys which are not in the given data. Other values must be equal.
+
+    Args:
+        data: the data to look for
+        existing_data: the existing data in which to look
+
+    Returns:
+        bool: True if `data` is contained in `existing_data`, False otherwise.
+    """
+    if isinstance(data, dict):
+        return isinstance(existing_data, dict) and all(
+            key in existing_data and data_is_subset(value, existing_data[key])
+            for key, value in data.items()
+        )
+    return data == existing_data
+
+
 class InputSessionTemplate(BaseInputItem):
     """A BOS session template from a bootprep input file.
 
@@ -156,6 +177,26 @@ class InputSessionTemplate(BaseInputItem):
         # Accessing the image_record queries IMS to find the image
         _ = self.image_record
 
+    def matches_existing_item(self, existing_item):
+        """Check whether the existing session template matches the data to create this one.
+
+        BOS may add properties to the session templates it stores, so only the
+        properties which bootprep sets are compared, but the existing session
+        template must have the same boot sets. The data includes the etag of
+        the image, so the session template does not match if the image was
+        rebuilt.
+
+        See parent class for full docstring.
+        """
+        try:
+            api_data = self.get_bos_api_data()
+        except InputItemValidateError:
+            return False
+
+        if set(existing_item.get('boot_sets') or {}) != set(api_data['boot_sets']):
+            return False
+        return data_is_subset(api_data, existing_item)
+
     def get_bos_api_data(self):
         """Get the data to pass to the BOS API to create this session template.
 
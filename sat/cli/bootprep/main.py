@@ -27,7 +27,7 @@ Entry point for the bootprep subcommand.
 import logging
 import os
 
-from cray_product_catalog.query import ProductCatalog, ProductCatalogError
+from cray_product_catalog.query import ProductCatalogError
 import yaml
 
 from sat.apiclient import CFSClient, IMSClient
@@ -44,7 +44,11 @@ from sat.cli.bootprep.errors import (
 )
 from sat.cli.bootprep.input.instance import InputInstance
 from sat.cli.bootprep.configuration import create_configurations
-from sat.cli.bootprep.constants import EXAMPLE_FILE_NAME
+from sat.cli.bootprep.constants import (
+    CFS_CONFIGURATION_CACHE_TTL,
+    EXAMPLE_FILE_NAME,
+    IMS_RESOURCE_CACHE_TTL
+)
 from sat.cli.bootprep.documentation import (
     display_schema,
     generate_docs_tarball,
@@ -53,11 +57,14 @@ from sat.cli.bootprep.documentation import (
 from sat.cli.bootprep.example import BootprepExampleError, get_example_cos_and_uan_data
 from sat.cli.bootprep.image import create_images
 from sat.cli.bootprep.output import ensure_output_directory, RequestDumper
+from sat.cli.bootprep.prefetch import prefetch_remote_data
+from sat.cli.bootprep.state import BootprepState
 from sat.cli.bootprep.validate import (
     load_and_validate_instance,
     load_and_validate_schema,
     SCHEMA_FILE_RELATIVE_PATH,
 )
+from sat.product_catalog import get_product_catalog
 from sat.session import SATSession
 
 
@@ -162,12 +169,12 @@ def do_bootprep_run(schema_validator, args):
     LOGGER.info('Input file successfully validated against schema')
 
     session = SATSession()
-    cfs_client = CFSClient(session)
-    ims_client = IMSClient(session)
+    cfs_client = CFSClient(session, cache_configurations=True, cache_ttl=CFS_CONFIGURATION_CACHE_TTL)
+    ims_client = IMSClient(session, cache_ttl=IMS_RESOURCE_CACHE_TTL)
     bos_client = BOSClientCommon.get_bos_client(session)
 
     try:
-        product_catalog = ProductCatalog()
+        product_catalog = get_product_catalog()
     except ProductCatalogError as err:
         LOGGER.warning(f'Failed to load product catalog data. Creation of any input items '
                        f'that require data from the product catalog will fail. ({err})')
@@ -177,6 +184,14 @@ def do_bootprep_run(schema_validator, args):
 
     instance = InputInstance(instance_data, cfs_client, ims_client, bos_client, product_catalog)
 
+    # Request the data referenced by the input from IMS, CFS, and VCS at once so
+    # that validating the items in the input does not query them item by item.
+    prefetch_remote_data(instance, resolve_branches=args.resolve_branches)
+
+    # The content hashes of created configurations and images are recorded so
+    # that images which are unchanged are not created again by the next run.
+    state = BootprepState.load()
+
     # TODO (CRAYSAT-1277): Refactor images to use BaseInputItemCollection
     # TODO (CRAYSAT-1278): Refactor configurations to use BaseInputItemCollection
     # As part of the above, do more in methods of those classes. Generally, we
@@ -187,25 +202,32 @@ def do_bootprep_run(schema_validator, args):
     # - Handle any existing objects of the same name
     # - Create the objects, if this is not a dry-run (or validation-only run)
     try:
-        create_configurations(instance, args)
+        create_configurations(instance, args, state)
     except ConfigurationCreateError as err:
         LOGGER.error(str(err))
         raise SystemExit(1)
+    finally:
+        if not args.dry_run:
+            state.save()
 
     try:
-        create_images(instance, args)
+        create_images(instance, args, state)
     except ImageCreateError as err:
         LOGGER.error(str(err))
         raise SystemExit(1)
+    finally:
+        if not args.dry_run:
+            state.save()
 
     # The IMSClient caches the list of images. Clear the cache so that we can find
     # newly created images when constructing session templates.
     ims_client.clear_resource_cache(resource_type='image')
 
     try:
-        instance.input_session_templates.handle_existing_items(args.overwrite_templates,
-                                                               args.skip_existing_templates,
-                                                               args.dry_run)
+        instance.input_session_templates.handle_existing_items(
+            args.overwrite_templates, args.skip_existing_templates, args.dry_run,
+            skip_unchanged=args.skip_unchanged and not args.overwrite_templates
+        )
     except UserAbortException:
         LOGGER.error('Aborted')
         raise SystemExit(1)
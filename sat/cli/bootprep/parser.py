@@ -24,15 +24,44 @@
 """
 The parser for the bootprep subcommand.
 """
+from argparse import ArgumentTypeError
+
 from inflect import engine
 
-from sat.cli.bootprep.constants import DEFAULT_PUBLIC_KEY_FILE, DOCS_ARCHIVE_FILE_NAME, EXAMPLE_FILE_NAME
+from sat.cli.bootprep.constants import (
+    DEFAULT_MAX_CONCURRENT_IMAGE_BUILDS,
+    DEFAULT_MAX_CONCURRENT_IMAGE_CUSTOMIZATIONS,
+    DEFAULT_PUBLIC_KEY_FILE,
+    DOCS_ARCHIVE_FILE_NAME,
+    EXAMPLE_FILE_NAME
+)
 
 OUTPUT_DIR_OPTION = '--output-dir'
 
 inflector = engine()
 
 
+def positive_int(value):
+    """Convert the given command-line argument to a positive integer.
+
+    Args:
+        value (str): the value given on the command line
+
+    Returns:
+        int: the positive integer value
+
+    Raises:
+        ArgumentTypeError: if the value is not a positive integer
+    """
+    try:
+        int_value = int(value)
+    except ValueError:
+        int_value = 0
+    if int_value < 1:
+        raise ArgumentTypeError(f'{value} is not a positive integer')
+    return int_value
+
+
 def add_skip_and_overwrite_options(parser, short_item, long_item):
     """Add skip and overwrite options for existing objects of the given type.
 
@@ -63,7 +92,7 @@ def add_skip_and_overwrite_options(parser, short_item, long_item):
     group.add_argument(
         f'--overwrite-{plural_short_item}', action='store_true',
         help=f'Overwrite any {plural_long_item} for which {inflector.a(long_item)} '
-             f'with the same name already exists.'
+             f'with the same name already exists, even if they are unchanged.'
     )
 
 
@@ -204,11 +233,29 @@ def _add_bootprep_run_subparser(subparsers):
         help='Do not resolve branch names to corresponding commit hashes before '
              'creating CFS configurations.'
     )
+    run_subparser.add_argument(
+        '--no-skip-unchanged', action='store_false', dest='skip_unchanged',
+        help='Do not skip configurations, images, and session templates which '
+             'are unchanged. Unchanged items of a type are never skipped when '
+             'the --overwrite option for that type is given.'
+    )
     run_subparser.add_argument(
         '--delete-ims-jobs', '-D', action='store_true',
         help='Delete IMS jobs after creating images. Note that deleting IMS jobs '
              'makes determining image history impossible.'
     )
+    run_subparser.add_argument(
+        '--max-concurrent-image-builds', type=positive_int,
+        default=DEFAULT_MAX_CONCURRENT_IMAGE_BUILDS, metavar='N',
+        help=f'The maximum number of IMS image build jobs to run at the same time. '
+             f'Defaults to {DEFAULT_MAX_CONCURRENT_IMAGE_BUILDS}.'
+    )
+    run_subparser.add_argument(
+        '--max-concurrent-image-customizations', type=positive_int,
+        default=DEFAULT_MAX_CONCURRENT_IMAGE_CUSTOMIZATIONS, metavar='N',
+        help=f'The maximum number of CFS image customization sessions to run at '
+             f'the same time. Defaults to {DEFAULT_MAX_CONCURRENT_IMAGE_CUSTOMIZATIONS}.'
+    )
     run_subparser.add_argument(
         '--bos-version',
         choices=['v1', 'v2'],
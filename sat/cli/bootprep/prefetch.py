@@ -0,0 +1,107 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Prefetches the data from remote services referenced by a bootprep input instance.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from sat.apiclient import APIError
+from sat.apiclient.vcs import VCSError
+from sat.cli.bootprep.configuration import prefetch_branch_refs
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_prefetch_functions(instance, resolve_branches):
+    """Get the functions which query the services referenced by the input instance.
+
+    Args:
+        instance (sat.cli.bootprep.input.instance.InputInstance): the input
+            instance for which remote data is needed
+        resolve_branches (bool): whether branches of configuration layers will
+            be resolved to commit hashes
+
+    Returns:
+        dict: a mapping from a description of the data to a function of no
+            arguments which requests that data from its service
+    """
+    input_images = instance.input_images
+    input_templates = instance.input_session_templates.items
+    functions = {}
+
+    if input_images or input_templates:
+        functions['IMS images'] = lambda: instance.ims_client.get_matching_resources('image')
+    if any(image.base_is_recipe for image in input_images):
+        functions['IMS recipes'] = lambda: instance.ims_client.get_matching_resources('recipe')
+    if instance.input_configurations or input_templates or \
+            any(image.configuration for image in input_images):
+        functions['CFS configurations'] = instance.cfs_client.get_configurations
+    if resolve_branches and instance.input_configurations:
+        functions['VCS branches'] = lambda: prefetch_branch_refs(instance.input_configurations)
+
+    return functions
+
+
+def prefetch_remote_data(instance, resolve_branches=True):
+    """Request the remote data referenced by the input instance in bulk.
+
+    Validating the input instance one item at a time would query IMS for the
+    base of each image and the image of each session template, CFS for the
+    configuration of each image and session template, and VCS for the branch
+    of each configuration layer. Instead, this requests all IMS images, all
+    IMS recipes, all CFS configurations, and the refs of each VCS repository,
+    with the requests to different services made concurrently. The clients
+    cache the responses, so the validators of the individual items are
+    answered from this snapshot.
+
+    Product catalog data is loaded once when the product catalog is created,
+    so it is not requested again here.
+
+    Failures are logged but otherwise ignored, since they are reported by the
+    validators of the items which need the data.
+
+    Args:
+        instance (sat.cli.bootprep.input.instance.InputInstance): the input
+            instance for which remote data is needed
+        resolve_branches (bool): whether branches of configuration layers will
+            be resolved to commit hashes
+
+    Returns:
+        None
+    """
+    functions = get_prefetch_functions(instance, resolve_branches)
+    if not functions:
+        return
+
+    LOGGER.debug(f'Requesting {", ".join(functions)} referenced by input file')
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        futures = {description: executor.submit(function)
+                   for description, function in functions.items()}
+
+    for description, future in futures.items():
+        try:
+            future.result()
+        except (APIError, VCSError) as err:
+            LOGGER.debug(f'Failed to request {description} referenced by input file: {err}')
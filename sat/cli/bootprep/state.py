@@ -0,0 +1,181 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Records content hashes of the items created by bootprep.
+
+An item whose content hash is unchanged since it was last created by bootprep
+does not need to be created again.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from sat.cli.bootprep.constants import DEFAULT_STATE_FILE
+
+LOGGER = logging.getLogger(__name__)
+
+STATE_FILE_VERSION = 1
+
+# The types under which configurations and images are recorded
+CONFIGURATION_ITEM_TYPE = 'CFS configuration'
+IMAGE_ITEM_TYPE = 'IMS image'
+
+
+def get_content_hash(data):
+    """Get a hash of the given data which does not depend on the order of keys.
+
+    Args:
+        data: the JSON-serializable data to hash
+
+    Returns:
+        str: the hexadecimal SHA-256 hash of the data
+    """
+    serialized = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+class BootprepState:
+    """The content hashes of the items created by previous runs of bootprep.
+
+    Attributes:
+        path (str): the path to the file in which the state is stored
+        items (dict): mapping from item type to a dictionary mapping from item
+            name to a dictionary with the 'hash' of the item and any other
+            recorded properties of the item.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE, items=None):
+        """Create a new BootprepState.
+
+        Args:
+            path (str): the path to the file in which the state is stored
+            items (dict or None): the recorded items. See class docstring.
+        """
+        self.path = path
+        self.items = items or {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_STATE_FILE):
+        """Load the state from the given file.
+
+        If the file does not exist or cannot be read, the state is empty, so
+        every item is considered changed.
+
+        Args:
+            path (str): the path to the file in which the state is stored
+
+        Returns:
+            BootprepState: the loaded state
+        """
+        try:
+            with open(path) as f:
+                state_data = json.load(f)
+        except FileNotFoundError:
+            LOGGER.debug(f'No bootprep state file found at {path}')
+            return cls(path)
+        except (OSError, ValueError) as err:
+            LOGGER.warning(f'Failed to load bootprep state from {path}; all items will be '
+                           f'treated as changed: {err}')
+            return cls(path)
+
+        if not isinstance(state_data, dict) or state_data.get('version') != STATE_FILE_VERSION:
+            LOGGER.warning(f'Ignoring bootprep state file {path} with unsupported format.')
+            return cls(path)
+
+        return cls(path, state_data.get('items'))
+
+    def save(self):
+        """Save the state to its file.
+
+        Failure to save the state is not fatal; the items created by this run
+        will just be treated as changed by the next run.
+
+        Returns:
+            None
+        """
+        state_data = {'version': STATE_FILE_VERSION, 'items': self.items}
+        temp_path = f'{self.path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump(state_data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as err:
+            LOGGER.warning(f'Failed to save bootprep state to {self.path}: {err}')
+        else:
+            LOGGER.debug(f'Saved bootprep state to {self.path}')
+
+    def get_record(self, item_type, name):
+        """Get the record of the item of the given type and name.
+
+        Args:
+            item_type (str): the type of the item
+            name (str): the name of the item
+
+        Returns:
+            dict or None: the record of the item, or None if not recorded
+        """
+        return self.items.get(item_type, {}).get(name)
+
+    def get_hash(self, item_type, name):
+        """Get the recorded content hash of the item of the given type and name.
+
+        Args:
+            item_type (str): the type of the item
+            name (str): the name of the item
+
+        Returns:
+            str or None: the recorded content hash, or None if not recorded
+        """
+        record = self.get_record(item_type, name)
+        return record.get('hash') if record else None
+
+    def is_unchanged(self, item_type, name, content_hash):
+        """Check whether an item has the same content hash as when it was recorded.
+
+        Args:
+            item_type (str): the type of the item
+            name (str): the name of the item
+            content_hash (str or None): the current content hash of the item,
+                or None if it could not be determined.
+
+        Returns:
+            bool: True if the item is recorded with the given content hash
+        """
+        return content_hash is not None and self.get_hash(item_type, name) == content_hash
+
+    def record(self, item_type, name, content_hash, **properties):
+        """Record the content hash of an item which was created.
+
+        Args:
+            item_type (str): the type of the item
+            name (str): the name of the item
+            content_hash (str): the content hash of the item
+            **properties: other properties of the item to record
+
+        Returns:
+            None
+        """
+        self.items.setdefault(item_type, {})[name] = dict(properties, hash=content_hash)
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -24,13 +24,18 @@
 """
 Validation functions for the bootprep input file based on the schema.
 """
+import hashlib
+from itertools import islice
+import json
 import logging
+import os
 import pkgutil
 
 from jsonschema import SchemaError
 from jsonschema.validators import validator_for
 from yaml import safe_load, YAMLError
 
+from sat.cli.bootprep.constants import DEFAULT_MAX_VALIDATION_ERRORS, DEFAULT_SCHEMA_CACHE_FILE
 from sat.cli.bootprep.errors import BootPrepInternalError, BootPrepValidationError, ValidationErrorCollection
 
 LOGGER = logging.getLogger(__name__)
@@ -41,9 +46,67 @@ LOGGER = logging.getLogger(__name__)
 SCHEMA_FILE_RELATIVE_PATH = 'data/schema/bootprep_schema.yaml'
 
 
-def load_and_validate_schema():
+def load_cached_schema(cache_path, schema_hash):
+    """Load the schema cached for schema file contents with the given hash.
+
+    Only schemas which passed validation against their metaschema are cached,
+    so a cached schema does not need to be checked again.
+
+    Args:
+        cache_path (str): the path to the schema cache file
+        schema_hash (str): the SHA-256 hash of the schema file contents
+
+    Returns:
+        dict or None: the cached schema, or None if the cache file is
+            missing, unreadable, or for different schema file contents.
+    """
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as err:
+        LOGGER.debug(f'Ignoring unreadable bootprep schema cache file {cache_path}: {err}')
+        return None
+
+    if not isinstance(cached, dict) or cached.get('schema_hash') != schema_hash:
+        return None
+    return cached.get('schema')
+
+
+def save_cached_schema(cache_path, schema_hash, schema):
+    """Cache the checked schema for schema file contents with the given hash.
+
+    Failure to write the cache is logged but otherwise ignored.
+
+    Args:
+        cache_path (str): the path to the schema cache file
+        schema_hash (str): the SHA-256 hash of the schema file contents
+        schema (dict): the schema loaded from the schema file
+    """
+    tmp_path = f'{cache_path}.tmp'
+    try:
+        contents = json.dumps({'schema_hash': schema_hash, 'schema': schema})
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            f.write(contents)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError, ValueError) as err:
+        LOGGER.debug(f'Unable to write bootprep schema cache file {cache_path}: {err}')
+
+
+def load_and_validate_schema(cache_path=None):
     """Load the bootprep input file schema and check its validity.
 
+    Parsing the YAML schema file and checking it against its metaschema are
+    slow, so the checked schema is cached in a file keyed by the hash of the
+    schema file contents. Later runs with the same schema file load it from
+    that cache instead.
+
+    Args:
+        cache_path (str or None): the path to the schema cache file. If None,
+            DEFAULT_SCHEMA_CACHE_FILE is used.
+
     Returns:
         A two-tuple containing the schema file contents as bytes and the schema
         validator object from the jsonschema library.
@@ -63,6 +126,13 @@ def load_and_validate_schema():
     if schema_file_contents is None:
         raise BootPrepInternalError(f'Unable to find installed {sat_pkg_name} package.')
 
+    if cache_path is None:
+        cache_path = DEFAULT_SCHEMA_CACHE_FILE
+    schema_hash = hashlib.sha256(schema_file_contents).hexdigest()
+    schema = load_cached_schema(cache_path, schema_hash)
+    if schema is not None:
+        return schema_file_contents, validator_for(schema)(schema)
+
     try:
         schema = safe_load(schema_file_contents)
     except YAMLError as err:
@@ -75,6 +145,7 @@ def load_and_validate_schema():
     except SchemaError as err:
         raise BootPrepInternalError(f'bootprep schema file is invalid: {err}')
 
+    save_cached_schema(cache_path, schema_hash, schema)
     return schema_file_contents, validator_cls(schema)
 
 
@@ -93,20 +164,25 @@ def load_bootprep_schema():
     return validator_cls
 
 
-def validate_instance(instance, schema_validator):
+def validate_instance(instance, schema_validator, max_errors=DEFAULT_MAX_VALIDATION_ERRORS):
     """Validate a given instance against the schema validator.
 
+    Errors are found lazily, and validation stops once `max_errors` errors have
+    been found, so a large invalid instance is not validated in full.
+
     Args:
         instance: The instance data loaded from the input file
         schema_validator: The validator object from the jsonschema library
+        max_errors (int): the maximum number of errors to report
 
     Raises:
         BootPrepValidationError: if the given instance does not validate against
             the given schema_validator.
     """
-    errors = list(schema_validator.iter_errors(instance))
+    # Look for one more error than will be reported to know whether there are more
+    errors = list(islice(schema_validator.iter_errors(instance), max_errors + 1))
     if errors:
-        raise ValidationErrorCollection(errors)
+        raise ValidationErrorCollection(errors[:max_errors], truncated=len(errors) > max_errors)
 
 
 def load_and_validate_instance(instance_file_path, schema_validator):
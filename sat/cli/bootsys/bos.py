@@ -24,28 +24,28 @@
 """
 Bootsys operations that use the Boot Orchestration Service (BOS).
 """
-from collections import defaultdict
+from collections import defaultdict, deque
 import logging
-import math
 import posixpath
-from random import choices, randint
-import shlex
-import subprocess
+from random import choices
 import sys
 from textwrap import dedent, indent
-from threading import Event, Thread
-from time import sleep, monotonic
 
 from inflect import engine
+from kubernetes.client import BatchV1Api, CoreV1Api
+from kubernetes.client.rest import ApiException
+from kubernetes.config import ConfigException
+from urllib3.exceptions import HTTPError
 
 from sat.apiclient import APIError, HSMClient
 from sat.apiclient.bos import BOSClientCommon
 from sat.cli.bootsys.defaults import PARALLEL_CHECK_INTERVAL
+from sat.cli.bootsys.service_activity import BOSV1ActivityChecker, BOSV2ActivityChecker, ServiceCheckError
 from sat.config import get_config_value
 from sat.session import SATSession
-from sat.util import pester, prompt_continue
+from sat.util import get_kube_api_client, pester, prompt_continue
 from sat.xname import XName
-from sat.waiting import Waiter
+from sat.waiting import GroupWaiter
 
 LOGGER = logging.getLogger(__name__)
 
@@ -142,9 +142,36 @@ class HSMFailure(Exception):
     pass
 
 
+# The namespace in which BOA jobs run
+BOA_NAMESPACE = 'services'
+
+
+def _iter_log_lines(log_response):
+    """Iterate over the lines of a streamed pod log as they are received.
+
+    Args:
+        log_response (urllib3.response.HTTPResponse): the response from a
+            request for a pod log made with `_preload_content=False`.
+
+    Yields:
+        str: each line of the log.
+    """
+    partial_line = ''
+    for chunk in log_response.stream():
+        lines = (partial_line + chunk.decode('utf-8', errors='replace')).split('\n')
+        partial_line = lines.pop()
+        yield from lines
+    if partial_line:
+        yield partial_line
+
+
 def boa_job_successful(boa_job_id):
     """Get whether the given BOA job was successful.
 
+    The log of the most recent pod of the job is streamed from Kubernetes and
+    checked for a fatal error message as it is received. Only the last lines
+    of the log are kept to be logged if the job was not successful.
+
     Args:
         boa_job_id (str): The BOA job ID
 
@@ -157,46 +184,40 @@ def boa_job_successful(boa_job_id):
     msg_prefix = ('Unable to determine success or failure of BOA job with ID '
                   '{}'.format(boa_job_id))
 
-    get_pod_cmd = shlex.split(
-        'kubectl -n services get pod --sort-by=.metadata.creationTimestamp '
-        '--no-headers --selector job-name={}'.format(boa_job_id)
-    )
     try:
-        pods_proc = subprocess.run(get_pod_cmd, stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE, check=True,
-                                   encoding='utf-8')
-    except (subprocess.CalledProcessError, OSError) as err:
+        core_api = CoreV1Api(get_kube_api_client())
+        pods = core_api.list_namespaced_pod(BOA_NAMESPACE, label_selector=f'job-name={boa_job_id}').items
+    except (ApiException, ConfigException) as err:
         raise BOSFailure('{}; failed to find pods: {}'.format(msg_prefix,
                                                               err))
 
-    try:
-        last_pod = pods_proc.stdout.splitlines()[-1].split()[0]
-    except IndexError:
+    if not pods:
         raise BOSFailure('{}; no pods with job-name={}'.format(msg_prefix,
                                                                boa_job_id))
+    last_pod = max(pods, key=lambda pod: pod.metadata.creation_timestamp).metadata.name
 
     LOGGER.info('Determining success of BOA job with ID %s by checking logs from pod %s', boa_job_id, last_pod)
-    logs_cmd = shlex.split('kubectl -n services logs -c boa '
-                           '{}'.format(last_pod))
 
     fatal_err_msg = ('Fatal conditions have been detected with this run of '
                      'Boot Orchestration that are not expected to be '
                      'recoverable through additional iterations.')
 
+    num_lines_to_log = 50
+    last_lines = deque(maxlen=num_lines_to_log)
+    success = True
     try:
-        logs_proc = subprocess.run(logs_cmd, stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE, check=True,
-                                   encoding='utf-8')
-    except (subprocess.CalledProcessError, OSError) as err:
+        log_response = core_api.read_namespaced_pod_log(last_pod, BOA_NAMESPACE, container='boa',
+                                                        _preload_content=False)
+        for line in _iter_log_lines(log_response):
+            last_lines.append(line)
+            if fatal_err_msg in line:
+                success = False
+    except (ApiException, HTTPError) as err:
         raise BOSFailure('{}; failed to get logs of pod {}: {}'.format(
             msg_prefix, last_pod, err))
 
-    success = not any(fatal_err_msg in line
-                      for line in logs_proc.stdout.splitlines())
-
     if not success:
-        num_lines_to_log = 50
-        lines_to_log = indent('\n'.join(logs_proc.stdout.splitlines()[-num_lines_to_log:]), prefix='  ')
+        lines_to_log = indent('\n'.join(last_lines), prefix='  ')
         LOGGER.error(
             'BOA job %s was not successful. Last %s log lines from pod %s:\n%s',
             boa_job_id, num_lines_to_log, last_pod, lines_to_log
@@ -206,77 +227,37 @@ def boa_job_successful(boa_job_id):
     return success
 
 
-class BOSV2SessionWaiter(Waiter):
-    """Waiter for monitoring the status of a BOS v2 session."""
-
-    def __init__(self, bos_session_thread, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.bos_client = BOSClientCommon.get_bos_client(SATSession(),
-                                                         version='v2')
-        self.bos_session_thread = bos_session_thread
-
-        self.pct_successful = 0.0
-        self.pct_failed = 0.0
-        self.error_summary = {}
-
-    def condition_name(self):
-        return f'session {self.bos_session_thread.session_id} completed'
-
-    def has_completed(self):
-        if self.bos_session_thread.stopped():
-            return True
-
-        try:
-            LOGGER.info(
-                'Waiting for BOS session %s to complete. Session template: %s',
-                self.bos_session_thread.session_id, self.bos_session_thread.session_template
-            )
-
-            session_status = self.bos_client.get_session_status(
-                self.bos_session_thread.session_id
-            )
-
-            if (session_status['percent_successful'] != self.pct_successful
-                    or session_status['percent_failed'] != self.pct_failed):
-                # Only log progress update when components succeed or fail
-                self.pct_successful = float(session_status['percent_successful'])
-                self.pct_failed = float(session_status['percent_failed'])
-                LOGGER.info(
-                    'Session %s: %.0f%% components succeeded, %.0f%% components failed',
-                    self.bos_session_thread.session_id, self.pct_successful, self.pct_failed
-                )
-
-            if session_status['error_summary']:
-                self.error_summary = session_status['error_summary']
+def get_boa_job_conditions():
+    """Get the conditions of the BOA jobs in Kubernetes.
 
-            if session_status['status'] == 'complete':
-                if not session_status.get('managed_components_count'):
-                    LOGGER.warning(
-                        'Session %s does not manage any components; another session '
-                        'may have been started which targets the same components as '
-                        'this session.', self.bos_session_thread.session_id
-                    )
-                return True
-
-            return False
+    This lists all the jobs in the BOA namespace with a single request, so
+    that the BOA jobs of any number of BOS sessions can be checked at once.
 
-        except APIError as err:
-            LOGGER.warning('Failed to query session status: %s', err)
-        except KeyError as err:
-            LOGGER.warning('BOS session status query response missing key %s', err)
-
-        return False
+    Returns:
+        dict: a dictionary mapping from job name to the set of types of the
+            conditions which are true for that job, e.g. 'Complete' or
+            'Failed'.
 
-    def post_wait_action(self):
-        if self.error_summary:
-            for err, summary in self.error_summary.items():
-                LOGGER.error('%s: %s', err, summary)
+    Raises:
+        BOSFailure: if unable to get the jobs.
+    """
+    try:
+        jobs = BatchV1Api(get_kube_api_client()).list_namespaced_job(BOA_NAMESPACE).items
+    except (ApiException, ConfigException) as err:
+        raise BOSFailure(f'Failed to get BOA jobs: {err}')
+
+    return {
+        job.metadata.name: {condition.type for condition in (job.status and job.status.conditions) or []
+                            if condition.status == 'True'}
+        for job in jobs
+    }
 
 
-class BOSSessionThread(Thread):
+class BOSSession:
+    """A BOS session created from a session template with an operation."""
 
     def __init__(self, session_template, operation, limit=None):
-        """Create a new BOSSessionThread that creates and monitors a BOS session
+        """Create a new BOSSession.
 
         Args:
             session_template (str): the name of the session template to use to
@@ -286,8 +267,6 @@ class BOSSessionThread(Thread):
             limit (str): a limit string to pass through to BOS as the `limit`
                 parameter in the POST payload when creating the BOS session
         """
-        super().__init__()
-        self._stop_event = Event()
         self.session_template = session_template
         self.limit = limit
         self.operation = operation
@@ -302,16 +281,9 @@ class BOSSessionThread(Thread):
         self.consec_stat_fails = 0
         # If we exceed this many consecutive failures, stop trying.
         self.max_consec_fails = 3
-        # How long to wait in seconds between each session status check
-        self.check_interval = PARALLEL_CHECK_INTERVAL
 
-    def stop(self):
-        """Stop the execution of this thread at the next opportunity."""
-        self._stop_event.set()
-
-    def stopped(self):
-        """Return whether a stop of this thread was requested."""
-        return self._stop_event.is_set()
+    def __str__(self):
+        return self.session_template
 
     def mark_failed(self, fail_msg):
         """Mark this BOS Session as failed with a message.
@@ -385,147 +357,234 @@ class BOSSessionThread(Thread):
                     self.mark_failed(f'{msg_prefix} due to missing key(s) in BOS '
                                      f'response: {", ".join(missing_keys)}')
 
-    def monitor_status_kubectl(self):
-        """Monitor the status of the BOS session using a 'kubectl wait' command.
+    def create_session_fake(self):
+        """Fake the creation of a new BOS session.
 
-        Since the BOS status endpoint is broken and not yet available on many
-        internal systems, use 'kubectl wait' on the BOA job ID to find out when
-        the BOS session has completed, and use inspection of the job's logs with
-        'kubectl logs' to determine if it was successful or not.
+        This is helpful for demos of this functionality without actually kicking
+        off a BOS session.
+        """
+        fake_session_id = ''.join(choices('abcdef0123456789', k=36))
+        LOGGER.debug("Creating a fake BOS session from session template '%s' "
+                     " with fake id %s.", self.session_template,
+                     fake_session_id)
+        self.session_id = fake_session_id
 
-        Once the BOA job is completed, this method returns, and results are
-        stored in the thread attributes to be examined by the coordinating
-        thread.
 
-        Returns:
-            None
+class BOSSessionMonitor(GroupWaiter):
+    """Waits for a group of BOS sessions to complete.
+
+    The status of all the sessions is checked together in each polling cycle.
+    With BOS v2, this is done by listing the BOS sessions and components, and
+    with BOS v1, by listing the BOA jobs in Kubernetes. The number of
+    components which have succeeded or failed in each BOS v2 session is logged
+    whenever it changes.
+    """
+
+    def __init__(self, bos_sessions, timeout, poll_interval=PARALLEL_CHECK_INTERVAL):
+        """Create a new BOSSessionMonitor.
+
+        Args:
+            bos_sessions (list of BOSSession): the created BOS sessions to
+                wait for.
+            timeout (int): the timeout, in seconds, for all the sessions to
+                complete.
+            poll_interval (int): the interval, in seconds, between checks of
+                the status of the sessions.
         """
-        # Return code is 0 when condition is met, non-zero if timeout
-        wait_cmd = shlex.split(
-            'kubectl wait -n services --for=condition=complete '
-            '--timeout=0 job/{}'.format(self.boa_job_id)
-        )
+        super().__init__(bos_sessions, timeout, poll_interval=poll_interval)
+        self.bos_client = BOSClientCommon.get_bos_client(SATSession())
+        self.bos_version = get_config_value('bos.api_version')
+        # The number of components which have succeeded and failed in each
+        # BOS v2 session at the last check
+        self.component_counts = {}
 
-        LOGGER.info(dedent(f'''
-            Waiting for BOA k8s job with id {self.boa_job_id} to complete. Session template: {self.session_template}.
-            To monitor the progress of this job, run the following command in a separate window:
-                'kubectl -n services logs -c boa -f --selector job-name={self.boa_job_id}'\
-            '''))
+    def condition_name(self):
+        return 'BOS sessions completed'
 
-        while not self.complete and not self.stopped():
-            sleep(self.check_interval)
+    def pre_wait_action(self):
+        if self.bos_version == 'v2':
+            return
+        for bos_session in self.members:
+            job_id, template_name = bos_session.boa_job_id, bos_session.session_template
+            LOGGER.info(dedent(f'''
+                Waiting for BOA k8s job with id {job_id} to complete. Session template: {template_name}.
+                To monitor the progress of this job, run the following command in a separate window:
+                    'kubectl -n services logs -c boa -f --selector job-name={job_id}'\
+                '''))
 
-            LOGGER.info("Waiting for BOA k8s job with job ID %s to complete. Session template: %s",
-                        self.boa_job_id, self.session_template)
-            try:
-                wait_proc = subprocess.run(wait_cmd, stdout=subprocess.PIPE,
-                                           stderr=subprocess.PIPE, encoding='utf-8')
-            except OSError as err:
-                LOGGER.warning("Failed to run 'kubectl wait' command: %s", err)
-                self.record_stat_failure()
-                continue
+    def member_has_completed(self, member):
+        return member in self.members_have_completed({member})
 
-            # This is either a timeout or some other failure
-            if wait_proc.returncode != 0:
-                if 'timed out waiting' not in wait_proc.stderr:
-                    LOGGER.warning("The 'kubectl wait' command failed instead "
-                                   "of timing out. stderr: %s",
-                                   wait_proc.stderr.strip())
-                    self.record_stat_failure()
-                else:
-                    self.consec_stat_fails = 0
-                continue
+    def members_have_completed(self, members):
+        """Check which of the given BOS sessions have completed successfully.
 
-            self.consec_stat_fails = 0
+        Sessions which have failed are added to `failed`.
 
-            # Check if successful or failed with logs.
-            try:
-                success = boa_job_successful(self.boa_job_id)
-            except BOSFailure as err:
-                LOGGER.warning(str(err))
-                self.record_stat_failure()
-                continue
+        Args:
+            members (set of BOSSession): the BOS sessions to check.
 
-            if success:
-                self.complete = True
-            else:
-                self.mark_failed(
-                    'BOS session with id {} and session template {} '
-                    'failed.'.format(self.session_id, self.session_template)
-                )
+        Returns:
+            set of BOSSession: the sessions which have completed successfully.
+        """
+        LOGGER.info('Waiting for BOS %s to complete. Session %s: %s',
+                    INFLECTOR.plural('session', len(members)),
+                    INFLECTOR.plural('template', len(members)),
+                    ', '.join(sorted(str(member) for member in members)))
 
-    def monitor_status(self):
-        """Monitor the status of the BOS session using a BOS v2 status endpoint.
+        check_sessions = self._check_v2_sessions if self.bos_version == 'v2' else self._check_boa_jobs
+        try:
+            completed = check_sessions(members)
+        except BOSFailure as err:
+            LOGGER.warning(str(err))
+            for bos_session in members:
+                bos_session.record_stat_failure()
+            completed = set()
+
+        failed = {bos_session for bos_session in members if bos_session.failed}
+        completed -= failed
+        self.failed |= failed
+
+        for bos_session in sorted(completed, key=str):
+            LOGGER.info(f'{bos_session.operation.title()} with BOS session template '
+                        f'{bos_session.session_template} completed.')
+        for bos_session in sorted(failed, key=str):
+            LOGGER.error("Operation '%s' failed on BOS session template '%s': %s",
+                         bos_session.operation, bos_session.session_template, bos_session.fail_msg)
+
+        remaining = members - completed - failed
+        if remaining and (completed or failed):
+            LOGGER.info(f'Still waiting on session(s) for template(s): '
+                        f'{", ".join(sorted(str(bos_session) for bos_session in remaining))}')
 
-        This periodically issues a request to the session/{session_id}/status
-        endpoint of the BOS v2 API and checks the response to determine if the
-        BOS session is complete and successful or failed.
+        return completed
 
-        Once the BOS session is reported to be complete, this method returns,
-        and results are stored in the thread attributes to be examined by the
-        coordinating thread.
+    def _check_v2_sessions(self, members):
+        """Check which of the given BOS v2 sessions have completed.
+
+        Args:
+            members (set of BOSSession): the BOS sessions to check.
 
         Returns:
-            None
+            set of BOSSession: the sessions which have completed.
+
+        Raises:
+            BOSFailure: if unable to list the BOS sessions or components.
         """
-        # Pass math.inf as the timeout since timeouts are handled by the
-        # `do_parallel_bos_operations()` function, independent of the waiter
-        # class here.
-        waiter = BOSV2SessionWaiter(self, math.inf,
-                                    poll_interval=PARALLEL_CHECK_INTERVAL)
-
-        waiter.wait_for_completion()
-        if waiter.failed:
-            self.mark_failed(
-                'BOS session with id {} and session template {} '
-                'failed.'.format(self.session_id, self.session_template)
-            )
-        else:
-            self.complete = True
+        try:
+            sessions_by_name = {session.get('name'): session for session in self.bos_client.get_sessions()}
+            components = self.bos_client.get_components()
+        except APIError as err:
+            raise BOSFailure(f'Failed to query status of BOS sessions: {err}') from err
 
-    def create_session_fake(self):
-        """Fake the creation of a new BOS session.
+        self._log_component_progress(members, components)
 
-        This is helpful for demos of this functionality without actually kicking
-        off a BOS session.
-        """
-        fake_session_id = ''.join(choices('abcdef0123456789', k=36))
-        LOGGER.debug("Creating a fake BOS session from session template '%s' "
-                     " with fake id %s.", self.session_template,
-                     fake_session_id)
-        self.session_id = fake_session_id
+        completed = set()
+        for bos_session in members:
+            bos_session.consec_stat_fails = 0
+            session = sessions_by_name.get(bos_session.session_id)
+            if session is None:
+                LOGGER.debug('BOS session %s not found in list of BOS sessions.', bos_session.session_id)
+            elif (session.get('status') or {}).get('status') == 'complete':
+                self._log_session_summary(bos_session)
+                completed.add(bos_session)
+        return completed
 
-    def monitor_status_fake(self):
-        """Fake the monitoring of a BOS session.
+    def _log_component_progress(self, members, components):
+        """Log the change in the number of succeeded and failed components of each session.
 
-        This is helpful for demos of this functionality without actually kicking
-        off a BOS session.
+        Args:
+            members (set of BOSSession): the BOS sessions to log progress for.
+            components (list of dict): the components from BOS v2.
         """
-        rand_duration = randint(60, 120)
-        sleep(rand_duration)
-        self.complete = True
-
-    def run(self):
-        """Run this thread's action.
+        counts_by_session_id = {bos_session.session_id: {'stable': 0, 'failed': 0}
+                                for bos_session in members}
+        for component in components:
+            session_counts = counts_by_session_id.get(component.get('session'))
+            component_status = (component.get('status') or {}).get('status')
+            if session_counts is not None and component_status in session_counts:
+                session_counts[component_status] += 1
+
+        for bos_session in sorted(members, key=str):
+            succeeded = counts_by_session_id[bos_session.session_id]['stable']
+            failed = counts_by_session_id[bos_session.session_id]['failed']
+            prev_succeeded, prev_failed = self.component_counts.get(bos_session, (0, 0))
+            if (succeeded, failed) != (prev_succeeded, prev_failed):
+                LOGGER.info('Session %s: %d components succeeded (%+d), %d components failed (%+d)',
+                            bos_session.session_id, succeeded, succeeded - prev_succeeded,
+                            failed, failed - prev_failed)
+                self.component_counts[bos_session] = (succeeded, failed)
+
+    def _log_session_summary(self, bos_session):
+        """Log the final status of a completed BOS v2 session.
 
-        This thread will create a new BOS session against the given session
-        template with the given operation, and then it will monitor the status
-        of that session and periodically update the complete, failed, and
-        fail_msg attributes as appropriate.
+        Args:
+            bos_session (BOSSession): the completed BOS session.
         """
-        self.create_session()
+        try:
+            session_status = self.bos_client.get_session_status(bos_session.session_id)
+        except APIError as err:
+            LOGGER.warning('Failed to query session status: %s', err)
+            return
 
-        if get_config_value('bos.api_version') == 'v2':
-            self.monitor_status()
-        else:
-            # Use 'kubectl wait', 'kubectl get', and 'kubectl logs' for BOS v1
-            # due to initial trouble with status endpoint (CAMSCMS-5532).
-            self.monitor_status_kubectl()
+        LOGGER.info('Session %s: %.0f%% components succeeded, %.0f%% components failed',
+                    bos_session.session_id, float(session_status.get('percent_successful', 0)),
+                    float(session_status.get('percent_failed', 0)))
+        if not session_status.get('managed_components_count'):
+            LOGGER.warning(
+                'Session %s does not manage any components; another session '
+                'may have been started which targets the same components as '
+                'this session.', bos_session.session_id
+            )
+        for err, summary in (session_status.get('error_summary') or {}).items():
+            LOGGER.error('%s: %s', err, summary)
+
+    def _check_boa_jobs(self, members):
+        """Check which of the given BOS v1 sessions have completed using their BOA jobs.
+
+        Args:
+            members (set of BOSSession): the BOS sessions to check.
+
+        Returns:
+            set of BOSSession: the sessions which have completed successfully.
+
+        Raises:
+            BOSFailure: if unable to list the BOA jobs.
+        """
+        job_conditions = get_boa_job_conditions()
+
+        completed = set()
+        for bos_session in members:
+            bos_session.consec_stat_fails = 0
+            conditions = job_conditions.get(bos_session.boa_job_id, set())
+            if 'Failed' in conditions:
+                bos_session.mark_failed(f'BOA job {bos_session.boa_job_id} for BOS session with id '
+                                        f'{bos_session.session_id} and session template '
+                                        f'{bos_session.session_template} failed.')
+            elif 'Complete' in conditions:
+                # Check if successful or failed with logs.
+                try:
+                    success = boa_job_successful(bos_session.boa_job_id)
+                except BOSFailure as err:
+                    LOGGER.warning(str(err))
+                    bos_session.record_stat_failure()
+                    continue
+
+                if success:
+                    completed.add(bos_session)
+                else:
+                    bos_session.mark_failed(
+                        'BOS session with id {} and session template {} '
+                        'failed.'.format(bos_session.session_id, bos_session.session_template)
+                    )
+        return completed
 
 
 def do_parallel_bos_operations(session_templates, operation, timeout, limit=None):
     """Perform BOS operation against the session templates in parallel.
 
+    A BOS session is created for each session template, and then all of the
+    sessions are monitored together by a single BOSSessionMonitor.
+
     Args:
         session_templates (list): A list of BOS session template names to use
             to create BOS sessions with the given `operation`.
@@ -549,60 +608,41 @@ def do_parallel_bos_operations(session_templates, operation, timeout, limit=None
     LOGGER.debug('Doing parallel %s with %s: %s', operation, template_plural,
                  ', '.join(session_templates))
 
-    bos_session_threads = [BOSSessionThread(session_template, operation, limit=limit)
-                           for session_template in session_templates]
-
-    start_time = monotonic()
-    elapsed_time = 0
-    for thread in bos_session_threads:
-        thread.start()
+    bos_sessions = [BOSSession(session_template, operation, limit=limit)
+                    for session_template in session_templates]
+    for bos_session in bos_sessions:
+        bos_session.create_session()
 
     LOGGER.info(f'Started {operation} operation on BOS '
                 f'{template_plural}: {", ".join(session_templates)}.')
-    LOGGER.info(f'Waiting up to {timeout} seconds for {session_plural} to complete.')
 
-    active_threads = {t.session_template: t for t in bos_session_threads}
     failed_session_templates = []
-    just_finished = []
-
-    while active_threads and elapsed_time < timeout:
-        if just_finished:
-            LOGGER.info(f'Still waiting on session(s) for template(s): '
-                        f'{", ".join(active_threads.keys())}')
-        just_finished = []
-
-        for session_template, thread in active_threads.items():
-            if thread.failed:
-                LOGGER.error(
-                    "Operation '%s' failed on BOS session template '%s': %s",
-                    operation, session_template, thread.fail_msg
-                )
-                failed_session_templates.append(session_template)
-                just_finished.append(session_template)
-            elif thread.complete:
-                LOGGER.info(f'{operation.title()} with BOS session template '
-                            f'{session_template} completed.')
-                just_finished.append(session_template)
-
-        for finished in just_finished:
-            del active_threads[finished]
-
-        sleep(PARALLEL_CHECK_INTERVAL)
-        elapsed_time = monotonic() - start_time
-
-    if active_threads:
-        LOGGER.error('BOS %s timed out after %s seconds for session %s: %s.',
-                     operation, timeout,
-                     INFLECTOR.plural('template', len(active_threads)),
-                     ', '.join(active_threads.keys()))
-
-        failed_session_templates.extend(active_threads.keys())
-
-        for thread in active_threads.values():
-            thread.stop()
-
-    for thread in bos_session_threads:
-        thread.join()
+    for bos_session in bos_sessions:
+        if bos_session.failed:
+            LOGGER.error(
+                "Operation '%s' failed on BOS session template '%s': %s",
+                operation, bos_session.session_template, bos_session.fail_msg
+            )
+            failed_session_templates.append(bos_session.session_template)
+
+    created_sessions = [bos_session for bos_session in bos_sessions if not bos_session.failed]
+    if created_sessions:
+        LOGGER.info(f'Waiting up to {timeout} seconds for {session_plural} to complete.')
+        monitor = BOSSessionMonitor(created_sessions, timeout)
+        timed_out_sessions = monitor.wait_for_completion()
+
+        failed_session_templates.extend(bos_session.session_template
+                                        for bos_session in created_sessions
+                                        if bos_session in monitor.failed)
+
+        if timed_out_sessions:
+            timed_out_templates = [bos_session.session_template for bos_session in created_sessions
+                                   if bos_session in timed_out_sessions]
+            LOGGER.error('BOS %s timed out after %s seconds for session %s: %s.',
+                         operation, timeout,
+                         INFLECTOR.plural('template', len(timed_out_templates)),
+                         ', '.join(timed_out_templates))
+            failed_session_templates.extend(timed_out_templates)
 
     if failed_session_templates:
         raise BOSFailure(
@@ -831,6 +871,98 @@ def get_session_templates_deprecated():
     return session_templates
 
 
+def get_active_template_sessions(session_templates):
+    """Get the active BOS sessions created from any of the given session templates.
+
+    Args:
+        session_templates (list): A list of BOS session template names.
+
+    Returns:
+        A list of OrderedDicts representing the active BOS sessions.
+
+    Raises:
+        ServiceCheckError: if unable to get the active BOS sessions.
+    """
+    checker_cls = \
+        BOSV1ActivityChecker if get_config_value('bos.api_version') == 'v1' \
+        else BOSV2ActivityChecker
+    checker = checker_cls(SATSession(), get_config_value('bootsys.session_check_timeout'))
+    return [session for session in checker.get_active_sessions()
+            if session.get(checker.template_field_name) in session_templates]
+
+
+def validate_bos_operations(operation):
+    """Check that a BOS operation performed by the bos-operations stage is complete.
+
+    The operation is complete if no BOS sessions for the session templates are
+    still active, and the nodes in the session templates are all in the state
+    expected after the operation.
+
+    Args:
+        operation (str): The operation performed on the session templates.
+            Valid operations are 'boot' and 'shutdown'.
+
+    Returns:
+        bool: True if the operation is complete, False otherwise.
+    """
+    try:
+        session_templates = get_session_templates()
+    except BOSFailure as err:
+        LOGGER.warning(f'Unable to get BOS session templates to check: {err}')
+        return False
+
+    try:
+        active_sessions = get_active_template_sessions(session_templates)
+    except ServiceCheckError as err:
+        LOGGER.warning(f'Unable to check for active BOS sessions: {err}')
+        return False
+    if active_sessions:
+        LOGGER.info(f"{INFLECTOR.no('BOS session', len(active_sessions))} for the "
+                    f"session templates {INFLECTOR.plural_verb('is', len(active_sessions))} "
+                    f"still active.")
+        return False
+
+    templates_needing_operation = get_templates_needing_operation(session_templates, operation)
+    if templates_needing_operation:
+        LOGGER.info(f"The '{operation}' operation is still needed for session "
+                    f"{INFLECTOR.plural('template', len(templates_needing_operation))}: "
+                    f"{', '.join(templates_needing_operation)}")
+        return False
+    return True
+
+
+def validate_bos_shutdowns(args):
+    """Check that the nodes shut down by the bos-operations stage are still off.
+
+    This is used to check whether the bos-operations stage of the shutdown
+    action can be skipped when resuming.
+
+    Args:
+        args: The argparse.Namespace object containing the parsed arguments
+            passed to this stage.
+
+    Returns:
+        bool: True if the shutdown is complete, False otherwise.
+    """
+    return validate_bos_operations(SHUTDOWN_OPERATION)
+
+
+def validate_bos_boots(args):
+    """Check that the nodes booted by the bos-operations stage are still ready.
+
+    This is used to check whether the bos-operations stage of the boot action
+    can be skipped when resuming.
+
+    Args:
+        args: The argparse.Namespace object containing the parsed arguments
+            passed to this stage.
+
+    Returns:
+        bool: True if the boot is complete, False otherwise.
+    """
+    return validate_bos_operations(BOOT_OPERATION)
+
+
 def do_bos_operations(operation, timeout, limit=None, recursive=False):
     """Perform a BOS operation on the compute node and UAN session templates.
 
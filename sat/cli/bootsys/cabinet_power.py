@@ -144,6 +144,110 @@ def do_liquid_cooled_cabinets_power_off(args):
                 f'state according to CAPMC.')
 
 
+def components_in_power_state(xnames, power_state):
+    """Check whether all the given components are in the given power state in CAPMC.
+
+    Args:
+        xnames (list): the xnames (str) of the components to check.
+        power_state (str): the expected power state, either 'on' or 'off'.
+
+    Returns:
+        bool: True if all the components are in the power state, False otherwise.
+    """
+    capmc_client = CAPMCClient(SATSession(), suppress_warnings=True)
+    try:
+        xnames_by_power_state = capmc_client.get_xnames_power_state(xnames)
+    except APIError as err:
+        LOGGER.warning(f'Unable to get power state of components: {err}')
+        return False
+
+    not_in_state = set(xnames) - set(xnames_by_power_state.get(power_state, []))
+    if not_in_state:
+        LOGGER.info(f'The following components are not powered {power_state}: '
+                    f'{", ".join(sorted(not_in_state))}')
+        return False
+    return True
+
+
+def discovery_suspend_status_is(suspend_status):
+    """Check whether the suspend status of the HMS discovery cronjob is as expected.
+
+    Args:
+        suspend_status (bool): the expected suspend status.
+
+    Returns:
+        bool: True if the cronjob has the suspend status, False otherwise.
+    """
+    try:
+        if HMSDiscoveryCronJob().get_suspend_status() == suspend_status:
+            return True
+    except HMSDiscoveryError as err:
+        LOGGER.warning(f'Unable to get suspend status of {HMSDiscoveryCronJob.FULL_NAME}: {err}')
+        return False
+
+    LOGGER.info(f'The {HMSDiscoveryCronJob.FULL_NAME} is '
+                f'{"not " if suspend_status else ""}suspended.')
+    return False
+
+
+def validate_cabinets_powered_off(args):
+    """Check that the cabinets powered off by the cabinet-power stage are still off.
+
+    This is used to check whether the cabinet-power stage of the shutdown
+    action can be skipped when resuming.
+
+    Args:
+        args (argparse.Namespace): The parsed bootsys arguments.
+
+    Returns:
+        bool: True if HMS discovery is suspended and the liquid-cooled
+            components and air-cooled non-management nodes are powered off,
+            False otherwise.
+    """
+    if not discovery_suspend_status_is(True):
+        return False
+
+    hsm_client = HSMClient(SATSession())
+    try:
+        xnames = get_xnames_for_power_action(hsm_client)
+        river_nodes = hsm_client.get_component_xnames({'type': 'Node',
+                                                       'class': 'River'})
+        river_mgmt_nodes = hsm_client.get_component_xnames({'type': 'Node',
+                                                            'role': 'Management',
+                                                            'class': 'River'})
+    except APIError as err:
+        LOGGER.warning(f'Unable to get components to check: {err}')
+        return False
+
+    xnames.extend(set(river_nodes) - set(river_mgmt_nodes))
+    return components_in_power_state(xnames, 'off')
+
+
+def validate_cabinets_powered_on(args):
+    """Check that the cabinets powered on by the cabinet-power stage are still on.
+
+    This is used to check whether the cabinet-power stage of the boot action
+    can be skipped when resuming.
+
+    Args:
+        args (argparse.Namespace): The parsed bootsys arguments.
+
+    Returns:
+        bool: True if HMS discovery is resumed and the liquid-cooled
+            components are powered on, False otherwise.
+    """
+    if not discovery_suspend_status_is(False):
+        return False
+
+    try:
+        xnames = get_xnames_for_power_action(HSMClient(SATSession()))
+    except APIError as err:
+        LOGGER.warning(f'Unable to get components to check: {err}')
+        return False
+
+    return components_in_power_state(xnames, 'on')
+
+
 def do_cabinets_power_off(args):
     """Power off the compute cabinets in the system.
 
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -31,7 +31,7 @@ import subprocess
 
 from paramiko import SSHException
 
-from sat.cli.bootsys.util import get_ssh_client
+from sat.cli.bootsys.util import get_ssh_connection_pool
 from sat.waiting import Waiter
 
 LOGGER = logging.getLogger(__name__)
@@ -49,8 +49,9 @@ class CephServiceRestartError(Exception):
 
 class CephHealthWaiter(Waiter):
     """Waiter for the Ceph cluster health status."""
-    def __init__(self, timeout, storage_hosts, poll_interval=5, retries=1):
-        super().__init__(timeout, poll_interval=poll_interval, retries=retries)
+    def __init__(self, timeout, storage_hosts, poll_interval=5, retries=1, max_poll_interval=30):
+        super().__init__(timeout, poll_interval=poll_interval, retries=retries,
+                         max_poll_interval=max_poll_interval)
         self.storage_hosts = storage_hosts
 
     def condition_name(self):
@@ -74,10 +75,9 @@ class CephHealthWaiter(Waiter):
         Returns: None.
         """
         for node in self.storage_hosts:
-            client = get_ssh_client()
             try:
                 try:
-                    client.connect(node)
+                    client = get_ssh_connection_pool().get_client(node)
                 except (SSHException, socket.error) as err:
                     raise CephServiceRestartError(err)
 
@@ -109,8 +109,6 @@ class CephHealthWaiter(Waiter):
 
             except CephServiceRestartError as err:
                 LOGGER.warning("Could not restart Ceph services on storage node %s: %s", node, err)
-            finally:
-                client.close()
 
 
 def validate_ceph_warning_state(ceph_check_data, allow_osdmap_flags=True):
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -39,5 +39,8 @@ HSN_STATE_DIR = 'hsn-states/'
 # The prefix used for files that record HSN state
 HSN_STATE_FILE_PREFIX = 'hsn-state'
 
+# The name of the file within DEFAULT_LOCAL_STATE_DIR which records the progress of stages
+JOURNAL_FILE_NAME = 'journal.json'
+
 # The number of seconds to wait between checks on parallel BOS operations
 PARALLEL_CHECK_INTERVAL = 10
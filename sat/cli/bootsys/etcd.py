@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -28,7 +28,7 @@ import logging
 import os
 import socket
 
-from sat.cli.bootsys.util import get_ssh_client
+from sat.cli.bootsys.util import get_ssh_connection_pool
 
 from paramiko import SSHException
 
@@ -64,10 +64,8 @@ def save_etcd_snapshot_on_host(hostname):
         EtcdSnapshotFailure: if there is a failure to create the directory for
             the snapshot or a failure to create the snapshot
     """
-    ssh_client = get_ssh_client()
-
     try:
-        ssh_client.connect(hostname)
+        ssh_client = get_ssh_connection_pool().get_client(hostname)
     except (SSHException, socket.error) as err:
         raise EtcdSnapshotFailure(f'Failed to connect to {hostname}: {err}')
 
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2019-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2019-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -26,11 +26,11 @@ Performs High-speed Network (HSN) bringup and waits for it to be healthy.
 """
 import logging
 import sys
-from collections import namedtuple
+from collections import Counter, defaultdict, namedtuple
 
 import inflect
 
-from sat.apiclient import FabricControllerClient
+from sat.apiclient import APIError, FabricControllerClient
 from sat.cached_property import cached_property
 from sat.cli.bootsys.state_recorder import HSNStateRecorder, StateError
 from sat.waiting import GroupWaiter
@@ -47,7 +47,12 @@ HSNPort = namedtuple('HSNPort', ('port_set', 'port_xname'))
 
 
 class HSNBringupWaiter(GroupWaiter):
-    """Run the HSN bringup script and wait for it to be brought up."""
+    """Run the HSN bringup script and wait for it to be brought up.
+
+    On each check, only the port sets which still have pending ports are
+    queried, and the percentage of ports in each port set which are up is
+    logged as it changes.
+    """
 
     def __init__(self, timeout, poll_interval=1):
         """Create a new HSNBringupWaiter."""
@@ -56,6 +61,9 @@ class HSNBringupWaiter(GroupWaiter):
         self.hsn_state_recorder = HSNStateRecorder()
         # dict mapping from port set name to dict mapping from port xname to enabled status
         self.current_hsn_state = {}
+        # The number of ports in each port set, and the number of those last reported as up
+        self.num_ports_by_port_set = Counter()
+        self.num_ports_up_by_port_set = {}
 
     def condition_name(self):
         return "HSN bringup"
@@ -67,10 +75,8 @@ class HSNBringupWaiter(GroupWaiter):
         self.members = {HSNPort(port_set, port_xname)
                         for port_set, port_xnames in self.fabric_client.get_fabric_edge_ports().items()
                         for port_xname in port_xnames}
-
-    def on_check_action(self):
-        """Get the latest HSN state from the fabric controller API."""
-        self.current_hsn_state = self.fabric_client.get_fabric_edge_ports_enabled_status()
+        self.num_ports_by_port_set = Counter(port.port_set for port in self.members)
+        self.num_ports_up_by_port_set = {}
 
     @cached_property
     def stored_hsn_state(self):
@@ -90,6 +96,9 @@ class HSNBringupWaiter(GroupWaiter):
     def member_has_completed(self, member):
         """Get whether the given member has completed.
 
+        This uses the state of the port from the last time its port set was
+        queried by `members_have_completed`.
+
         Args:
             member (HSNPort): the port to check for completion.
 
@@ -114,6 +123,55 @@ class HSNBringupWaiter(GroupWaiter):
         # if expected state is true, then current state must be true
         return current_state or not expected_state
 
+    def members_have_completed(self, members):
+        """Get the ports which have completed.
+
+        The status of each port set which contains any of the given ports is
+        queried once, and port sets with no pending ports are not queried.
+
+        Args:
+            members (set of HSNPort): the ports to check for completion.
+
+        Returns:
+            set of HSNPort: the ports which have completed.
+        """
+        ports_by_port_set = defaultdict(list)
+        for member in members:
+            ports_by_port_set[member.port_set].append(member)
+
+        completed = set()
+        for port_set, ports in ports_by_port_set.items():
+            try:
+                self.current_hsn_state[port_set] = self.fabric_client.get_port_set_enabled_status(port_set)
+            except APIError as err:
+                LOGGER.warning(f'Failed to get port status for port set {port_set}: {err}')
+                continue
+
+            completed_in_port_set = {port for port in ports if self.member_has_completed(port)}
+            completed.update(completed_in_port_set)
+            self._log_port_set_progress(port_set, len(ports) - len(completed_in_port_set))
+
+        return completed
+
+    def _log_port_set_progress(self, port_set, num_pending):
+        """Log the percentage of ports in a port set which are up if it has changed.
+
+        Args:
+            port_set (str): the name of the port set.
+            num_pending (int): the number of ports in the port set which are
+                not up yet.
+        """
+        num_ports = self.num_ports_by_port_set[port_set]
+        if not num_ports:
+            return
+        num_up = num_ports - num_pending
+        if self.num_ports_up_by_port_set.get(port_set) == num_up:
+            return
+
+        self.num_ports_up_by_port_set[port_set] = num_up
+        LOGGER.info('Port set %s: %d of %d %s up (%.0f%%)', port_set, num_up, num_ports,
+                    INF.plural('port', num_ports), 100 * num_up / num_ports)
+
 
 def do_hsn_bringup(args):
     """Bring up HSN and wait for it to be healthy.
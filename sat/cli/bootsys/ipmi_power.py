@@ -0,0 +1,194 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Concurrent IPMI power commands using ipmitool.
+"""
+from collections import namedtuple
+from concurrent.futures import as_completed, ThreadPoolExecutor
+import logging
+import os
+import shlex
+import subprocess
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# The maximum number of BMCs to which ipmitool commands are sent at the same time.
+MAX_CONCURRENT_IPMI_COMMANDS = 16
+# The time, in seconds, allowed for a single ipmitool command to complete.
+IPMI_COMMAND_TIMEOUT = 30
+# The number of times a failed or timed out ipmitool command is retried.
+IPMI_COMMAND_RETRIES = 2
+# The time, in seconds, to wait before retrying a failed ipmitool command.
+IPMI_RETRY_DELAY = 1
+
+# The result of running an ipmitool command against the BMC of a host.
+# The returncode is None if the command timed out on its last attempt. The
+# elapsed time, in seconds, covers all the attempts made.
+IPMICommandResult = namedtuple('IPMICommandResult',
+                               ('host', 'returncode', 'stdout', 'stderr', 'elapsed', 'attempts'))
+
+
+class IPMIPowerClient:
+    """Runs ipmitool power commands against the BMCs of many hosts concurrently.
+
+    The password is passed to ipmitool through its environment rather than on
+    the command line.
+
+    Attributes:
+        username (str): the username to use when running ipmitool commands
+        password (str): the password to use when running ipmitool commands
+        timeout (float): the time, in seconds, allowed for each ipmitool
+            command to complete.
+        retries (int): the number of times a failed or timed out ipmitool
+            command is retried before giving up.
+        retry_delay (float): the time, in seconds, to wait between attempts.
+        max_workers (int): the maximum number of ipmitool commands to run at
+            the same time.
+    """
+
+    def __init__(self, username, password, timeout=IPMI_COMMAND_TIMEOUT,
+                 retries=IPMI_COMMAND_RETRIES, retry_delay=IPMI_RETRY_DELAY,
+                 max_workers=MAX_CONCURRENT_IPMI_COMMANDS):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least one.")
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.max_workers = max_workers
+
+    def get_ipmi_command(self, host, command):
+        """Get the full command-line for an ipmitool command.
+
+        Args:
+            host (str): the host whose BMC should be targeted
+            command (str): the ipmitool command to run, e.g. `chassis power status`
+
+        Returns:
+            The command to run, split into a list of args by shlex.split.
+        """
+        # Tell ipmitool to use the password from the env variable using '-E'
+        return shlex.split(
+            f'ipmitool -I lanplus -U {self.username} -E -H {host}-mgmt {command}'
+        )
+
+    def run_command(self, host, command, retries=None):
+        """Run an ipmitool command against the BMC of a host.
+
+        Commands which fail or time out are retried, so that a single dropped
+        packet or busy BMC does not fail the whole command.
+
+        Args:
+            host (str): the host whose BMC should be targeted
+            command (str): the ipmitool command to run
+            retries (int or None): the number of times to retry the command
+                if it fails, or None to use `self.retries`.
+
+        Returns:
+            IPMICommandResult: the result of the last attempt.
+
+        Raises:
+            OSError: if ipmitool could not be run at all.
+        """
+        if retries is None:
+            retries = self.retries
+        ipmi_command = self.get_ipmi_command(host, command)
+        env = dict(os.environ, IPMITOOL_PASSWORD=self.password)
+
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                proc = subprocess.run(ipmi_command, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, encoding='utf-8',
+                                      timeout=self.timeout, env=env)
+            except subprocess.TimeoutExpired:
+                result = IPMICommandResult(host, None, '',
+                                           f'timed out after {self.timeout} seconds',
+                                           time.monotonic() - start, attempt)
+            else:
+                result = IPMICommandResult(host, proc.returncode, proc.stdout, proc.stderr,
+                                           time.monotonic() - start, attempt)
+
+            if result.returncode == 0 or attempt > retries:
+                break
+            LOGGER.debug('ipmitool command `%s` failed for host %s on attempt %d; retrying: %s',
+                         command, host, attempt, result.stderr)
+            time.sleep(self.retry_delay)
+
+        LOGGER.debug('ipmitool command `%s` for host %s finished in %.2f seconds '
+                     'after %d attempt(s)', command, host, result.elapsed, result.attempts)
+        return result
+
+    def run_command_on_hosts(self, hosts, command, retries=None):
+        """Run an ipmitool command against the BMCs of many hosts at the same time.
+
+        Args:
+            hosts (Iterable[str]): the hosts whose BMCs should be targeted
+            command (str): the ipmitool command to run
+            retries (int or None): the number of times to retry the command
+                on each host if it fails, or None to use `self.retries`.
+
+        Returns:
+            dict: a dict mapping from each host to its IPMICommandResult.
+
+        Raises:
+            OSError: if ipmitool could not be run at all.
+        """
+        hosts = list(hosts)
+        if not hosts:
+            return {}
+
+        start = time.monotonic()
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(hosts))) as executor:
+            futures = [executor.submit(self.run_command, host, command, retries)
+                       for host in hosts]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.host] = result
+
+        slowest = max(results.values(), key=lambda r: r.elapsed)
+        LOGGER.debug('ipmitool command `%s` finished for %d host(s) in %.2f seconds; '
+                     'slowest was host %s at %.2f seconds', command, len(results),
+                     time.monotonic() - start, slowest.host, slowest.elapsed)
+        return results
+
+    def set_power_state(self, hosts, power_state):
+        """Send an IPMI power command to the BMCs of the given hosts.
+
+        Args:
+            hosts (Iterable[str]): the hosts to power on or off
+            power_state (str): either 'on' or 'off'
+
+        Returns:
+            dict: a dict mapping from each host to its IPMICommandResult.
+
+        Raises:
+            OSError: if ipmitool could not be run at all.
+        """
+        return self.run_command_on_hosts(hosts, f'chassis power {power_state}')
@@ -0,0 +1,179 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Records the progress of bootsys stages so that a run can be resumed.
+"""
+from datetime import datetime
+import json
+import logging
+import os
+
+from sat.cli.bootsys.defaults import DEFAULT_LOCAL_STATE_DIR, JOURNAL_FILE_NAME
+
+LOGGER = logging.getLogger(__name__)
+
+# The arguments which change what a stage does. A completed stage is only
+# skipped when resuming with the same values of these arguments.
+STAGE_INPUT_ARGS = (
+    'bos_limit',
+    'bos_templates',
+    'bos_version',
+    'cle_bos_template',
+    'excluded_ncns',
+    'recursive',
+    'uan_bos_template',
+)
+
+
+def get_stage_inputs(args):
+    """Get the inputs of a stage from the parsed arguments.
+
+    Args:
+        args: The argparse.Namespace object containing the parsed arguments
+            passed to the bootsys subcommand.
+
+    Returns:
+        dict: a dict mapping from argument names in STAGE_INPUT_ARGS to their
+            values, converted so that they can be stored as JSON.
+    """
+    inputs = {}
+    for arg_name in STAGE_INPUT_ARGS:
+        value = getattr(args, arg_name, None)
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        inputs[arg_name] = value
+    return inputs
+
+
+class BootsysJournal:
+    """A journal of the stages of bootsys actions which have started and completed.
+
+    The journal is stored as a JSON object which maps from action name to
+    stage name to an entry recording the inputs the stage was run with and
+    the UTC times at which it started and completed. Only the stages of the
+    most recent action are kept, since running a stage of one action (e.g.
+    boot) means the stages of the other action (e.g. shutdown) must be run
+    again next time.
+
+    Failing to read or write the journal is logged as a warning but is
+    otherwise ignored, since the journal is only needed to resume.
+
+    Attributes:
+        path (str): the path to the journal file.
+        entries (dict): the contents of the journal.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DEFAULT_LOCAL_STATE_DIR, JOURNAL_FILE_NAME)
+        self.entries = self._load()
+
+    def _load(self):
+        """Load the journal file.
+
+        Returns:
+            dict: the contents of the journal, or an empty dict if it does not
+                exist or cannot be read.
+        """
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            LOGGER.warning(f'Ignoring bootsys journal {self.path} which could not be read: {err}')
+            return {}
+
+        if not isinstance(entries, dict):
+            LOGGER.warning(f'Ignoring bootsys journal {self.path} which is not a JSON object.')
+            return {}
+        return entries
+
+    def _save(self):
+        """Write the journal file.
+
+        The journal is written to a temporary file which then replaces the
+        journal file, so that a partially written journal is never read.
+        """
+        temp_path = f'{self.path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump(self.entries, f, indent=4)
+            os.replace(temp_path, self.path)
+        except OSError as err:
+            LOGGER.warning(f'Failed to write bootsys journal {self.path}: {err}')
+
+    @staticmethod
+    def _get_timestamp():
+        """str: the current UTC time"""
+        return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+
+    def get_completed_entry(self, action, stage, inputs):
+        """Get the entry for a stage if it completed with the given inputs.
+
+        Args:
+            action (str): the bootsys action, e.g. 'shutdown' or 'boot'.
+            stage (str): the name of the stage.
+            inputs (dict): the inputs of the stage, as returned by
+                get_stage_inputs.
+
+        Returns:
+            dict or None: the entry for the stage, or None if the stage has not
+                completed or was run with different inputs.
+        """
+        entry = self.entries.get(action, {}).get(stage)
+        if not isinstance(entry, dict) or not entry.get('completed'):
+            return None
+        if entry.get('inputs') != inputs:
+            LOGGER.info(f'Stage {stage} of {action} completed at {entry["completed"]} '
+                        f'with different options, so it will be run again.')
+            return None
+        return entry
+
+    def record_start(self, action, stage, inputs):
+        """Record that a stage has started.
+
+        Args:
+            action (str): the bootsys action, e.g. 'shutdown' or 'boot'.
+            stage (str): the name of the stage.
+            inputs (dict): the inputs of the stage, as returned by
+                get_stage_inputs.
+        """
+        self.entries = {action: self.entries.get(action, {})}
+        self.entries[action][stage] = {
+            'inputs': inputs,
+            'started': self._get_timestamp(),
+            'completed': None
+        }
+        self._save()
+
+    def record_completion(self, action, stage):
+        """Record that a stage has completed.
+
+        Args:
+            action (str): the bootsys action, e.g. 'shutdown' or 'boot'.
+            stage (str): the name of the stage.
+        """
+        self.entries[action][stage]['completed'] = self._get_timestamp()
+        self._save()
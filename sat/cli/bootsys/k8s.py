@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -36,7 +36,7 @@ from yaml import YAMLLoadWarning
 from sat.cached_property import cached_property
 from sat.cli.bootsys.state_recorder import PodStateRecorder, StateError
 from sat.cli.bootsys.util import k8s_pods_to_status_dict
-from sat.waiting import GroupWaiter, Waiter
+from sat.waiting import GroupWaiter, KubernetesWatchMixin, Waiter
 from sat.config import get_config_value
 from sat.report import Report
 from sat.util import BeginEndLogger
@@ -45,21 +45,23 @@ LOGGER = logging.getLogger(__name__)
 INF = inflect.engine()
 
 
-class KubernetesPodStatusWaiter(GroupWaiter):
+class KubernetesPodStatusWaiter(KubernetesWatchMixin, GroupWaiter):
     """A waiter which waits for pods to reach expected state.
 
     This waits for all pods to be in the same state they were in before the
     previous shutdown and for any new pods to be in the 'Running' or 'Complete'
-    state.
+    state. Pods are listed once, and changes to their phases are then received
+    from a Kubernetes watch stream.
     """
 
-    def __init__(self, timeout, poll_interval=10):
+    def __init__(self, timeout, poll_interval=10, max_poll_interval=30):
         """Initialize the Kubernetes waiter.
 
         See GroupWaiter documentation.
         """
 
-        super().__init__(set(), timeout, poll_interval=poll_interval)
+        super().__init__(set(), timeout, poll_interval=poll_interval,
+                         max_poll_interval=max_poll_interval)
 
         # Load k8s configuration before trying to use API
         self.k8s_api = load_kube_api()
@@ -97,9 +99,37 @@ class KubernetesPodStatusWaiter(GroupWaiter):
         """
         all_pods = self.k8s_api.list_pod_for_all_namespaces()
         self.k8s_pod_status = k8s_pods_to_status_dict(all_pods)
+        self.watch_resource_version = all_pods.metadata.resource_version
 
     def on_check_action(self):
-        """Update pod status before doing each check for completion."""
+        """Update pod status before doing each check for completion.
+
+        Pod status is kept up to date by handle_watch_event while watching,
+        so pods are only listed again if waiting has fallen back to polling.
+        """
+        if not self.watching:
+            self.update_k8s_pod_status()
+
+    def get_watch_source(self):
+        return self.k8s_api.list_pod_for_all_namespaces, (), {}
+
+    def handle_watch_event(self, event_type, obj):
+        """Update the status of the pod from the event.
+
+        Returns:
+            bool: True if the phase of a pending pod changed, False otherwise.
+        """
+        ns, name = obj.metadata.namespace, obj.metadata.name
+        if event_type == 'DELETED':
+            self.k8s_pod_status[ns].pop(name, None)
+            return False
+
+        old_phase = self.k8s_pod_status[ns].get(name)
+        self.k8s_pod_status[ns][name] = obj.status.phase
+        return (ns, name) in self.pending and obj.status.phase != old_phase
+
+    def resync_watch_state(self):
+        """List all pods again after the watched resource version expired."""
         self.update_k8s_pod_status()
 
     def post_wait_action(self):
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -27,12 +27,42 @@ Entry point for the bootsys subcommand.
 import logging
 import sys
 
-from sat.cli.bootsys.stages import STAGES_BY_ACTION, load_stage
+from sat.cli.bootsys.journal import BootsysJournal, get_stage_inputs
+from sat.cli.bootsys.stages import STAGE_REVALIDATIONS_BY_ACTION, STAGES_BY_ACTION, load_stage
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+def can_skip_stage(journal, args, stage_inputs):
+    """Check whether a stage completed and does not need to be run again.
+
+    Args:
+        journal (sat.cli.bootsys.journal.BootsysJournal): the journal of
+            stages which have completed.
+        args: The argparse.Namespace object containing the parsed arguments
+            passed to this subcommand.
+        stage_inputs (dict): the inputs of the stage, as returned by
+            get_stage_inputs.
+
+    Returns:
+        bool: True if the stage can be skipped, False otherwise.
+    """
+    entry = journal.get_completed_entry(args.action, args.stage, stage_inputs)
+    if entry is None:
+        return False
+
+    revalidation = STAGE_REVALIDATIONS_BY_ACTION[args.action].get(args.stage)
+    if revalidation is not None and not load_stage(*revalidation)(args):
+        LOGGER.info('Stage %s of %s completed at %s, but its effects are no longer '
+                    'in place, so it will be run again.', args.stage, args.action, entry['completed'])
+        return False
+
+    LOGGER.info('Skipping stage %s of %s, which completed at %s.',
+                args.stage, args.action, entry['completed'])
+    return True
+
+
 def do_bootsys(args):
     """Perform a single stage of a boot or shutdown operation on the system.
 
@@ -93,4 +123,12 @@ def do_bootsys(args):
         LOGGER.error('Invalid stage received for %s action: %s', args.action, args.stage)
         sys.exit(1)
     stage = load_stage(submodule, stage_func_name)
+
+    journal = BootsysJournal()
+    stage_inputs = get_stage_inputs(args)
+    if args.resume and can_skip_stage(journal, args, stage_inputs):
+        return
+
+    journal.record_start(args.action, args.stage, stage_inputs)
     stage(args)
+    journal.record_completion(args.action, args.stage)
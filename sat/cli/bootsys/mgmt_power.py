@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -26,16 +26,21 @@ Management cluster boot, shutdown, and IPMI power support.
 """
 from collections import defaultdict
 import logging
-import shlex
 import socket
-import subprocess
 import sys
 
 import inflect
 from paramiko.ssh_exception import BadHostKeyException, AuthenticationException, SSHException
 
 from sat.cli.bootsys.ipmi_console import IPMIConsoleLogger, ConsoleLoggingError
-from sat.cli.bootsys.util import get_and_verify_ncn_groups, get_ssh_client, FatalBootsysError
+from sat.cli.bootsys.ipmi_power import IPMI_COMMAND_TIMEOUT, IPMIPowerClient
+from sat.cli.bootsys.util import (
+    get_and_verify_ncn_groups,
+    get_mgmt_ncn_groups,
+    get_ssh_client,
+    get_ssh_connection_pool,
+    FatalBootsysError
+)
 from sat.waiting import GroupWaiter, WaitingFailure
 from sat.config import get_config_value
 from sat.util import BeginEndLogger, get_username_and_password_interactively, prompt_continue
@@ -43,14 +48,22 @@ from sat.util import BeginEndLogger, get_username_and_password_interactively, pr
 LOGGER = logging.getLogger(__name__)
 INF = inflect.engine()
 
+# The maximum number of hosts to check concurrently with ipmitool or SSH.
+MAX_CONCURRENT_HOST_CHECKS = 16
+# The time, in seconds, allowed for a single SSH connection attempt.
+SSH_CONNECT_TIMEOUT = 10
+
 
 class IPMIPowerStateWaiter(GroupWaiter):
     """Implementation of a waiter for IPMI power states.
 
-    Waits for all members to reach the given IPMI power state."""
+    Waits for all members to reach the given IPMI power state. The power
+    state of every pending member is queried at the same time on each check,
+    up to `max_workers` at once."""
 
     def __init__(self, members, power_state, timeout, username, password,
-                 send_command=False, poll_interval=1, failure_threshold=3):
+                 send_command=False, poll_interval=1, failure_threshold=3,
+                 max_workers=MAX_CONCURRENT_HOST_CHECKS, member_timeout=IPMI_COMMAND_TIMEOUT):
         """Constructor for an IPMIPowerStateWaiter object.
 
         Args:
@@ -61,37 +74,64 @@ class IPMIPowerStateWaiter(GroupWaiter):
             username (str): the username to use when running ipmitool commands
             password (str): the password to use when running ipmitool commands
             failure_threshold (int): if a call to ipmitool gives a nonzero
-                return code this many times in a row for a given member, then
-                that member will be marked as failed.
+                return code or times out this many times in a row for a given
+                member, then that member will be marked as failed.
+            max_workers (int): the maximum number of ipmitool commands to run
+                concurrently.
+            member_timeout (int): the time, in seconds, allowed for each
+                ipmitool command to complete.
         """
         self.power_state = power_state
-        self.username = username
-        self.password = password
         self.send_command = send_command
+        self.ipmi_client = IPMIPowerClient(username, password, timeout=member_timeout,
+                                           max_workers=max_workers)
 
         self.failure_threshold = failure_threshold
         self.consecutive_failures = defaultdict(int)
 
-        super().__init__(members, timeout, poll_interval=poll_interval)
+        super().__init__(members, timeout, poll_interval=poll_interval,
+                         max_workers=max_workers, member_timeout=member_timeout)
 
     def condition_name(self):
         return 'IPMI power ' + self.power_state
 
-    def get_ipmi_command(self, member, command):
-        """Get the full command-line for an ipmitool command.
+    def _check_power_status(self, result):
+        """Check the result of an ipmitool power status command.
 
         Args:
-            member (str): the host to query
-            command (str): the ipmitool command to run, e.g. `chassis power status`
+            result (IPMICommandResult): the result of the command.
 
         Returns:
-            The command to run, split into a list of args by shlex.split.
+            True if the host is in the desired power state, False otherwise.
+
+        Raises:
+            WaitingFailure: if ipmitool has failed `failure_threshold` times
+                in a row for the host.
         """
-        return shlex.split(
-            'ipmitool -I lanplus -U {} -P {} -H {}-mgmt {}'.format(
-                self.username, self.password, member, command
-            )
-        )
+        member = result.host
+        if result.returncode is None:
+            self.consecutive_failures[member] += 1
+            if self.consecutive_failures[member] >= self.failure_threshold:
+                raise WaitingFailure(f'ipmitool command timed out after {self.member_timeout} '
+                                     f'seconds {self.consecutive_failures[member]} time(s)')
+            LOGGER.debug('ipmitool command timed out after %s seconds for host %s',
+                         self.member_timeout, member)
+            return False
+
+        if result.returncode:
+            if not self.consecutive_failures[member]:
+                LOGGER.warning("impitool command failed with code %d: %s",
+                               result.returncode, result.stderr)
+
+            self.consecutive_failures[member] += 1
+            if self.consecutive_failures[member] >= self.failure_threshold:
+                raise WaitingFailure(f'ipmitool command failed {self.consecutive_failures[member]} time(s) '
+                                     f'with code {result.returncode}; stderr: {result.stderr}')
+            return False
+        elif self.consecutive_failures[member]:
+            self.consecutive_failures[member] = 0
+
+        return self.power_state in result.stdout
 
     def member_has_completed(self, member):
         """Check if a host is in the desired state.
@@ -100,66 +140,82 @@ class IPMIPowerStateWaiter(GroupWaiter):
             If the powerstate of the host matches that which was given
             in the constructor, return True. Otherwise, return False.
         """
-        ipmi_command = self.get_ipmi_command(member, 'chassis power status')
+        # Failed status checks are not retried here since the host is
+        # checked again on the next poll anyway.
         try:
-            proc = subprocess.run(ipmi_command, stdout=subprocess.PIPE,
-                                  stderr=subprocess.PIPE, encoding='utf-8')
+            result = self.ipmi_client.run_command(member, 'chassis power status', retries=0)
         except OSError as err:
             raise WaitingFailure(f'Unable to find ipmitool: {err}')
+        return self._check_power_status(result)
 
-        if proc.returncode:
-            if not self.consecutive_failures[member]:
-                LOGGER.warning("impitool command failed with code %d: %s",
-                               proc.returncode, proc.stderr)
+    def members_have_completed(self, members):
+        """Check which hosts are in the desired state.
 
-            self.consecutive_failures[member] += 1
-            if self.consecutive_failures[member] >= self.failure_threshold:
-                raise WaitingFailure(f'ipmitool command failed {self.consecutive_failures[member]} time(s) '
-                                     f'with code {proc.returncode}; stderr: {proc.stderr}')
-            return False
-        elif self.consecutive_failures[member]:
-            self.consecutive_failures[member] = 0
+        Args:
+            members (set): the hosts to check.
 
-        return self.power_state in proc.stdout
+        Returns:
+            set: the hosts which are in the desired state.
+        """
+        try:
+            results = self.ipmi_client.run_command_on_hosts(members, 'chassis power status',
+                                                            retries=0)
+        except OSError as err:
+            for member in members:
+                self._member_failed(member, WaitingFailure(f'Unable to find ipmitool: {err}'))
+            return set()
+
+        completed = set()
+        for member, result in results.items():
+            try:
+                if self._check_power_status(result):
+                    completed.add(member)
+            except WaitingFailure as err:
+                self._member_failed(member, err)
+        return completed
 
     def pre_wait_action(self):
         """Send IPMI power commands to given hosts.
 
         This will issue IPMI power commands to put the given hosts in the power
-        state given by `self.power_state`.
+        state given by `self.power_state`. The commands are sent to all the
+        hosts at the same time, and failed commands are retried.
 
         Returns:
             None
         """
         LOGGER.debug("Entered pre_wait_action with self.send_command: %s.", self.send_command)
         if self.send_command:
-            for member in self.members:
-                LOGGER.info('Sending IPMI power %s command to host %s', self.power_state, member)
-                ipmi_command = self.get_ipmi_command(member,
-                                                     'chassis power {}'.format(self.power_state))
-                try:
-                    proc = subprocess.run(ipmi_command, stdout=subprocess.PIPE,
-                                          stderr=subprocess.PIPE, encoding='utf-8')
-                except OSError as err:
+            LOGGER.info('Sending IPMI power %s command to host(s): %s',
+                        self.power_state, ', '.join(sorted(self.members)))
+            try:
+                results = self.ipmi_client.set_power_state(self.members, self.power_state)
+            except OSError as err:
+                # TODO (SAT-552): Improve handling of ipmitool errors
+                LOGGER.error('Unable to find ipmitool: %s', err)
+                return
+
+            for member, result in sorted(results.items()):
+                if result.returncode is None:
+                    LOGGER.error('ipmitool power %s command for host %s %s after %d attempt(s)',
+                                 self.power_state, member, result.stderr, result.attempts)
+                elif result.returncode:
                     # TODO (SAT-552): Improve handling of ipmitool errors
-                    LOGGER.error('Unable to find ipmitool: %s', err)
-                    return
-
-                if proc.returncode:
-                    # TODO (SAT-552): Improve handling of ipmitool errors
-                    LOGGER.error('ipmitool command failed with code %s: stderr: %s',
-                                 proc.returncode, proc.stderr)
-                    return
+                    LOGGER.error('ipmitool power %s command for host %s failed with code %s '
+                                 'after %d attempt(s): stderr: %s', self.power_state, member,
+                                 result.returncode, result.attempts, result.stderr)
 
 
 class SSHAvailableWaiter(GroupWaiter):
     """A waiter which waits for all member nodes to be accessible via SSH.
     """
 
-    def __init__(self, members, timeout, poll_interval=1):
+    def __init__(self, members, timeout, poll_interval=1,
+                 max_workers=MAX_CONCURRENT_HOST_CHECKS, member_timeout=SSH_CONNECT_TIMEOUT):
         self.ssh_client = get_ssh_client()
 
-        super().__init__(members, timeout, poll_interval=poll_interval)
+        super().__init__(members, timeout, poll_interval=poll_interval,
+                         max_workers=max_workers, member_timeout=member_timeout)
 
     def condition_name(self):
         return 'Hosts accessible via SSH'
@@ -174,30 +230,36 @@ class SSHAvailableWaiter(GroupWaiter):
             True if SSH connecting succeeded, and
                 False otherwise.
         """
+        # paramiko.SSHClient is not safe to share between threads, so use a
+        # separate client for each check when checking hosts concurrently.
+        ssh_client = get_ssh_client() if self.max_workers > 1 else self.ssh_client
         try:
-            self.ssh_client.connect(member)
+            ssh_client.connect(member, timeout=self.member_timeout)
         except (SSHException, socket.error):
             return False
         else:
             return True
+        finally:
+            if ssh_client is not self.ssh_client:
+                ssh_client.close()
 
 
 # Failures are logged, but otherwise ignored. They may be considered "stalled shutdowns" and
 # forcibly powered off as allowed for in the process.
-def start_shutdown(hosts, ssh_client):
+def start_shutdown(hosts):
     """Start shutdown by sending a shutdown command to each host.
 
     Args:
         hosts ([str]): a list of hostnames to shut down.
-        ssh_client (paramiko.SSHClient): a paramiko client object.
     """
 
     REMOTE_CMD = 'shutdown -h now'
+    ssh_pool = get_ssh_connection_pool()
 
     for host in hosts:
         LOGGER.info('Executing command on host "%s": `%s`', host, REMOTE_CMD)
         try:
-            ssh_client.connect(host)
+            ssh_client = ssh_pool.get_client(host)
         except (BadHostKeyException, AuthenticationException,
                 SSHException, socket.error) as err:
             LOGGER.warning('Unable to connect to host "%s": %s', host, err)
@@ -210,6 +272,9 @@ def start_shutdown(hosts, ssh_client):
         else:
             for channel in remote_streams:
                 channel.close()
+        finally:
+            # The host is going down, so its connection cannot be reused.
+            ssh_pool.close_client(host)
 
 
 def finish_shutdown(hosts, username, password, ncn_shutdown_timeout, ipmi_timeout):
@@ -248,11 +313,10 @@ def finish_shutdown(hosts, username, password, ncn_shutdown_timeout, ipmi_timeou
             sys.exit(1)
 
 
-def do_mgmt_shutdown_power(ssh_client, username, password, excluded_ncns, ncn_shutdown_timeout, ipmi_timeout):
+def do_mgmt_shutdown_power(username, password, excluded_ncns, ncn_shutdown_timeout, ipmi_timeout):
     """Power off NCNs.
 
     Args:
-        ssh_client (paramiko.SSHClient): a paramiko client object.
         username (str): IPMI username to use.
         password (str): IPMI password to use.
         excluded_ncns (set of str): The set of ncn hostnames to exclude, in
@@ -277,7 +341,7 @@ def do_mgmt_shutdown_power(ssh_client, username, password, excluded_ncns, ncn_sh
     try:
         with IPMIConsoleLogger(other_ncns, username, password):
             LOGGER.info(f'Sending shutdown command to other NCNs: {", ".join(other_ncns)}')
-            start_shutdown(other_ncns, ssh_client)
+            start_shutdown(other_ncns)
             LOGGER.info(f'Waiting up to {ncn_shutdown_timeout} seconds for other NCNs to '
                         f'reach powered off state according to ipmitool: {", ".join(other_ncns)}.')
             finish_shutdown(other_ncns, username, password,
@@ -301,15 +365,41 @@ def do_power_off_ncns(args):
         prompt_continue(action_msg)
     username, password = get_username_and_password_interactively(username_prompt='IPMI username',
                                                                  password_prompt='IPMI password')
-    ssh_client = get_ssh_client()
 
     with BeginEndLogger(action_msg):
-        do_mgmt_shutdown_power(ssh_client, username, password, args.excluded_ncns,
+        do_mgmt_shutdown_power(username, password, args.excluded_ncns,
                                get_config_value('bootsys.ncn_shutdown_timeout'),
                                get_config_value('bootsys.ipmi_timeout'))
     LOGGER.info('Succeeded with {}.'.format(action_msg))
 
 
+def validate_ncns_powered_on(args):
+    """Check that the NCNs booted by the ncn-power stage are still accessible via SSH.
+
+    This is used to check whether the ncn-power stage of the boot action can
+    be skipped when resuming.
+
+    Args:
+        args: The argparse.Namespace object containing the parsed arguments
+            passed to this stage.
+
+    Returns:
+        bool: True if all the NCNs are accessible via SSH, False otherwise.
+    """
+    try:
+        included_ncn_groups, _ = get_mgmt_ncn_groups(args.excluded_ncns.union({'ncn-m001'}))
+    except FatalBootsysError as err:
+        LOGGER.warning(f'Unable to get NCNs to check: {err}')
+        return False
+
+    ncns = {ncn for role in ('managers', 'storage', 'workers') for ncn in included_ncn_groups[role]}
+    inaccessible_nodes = SSHAvailableWaiter(ncns, SSH_CONNECT_TIMEOUT).wait_for_completion()
+    if inaccessible_nodes:
+        LOGGER.info(f'The following NCNs are not accessible via SSH: {", ".join(sorted(inaccessible_nodes))}')
+        return False
+    return True
+
+
 def do_power_on_ncns(args):
     """Power on NCNs while monitoring consoles with ipmitool.
 
@@ -59,6 +59,8 @@ TIMEOUT_SPECS = [
     TimeoutSpec('ncn-shutdown', ['shutdown'], 300,
                 'management NCNs have completed a graceful shutdown and have reached '
                 'the powered off state according to IPMI.'),
+    TimeoutSpec('session-check', ['shutdown'], 120,
+                'each service has been checked for active sessions.'),
 ]
 
 
@@ -187,6 +189,23 @@ def _add_excluded_ncns_option(subparser):
     )
 
 
+def _add_resume_option(subparser, action):
+    """Add the --resume option to the subparser.
+
+    Args:
+        subparser: The argparse.ArgumentParser object for the bootsys action
+        action (str): the action to which the option applies.
+
+    Returns:
+        None
+    """
+    subparser.add_argument(
+        '--resume', action='store_true',
+        help=f'Skip the stage if it already completed during this {action} '
+             f'with the same options, and its effects are still in place.'
+    )
+
+
 def _add_bootsys_action_subparser(subparsers, action):
     """Add the shutdown subparser to the parent bootsys parser.
 
@@ -210,6 +229,7 @@ def _add_bootsys_action_subparser(subparsers, action):
     _add_bos_template_options(action_parser, action)
     _add_timeout_options(action_parser, action)
     _add_excluded_ncns_option(action_parser)
+    _add_resume_option(action_parser, action)
 
 
 def _add_bootsys_shutdown_subparser(subparsers):
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -26,10 +26,13 @@ Start and stop platform services to boot and shut down a Shasta system.
 """
 
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import math
 import socket
 from paramiko import SSHException
 from threading import Thread
+import time
 
 from sat.cached_property import cached_property
 from sat.config import get_config_value
@@ -40,8 +43,14 @@ from sat.cli.bootsys.ceph import (
     CephHealthWaiter
 )
 from sat.cli.bootsys.etcd import save_etcd_snapshot_on_host, EtcdInactiveFailure, EtcdSnapshotFailure
-from sat.cli.bootsys.util import get_and_verify_ncn_groups, get_ssh_client, FatalBootsysError
-from sat.waiting import Waiter
+from sat.cli.bootsys.util import get_and_verify_ncn_groups, get_ssh_connection_pool, FatalBootsysError
+from sat.waiting import (
+    DependencyGroupMember,
+    DependencyGroupWaiter,
+    Waiter,
+    WaiterScheduler,
+    WaitingFailure
+)
 from sat.util import BeginEndLogger, pester_choices, prompt_continue
 
 LOGGER = logging.getLogger(__name__)
@@ -56,6 +65,8 @@ CONTAINER_STOP_SCRIPT = (
 )
 # Default timeout in seconds for service start/stop actions
 SERVICE_ACTION_TIMEOUT = 30
+# Maximum number of hosts on which service start/stop actions run at the same time
+MAX_CONCURRENT_SERVICE_ACTIONS = 16
 
 
 class FatalPlatformError(Exception):
@@ -110,7 +121,7 @@ class RemoteServiceWaiter(Waiter):
         self.service_name = service_name
         self.target_state = target_state
         self.target_enabled = target_enabled
-        self.ssh_client = get_ssh_client()
+        self.ssh_client = None
 
     def _run_remote_command(self, command, nonzero_error=True):
         """Run the given command on the remote host.
@@ -139,10 +150,10 @@ class RemoteServiceWaiter(Waiter):
 
         return stdout, stderr
 
-    def wait_for_completion(self):
+    def _wait_steps(self):
         """Wait for completion but catch and log errors, and fail if errors are caught."""
         try:
-            return super().wait_for_completion()
+            return (yield from super()._wait_steps())
         except (RuntimeError, socket.error, SSHException) as e:
             LOGGER.error(e)
             return False
@@ -153,7 +164,7 @@ class RemoteServiceWaiter(Waiter):
                 f'on {self.host}')
 
     def pre_wait_action(self):
-        """Connect to remote host and start/stop the service if needed.
+        """Get a connection to the remote host and start/stop the service if needed.
 
         This method will set `self.completed` to True if no action is needed.
 
@@ -163,7 +174,7 @@ class RemoteServiceWaiter(Waiter):
             RuntimeError, SSHException: from _run_remote_command.
         """
         systemctl_action = ('stop', 'start')[self.target_state == 'active']
-        self.ssh_client.connect(self.host)
+        self.ssh_client = get_ssh_connection_pool().get_client(self.host)
         if self.has_completed():
             self.completed = True
         else:
@@ -235,9 +246,7 @@ class ContainerStopThread(Thread):
             SystemExit(1): if there is a failure to connect to `self.host`.
         """
         try:
-            ssh_client = get_ssh_client()
-            ssh_client.connect(self.host)
-            return ssh_client
+            return get_ssh_connection_pool().get_client(self.host)
         except (socket.error, SSHException) as err:
             self._err_exit(f'Failed to connect to host {self.host}: {err}')
 
@@ -393,12 +402,8 @@ def do_service_action_on_hosts(hosts, service, target_state,
     service_action_waiters = [RemoteServiceWaiter(host, service, target_state=target_state,
                                                   timeout=timeout, target_enabled=target_enabled)
                               for host in hosts]
-    for waiter in service_action_waiters:
-        waiter.wait_for_completion_async()
-    for waiter in service_action_waiters:
-        waiter.wait_for_completion_await()
-
-    if not all(waiter.completed for waiter in service_action_waiters):
+    scheduler = WaiterScheduler(service_action_waiters, max_workers=MAX_CONCURRENT_SERVICE_ACTIONS)
+    if not scheduler.wait_for_completion():
         raise FatalPlatformError(f'Failed to ensure {service} is {target_state} '
                                  f'{f"and {target_enabled} " if target_enabled else ""}'
                                  f'on all hosts.')
@@ -541,11 +546,14 @@ def do_etcd_start(ncn_groups):
                                target_enabled='enabled')
 
 
-# Each step has a description that is printed and an action that is called
-# with the single argument being a dict mapping from NCN group names to hosts.
-PlatformServicesStep = namedtuple('PlatformServicesStep', ('description', 'action'))
+# Each step has a description that is printed, an action that is called with
+# the single argument being a dict mapping from NCN group names to hosts, and
+# the actions of the steps which must finish before the step can begin. Steps
+# which do not depend on each other are run at the same time.
+PlatformServicesStep = namedtuple('PlatformServicesStep', ('description', 'action', 'dependencies'),
+                                  defaults=((),))
 STEPS_BY_ACTION = {
-    # The ordered steps to start platform services
+    # The steps to start platform services
     'start': [
         PlatformServicesStep('Ensure containerd is running and enabled on all Kubernetes NCNs.',
                              do_containerd_start),
@@ -553,23 +561,186 @@ STEPS_BY_ACTION = {
                              do_etcd_start),
         PlatformServicesStep('Start inactive Ceph services, unfreeze Ceph cluster and wait for Ceph health.',
                              do_ceph_unfreeze),
-        PlatformServicesStep('Start and enable kubelet on all Kubernetes NCNs.', do_kubelet_start)
+        PlatformServicesStep('Start and enable kubelet on all Kubernetes NCNs.', do_kubelet_start,
+                             (do_containerd_start, do_etcd_start, do_ceph_unfreeze))
     ],
-    # The ordered steps to stop platform services
+    # The steps to stop platform services. Nothing is stopped until the etcd
+    # snapshot has been created.
     'stop': [
         PlatformServicesStep('Create etcd snapshot on all Kubernetes manager NCNs.', do_etcd_snapshot),
-        PlatformServicesStep('Stop etcd on all Kubernetes manager NCNs.', do_etcd_stop),
-        PlatformServicesStep('Stop and disable kubelet on all Kubernetes NCNs.', do_kubelet_stop),
+        PlatformServicesStep('Stop etcd on all Kubernetes manager NCNs.', do_etcd_stop,
+                             (do_etcd_snapshot,)),
+        PlatformServicesStep('Stop and disable kubelet on all Kubernetes NCNs.', do_kubelet_stop,
+                             (do_etcd_snapshot,)),
         PlatformServicesStep('Stop containers running under containerd on all Kubernetes NCNs.',
-                             do_stop_containers),
-        PlatformServicesStep('Stop containerd on all Kubernetes NCNs.', do_containerd_stop),
-        PlatformServicesStep('Check health of Ceph cluster and freeze state.', do_ceph_freeze)
+                             do_stop_containers, (do_kubelet_stop,)),
+        PlatformServicesStep('Stop containerd on all Kubernetes NCNs.', do_containerd_stop,
+                             (do_stop_containers,)),
+        PlatformServicesStep('Check health of Ceph cluster and freeze state.', do_ceph_freeze,
+                             (do_containerd_stop,))
     ]
 }
 
 
+class PlatformServicesStepRunner(DependencyGroupMember):
+    """Runs a PlatformServicesStep in the background once its dependencies have finished.
+
+    Attributes:
+        step (PlatformServicesStep): the step to run.
+        ncn_groups (dict): a dict mapping from NCN group names to hosts, which
+            is passed to the action of the step.
+        executor (concurrent.futures.Executor): the executor in which to run
+            the action of the step.
+        future (concurrent.futures.Future or None): the result of the action,
+            or None if the step has not begun.
+        error (Exception or None): the error raised by the action, if any.
+        start_time (float or None): the value of time.monotonic() when the
+            step began.
+        end_time (float or None): the value of time.monotonic() when the step
+            finished.
+    """
+
+    def __init__(self, step, ncn_groups, executor):
+        super().__init__()
+        self.step = step
+        self.ncn_groups = ncn_groups
+        self.executor = executor
+        self.future = None
+        self.error = None
+        self.start_time = None
+        self.end_time = None
+
+    def __str__(self):
+        return self.step.description
+
+    def begin(self):
+        """Start running the action of the step."""
+        LOGGER.info(f'Executing step: {self.step.description}')
+        self.start_time = time.monotonic()
+        self.future = self.executor.submit(self._run_action)
+
+    def _run_action(self):
+        """Run the action of the step and record when it finished."""
+        try:
+            self.step.action(self.ncn_groups)
+        finally:
+            self.end_time = time.monotonic()
+
+
+class PlatformServicesStepWaiter(DependencyGroupWaiter):
+    """Begins platform services steps once their dependencies finish and waits for them.
+
+    Dependencies on steps which are not members of the waiter are treated as
+    satisfied. This allows the steps which were blocked by a non-fatal error
+    in a step they depend on to be run by a new waiter without changing the
+    dependencies of the steps.
+
+    Attributes:
+        action (str): the platform services action, e.g. 'start' or 'stop'.
+        fatal_error (bool): True if a step failed with a FatalPlatformError.
+            No more steps are begun after that happens.
+    """
+
+    def __init__(self, members, action, poll_interval=1):
+        # There is no overall timeout since each step enforces its own timeouts.
+        super().__init__(members, math.inf, poll_interval)
+        self.action = action
+        self.fatal_error = False
+        self.pending = set(member for member in self.members
+                           if not member.dependencies.intersection(self.members))
+
+    def condition_name(self):
+        return f'platform services {self.action}'
+
+    def member_has_completed(self, member):
+        """Check whether the given step has finished.
+
+        Raises:
+            WaitingFailure: if the step failed with a FatalPlatformError or
+                NonFatalPlatformError.
+        """
+        if member.future is None or not member.future.done():
+            return False
+
+        member.error = member.future.exception()
+        if isinstance(member.error, (FatalPlatformError, NonFatalPlatformError)):
+            raise WaitingFailure(str(member.error))
+        # Raise any other error from the step in this thread.
+        member.future.result()
+        return True
+
+    def _member_failed(self, member, err):
+        if isinstance(member.error, NonFatalPlatformError):
+            LOGGER.warning(f'Non-fatal error in step "{member}" of '
+                           f'platform services {self.action}: {err}')
+        else:
+            LOGGER.error(f'Fatal error in step "{member}" of '
+                         f'platform services {self.action}: {err}')
+            self.fatal_error = True
+        self.failed.add(member)
+
+    def _begin_member(self, member):
+        if self.fatal_error:
+            # Steps not yet begun are abandoned along with the action.
+            self.failed.add(member)
+            return
+        super()._begin_member(member)
+
+
+def get_step_runners(steps, ncn_groups, executor):
+    """Get a PlatformServicesStepRunner for each step with its dependencies set.
+
+    Args:
+        steps (list of PlatformServicesStep): the steps to run.
+        ncn_groups (dict): a dict mapping from NCN group names to hosts.
+        executor (concurrent.futures.Executor): the executor in which to run
+            the actions of the steps.
+
+    Returns:
+        list of PlatformServicesStepRunner: the runners for the steps, in the
+            same order as the steps.
+    """
+    runners_by_action = {step.action: PlatformServicesStepRunner(step, ncn_groups, executor)
+                         for step in steps}
+    for runner in runners_by_action.values():
+        for dependency in runner.step.dependencies:
+            runner.add_dependency(runners_by_action[dependency])
+    return list(runners_by_action.values())
+
+
+def get_critical_path(runners):
+    """Get the chain of dependent steps which determined how long an action took.
+
+    This starts from the step which finished last and repeatedly follows the
+    dependency of the step which finished last.
+
+    Args:
+        runners (list of PlatformServicesStepRunner): the steps which ran.
+
+    Returns:
+        list of PlatformServicesStepRunner: the steps on the critical path, in
+            the order in which they ran.
+    """
+    def finish_time(runner):
+        return runner.end_time
+
+    finished = [runner for runner in runners if runner.end_time is not None]
+    critical_path = []
+    while finished:
+        last = max(finished, key=finish_time)
+        critical_path.append(last)
+        finished = [dependency for dependency in last.dependencies if dependency.end_time is not None]
+
+    return list(reversed(critical_path))
+
+
 def do_platform_action(args, action):
-    """Do a platform action with the given ordered steps.
+    """Do a platform action with the given steps.
+
+    Steps begin as soon as the steps they depend on have finished. If a step
+    fails with a non-fatal error, the steps already running are allowed to
+    finish, and then the admin is asked whether to continue with the steps
+    which depend on it.
 
     Args:
         args: The argparse.Namespace object containing the parsed arguments
@@ -594,24 +765,32 @@ def do_platform_action(args, action):
         LOGGER.error(f'Not proceeding with platform {action}: {err}')
         raise SystemExit(1)
 
-    for step in steps:
-        try:
-            info_message = f'Executing step: {step.description}'
-            LOGGER.info(info_message)
-            step.action(ncn_groups)
-        except NonFatalPlatformError as err:
-            LOGGER.warning(f'Non-fatal error in step "{step.description}" of '
-                           f'platform services {action}: {err}')
-            answer = pester_choices(f'Continue with platform services {action}?', ('yes', 'no'))
-            if answer == 'yes':
-                LOGGER.info('Continuing.')
-            else:
-                LOGGER.info('Aborting.')
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        runners = get_step_runners(steps, ncn_groups, executor)
+        runners_to_run = runners
+        while runners_to_run:
+            waiter = PlatformServicesStepWaiter(runners_to_run, action)
+            waiter.wait_for_completion()
+
+            if waiter.fatal_error:
                 raise SystemExit(1)
-        except FatalPlatformError as err:
-            LOGGER.error(f'Fatal error in step "{step.description}" of '
-                         f'platform services {action}: {err}')
-            raise SystemExit(1)
+            if waiter.failed:
+                answer = pester_choices(f'Continue with platform services {action}?', ('yes', 'no'))
+                if answer == 'yes':
+                    LOGGER.info('Continuing.')
+                else:
+                    LOGGER.info('Aborting.')
+                    raise SystemExit(1)
+
+            # Run the steps which were blocked by non-fatal errors in the steps they depend on.
+            runners_to_run = [runner for runner in runners_to_run if runner.future is None]
+
+    critical_path = get_critical_path(runners)
+    if critical_path:
+        duration = critical_path[-1].end_time - critical_path[0].start_time
+        LOGGER.info(f'Platform services {action} took {duration:.1f} seconds. Critical path: ' +
+                    ' -> '.join(f'"{runner}" ({runner.end_time - runner.start_time:.1f} seconds)'
+                                for runner in critical_path))
 
 
 def do_platform_stop(args):
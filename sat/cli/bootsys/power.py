@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -69,7 +69,8 @@ def get_nodes_by_role_and_state(role, power_state):
 class CAPMCPowerWaiter(GroupWaiter):
     """Waits for all members to reach the given power state in CAPMC."""
 
-    def __init__(self, members, power_state, timeout, poll_interval=5, suppress_warnings=False):
+    def __init__(self, members, power_state, timeout, poll_interval=5, suppress_warnings=False,
+                 max_poll_interval=20):
         """Create a new CAPMCPowerStateWaiter.
 
         Args:
@@ -78,13 +79,16 @@ class CAPMCPowerWaiter(GroupWaiter):
             timeout (int): how long to wait for nodes to reach given power state
                 before timing out.
             poll_interval (int): how long to wait between checks on power state
+                initially and after any member reaches the power state
             suppress_warnings (bool): if True, suppress warnings when a query to
                 get_xname_status results in an error and node(s) in undefined
                 state. As an example, this is useful when waiting for a BMC or
                 node controller to be powered on since CAPMC will fail to query
                 the power status until it is powered on.
+            max_poll_interval (int): the longest to wait between checks on
+                power state when no members are reaching the power state
         """
-        super().__init__(members, timeout, poll_interval)
+        super().__init__(members, timeout, poll_interval, max_poll_interval=max_poll_interval)
         self.power_state = power_state
         self.capmc_client = CAPMCClient(SATSession(), suppress_warnings=suppress_warnings)
 
@@ -113,6 +117,31 @@ class CAPMCPowerWaiter(GroupWaiter):
 
         return current_state == self.power_state
 
+    def members_have_completed(self, members):
+        """Return the member xnames which have reached the desired power state.
+
+        This queries the power state of all the given members with a single
+        request to CAPMC.
+
+        Args:
+            members (set of str): the xnames to check
+
+        Returns:
+            set of str: the xnames which have reached the desired power state
+                according to CAPMC.
+        """
+        LOGGER.debug('Checking whether %s xname(s) have reached desired power state %s',
+                     len(members), self.power_state)
+        try:
+            xnames_by_power_state = self.capmc_client.get_xnames_power_state(list(members))
+        except APIError as err:
+            # When cabinets are powered off, the query will respond with 400 bad request
+            # until components are reachable.
+            LOGGER.debug('Failed to query power state: %s', err)
+            return set()
+
+        return set(xnames_by_power_state.get(self.power_state, [])).intersection(members)
+
 
 def do_nodes_power_off(timeout):
     """Ensure the compute and application nodes (UANs) are powered off.
@@ -27,17 +27,14 @@ Various checks on system services to ensure idleness before shutdown.
 from abc import ABC, abstractmethod
 from collections import OrderedDict
 import logging
-import socket
 import sys
-import warnings
+from threading import Thread
+import time
 
 from inflect import engine
 from kubernetes.client import CoreV1Api
 from kubernetes.client.rest import ApiException
-from kubernetes.config import load_kube_config
 from kubernetes.config.config_exception import ConfigException
-from paramiko.ssh_exception import SSHException
-from yaml import YAMLLoadWarning
 
 from sat.apiclient import (
     APIError,
@@ -46,13 +43,13 @@ from sat.apiclient import (
     NMDClient
 )
 from sat.apiclient.bos import BOSClientCommon
-from sat.cli.bootsys.util import get_mgmt_ncn_groups, get_ssh_client
+from sat.cli.bootsys.util import get_mgmt_ncn_groups, get_ssh_connection_pool
 from sat.config import get_config_value
 from sat.constants import MISSING_VALUE
 from sat.apiclient import FASClient
 from sat.report import Report
 from sat.session import SATSession
-from sat.util import get_new_ordered_dict, get_val_by_path
+from sat.util import get_kube_api_client, get_new_ordered_dict, get_val_by_path
 
 
 LOGGER = logging.getLogger(__name__)
@@ -66,8 +63,14 @@ class ServiceCheckError(Exception):
 
 class ActivityChecker(ABC):
     """An abstract base class for checking arbitrary activities."""
-    def __init__(self):
-        """Create a new ActivityChecker."""
+    def __init__(self, timeout=None):
+        """Create a new ActivityChecker.
+
+        Args:
+            timeout (float or None): the timeout, in seconds, for each request
+                made to check the activity, or None for the default timeout.
+        """
+        self.timeout = timeout
         # The name of the service
         self.service_name = ''
         # The singular noun describing the sessions
@@ -137,13 +140,29 @@ class ServiceActivityChecker(ActivityChecker):
     cli.
     """
 
-    def __init__(self):
-        """Create a new ServiceActivityChecker."""
-        super().__init__()
+    def __init__(self, session=None, timeout=None):
+        """Create a new ServiceActivityChecker.
+
+        Args:
+            session (SATSession or None): the session to use to query the
+                service. If None, a new SATSession is created when needed.
+            timeout (float or None): the timeout, in seconds, for each request
+                made to the service, or None for the default API gateway
+                timeout.
+        """
+        super().__init__(timeout)
         # cray CLI args to get more information about a specific session
         self.cray_cli_args = ''
         # The field name that identifies a session
         self.id_field_name = ''
+        self._session = session
+
+    @property
+    def session(self):
+        """SATSession: the session to use to query the service."""
+        if self._session is None:
+            self._session = SATSession()
+        return self._session
 
     @property
     def cray_cli_command(self):
@@ -158,13 +177,18 @@ class ServiceActivityChecker(ActivityChecker):
 
 class SDUActivityChecker(ActivityChecker):
     """A class that checks for SDU being used to actively dump system state."""
-    def __init__(self):
-        """Create a new SDUActivityChecker."""
-        super().__init__()
+    def __init__(self, timeout=None):
+        """Create a new SDUActivityChecker.
+
+        Args:
+            timeout (float or None): the timeout, in seconds, for connecting to
+                each NCN and for the command run on it to produce output, or
+                None for no timeout.
+        """
+        super().__init__(timeout)
         self.service_name = 'SDU'
         self.session_name = 'session'
 
-        self.ssh_client = get_ssh_client()
         mgmt_ncns, _ = get_mgmt_ncn_groups()
         self.remote_manager_ncns = mgmt_ncns['managers']
 
@@ -181,19 +205,16 @@ class SDUActivityChecker(ActivityChecker):
         """
         self.active_sdu_sessions = []
 
+        command = 'sdu bash pgrep sdu'
+        LOGGER.debug("Running command %s on NCNs: %s", command, ', '.join(self.remote_manager_ncns))
+        results = get_ssh_connection_pool().run_command_on_hosts(self.remote_manager_ncns, command,
+                                                                 timeout=self.timeout)
+
         for ncn in self.remote_manager_ncns:
-            try:
-                self.ssh_client.connect(ncn)
-                command = 'sdu bash pgrep sdu'
-                LOGGER.debug("Running command %s on NCN \"%s\"", command, ncn)
-                channel = self.ssh_client.get_transport().open_session()
-                channel.exec_command(command)
-
-                self.interpret_return_value(ncn, channel.recv_exit_status(), channel.makefile_stderr().read())
-            except (SSHException, socket.error) as err:
-                raise self.get_err(f'Unable to connect to management NCN "{ncn}": {str(err)}')
-            finally:
-                self.ssh_client.close()
+            result = results[ncn]
+            if result.error:
+                raise self.get_err(f'Unable to connect to management NCN "{ncn}": {str(result.error)}')
+            self.interpret_return_value(ncn, result.exit_status, result.stderr)
 
         return self.active_sdu_sessions
 
@@ -218,7 +239,7 @@ class SDUActivityChecker(ActivityChecker):
             ncn (str): the hostname of the NCN being checked for an SDU session
             retval (int): the return code of the sdu/pgrep process checking for SDU
                 sessions
-            stderr (bytes): the raw contents of stderr from the sdu/pgrep process
+            stderr (str): the contents of stderr from the sdu/pgrep process
 
         Raises:
             ServiceCheckError: if an error occurred while checking for an SDU session.
@@ -233,7 +254,7 @@ class SDUActivityChecker(ActivityChecker):
         elif retval == 127:
             LOGGER.warning("The `sdu` command was not found on %s.", ncn)
         else:
-            stderr_contents = stderr.decode().strip()
+            stderr_contents = stderr.strip()
             err_details = f'(return code: {retval}, stderr: "{stderr_contents}")'
             errmsg = {
                 2:   f"Syntax error on pgrep commandline on {ncn}. {stderr_contents}",
@@ -246,14 +267,15 @@ class SDUActivityChecker(ActivityChecker):
 class BOSV1ActivityChecker(ServiceActivityChecker):
     """A class that checks for active BOS sessions when BOS v1 is in use."""
 
-    def __init__(self):
+    def __init__(self, session=None, timeout=None):
         """Create a new BOSActivityChecker."""
-        super().__init__()
+        super().__init__(session, timeout)
 
         self.service_name = 'BOS'
         self.session_name = 'session'
         self.cray_cli_args = 'bos v1 session describe'
         self.id_field_name = 'session_id'
+        self.template_field_name = 'session_template_id'
 
     def get_active_sessions(self):
         """Get any active BOS sessions.
@@ -264,7 +286,7 @@ class BOSV1ActivityChecker(ServiceActivityChecker):
         Raises:
             ServiceCheckError: if unable to get the active BOS sessions.
         """
-        bos_client = BOSClientCommon.get_bos_client(SATSession(), version='v1')
+        bos_client = BOSClientCommon.get_bos_client(self.session, version='v1', timeout=self.timeout)
 
         active_sessions = []
         bos_session_fields = ['bos_launch', 'operation', 'stage',
@@ -279,16 +301,12 @@ class BOSV1ActivityChecker(ServiceActivityChecker):
         # doing a GET on the session ID. This is being improved in CASM-1348, but
         # for now, we have to look at BOA pod status.
         try:
-            with warnings.catch_warnings():
-                warnings.filterwarnings('ignore', category=YAMLLoadWarning)
-                load_kube_config()
-        # Earlier versions: FileNotFoundError; later versions: ConfigException
-        except (FileNotFoundError, ConfigException) as err:
+            k8s_client = CoreV1Api(get_kube_api_client())
+        except ConfigException as err:
             raise self.get_err(
                 'Failed to load kubernetes config to get BOA pod status: '
                 '{}'.format(err)
             )
-        k8s_client = CoreV1Api()
 
         for session_id in session_ids:
             session_info = {}
@@ -303,7 +321,8 @@ class BOSV1ActivityChecker(ServiceActivityChecker):
             try:
                 pods = k8s_client.list_namespaced_pod(
                     'services',
-                    label_selector=label_selector
+                    label_selector=label_selector,
+                    _request_timeout=self.timeout
                 ).items
             except ApiException as err:
                 raise self.get_err(
@@ -333,12 +352,13 @@ class BOSV1ActivityChecker(ServiceActivityChecker):
 class BOSV2ActivityChecker(ServiceActivityChecker):
     """A class that checks for active BOS sessions when BOS v2 is in use."""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, session=None, timeout=None):
+        super().__init__(session, timeout)
         self.service_name = 'BOS'
         self.session_name = 'session'
         self.cray_cli_args = 'bos v2 sessions describe'
         self.id_field_name = 'name'
+        self.template_field_name = 'template_name'
 
     def get_active_sessions(self):
         """Get any active BOS sessions.
@@ -357,7 +377,7 @@ class BOSV2ActivityChecker(ServiceActivityChecker):
             'status.status',
             'template_name',
         ]
-        bos_client = BOSClientCommon.get_bos_client(SATSession(), version='v2')
+        bos_client = BOSClientCommon.get_bos_client(self.session, version='v2', timeout=self.timeout)
 
         try:
             return [
@@ -373,9 +393,9 @@ class BOSV2ActivityChecker(ServiceActivityChecker):
 class CFSActivityChecker(ServiceActivityChecker):
     """A class that checks for active CFS sessions."""
 
-    def __init__(self):
+    def __init__(self, session=None, timeout=None):
         """Create a new CFSActivityChecker."""
-        super().__init__()
+        super().__init__(session, timeout)
         self.service_name = 'CFS'
         self.session_name = 'session'
         self.cray_cli_args = 'cfs sessions describe'
@@ -392,7 +412,7 @@ class CFSActivityChecker(ServiceActivityChecker):
         Raises:
             ServiceCheckError: if unable to get the active CFS sessions.
         """
-        cfs_client = CFSClient(SATSession())
+        cfs_client = CFSClient(self.session, timeout=self.timeout)
         try:
             sessions = cfs_client.get('sessions').json()
         except (APIError, ValueError) as err:
@@ -417,9 +437,9 @@ class CFSActivityChecker(ServiceActivityChecker):
 class CRUSActivityChecker(ServiceActivityChecker):
     """A class that checks for active CRUS sessions."""
 
-    def __init__(self):
+    def __init__(self, session=None, timeout=None):
         """Create a new CRUSActivityChecker."""
-        super().__init__()
+        super().__init__(session, timeout)
         self.service_name = 'CRUS'
         self.session_name = 'upgrade'
         self.cray_cli_args = 'crus session describe'
@@ -434,7 +454,7 @@ class CRUSActivityChecker(ServiceActivityChecker):
         Raises:
             ServiceCheckError: if unable to get the active CRUS upgrades.
         """
-        crus_client = CRUSClient(SATSession())
+        crus_client = CRUSClient(self.session, timeout=self.timeout)
         try:
             upgrades = crus_client.get('session').json()
         except (APIError, ValueError) as err:
@@ -457,10 +477,10 @@ class CRUSActivityChecker(ServiceActivityChecker):
 class FirmwareActivityChecker(ServiceActivityChecker):
     """A class that checks for active FAS sessions."""
 
-    def __init__(self):
+    def __init__(self, session=None, timeout=None):
         """Create a new FirmwareActivityChecker"""
-        super().__init__()
-        self.fw_client = FASClient(SATSession())
+        super().__init__(session, timeout)
+        self.fw_client = FASClient(self.session, timeout=self.timeout)
 
         self.service_name = 'FAS'
         self.session_name = 'action'
@@ -494,9 +514,9 @@ class FirmwareActivityChecker(ServiceActivityChecker):
 class NMDActivityChecker(ServiceActivityChecker):
     """A class that checks for active NMD sessions."""
 
-    def __init__(self):
+    def __init__(self, session=None, timeout=None):
         """Create a new NMDActivityChecker."""
-        super().__init__()
+        super().__init__(session, timeout)
         self.service_name = 'NMD'
         self.session_name = 'dump'
         self.cray_cli_args = 'nmd dumps describe'
@@ -511,7 +531,7 @@ class NMDActivityChecker(ServiceActivityChecker):
         Raises:
             ServiceCheckError: if unable to get the active NMD dumps.
         """
-        nmd_client = NMDClient(SATSession())
+        nmd_client = NMDClient(self.session, timeout=self.timeout)
         try:
             dumps = nmd_client.get('dumps').json()
         except (APIError, ValueError) as err:
@@ -528,14 +548,41 @@ class NMDActivityChecker(ServiceActivityChecker):
         ]
 
 
-def _report_active_sessions(service_activity_checkers):
+def _check_for_active_sessions(checker, results):
+    """Get the active sessions from the given checker and store the outcome.
+
+    Args:
+        checker (ActivityChecker): the checker to query for active sessions.
+        results (dict): the dict in which to store a tuple of the sessions and
+            None, or None and the exception raised, keyed by the checker.
+
+    Returns:
+        None
+    """
+    try:
+        results[checker] = (checker.get_active_sessions(), None)
+    except Exception as err:
+        results[checker] = (None, err)
+
+
+def _report_active_sessions(service_activity_checkers, timeout=None):
     """Reports on the active sessions of various services on the system.
 
-    Prints information about active sessions of the various services.
+    Prints information about active sessions of the various services. All the
+    services are queried at the same time, and the results are reported in
+    the order of `service_activity_checkers`.
+
+    The checkers should limit the time taken by each of their requests. In
+    case a check still does not finish in time, each check runs in a daemon
+    thread, so that a check which is abandoned does not prevent the process
+    from exiting.
 
     Args:
         service_activity_checkers: A list of ServiceActivityChecker objects to
             be queried for service activity.
+        timeout (int or None): the time, in seconds, allowed for each service
+            to be queried, or None for no timeout. Services which are not
+            queried in time are treated as failed.
 
     Returns:
         A tuple of:
@@ -545,14 +592,35 @@ def _report_active_sessions(service_activity_checkers):
     active_services = []
     failed_services = []
 
+    results = {}
+    threads = []
     for checker in service_activity_checkers:
         LOGGER.info('Checking for {}.'.format(checker.active_sessions_desc))
-        try:
-            sessions = checker.get_active_sessions()
-        except ServiceCheckError as err:
+        thread = Thread(target=_check_for_active_sessions, args=(checker, results), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    # Every check starts at the same time, so each gets the full timeout.
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in threads:
+        thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+
+    for checker in service_activity_checkers:
+        # Read the result once, since a thread which timed out may still write to results.
+        result = results.get(checker)
+        if result is None:
+            LOGGER.error('Timed out after {} seconds while checking for {}.'.format(
+                timeout, checker.active_sessions_desc))
+            failed_services.append(checker.service_name)
+            continue
+
+        sessions, err = result
+        if isinstance(err, ServiceCheckError):
             LOGGER.error(str(err))
             failed_services.append(checker.service_name)
             continue
+        elif err is not None:
+            raise err
 
         # get_active_sessions should return a list of dicts with common keys
         try:
@@ -602,16 +670,20 @@ def do_service_activity_check(args):
         BOSV1ActivityChecker if get_config_value('bos.api_version') == 'v1' \
         else BOSV2ActivityChecker
 
+    # The checkers query their services at the same time, sharing one session.
+    # Each request they make is limited to the time allowed for the whole check.
+    timeout = get_config_value('bootsys.session_check_timeout')
+    session = SATSession()
     service_activity_checkers = [
-        bos_checker_cls(),
-        CFSActivityChecker(),
-        CRUSActivityChecker(),
-        FirmwareActivityChecker(),
-        NMDActivityChecker(),
-        SDUActivityChecker()
+        bos_checker_cls(session, timeout),
+        CFSActivityChecker(session, timeout),
+        CRUSActivityChecker(session, timeout),
+        FirmwareActivityChecker(session, timeout),
+        NMDActivityChecker(session, timeout),
+        SDUActivityChecker(timeout)
     ]
 
-    active, failed = _report_active_sessions(service_activity_checkers)
+    active, failed = _report_active_sessions(service_activity_checkers, timeout=timeout)
 
     if failed:
         LOGGER.error(f'Failed to get active sessions for the following '
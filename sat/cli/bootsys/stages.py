@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -74,3 +74,21 @@ STAGES_BY_ACTION = {
         ('bos-operations', ('bos', 'do_bos_boots'))
     ])
 }
+
+# Some stages have a check that their effects are still in place, which is
+# much quicker than running the stage again. When resuming, a stage which
+# completed is skipped if its check passes or if it does not have a check.
+# The check is given by a tuple of sat.cli.bootsys submodule and name of the
+# function that takes the parsed args and returns True if the check passes.
+STAGE_REVALIDATIONS_BY_ACTION = {
+    'shutdown': {
+        'capture-state': ('state_recorder', 'validate_state_capture'),
+        'bos-operations': ('bos', 'validate_bos_shutdowns'),
+        'cabinet-power': ('cabinet_power', 'validate_cabinets_powered_off'),
+    },
+    'boot': {
+        'ncn-power': ('mgmt_power', 'validate_ncns_powered_on'),
+        'cabinet-power': ('cabinet_power', 'validate_cabinets_powered_on'),
+        'bos-operations': ('bos', 'validate_bos_boots'),
+    }
+}
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,6 +25,7 @@
 Handles capturing state (e.g. k8s pod state) before a shutdown operation.
 """
 from abc import ABC, abstractmethod
+import gzip
 import json
 import logging
 import os
@@ -54,6 +55,62 @@ from sat.util import BeginEndLogger, get_s3_resource
 LOGGER = logging.getLogger(__name__)
 
 
+# The suffix of the manifest listing the stored state files
+MANIFEST_FILE_SUFFIX = '.manifest.json'
+# The version of the manifest format
+MANIFEST_VERSION = 1
+# The suffix added to the names of compressed state files
+COMPRESSED_FILE_SUFFIX = '.gz'
+# The number of states stored as deltas before a full state is stored again
+MAX_DELTAS_PER_FULL_STATE = 10
+
+
+def get_state_delta(base, new):
+    """Get the changes which turn one state dictionary into another.
+
+    Args:
+        base (dict): The state to compare against.
+        new (dict): The new state.
+
+    Returns:
+        dict: The delta, with the keys 'changed', a dict of the keys whose
+            values were added or replaced; 'removed', a list of the keys which
+            were removed; and 'nested', a dict mapping from the keys whose
+            values are dicts in both states to the delta between those dicts.
+    """
+    delta = {
+        'changed': {},
+        'removed': [key for key in base if key not in new],
+        'nested': {}
+    }
+    for key, value in new.items():
+        if key in base and isinstance(value, dict) and isinstance(base[key], dict):
+            nested_delta = get_state_delta(base[key], value)
+            if any(nested_delta.values()):
+                delta['nested'][key] = nested_delta
+        elif key not in base or base[key] != value:
+            delta['changed'][key] = value
+    return delta
+
+
+def apply_state_delta(base, delta):
+    """Apply a delta from get_state_delta to a state dictionary.
+
+    Args:
+        base (dict): The state the delta was computed against.
+        delta (dict): The delta to apply.
+
+    Returns:
+        dict: The new state. `base` is not modified.
+    """
+    removed = set(delta.get('removed', []))
+    new = {key: value for key, value in base.items() if key not in removed}
+    for key, nested_delta in delta.get('nested', {}).items():
+        new[key] = apply_state_delta(base.get(key, {}), nested_delta)
+    new.update(delta.get('changed', {}))
+    return new
+
+
 class StateError(Exception):
     """Failed to capture state information or load captured state information."""
     pass
@@ -69,7 +126,12 @@ class StateRecorder(ABC):
     Records some state information to a time-stamped file and stores it in the
     configured S3 bucket.
 
-    The data is stored in JSON and loaded as JSON.
+    The data is stored as gzip-compressed JSON and loaded as JSON. To keep the
+    stored files small, most states are stored as a delta against the most
+    recent full state, and a full state is stored again after
+    `MAX_DELTAS_PER_FULL_STATE` deltas. The stored files are listed, oldest
+    first, in a small manifest object, so that the bucket does not need to be
+    listed to find the latest state or to remove old states.
     """
 
     def __init__(self, description, dir_path, file_prefix, num_to_keep, s3, bucket_name, file_suffix='.json'):
@@ -93,9 +155,17 @@ class StateRecorder(ABC):
         self.s3 = s3
         self.bucket_name = bucket_name
 
+    @property
+    def manifest_key(self):
+        """str: The key of the manifest object listing the stored state files."""
+        return os.path.join(self.dir_path, f'{self.file_prefix}{MANIFEST_FILE_SUFFIX}')
+
     def _get_s3_state_files(self):
         """Get a list of state files the configured S3 bucket.
 
+        This lists the whole directory, so it is only used to find state files
+        stored before the manifest was introduced.
+
         File names will be sorted by last-modified time, from oldest to most recent.
         """
         try:
@@ -104,53 +174,115 @@ class StateRecorder(ABC):
                 f.key for f in
                 sorted(s3_bucket.objects.filter(Prefix=self.dir_path), key=lambda x: x.last_modified)
                 if os.path.basename(f.key).startswith(self.file_prefix) and f.key.endswith(self.file_suffix)
+                and f.key != self.manifest_key
             ]
             return state_files
         except (BotoCoreError, ClientError, Boto3Error) as err:
             raise StateError(f'Unable to list files in S3 Bucket {self.bucket_name}: {err}')
 
-    def _remove_old_files(self):
-        """Remove old files within the given S3 bucket that match the given prefix.
+    def _load_manifest(self):
+        """Load the manifest of stored state files from the S3 bucket.
+
+        If there is no manifest yet, one is built from the state files found by
+        listing the bucket, which are all full states.
 
-        File names will be sorted by last-modified time and all but the last `self.num_to_keep` files will be removed.
+        Returns:
+            dict: The manifest. Its 'states' key is a list of dicts, oldest
+                first, each with the 'key' of a state file and the 'base' key
+                of the full state it is a delta against, or None if the file
+                contains a full state. Its 'deltas_since_full' key is the
+                number of deltas stored since the latest full state.
+
+        Raises:
+            StateError: if the manifest cannot be downloaded or parsed.
         """
-        candidates_for_removal = self._get_s3_state_files()
-        LOGGER.debug('Current state files: %s', candidates_for_removal)
+        try:
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+                response = self.s3.Object(self.bucket_name, self.manifest_key).get()
+            manifest = json.load(response['Body'])
+        except ClientError as err:
+            if err.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                raise StateError(f'Unable to download {self.manifest_key} from S3: {err}')
+            LOGGER.debug('No manifest %s found; listing state files in S3.', self.manifest_key)
+            return {
+                'version': MANIFEST_VERSION,
+                'states': [{'key': key, 'base': None} for key in self._get_s3_state_files()],
+                'deltas_since_full': 0
+            }
+        except (BotoCoreError, Boto3Error) as err:
+            raise StateError(f'Unable to download {self.manifest_key} from S3: {err}')
+        except ValueError as err:
+            raise StateError(f'Failed to parse JSON from {self.manifest_key}: {err}')
 
-        num_to_remove = len(candidates_for_removal) - self.num_to_keep
-        if num_to_remove > 0:
-            for file_to_remove in candidates_for_removal[:num_to_remove]:
-                LOGGER.debug('Removing %s from S3', file_to_remove)
-                try:
-                    self.s3.Object(self.bucket_name, file_to_remove).delete()
-                except (BotoCoreError, ClientError, Boto3Error) as err:
-                    LOGGER.warning(f'Failed to remove old file {file_to_remove} from S3: {err}')
+        if not isinstance(manifest, dict) or not isinstance(manifest.get('states'), list):
+            raise StateError(f'Manifest {self.manifest_key} does not contain a list of states.')
+        return manifest
 
-        LOGGER.debug('Files left in bucket: %s', self._get_s3_state_files())
+    def _save_manifest(self, manifest):
+        """Upload the manifest of stored state files to the S3 bucket.
 
-    def _create_new_file(self):
-        """Create a new file in the given directory.
+        Args:
+            manifest (dict): The manifest to upload.
 
-        The new file name will be of the form `file_prefix`.TIMESTAMP`file_suffix`.
+        Raises:
+            StateError: if the manifest cannot be uploaded.
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+                self.s3.Object(self.bucket_name, self.manifest_key).put(
+                    Body=json.dumps(manifest).encode()
+                )
+        except (BotoCoreError, ClientError, Boto3Error) as err:
+            raise StateError(f'Failed to upload {self.manifest_key} to S3: {err}')
 
-        Returns:
-            str: The name of the newly created file.
+    def _remove_old_files(self, manifest):
+        """Remove old state files from the manifest and the S3 bucket.
+
+        All but the last `self.num_to_keep` states will be removed, except for
+        full states which a remaining delta is stored against. The manifest is
+        updated in place and uploaded before the files are removed.
+
+        Args:
+            manifest (dict): The manifest listing the stored state files.
 
         Raises:
-            StateError: if the new file cannot be created.
+            StateError: if the manifest cannot be uploaded.
         """
-        timestamp_str = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
-        new_file = os.path.join(self.dir_path,
-                                f'{self.file_prefix}.{timestamp_str}{self.file_suffix}')
-        local_new_file_path = os.path.join(DEFAULT_LOCAL_STATE_DIR, new_file)
+        states = manifest['states']
+        num_to_remove = len(states) - self.num_to_keep
+        if num_to_remove > 0:
+            bases_in_use = {state['base'] for state in states[num_to_remove:] if state['base']}
+            to_remove = [state['key'] for state in states[:num_to_remove]
+                         if state['key'] not in bases_in_use]
+        else:
+            to_remove = []
 
-        try:
-            with open(local_new_file_path, 'w') as f:
-                f.write('')
-        except OSError as err:
-            raise StateError(f'Failed to create new file {local_new_file_path}: {err}') from err
+        manifest['states'] = [state for state in states if state['key'] not in to_remove]
+        self._save_manifest(manifest)
+
+        for file_to_remove in to_remove:
+            LOGGER.debug('Removing %s from S3', file_to_remove)
+            try:
+                self.s3.Object(self.bucket_name, file_to_remove).delete()
+            except (BotoCoreError, ClientError, Boto3Error) as err:
+                LOGGER.warning(f'Failed to remove old file {file_to_remove} from S3: {err}')
+
+        LOGGER.debug('Files left in bucket: %s', [state['key'] for state in manifest['states']])
 
-        return new_file
+    def _get_new_file_name(self):
+        """Get the name of a new state file in `self.dir_path`.
+
+        The new file name will be of the form
+        `file_prefix`.TIMESTAMP`file_suffix`.gz
+
+        Returns:
+            str: The name of the new file.
+        """
+        timestamp_str = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+        return os.path.join(self.dir_path,
+                            f'{self.file_prefix}.{timestamp_str}{self.file_suffix}{COMPRESSED_FILE_SUFFIX}')
 
     def _ensure_local_dir_path_exists(self):
         """Ensure that DEFAULT_LOCAL_STATE_DIR/self.dir_path exists"""
@@ -165,6 +297,77 @@ class StateRecorder(ABC):
         except OSError as err:
             raise StateError(f'Failed to ensure state directory {local_dir_path} exists: {err}')
 
+    def _upload_state_file(self, file_name, data):
+        """Write data to a compressed state file and upload it to the S3 bucket.
+
+        The data is encoded and compressed as it is written to a local file,
+        which is then uploaded and removed.
+
+        Args:
+            file_name (str): The name of the file within the bucket.
+            data: The data to encode as JSON.
+
+        Raises:
+            StateError: if the file cannot be written or uploaded.
+        """
+        local_file_name = os.path.join(DEFAULT_LOCAL_STATE_DIR, file_name)
+        try:
+            with gzip.open(local_file_name, 'wt', encoding='utf-8') as f:
+                json.dump(data, f)
+        except OSError as err:
+            raise StateError(f'Failed to write state to file {local_file_name}: {err}') from err
+
+        try:
+            LOGGER.debug('Uploading %s to S3', file_name)
+            # TODO(SAT-926): Start verifying HTTPS requests
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+                self.s3.Object(self.bucket_name, file_name).upload_file(local_file_name)
+        except (ClientError, BotoCoreError, Boto3Error) as err:
+            raise PodStateError(f'Failed to dump state to S3: {err}')
+        finally:
+            os.remove(local_file_name)
+
+    def _download_state_file(self, file_name):
+        """Download a state file from the S3 bucket and parse it as JSON.
+
+        Files whose names end with `COMPRESSED_FILE_SUFFIX` are decompressed.
+
+        Args:
+            file_name (str): The name of the file within the bucket.
+
+        Returns:
+            The data parsed from the file.
+
+        Raises:
+            StateError: if the file cannot be downloaded, opened or parsed.
+        """
+        local_file_name = os.path.join(DEFAULT_LOCAL_STATE_DIR, file_name)
+        self._ensure_local_dir_path_exists()
+        try:
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+                self.s3.Object(self.bucket_name, file_name).download_file(local_file_name)
+            LOGGER.debug('Downloaded %s to %s', file_name, local_file_name)
+        except (BotoCoreError, ClientError, Boto3Error) as err:
+            raise StateError(f'Unable to download {file_name} from s3: {err}')
+
+        try:
+            if file_name.endswith(COMPRESSED_FILE_SUFFIX):
+                f = gzip.open(local_file_name, 'rt', encoding='utf-8')
+            else:
+                f = open(local_file_name)
+            with f:
+                return json.load(f)
+        except OSError as err:
+            raise StateError(
+                f'Failed to open downloaded file {local_file_name} to read latest state: {err}'
+            )
+        except ValueError as err:
+            raise StateError(f'Failed to parse JSON from downloaded file {local_file_name}: {err}')
+        finally:
+            os.remove(local_file_name)
+
     @abstractmethod
     def get_state_data(self):
         """Gets the state data that should be written to the file.
@@ -179,6 +382,36 @@ class StateRecorder(ABC):
         raise NotImplementedError("'get_state_data' is not implemented on abstract "
                                   "base class StateRecorder.")
 
+    def _get_delta_base(self, manifest, state_data):
+        """Get the full state to store a new state as a delta against.
+
+        Args:
+            manifest (dict): The manifest listing the stored state files.
+            state_data: The new state data.
+
+        Returns:
+            A tuple of the key of the full state and its data, or (None, None)
+            if the new state should be stored in full.
+        """
+        states = manifest['states']
+        if not isinstance(state_data, dict) or not states:
+            return None, None
+        if manifest.get('deltas_since_full', 0) >= MAX_DELTAS_PER_FULL_STATE:
+            return None, None
+
+        latest_state = states[-1]
+        base_key = latest_state['base'] or latest_state['key']
+        try:
+            base_data = self._download_state_file(base_key)
+        except StateError as err:
+            LOGGER.warning(f'Unable to load previous {self.description}, so the full state '
+                           f'will be stored: {err}')
+            return None, None
+
+        if not isinstance(base_data, dict):
+            return None, None
+        return base_key, base_data
+
     def dump_state(self):
         """Dump state information to a file in `self.dir_path`.
 
@@ -195,32 +428,41 @@ class StateRecorder(ABC):
         state_data = self.get_state_data()
 
         self._ensure_local_dir_path_exists()
-        new_file_name = self._create_new_file()
-        local_new_file_name = os.path.join(DEFAULT_LOCAL_STATE_DIR, new_file_name)
+        manifest = self._load_manifest()
 
-        try:
-            with open(local_new_file_name, 'w') as f:
-                json.dump(state_data, f)
-        except OSError as err:
-            raise StateError(f'Failed to write state to file {local_new_file_name}: {err}') from err
-        try:
-            LOGGER.debug('Uploading %s to S3', new_file_name)
-            # TODO(SAT-926): Start verifying HTTPS requests
-            with warnings.catch_warnings():
-                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
-                self.s3.Object(self.bucket_name, new_file_name).upload_file(local_new_file_name)
-        except (ClientError, BotoCoreError, Boto3Error) as err:
-            raise PodStateError(f'Failed to dump state to S3: {err}')
-        finally:
-            os.remove(local_new_file_name)
+        base_key, base_data = self._get_delta_base(manifest, state_data)
+        if base_key is not None:
+            LOGGER.debug('Storing %s as a delta against %s', self.description, base_key)
+            file_data = {'base': base_key, 'delta': get_state_delta(base_data, state_data)}
+            manifest['deltas_since_full'] = manifest.get('deltas_since_full', 0) + 1
+        else:
+            file_data = state_data
+            manifest['deltas_since_full'] = 0
+
+        new_file_name = self._get_new_file_name()
+        self._upload_state_file(new_file_name, file_data)
+
+        manifest['version'] = MANIFEST_VERSION
+        manifest['states'].append({'key': new_file_name, 'base': base_key})
+        self._remove_old_files(manifest)
 
-        self._remove_old_files()
+    def has_stored_state(self):
+        """Check whether any state has been stored in the S3 bucket.
+
+        Returns:
+            bool: True if at least one state file is stored, False otherwise.
+
+        Raises:
+            StateError: if the manifest cannot be loaded.
+        """
+        return bool(self._load_manifest()['states'])
 
     def get_stored_state(self):
         """Get the state information most recently stored to a file.
 
         This assumes the information in the file is in JSON format and parses it
-        with JSON.
+        with JSON. If the file contains a delta, it is applied to the full
+        state it was stored against.
 
         Returns:
             The latest state information loaded from the given file and parsed
@@ -230,34 +472,23 @@ class StateRecorder(ABC):
             StateError: if the file containing the latest state cannot be
                 opened or parsed with JSON.
         """
-        files_in_bucket = self._get_s3_state_files()
-        LOGGER.debug('Files in bucket: %s', files_in_bucket)
-        if not files_in_bucket:
+        states = self._load_manifest()['states']
+        LOGGER.debug('Files in bucket: %s', [state['key'] for state in states])
+        if not states:
             raise StateError('No stored state found')
-        latest_state_file = os.path.join(files_in_bucket[-1])
-        latest_state_file_local_path = os.path.join(DEFAULT_LOCAL_STATE_DIR, latest_state_file)
-        LOGGER.debug('Latest state file: %s', latest_state_file)
-        self._ensure_local_dir_path_exists()
-        try:
-            with warnings.catch_warnings():
-                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
-                self.s3.Object(self.bucket_name, latest_state_file).download_file(latest_state_file_local_path)
-            LOGGER.debug('Downloaded %s to %s', latest_state_file, latest_state_file_local_path)
-        except (BotoCoreError, ClientError, Boto3Error) as err:
-            raise StateError(f'Unable to download {latest_state_file} from s3: {err}')
 
-        try:
-            with open(latest_state_file_local_path) as f:
-                state_data = json.load(f)
+        latest_state = states[-1]
+        LOGGER.debug('Latest state file: %s', latest_state['key'])
+        state_data = self._download_state_file(latest_state['key'])
+        if latest_state['base'] is None:
             return state_data
-        except OSError as err:
-            raise StateError(
-                f'Failed to open downloaded file {latest_state_file_local_path} to read latest state: {err}'
-            )
-        except ValueError as err:
-            raise StateError(f'Failed to parse JSON from downloaded file {latest_state_file_local_path}: {err}')
-        finally:
-            os.remove(latest_state_file_local_path)
+
+        try:
+            delta = state_data['delta']
+        except (KeyError, TypeError):
+            raise StateError(f'State file {latest_state["key"]} does not contain a delta.')
+        base_data = self._download_state_file(latest_state['base'])
+        return apply_state_delta(base_data, delta)
 
 
 class PodStateRecorder(StateRecorder):
@@ -350,3 +581,26 @@ def do_state_capture(args):
         sys.exit(1)
     else:
         LOGGER.info('Finished capturing system state.')
+
+
+def validate_state_capture(args):
+    """Check that the state captured by the capture-state stage is still stored.
+
+    This is used to check whether the capture-state stage of the shutdown
+    action can be skipped when resuming.
+
+    Args:
+        args: The argparse.Namespace object containing the parsed arguments
+            passed to the bootsys subcommand.
+
+    Returns:
+        bool: True if captured state is stored, False otherwise.
+    """
+    state_recorder = PodStateRecorder()
+    try:
+        if state_recorder.has_stored_state():
+            return True
+        LOGGER.info(f'No {state_recorder.description} is stored.')
+    except StateError as err:
+        LOGGER.warning(f'Unable to check for stored {state_recorder.description}: {err}')
+    return False
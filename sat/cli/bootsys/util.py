@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,11 +25,14 @@
 Generic common utilities for the bootsys subcommand.
 """
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from concurrent.futures import as_completed, ThreadPoolExecutor
 import logging
 import re
+import socket
+from threading import Lock
 
-from paramiko import SSHClient, WarningPolicy
+from paramiko import SSHClient, SSHException, WarningPolicy
 import yaml
 
 from sat.util import pester_choices
@@ -45,6 +48,16 @@ MGMT_NCN_HOSTNAME_PREFIXES = {
 }
 
 
+# The maximum number of hosts on which to run a command at the same time
+MAX_CONCURRENT_SSH_COMMANDS = 16
+
+# The result of running a command on a host with SSHConnectionPool.
+# The exit_status, stdout and stderr are None if the command could not be run,
+# in which case error is the exception describing why.
+RemoteCommandResult = namedtuple('RemoteCommandResult',
+                                 ('host', 'exit_status', 'stdout', 'stderr', 'error'))
+
+
 class FatalBootsysError(Exception):
     """A fatal error has occurred during bootsys."""
     pass
@@ -227,3 +240,150 @@ def get_ssh_client():
     ssh_client.set_missing_host_key_policy(WarningPolicy)
 
     return ssh_client
+
+
+class SSHConnectionPool:
+    """Keeps one connected SSHClient for each host.
+
+    paramiko runs each command in its own channel of a client's transport, so
+    commands run on the same host, including from different threads, share a
+    single connection and authentication rather than each connecting again.
+
+    Attributes:
+        connect_timeout (float or None): the timeout, in seconds, for
+            connecting to a host, or None for no timeout.
+    """
+
+    def __init__(self, connect_timeout=None):
+        self.connect_timeout = connect_timeout
+        self._clients = {}
+        self._host_locks = defaultdict(Lock)
+        self._lock = Lock()
+
+    def get_client(self, host, connect_timeout=None):
+        """Get an SSHClient connected to the given host.
+
+        A new connection is only made if there is no open connection to the
+        host already.
+
+        Args:
+            host (str): the host to connect to.
+            connect_timeout (float or None): the timeout, in seconds, for
+                connecting to the host, or None to use `self.connect_timeout`.
+
+        Returns:
+            paramiko.SSHClient: a client connected to the host.
+
+        Raises:
+            SSHException, socket.error: if connecting to the host fails.
+        """
+        with self._lock:
+            host_lock = self._host_locks[host]
+
+        # Only one thread connects to a given host at a time, but threads
+        # connecting to different hosts do not wait for each other.
+        with host_lock:
+            client = self._clients.get(host)
+            if client is not None:
+                transport = client.get_transport()
+                if transport is not None and transport.is_active():
+                    return client
+                LOGGER.debug('Connection to %s was closed; reconnecting.', host)
+                client.close()
+
+            client = get_ssh_client()
+            client.connect(host, timeout=connect_timeout if connect_timeout is not None
+                           else self.connect_timeout)
+            self._clients[host] = client
+            return client
+
+    def close_client(self, host):
+        """Close the connection to the given host, if any.
+
+        Args:
+            host (str): the host whose connection to close.
+        """
+        with self._lock:
+            client = self._clients.pop(host, None)
+        if client is not None:
+            client.close()
+
+    def close(self):
+        """Close the connections to all hosts."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def run_command(self, host, command, timeout=None):
+        """Run a command on the given host.
+
+        Args:
+            host (str): the host on which to run the command.
+            command (str): the command to run.
+            timeout (float or None): the timeout, in seconds, for connecting
+                to the host, if not already connected, and for the command to
+                produce output, or None for no timeout.
+
+        Returns:
+            RemoteCommandResult: the result of the command. If the command
+                could not be run, the `error` attribute is set.
+        """
+        try:
+            client = self.get_client(host, connect_timeout=timeout)
+            LOGGER.debug('Executing command "%s" on host %s', command, host)
+            _, stdout, stderr = client.exec_command(command, timeout=timeout)
+            stdout_str = stdout.read().decode()
+            stderr_str = stderr.read().decode()
+            exit_status = stdout.channel.recv_exit_status()
+        except (SSHException, socket.error) as err:
+            return RemoteCommandResult(host, None, None, None, err)
+
+        return RemoteCommandResult(host, exit_status, stdout_str, stderr_str, None)
+
+    def run_command_on_hosts(self, hosts, command, timeout=None,
+                             max_workers=MAX_CONCURRENT_SSH_COMMANDS):
+        """Run a command on each of the given hosts at the same time.
+
+        Args:
+            hosts (Iterable[str]): the hosts on which to run the command.
+            command (str): the command to run.
+            timeout (float or None): the timeout, in seconds, for connecting
+                to each host and for the command to produce output on it, or
+                None for no timeout.
+            max_workers (int): the maximum number of hosts on which to run
+                the command at the same time.
+
+        Returns:
+            dict: a dict mapping from each host to its RemoteCommandResult.
+        """
+        hosts = list(hosts)
+        if not hosts:
+            return {}
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(hosts))) as executor:
+            futures = [executor.submit(self.run_command, host, command, timeout)
+                       for host in hosts]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.host] = result
+        return results
+
+
+_SSH_CONNECTION_POOL = None
+_SSH_CONNECTION_POOL_LOCK = Lock()
+
+
+def get_ssh_connection_pool():
+    """Get the SSHConnectionPool shared by everything in this process.
+
+    Returns:
+        SSHConnectionPool: the shared pool of SSH connections.
+    """
+    global _SSH_CONNECTION_POOL
+    with _SSH_CONNECTION_POOL_LOCK:
+        if _SSH_CONNECTION_POOL is None:
+            _SSH_CONNECTION_POOL = SSHConnectionPool()
+        return _SSH_CONNECTION_POOL
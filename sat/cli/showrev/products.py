@@ -28,9 +28,10 @@ from collections import OrderedDict
 import logging
 import os
 
-from cray_product_catalog.query import ProductCatalog, ProductCatalogError
+from cray_product_catalog.query import ProductCatalogError
 
 from sat.constants import MISSING_VALUE
+from sat.product_catalog import get_product_catalog
 
 LOGGER = logging.getLogger(__name__)
 
@@ -88,7 +89,7 @@ def get_product_versions():
     headers = [product_key, version_key, active_key, image_key, recipe_key]
 
     try:
-        product_catalog = ProductCatalog()
+        product_catalog = get_product_catalog()
     except ProductCatalogError as err:
         LOGGER.error(f'Unable to obtain product version information from product catalog: {err}')
         return [], []
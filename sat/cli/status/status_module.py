@@ -440,14 +440,13 @@ class CFSStatusModule(StatusModule):
     @property
     def rows(self):
         cfs_client = CFSClient(self.session)
+        # Only keep the fields shown in the table rather than full components,
+        # which include the history of their configuration state.
+        fields = ['id', 'desiredConfig', 'configurationStatus', 'errorCount']
         try:
-            cfs_response = cfs_client.get('components').json()
+            yield from cfs_client.iter_components(fields=fields)
         except APIError as err:
             raise StatusModuleException(f'Failed to query CFS for component information: {err}') from err
-        except ValueError as err:
-            raise StatusModuleException(f'Failed to parse JSON from CFS component response: {err}') from err
-
-        return cfs_response
 
 
 class BOSStatusModule(StatusModule):
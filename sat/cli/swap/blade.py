@@ -265,6 +265,27 @@ class RedfishEndpointDiscoveryWaiter(GroupWaiter):
             if not any('404' in arg for arg in err.args):
                 raise WaitingFailure(f'Could not query Redfish endpoint for {member}: {err}')
 
+    def members_have_completed(self, members):
+        try:
+            endpoints = self.hsm_client.get_redfish_endpoints_inventory(members)
+        except APIError as err:
+            LOGGER.error('Failed to wait for condition "%s": Could not query Redfish endpoints: %s',
+                         self.condition_name(), err)
+            self.failed |= members
+            return set()
+
+        completed = set()
+        endpoints_by_id = {endpoint.get('ID'): endpoint for endpoint in endpoints}
+        for member in members:
+            endpoint = endpoints_by_id.get(member)
+            if endpoint is None:
+                # Endpoints may not be created yet immediately after the slot
+                # has been powered on, so keep waiting for them.
+                continue
+            if endpoint.get('DiscoveryInfo', {}).get('LastDiscoveryStatus') == 'DiscoverOK':
+                completed.add(member)
+        return completed
+
 
 class SwapOutProcedure(BladeSwapProcedure):
     """The blade removal portion of the blade swap procedure."""
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -29,14 +29,14 @@ import csv
 import logging
 import os
 import re
-import shlex
-import subprocess
-import warnings
-from yaml import YAMLLoadWarning
 
-from kubernetes.client import CoreV1Api
+from kubernetes.client import ApiClient, CoreV1Api
 from kubernetes.client.rest import ApiException
-from kubernetes.config import load_kube_config, ConfigException
+from kubernetes.config import ConfigException
+from kubernetes.stream import stream
+from websocket import WebSocketException
+
+from sat.util import get_kube_api_client
 
 LOGGER = logging.getLogger(__name__)
 
@@ -55,25 +55,26 @@ class CableEndpoints:
     def copy_shasta_p2p_file(self):
         """Copy Shasta p2p file from the fabric-manager pod.
 
+        The file is read from the pod through an exec stream and written to
+        the destination as it is received.
+
         Returns:
             True if p2p file was copied and is available in the sat container.
             False if there is an error copying the p2p file.
         """
 
         try:
-            with warnings.catch_warnings():
-                warnings.filterwarnings('ignore', category=YAMLLoadWarning)
-                load_kube_config()
-        # Earlier versions: FileNotFoundError; later versions: ConfigException
-        except (FileNotFoundError, ConfigException) as err:
+            kube_api_client = get_kube_api_client()
+        except ConfigException as err:
             LOGGER.error('Failed to load kubernetes config: {}'.format(err))
             return False
+        core_api = CoreV1Api(kube_api_client)
 
         namespace = 'services'
         container = 'slingshot-fabric-manager'
         pod_label = f'app.kubernetes.io/name={container}'
         try:
-            dump = CoreV1Api().list_namespaced_pod(namespace, label_selector=pod_label)
+            dump = core_api.list_namespaced_pod(namespace, label_selector=pod_label)
             pod = dump.items[0].metadata.name
         except ApiException as err:
             LOGGER.error('Could not retrieve list of pods: {}'.format(err))
@@ -84,16 +85,36 @@ class CableEndpoints:
 
         src_file = os.path.join(self.src_dir, self.p2p_file)
         dest_file = os.path.join(self.dest_dir, self.p2p_file)
-        cmd = f'kubectl -n {namespace} -c {container} cp {pod}:{src_file} {dest_file}'
-        LOGGER.debug(f'Running {cmd}')
+        LOGGER.debug(f'Copying {src_file} from container {container} in pod {pod} to {dest_file}')
 
+        # stream() replaces the request method of the API client it is given
+        # while the exec runs, so it gets its own client rather than the
+        # shared client, which may be in use by other threads.
+        exec_api_client = ApiClient(kube_api_client.configuration)
         try:
-            subprocess.check_call(shlex.split(cmd),
-                                  stdout=subprocess.DEVNULL,
-                                  stderr=subprocess.STDOUT)
-        except (subprocess.CalledProcessError, OSError) as err:
+            exec_stream = stream(CoreV1Api(exec_api_client).connect_get_namespaced_pod_exec, pod, namespace,
+                                 container=container, command=['cat', src_file],
+                                 stderr=True, stdin=False, stdout=True, tty=False,
+                                 _preload_content=False)
+            stderr = []
+            with open(dest_file, 'w') as dest:
+                while exec_stream.is_open():
+                    exec_stream.update(timeout=1)
+                    if exec_stream.peek_stdout():
+                        dest.write(exec_stream.read_stdout())
+                    if exec_stream.peek_stderr():
+                        stderr.append(exec_stream.read_stderr())
+            exec_stream.close()
+        except (ApiException, WebSocketException, OSError) as err:
             LOGGER.error('Exception when copying p2p file: {}'.format(err))
             return False
+        finally:
+            exec_api_client.close()
+
+        if exec_stream.returncode:
+            LOGGER.error(f'Failed to copy p2p file (exit status {exec_stream.returncode}): '
+                         f'{"".join(stderr).strip()}')
+            return False
 
         if not os.path.isfile(dest_file):
             LOGGER.error(f'File {dest_file} does not exist')
@@ -36,7 +36,7 @@ from kubernetes.client import BatchV1beta1Api
 from kubernetes.client.rest import ApiException
 
 from sat.cached_property import cached_property
-from sat.waiting import Waiter
+from sat.waiting import KubernetesWatchMixin, Waiter
 
 LOGGER = logging.getLogger(__name__)
 
@@ -87,6 +87,20 @@ class HMSDiscoveryCronJob:
             raise HMSDiscoveryError(f'Failed to get data for '
                                     f'{self.FULL_NAME}: {err}') from err
 
+    def get_watch_source(self):
+        """Get the arguments for a Kubernetes watch of this cronjob.
+
+        Returns:
+            tuple: the list function, its positional arguments, and its keyword
+                arguments as expected by KubernetesWatchMixin.get_watch_source
+
+        Raises:
+            HMSDiscoveryError: if there is an error loading k8s config
+        """
+        return (self.k8s_batch_api.list_namespaced_cron_job,
+                (self.HMS_DISCOVERY_NAMESPACE,),
+                {'field_selector': f'metadata.name={self.HMS_DISCOVERY_NAME}'})
+
     def get_last_schedule_time(self):
         """Get the last scheduled time, i.e. the last time k8s scheduled the job.
 
@@ -178,8 +192,12 @@ class HMSDiscoveryCronJob:
         return ci.get_next(datetime)
 
 
-class HMSDiscoveryScheduledWaiter(Waiter):
-    """Waiter for HMS discovery cronjob to be scheduled by k8s."""
+class HMSDiscoveryScheduledWaiter(KubernetesWatchMixin, Waiter):
+    """Waiter for HMS discovery cronjob to be scheduled by k8s.
+
+    The cronjob is checked again whenever a change to it is received from a
+    Kubernetes watch stream.
+    """
 
     def __init__(self, poll_interval=5, grace_period=60):
         """Create a new HMSDiscoveryScheduledWaiter.
@@ -208,6 +226,9 @@ class HMSDiscoveryScheduledWaiter(Waiter):
     def condition_name(self):
         return 'HMS Discovery Scheduled'
 
+    def get_watch_source(self):
+        return self.hd_cron_job.get_watch_source()
+
     def has_completed(self):
         """Return whether the HMS Discovery job has been scheduled.
 
@@ -230,11 +251,13 @@ class HMSDiscoveryScheduledWaiter(Waiter):
             return False
 
 
-class HMSDiscoverySuspendedWaiter(Waiter):
+class HMSDiscoverySuspendedWaiter(KubernetesWatchMixin, Waiter):
     """Waiter for HMS discovery cronjob to be suspended and not running.
 
     Specifically, the waiter checks if the the cron job is suspended, and if
-    there are any k8s jobs running that were launched by the cron job.
+    there are any k8s jobs running that were launched by the cron job. The
+    cronjob is checked again whenever a change to it is received from a
+    Kubernetes watch stream.
     """
 
     def __init__(self, timeout, poll_interval=1, retries=0):
@@ -244,5 +267,8 @@ class HMSDiscoverySuspendedWaiter(Waiter):
     def condition_name(self):
         return "HMS Discovery Suspended"
 
+    def get_watch_source(self):
+        return self.hd_cron_job.get_watch_source()
+
     def has_completed(self):
         return self.hd_cron_job.get_suspend_status() and not self.hd_cron_job.is_active()
@@ -0,0 +1,257 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Cached, indexed snapshot of the product catalog shared by sat subcommands.
+"""
+import json
+import logging
+import os
+import re
+from threading import Lock
+
+from cray_product_catalog.query import InstalledProductVersion, ProductCatalogError
+from kubernetes.client import ApiException, CoreV1Api
+from kubernetes.config import ConfigException
+from urllib3.exceptions import MaxRetryError
+from yaml import safe_load, YAMLError
+
+from sat.util import get_kube_api_client
+
+LOGGER = logging.getLogger(__name__)
+
+PRODUCT_CATALOG_CONFIG_MAP_NAME = 'cray-product-catalog'
+PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE = 'services'
+DEFAULT_PRODUCT_CATALOG_CACHE_FILE = f'{os.getenv("HOME", "/root")}/.cache/sat/product-catalog.json'
+
+SEMVER_REGEX = re.compile(r'(\d+)\.(\d+)\.(\d+)(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?')
+
+_PRODUCT_CATALOG = None
+_PRODUCT_CATALOG_LOCK = Lock()
+
+
+def get_version_sort_key(version):
+    """Get a key which sorts versions by semantic versioning precedence.
+
+    Pre-release versions sort before the corresponding release, and build
+    metadata is ignored. Versions which are not semantic versions sort before
+    all semantic versions, in string order.
+
+    Args:
+        version (str): the version
+
+    Returns:
+        tuple: the key to use when sorting the version
+    """
+    match = SEMVER_REGEX.fullmatch(version)
+    if not match:
+        return 0, version
+
+    major, minor, patch, prerelease = match.groups()
+    if prerelease is None:
+        prerelease_key = (1,)
+    else:
+        # Numeric identifiers sort before alphanumeric identifiers
+        prerelease_key = (0, tuple((0, int(identifier), '') if identifier.isdigit() else (1, 0, identifier)
+                                   for identifier in prerelease.split('.')))
+    return 1, int(major), int(minor), int(patch), prerelease_key
+
+
+class ProductCatalogSnapshot:
+    """The installed product versions from the product catalog, indexed by name and version.
+
+    Attributes:
+        resource_version (str or None): the resourceVersion of the product
+            catalog ConfigMap from which the snapshot was loaded
+        products (list of InstalledProductVersion): all the installed product
+            versions
+        products_by_name (dict): a mapping from product name to a mapping from
+            version to InstalledProductVersion
+        latest_products (dict): a mapping from product name to its latest
+            InstalledProductVersion
+    """
+
+    def __init__(self, product_data, resource_version=None):
+        """Create a new ProductCatalogSnapshot.
+
+        Args:
+            product_data (dict): a mapping from product name to a mapping from
+                version to the data for that version of the product, as parsed
+                from the product catalog ConfigMap.
+            resource_version (str or None): the resourceVersion of the ConfigMap
+        """
+        self.resource_version = resource_version
+        self.products = [
+            InstalledProductVersion(name, str(version), version_data)
+            for name, versions in product_data.items()
+            for version, version_data in versions.items()
+        ]
+        self.products_by_name = {}
+        for product in self.products:
+            self.products_by_name.setdefault(product.name, {})[product.version] = product
+        self.latest_products = {
+            name: versions[max(versions, key=get_version_sort_key)]
+            for name, versions in self.products_by_name.items()
+        }
+
+    def get_product(self, name, version=None):
+        """Get the installed product version with the given name and version.
+
+        Args:
+            name (str): the name of the product
+            version (str or None): the version of the product, or None to get
+                the latest version.
+
+        Returns:
+            InstalledProductVersion: the matching product version
+
+        Raises:
+            ProductCatalogError: if there is no matching product version
+        """
+        if name not in self.products_by_name:
+            raise ProductCatalogError(f'No installed products with name {name}.')
+
+        if not version:
+            latest = self.latest_products[name]
+            LOGGER.debug(f'Using latest version ({latest.version}) of product {name}')
+            return latest
+
+        try:
+            return self.products_by_name[name][version]
+        except KeyError:
+            raise ProductCatalogError(f'No installed products with name {name} and version {version}.')
+
+    @staticmethod
+    def load_cached_product_data(cache_path, resource_version):
+        """Load the parsed product data cached for the given resourceVersion.
+
+        Args:
+            cache_path (str): the path to the cache file
+            resource_version (str): the current resourceVersion of the ConfigMap
+
+        Returns:
+            dict or None: the cached product data, or None if the cache is
+                missing, unreadable, or for a different resourceVersion.
+        """
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            LOGGER.debug(f'Ignoring unreadable product catalog cache file {cache_path}: {err}')
+            return None
+
+        if not isinstance(cached, dict) or cached.get('resource_version') != resource_version:
+            return None
+        return cached.get('products')
+
+    @staticmethod
+    def save_cached_product_data(cache_path, resource_version, product_data):
+        """Cache the parsed product data for the given resourceVersion.
+
+        Failure to write the cache is logged but otherwise ignored.
+
+        Args:
+            cache_path (str): the path to the cache file
+            resource_version (str): the resourceVersion of the ConfigMap
+            product_data (dict): the parsed product data
+        """
+        tmp_path = f'{cache_path}.tmp'
+        try:
+            contents = json.dumps({'resource_version': resource_version, 'products': product_data})
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                f.write(contents)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError) as err:
+            LOGGER.debug(f'Unable to write product catalog cache file {cache_path}: {err}')
+
+    @classmethod
+    def load(cls, cache_path=DEFAULT_PRODUCT_CATALOG_CACHE_FILE,
+             name=PRODUCT_CATALOG_CONFIG_MAP_NAME, namespace=PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE):
+        """Load a snapshot of the product catalog from its ConfigMap.
+
+        Parsing the YAML data for every product is slow for a large product
+        catalog, so the parsed data is cached in a file keyed by the
+        resourceVersion of the ConfigMap. It is only parsed again when the
+        ConfigMap changes.
+
+        Args:
+            cache_path (str or None): the path to the cache file, or None to
+                not use a cache file.
+            name (str): the name of the product catalog ConfigMap
+            namespace (str): the namespace of the product catalog ConfigMap
+
+        Returns:
+            ProductCatalogSnapshot: the snapshot of the product catalog
+
+        Raises:
+            ProductCatalogError: if unable to read or parse the ConfigMap
+        """
+        try:
+            config_map = CoreV1Api(get_kube_api_client()).read_namespaced_config_map(name, namespace)
+        except ConfigException as err:
+            raise ProductCatalogError(f'Unable to load Kubernetes configuration: {err}')
+        except (ApiException, MaxRetryError) as err:
+            raise ProductCatalogError(f'Unable to read ConfigMap {name} in namespace {namespace}: {err}')
+
+        if config_map.data is None:
+            raise ProductCatalogError(f'No data found in ConfigMap {name} in namespace {namespace}')
+
+        resource_version = config_map.metadata.resource_version
+        product_data = None
+        if cache_path is not None and resource_version is not None:
+            product_data = cls.load_cached_product_data(cache_path, resource_version)
+
+        if product_data is None:
+            try:
+                product_data = {product_name: safe_load(versions) or {}
+                                for product_name, versions in config_map.data.items()}
+            except YAMLError as err:
+                raise ProductCatalogError(f'Failed to parse data in ConfigMap {name} '
+                                          f'in namespace {namespace}: {err}')
+            if cache_path is not None and resource_version is not None:
+                cls.save_cached_product_data(cache_path, resource_version, product_data)
+        else:
+            LOGGER.debug(f'Using cached product catalog data for resourceVersion {resource_version}')
+
+        return cls(product_data, resource_version)
+
+
+def get_product_catalog():
+    """Get the product catalog snapshot shared by everything in this process.
+
+    The product catalog is only loaded the first time this is called.
+
+    Returns:
+        ProductCatalogSnapshot: the snapshot of the product catalog
+
+    Raises:
+        ProductCatalogError: if unable to load the product catalog
+    """
+    global _PRODUCT_CATALOG
+    with _PRODUCT_CATALOG_LOCK:
+        if _PRODUCT_CATALOG is None:
+            _PRODUCT_CATALOG = ProductCatalogSnapshot.load()
+        return _PRODUCT_CATALOG
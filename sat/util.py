@@ -35,7 +35,9 @@ import math
 import os
 import os.path
 import re
+from threading import Lock
 import time
+import warnings
 
 # Logic borrowed from imps to get the most efficient YAML available
 try:
@@ -46,7 +48,10 @@ from yaml.resolver import BaseResolver
 from yaml import dump
 from json import dumps
 import boto3
+from kubernetes.client import ApiClient, Configuration
+from kubernetes.config import ConfigException, load_kube_config
 from prettytable import PrettyTable
+from yaml import YAMLLoadWarning
 
 from sat.xname import XName
 from sat.config import get_config_value, read_config_value_file
@@ -54,6 +59,9 @@ from sat.config import get_config_value, read_config_value_file
 
 LOGGER = logging.getLogger(__name__)
 
+_KUBE_API_CLIENT = None
+_KUBE_API_CLIENT_LOCK = Lock()
+
 
 def pester(message,
            valid_answer=r"^(yes|no)?$",
@@ -534,6 +542,36 @@ def get_s3_resource():
         raise SystemExit(1)
 
 
+def get_kube_api_client():
+    """Get the Kubernetes API client shared by everything in this process.
+
+    The Kubernetes configuration is only loaded the first time this is called.
+    API objects created with the returned client, e.g.
+    `CoreV1Api(get_kube_api_client())`, share its configuration and
+    connection pool.
+
+    Returns:
+        kubernetes.client.ApiClient: the shared Kubernetes API client.
+
+    Raises:
+        kubernetes.config.ConfigException: if unable to load the Kubernetes
+            configuration.
+    """
+    global _KUBE_API_CLIENT
+    with _KUBE_API_CLIENT_LOCK:
+        if _KUBE_API_CLIENT is None:
+            configuration = Configuration()
+            try:
+                with warnings.catch_warnings():
+                    warnings.filterwarnings('ignore', category=YAMLLoadWarning)
+                    load_kube_config(client_configuration=configuration)
+            # Earlier versions: FileNotFoundError; later versions: ConfigException
+            except (FileNotFoundError, ConfigException) as err:
+                raise ConfigException(f'Failed to load Kubernetes configuration: {err}') from err
+            _KUBE_API_CLIENT = ApiClient(configuration)
+        return _KUBE_API_CLIENT
+
+
 class BeginEndLogger:
     """A context manager that logs a message when entering and exiting context.
 
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -26,11 +26,21 @@ Common code for waiting for a condition.
 """
 
 import abc
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait
+)
+import heapq
 import logging
+import math
 from threading import Thread
 import time
 
 import inflect
+from kubernetes.client.rest import ApiException
+from kubernetes.watch import Watch
+from urllib3.exceptions import HTTPError
 
 
 inf = inflect.engine()
@@ -44,6 +54,26 @@ class WaitingFailure(Exception):
     command not working."""
 
 
+def _run_wait_steps(steps):
+    """Run waiting steps to completion, sleeping between steps.
+
+    Args:
+        steps (generator): a generator which yields the time, in seconds, to
+            wait before its next step, e.g. the one returned by
+            Waiter._wait_steps().
+
+    Returns:
+        The value returned by the generator.
+    """
+    while True:
+        try:
+            delay = next(steps)
+        except StopIteration as done:
+            return done.value
+        if delay > 0:
+            time.sleep(delay)
+
+
 class Waiter(metaclass=abc.ABCMeta):
     """Waits for a single condition to occur.
 
@@ -62,19 +92,41 @@ class Waiter(metaclass=abc.ABCMeta):
     in the code, though understanding what different states the Waiter can be in
     can help understand how the class works internally.
 
+    The interval between polls starts at `poll_interval`. Each time a poll
+    observes no progress, the interval is multiplied by `backoff_factor`, up to
+    `max_poll_interval`, and as soon as progress is observed it is reset to
+    `poll_interval`. Polling never sleeps past the timeout, so the last poll
+    happens when the timeout expires.
+
     Attributes:
         timeout (int): the timeout, in seconds, for the wait operation
         poll_interval (int): the interval, in seconds, between polls for
             completion.
+        max_poll_interval (int): the maximum interval, in seconds, between
+            polls for completion. By default, this is the same as
+            `poll_interval`, meaning polls happen at a fixed interval.
+        backoff_factor (int): the factor by which the interval between polls
+            grows when no progress is observed.
         completed (bool): True if the condition has been met, False otherwise.
         retries (int): the number of times waiting may be retried. By default,
             this is 0, meaning the wait will only occur once.
         failed (bool): True if there was an irrecoverable failure waiting
             for the condition, False if waiting did not have issues.
+        poll_count (int): the number of times completion has been polled.
+        first_completion_time (float or None): the time, in seconds, after
+            waiting began that the first completion was observed.
+        last_completion_time (float or None): the time, in seconds, after
+            waiting began that the last completion was observed.
     """
-    def __init__(self, timeout, poll_interval=1, retries=0):
+    def __init__(self, timeout, poll_interval=1, retries=0,
+                 max_poll_interval=None, backoff_factor=2):
         self.timeout = timeout
         self.poll_interval = poll_interval
+        self.max_poll_interval = poll_interval if max_poll_interval is None else max_poll_interval
+        if self.max_poll_interval < self.poll_interval:
+            raise ValueError("max_poll_interval cannot be less than poll_interval.")
+        self.backoff_factor = backoff_factor
+        self._current_poll_interval = poll_interval
         self.completed = False
         self.failed = False
         self._waiter_thread = None
@@ -83,6 +135,11 @@ class Waiter(metaclass=abc.ABCMeta):
             raise ValueError("Retries cannot be less than zero.")
         self.retries_remaining = retries
 
+        self.poll_count = 0
+        self.first_completion_time = None
+        self.last_completion_time = None
+        self._wait_start_time = None
+
     @abc.abstractmethod
     def condition_name(self):
         """The name of the condition being waited for.
@@ -132,32 +189,117 @@ class Waiter(metaclass=abc.ABCMeta):
         behaviors by overriding this method.
         """
 
-    def _wait_polling_loop(self):
-        """Internal helper function which implements the polling loop for a given Waiter class.
+    def _record_poll(self, completed_any, failed_any=False):
+        """Record the outcome of one poll and adjust the interval before the next poll.
+
+        Args:
+            completed_any (bool): True if completion was observed in this poll.
+            failed_any (bool): True if a new failure was observed in this poll.
+
+        Returns:
+            None
+        """
+        self.poll_count += 1
+        if completed_any:
+            elapsed = time.monotonic() - self._wait_start_time
+            if self.first_completion_time is None:
+                self.first_completion_time = elapsed
+            self.last_completion_time = elapsed
+
+        if completed_any or failed_any:
+            self._current_poll_interval = self.poll_interval
+
+    def _next_poll_delay(self, deadline):
+        """Get the time to wait until the next poll, but never past the given deadline.
+
+        Args:
+            deadline (float): the value of time.monotonic() at which waiting
+                times out.
+
+        Returns:
+            float or None: the time, in seconds, to wait before the next poll,
+                or None if the deadline has been reached.
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+
+        delay = min(self._current_poll_interval, remaining)
+        self._current_poll_interval = min(self._current_poll_interval * self.backoff_factor,
+                                          self.max_poll_interval)
+        return delay
+
+    def _start_polling_loop(self):
+        """Reset the poll interval at the start of a waiting attempt.
+
+        Returns:
+            float: the value of time.monotonic() at which this attempt times out.
+        """
+        start_time = time.monotonic()
+        if self._wait_start_time is None:
+            self._wait_start_time = start_time
+        self._current_poll_interval = self.poll_interval
+        return start_time + self.timeout
+
+    def _log_wait_statistics(self):
+        """Log the number of polls and the completion times of the condition."""
+        if self.first_completion_time is None:
+            LOGGER.debug('Polled condition "%s" %d %s with no completions.',
+                         self.condition_name(), self.poll_count,
+                         inf.plural_noun('time', self.poll_count))
+        else:
+            LOGGER.debug('Polled condition "%s" %d %s; first completion after %.1f seconds, '
+                         'last completion after %.1f seconds (tail latency %.1f seconds).',
+                         self.condition_name(), self.poll_count,
+                         inf.plural_noun('time', self.poll_count),
+                         self.first_completion_time, self.last_completion_time,
+                         self.last_completion_time - self.first_completion_time)
+
+    def _polling_steps(self):
+        """Internal helper generator which implements the polling loop for a given Waiter class.
 
         This function essentially implements one waiting attempt, and different
         implementations can be used to optimize waiting methods for different
         situations, and should generally not be overwritten by client classes
-        outside this module.
+        outside this module. Rather than sleeping between polls, it yields the
+        time to wait before the next poll, so that whoever is driving it (either
+        wait_for_completion() or a WaiterScheduler) decides how to wait.
+
+        Yields:
+            float: the time, in seconds, to wait before the next poll.
         """
-        start_time = time.monotonic()
-        while time.monotonic() - start_time < self.timeout:
+        deadline = self._start_polling_loop()
+        while True:
             self.on_check_action()
 
             # Store value in case we want to use it in post_wait_action.
             self.completed = self.has_completed()
+            self._record_poll(self.completed)
 
             if self.completed:
                 break
+            delay = self._next_poll_delay(deadline)
+            if delay is None:
+                break
+            yield delay
 
-            time.sleep(self.poll_interval)
+    def _wait_steps(self):
+        """Internal helper generator which implements waiting for the condition.
 
-    def wait_for_completion(self):
-        """Wait for the condition to be achieved or for timeout.
+        This performs the same steps as wait_for_completion(), but yields
+        whenever it would sleep instead of sleeping.
+
+        Yields:
+            float: the time, in seconds, to wait before the next step.
 
         Returns:
             bool: True if condition succeeded, False if timed out.
         """
+        self._wait_start_time = time.monotonic()
+        self.poll_count = 0
+        self.first_completion_time = None
+        self.last_completion_time = None
+
         self.pre_wait_action()
 
         # Allow pre_wait_action() to set self.completed to prevent needless waiting.
@@ -166,7 +308,7 @@ class Waiter(metaclass=abc.ABCMeta):
 
         try:
             while not self.completed:
-                self._wait_polling_loop()
+                yield from self._polling_steps()
 
                 if not self.completed:
                     LOGGER.error('Waiting for condition "%s" timed out after %d seconds',
@@ -185,10 +327,19 @@ class Waiter(metaclass=abc.ABCMeta):
             self.failed = True
             LOGGER.error('Could not wait for condition "%s": %s', self.condition_name(), err)
 
+        self._log_wait_statistics()
         self.post_wait_action()
 
         return self.completed
 
+    def wait_for_completion(self):
+        """Wait for the condition to be achieved or for timeout.
+
+        Returns:
+            bool: True if condition succeeded, False if timed out.
+        """
+        return _run_wait_steps(self._wait_steps())
+
     def wait_for_completion_async(self):
         """Begin waiting for the completion condition.
 
@@ -235,13 +386,152 @@ class Waiter(metaclass=abc.ABCMeta):
         self.wait_for_completion_await()
 
 
+class WaiterScheduler:
+    """Waits for many Waiters at once without a thread per Waiter.
+
+    The next poll of each Waiter is kept in a queue ordered by the time at
+    which it is due, and the scheduler runs whichever poll is due next. Polls
+    run in the calling thread or, if `max_workers` is greater than one, on a
+    shared pool of threads. This bounds the number of checks (e.g. API
+    requests or SSH commands) in progress at once, no matter how many Waiters
+    there are.
+
+    Each step of a Waiter must return promptly, so Waiters using
+    KubernetesWatchMixin cannot be scheduled. They block on their watch
+    between polls, which would stall the polls of every other Waiter.
+
+    Attributes:
+        waiters (list of Waiter): the Waiters to wait for.
+        max_workers (int): the maximum number of Waiters whose polls run at
+            the same time.
+    """
+
+    def __init__(self, waiters, max_workers=1):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least one.")
+        self.waiters = list(waiters)
+        for waiter in self.waiters:
+            if isinstance(waiter, KubernetesWatchMixin):
+                raise TypeError(f'Waiters which watch Kubernetes cannot be scheduled with other '
+                                f'Waiters. ({waiter.__class__.__name__})')
+        self.max_workers = max_workers
+
+    def _initial_queue(self):
+        """Get a queue in which the first step of every Waiter is due now.
+
+        Returns:
+            list: a heap of tuples of the time each step is due, the index of
+                the Waiter (so that Waiters are never compared), the Waiter,
+                and its waiting steps.
+        """
+        now = time.monotonic()
+        queue = [(now, index, waiter, waiter._wait_steps())
+                 for index, waiter in enumerate(self.waiters)]
+        heapq.heapify(queue)
+        return queue
+
+    @staticmethod
+    def _run_step(waiter, steps):
+        """Run one step of waiting for the given Waiter.
+
+        Args:
+            waiter (Waiter): the Waiter whose step to run.
+            steps (generator): the waiting steps of the Waiter.
+
+        Returns:
+            float or None: the time, in seconds, until the next step of the
+                Waiter is due, or None if it is done waiting.
+        """
+        try:
+            return next(steps)
+        except StopIteration:
+            return None
+        except Exception as err:
+            # An unexpected error while waiting for one condition should not
+            # stop waiting for the others.
+            LOGGER.error('Unexpected error waiting for condition "%s": %s',
+                         waiter.condition_name(), err)
+            return None
+
+    def all_completed(self):
+        """Check whether every Waiter has completed.
+
+        Returns:
+            bool: True if all Waiters completed, False otherwise.
+        """
+        return all(waiter.completed for waiter in self.waiters)
+
+    def wait_steps(self):
+        """Wait for all Waiters from the calling thread, yielding instead of sleeping.
+
+        Yields:
+            float: the time, in seconds, until the next poll is due.
+
+        Returns:
+            bool: True if all Waiters completed, False otherwise.
+        """
+        queue = self._initial_queue()
+        while queue:
+            due_time, index, waiter, steps = queue[0]
+            delay = due_time - time.monotonic()
+            if delay > 0:
+                yield delay
+                continue
+
+            heapq.heappop(queue)
+            delay = self._run_step(waiter, steps)
+            if delay is not None:
+                heapq.heappush(queue, (time.monotonic() + delay, index, waiter, steps))
+
+        return self.all_completed()
+
+    def wait_for_completion(self):
+        """Wait for all Waiters to complete, fail, or time out.
+
+        Returns:
+            bool: True if all Waiters completed, False otherwise.
+        """
+        if self.max_workers == 1:
+            return _run_wait_steps(self.wait_steps())
+
+        queue = self._initial_queue()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while queue or running:
+                now = time.monotonic()
+                while queue and queue[0][0] <= now and len(running) < self.max_workers:
+                    _, index, waiter, steps = heapq.heappop(queue)
+                    running[executor.submit(self._run_step, waiter, steps)] = (index, waiter, steps)
+
+                # Wake up when the next step is due, unless there is no room to run it.
+                if queue and len(running) < self.max_workers:
+                    timeout = max(queue[0][0] - now, 0)
+                else:
+                    timeout = None
+
+                if not running:
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, waiter, steps = running.pop(future)
+                    delay = future.result()
+                    if delay is not None:
+                        heapq.heappush(queue, (time.monotonic() + delay, index, waiter, steps))
+
+        return self.all_completed()
+
+
 class SimultaneousWaiter(Waiter):
     """Waits for multiple conditions concurrently.
 
     This class can be used to synthesize multiple waiters into a
     single waiter; this essentially combines multiple awaited
     conditions with a logical "and", and waits for the combined
-    conditions concurrently.
+    conditions concurrently. The conditions are polled in turn from
+    the waiting thread using a WaiterScheduler, so Waiters using
+    KubernetesWatchMixin cannot be combined.
     """
 
     def __init__(self, waiter_classes, timeout, poll_interval=1, **kwargs):
@@ -252,6 +542,10 @@ class SimultaneousWaiter(Waiter):
             timeout (int): timeout waiting for all conditions.
             poll_interval (int): the interval, in seconds, at which to
                poll for completion.
+
+        Raises:
+            TypeError: if any class is not a subclass of Waiter, or is a
+                subclass of KubernetesWatchMixin.
         """
         self._subwaiters = []
         for WaiterClass in waiter_classes:
@@ -259,6 +553,7 @@ class SimultaneousWaiter(Waiter):
                 raise TypeError(f'All classes must be subclasses of Waiter. '
                                 '({WaiterClass.__name__})')
             self._subwaiters.append(WaiterClass(timeout, poll_interval=poll_interval, **kwargs))
+        self._scheduler = WaiterScheduler(self._subwaiters)
 
         super().__init__(timeout, poll_interval=poll_interval)
 
@@ -266,16 +561,13 @@ class SimultaneousWaiter(Waiter):
         conditions = ', '.join(waiter.condition_name() for waiter in self._subwaiters)
         return f"Simultaneous conditions: {conditions}"
 
-    def pre_wait_action(self):
-        for waiter in self._subwaiters:
-            waiter.wait_for_completion_async()
-
     def has_completed(self):
         return all(waiter.completed for waiter in self._subwaiters)
 
-    def post_wait_action(self):
-        for waiter in self._subwaiters:
-            waiter.wait_for_completion_await()
+    def _wait_steps(self):
+        """Wait for all the subwaiters, interleaving their polls."""
+        self.completed = yield from self._scheduler.wait_steps()
+        return self.completed
 
 
 class GroupWaiter(Waiter):
@@ -290,15 +582,35 @@ class GroupWaiter(Waiter):
             this is 0, meaning the wait will only occur once.
         failed (set): contains members which cannot be waited for, or
             which it is known will never complete.
+        max_workers (int): the maximum number of members which are checked
+            concurrently in each polling cycle. By default, this is 1, meaning
+            members are checked one at a time in the waiting thread.
+        member_timeout (int or None): the time, in seconds, allowed for
+            checking a single member. Implementations of member_has_completed()
+            must enforce this limit themselves, e.g. as the timeout of the
+            command or connection used for the check. When members are checked
+            concurrently, each polling cycle waits for the checks for at most
+            as long as the workers would take to check every member at this
+            limit. If None, there is no limit.
     """
 
-    def __init__(self, members, timeout, poll_interval=1, retries=0):
-        super().__init__(timeout, poll_interval, retries)
+    def __init__(self, members, timeout, poll_interval=1, retries=0,
+                 max_workers=1, member_timeout=None, max_poll_interval=None):
+        super().__init__(timeout, poll_interval, retries, max_poll_interval=max_poll_interval)
+
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least one.")
+        self.max_workers = max_workers
+        self.member_timeout = member_timeout
 
         self.members = set(members)
         self.pending = set(self.members)
         self.failed = set()
 
+        # Used when members are checked concurrently
+        self._executor = None
+        self._member_futures = {}
+
     @abc.abstractmethod
     def member_has_completed(self, member):
         """Check whether or not a given member has completed.
@@ -311,6 +623,118 @@ class GroupWaiter(Waiter):
         """
         raise NotImplementedError('{}.member_has_completed'.format(self.__class__.__name__))
 
+    def members_have_completed(self, members):
+        """Check which of the given members have completed.
+
+        The default implementation calls member_has_completed() once for
+        each member, using up to `max_workers` threads. Subclasses which can
+        check many members with a single query should override this method to
+        do so. Members which cannot be waited for should be added to the
+        `failed` attribute.
+
+        Args:
+            members (set): the members to check.
+
+        Returns:
+            set: the members which have completed.
+        """
+        if self.max_workers > 1:
+            return self._members_have_completed_concurrently(members)
+
+        completed = set()
+        for member in members:
+            try:
+                if self.member_has_completed(member):
+                    completed.add(member)
+            except WaitingFailure as err:
+                self._member_failed(member, err)
+        return completed
+
+    def _member_failed(self, member, err):
+        """Log the failure of a member and add it to the failed members.
+
+        Args:
+            member: the member which failed.
+            err (WaitingFailure): the reason the member failed.
+
+        Returns:
+            None
+        """
+        LOGGER.error('Failed to wait for condition "%s" for member %s: %s',
+                     self.condition_name(), str(member), err)
+        self.failed.add(member)
+
+    def _members_have_completed_concurrently(self, members):
+        """Check which of the given members have completed using a pool of threads.
+
+        The pool is kept for the whole wait. A member whose previous check is
+        still running is not checked again, so member_has_completed() is never
+        called for the same member in two threads at once. Checks which do not
+        finish within the polling cycle are left running, and their results
+        are used in a later cycle. Results are collected and `failed` is
+        updated only in the calling thread.
+
+        Args:
+            members (set): the members to check.
+
+        Returns:
+            set: the members which have completed.
+        """
+        if not members:
+            return set()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        for member in members:
+            if member not in self._member_futures:
+                self._member_futures[member] = self._executor.submit(self.member_has_completed, member)
+        futures = {self._member_futures[member]: member for member in members}
+
+        if self.member_timeout is None:
+            cycle_timeout = None
+        else:
+            # Each worker checks its share of the members one after another.
+            num_workers = min(self.max_workers, len(futures))
+            cycle_timeout = self.member_timeout * math.ceil(len(futures) / num_workers)
+
+        done, not_done = wait(futures, timeout=cycle_timeout)
+
+        completed = set()
+        for future in done:
+            member = futures[future]
+            del self._member_futures[member]
+            try:
+                if future.result():
+                    completed.add(member)
+            except WaitingFailure as err:
+                self._member_failed(member, err)
+
+        if not_done:
+            still_running = sorted(str(futures[future]) for future in not_done)
+            LOGGER.warning('Checking condition "%s" did not finish within %s seconds for '
+                           'member(s): %s', self.condition_name(), cycle_timeout,
+                           ', '.join(still_running))
+
+        return completed
+
+    def _shutdown_executor(self):
+        """Stop the pool of threads used to check members concurrently, if any.
+
+        Checks which have not started are cancelled. Checks which are running
+        are not waited for; they end on their own since member_has_completed()
+        enforces `member_timeout`.
+
+        Returns:
+            None
+        """
+        if self._executor is None:
+            return
+        for future in self._member_futures.values():
+            future.cancel()
+        self._member_futures = {}
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
     def has_completed(self):
         """Check if every member has completed.
 
@@ -318,8 +742,13 @@ class GroupWaiter(Waiter):
         Returns: True if every member has reached its completed state,
             and False otherwise.
         """
-        return all(self.member_has_completed(member)
-                   for member in self.members)
+        return self.members_have_completed(self.members) >= self.members
+
+    def _wait_steps(self):
+        try:
+            return (yield from super()._wait_steps())
+        finally:
+            self._shutdown_executor()
 
     def wait_for_completion(self):
         """Wait until all members have completed (or failed), or timeout is reached.
@@ -331,39 +760,174 @@ class GroupWaiter(Waiter):
         super().wait_for_completion()
         return self.pending
 
-    def _wait_polling_loop(self):
+    def _polling_steps(self):
         """Alternate implementation of the polling loop for waiting on groups.
 
         This removes completed and failed members from as it goes, and excludes
-        them from future attempts as a small optimization.
+        them from future attempts as a small optimization. Waiting stops as soon
+        as no members are pending.
         """
-
-        start_time = time.monotonic()
+        deadline = self._start_polling_loop()
 
         # Ensure we set this to a set of all members before starting to wait
         # because children classes may set `self.members` after `__init__`.
         self.pending = set(self.members)
 
-        while self.pending and time.monotonic() - start_time < self.timeout:
-            completed = set()
-
+        while self.pending:
             self.on_check_action()
-            for member in (self.pending - self.failed):
-                try:
-                    if self.member_has_completed(member):
-                        completed.add(member)
-                except WaitingFailure as err:
-                    LOGGER.error('Failed to wait for condition "%s" for member %s: %s',
-                                 self.condition_name(), str(member), err)
-                    self.failed.add(member)
+            num_failed = len(self.failed)
+            completed = self.members_have_completed(self.pending - self.failed)
 
             self.pending -= (completed | self.failed)
+            self._record_poll(bool(completed), len(self.failed) > num_failed)
 
-            time.sleep(self.poll_interval)
+            if not self.pending:
+                break
+            delay = self._next_poll_delay(deadline)
+            if delay is None:
+                break
+            yield delay
 
         self.completed = not self.pending
 
 
+class KubernetesWatchMixin:
+    """Mixin for Waiters which are woken by events from a Kubernetes watch stream.
+
+    Instead of sleeping between polls, a Waiter using this mixin watches the
+    Kubernetes resources returned by get_watch_source() and checks for
+    completion again as soon as handle_watch_event() reports a relevant
+    change. If no relevant event arrives, completion is checked again after
+    at most `watch_resync_interval` seconds.
+
+    The watch resumes from `watch_resource_version`, which is updated as
+    events are received. Subclasses which list the watched resources should
+    set it to the resourceVersion of the list, so that no changes between the
+    list and the watch are missed. If the resource version has expired, then
+    resync_watch_state() is called and the watch starts over.
+
+    If the watch fails for any other reason, the Waiter falls back to polling
+    at its normal interval for the rest of the wait.
+
+    Because the Waiter blocks on the watch between polls, it must be waited
+    for on its own, e.g. with wait_for_completion() or
+    wait_for_completion_async(). A WaiterScheduler or SimultaneousWaiter
+    rejects it.
+
+    Attributes:
+        watching (bool): True if events from the watch stream are being used,
+            False if the Waiter has fallen back to polling.
+        watch_resource_version (str or None): the resourceVersion from which
+            to resume watching, or None to start from the current state.
+        watch_resync_interval (int): the maximum time, in seconds, to wait for
+            an event before checking for completion again.
+    """
+
+    # The HTTP status returned by Kubernetes when a resource version has expired
+    RESOURCE_VERSION_EXPIRED_STATUS = 410
+
+    def __init__(self, *args, watch_resync_interval=60, **kwargs):
+        self.watching = True
+        self.watch_resource_version = None
+        self.watch_resync_interval = watch_resync_interval
+        super().__init__(*args, **kwargs)
+
+    @abc.abstractmethod
+    def get_watch_source(self):
+        """Get the Kubernetes API list function to watch and its arguments.
+
+        Returns:
+            tuple: a tuple of the list function (e.g.
+                `CoreV1Api.list_pod_for_all_namespaces`), a tuple of positional
+                arguments, and a dict of keyword arguments to pass to it.
+        """
+        raise NotImplementedError('{}.get_watch_source'.format(self.__class__.__name__))
+
+    def handle_watch_event(self, event_type, obj):
+        """Handle an event from the watch stream.
+
+        The default implementation treats every event as relevant. Override
+        this method to record the new state of the watched resource.
+
+        Args:
+            event_type (str): the type of event, e.g. 'ADDED', 'MODIFIED', or
+                'DELETED'.
+            obj: the Kubernetes object which the event is about.
+
+        Returns:
+            bool: True if completion should be checked again, False otherwise.
+        """
+        return True
+
+    def resync_watch_state(self):
+        """Recover from an expired resource version.
+
+        The default implementation restarts the watch from the current state.
+        Override this method to list the watched resources again and set
+        `watch_resource_version` from the list.
+        """
+        self.watch_resource_version = None
+
+    def _watch_for_change(self, timeout):
+        """Watch for a relevant event for up to the given number of seconds.
+
+        Args:
+            timeout (float): the maximum time, in seconds, to watch.
+
+        Returns:
+            bool: True if a relevant event was received, False otherwise.
+        """
+        list_fn, args, kwargs = self.get_watch_source()
+        timeout_seconds = max(1, math.ceil(timeout))
+        stream_kwargs = dict(kwargs, timeout_seconds=timeout_seconds)
+        if self.watch_resource_version is not None:
+            stream_kwargs['resource_version'] = self.watch_resource_version
+
+        watch = Watch()
+        events = watch.stream(list_fn, *args, **stream_kwargs)
+        try:
+            for event in events:
+                if watch.resource_version is not None:
+                    self.watch_resource_version = watch.resource_version
+                if self.handle_watch_event(event['type'], event['object']):
+                    return True
+        except ApiException as err:
+            if err.status != self.RESOURCE_VERSION_EXPIRED_STATUS:
+                raise
+            LOGGER.debug('Resource version %s expired while waiting for condition "%s"; '
+                         'resynchronizing.', self.watch_resource_version, self.condition_name())
+            self.resync_watch_state()
+            return True
+        finally:
+            # Closes the connection to the Kubernetes API
+            events.close()
+
+        return False
+
+    def _next_poll_delay(self, deadline):
+        """Watch for a relevant change, and then poll again immediately.
+
+        This blocks for up to `watch_resync_interval` seconds. If watching
+        fails, the normal delay between polls is used instead.
+        """
+        if not self.watching:
+            return super()._next_poll_delay(deadline)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+
+        try:
+            self._watch_for_change(min(remaining, self.watch_resync_interval))
+        except (ApiException, HTTPError, OSError, ValueError) as err:
+            LOGGER.warning('Failed to watch for changes while waiting for condition "%s"; '
+                           'falling back to polling: %s', self.condition_name(), err)
+            self.watching = False
+            return super()._next_poll_delay(deadline)
+
+        return 0
+
+
 class DependencyCycleError(Exception):
     """A cycle exists in item dependencies."""
     def __init__(self, cycle_members):
@@ -483,8 +1047,11 @@ class DependencyGroupMember(abc.ABC):
 class DependencyGroupWaiter(GroupWaiter, abc.ABC):
     """A specialized GroupWaiter which can reason about dependencies between members."""
 
-    def __init__(self, members, timeout, poll_interval=1, retries=0):
-        super().__init__(members, timeout, poll_interval, retries)
+    def __init__(self, members, timeout, poll_interval=1, retries=0,
+                 max_workers=1, member_timeout=None, max_poll_interval=None):
+        super().__init__(members, timeout, poll_interval, retries,
+                         max_workers=max_workers, member_timeout=member_timeout,
+                         max_poll_interval=max_poll_interval)
 
         for member in self.members:
             if not isinstance(member, DependencyGroupMember):
@@ -519,20 +1086,14 @@ class DependencyGroupWaiter(GroupWaiter, abc.ABC):
             self._begin_member(member)
         self.pending -= self.failed
 
-    def _wait_polling_loop(self):
-        start_time = time.monotonic()
-        while self.pending and time.monotonic() - start_time < self.timeout:
-            completed = set()
-            for member in self.pending:
-                try:
-                    if self.member_has_completed(member):
-                        completed.add(member)
-                except WaitingFailure as err:
-                    LOGGER.error('Failed to wait for condition "%s" for member %s: %s',
-                                 self.condition_name(), str(member), err)
-                    self.failed.add(member)
+    def _polling_steps(self):
+        deadline = self._start_polling_loop()
+        while self.pending:
+            num_failed = len(self.failed)
+            completed = self.members_have_completed(set(self.pending))
 
             self.pending -= (completed | self.failed)
+            self._record_poll(bool(completed), len(self.failed) > num_failed)
             for member in completed:
                 for dependent in member.dependents:
                     # TODO: full_dependencies() runs in linear time based on the
@@ -543,6 +1104,11 @@ class DependencyGroupWaiter(GroupWaiter, abc.ABC):
                         self.pending.add(dependent)
                         self._begin_member(dependent)
 
-            time.sleep(self.poll_interval)
+            if not self.pending:
+                break
+            delay = self._next_poll_delay(deadline)
+            if delay is None:
+                break
+            yield delay
 
         self.completed = not self.pending
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2019-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2019-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -283,5 +283,94 @@ class TestCAPMCClientGetState(ExtendedTestCase):
             self.capmc_client.get_xname_power_state(xname)
 
 
+class TestCAPMCClientBatches(ExtendedTestCase):
+    """Test the CAPMCClient splits large requests into batches."""
+
+    def setUp(self):
+        self.xnames = [f'x1000c0s{slot}b0n0' for slot in range(5)]
+        self.batches = [self.xnames[:2], self.xnames[2:4], self.xnames[4:]]
+        # A set of xnames for which CAPMC should return an error response
+        self.failing_xnames = set()
+
+        def mock_post(path, json):
+            response = mock.Mock()
+            batch = json['xnames']
+            if path == 'get_xname_status':
+                response.json.return_value = {'e': 0, 'err_msg': '', 'on': batch[:1], 'off': batch[1:]}
+            else:
+                failed = [xname for xname in batch if xname in self.failing_xnames]
+                response.json.return_value = {
+                    'e': -1 if failed else 0,
+                    'err_msg': 'failure' if failed else '',
+                    'xnames': [{'e': -1, 'err_msg': 'failure', 'xname': xname} for xname in failed]
+                }
+            return response
+
+        self.mock_post = mock.patch.object(APIGatewayClient, 'post', side_effect=mock_post).start()
+        self.capmc_client = CAPMCClient(max_xnames_per_request=2)
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def assert_posted_batches(self, path):
+        """Assert that one request was made for each batch of xnames."""
+        self.assertEqual(len(self.batches), self.mock_post.call_count)
+        self.assertCountEqual([call.kwargs['json']['xnames'] for call in self.mock_post.call_args_list],
+                              self.batches)
+        for call in self.mock_post.call_args_list:
+            self.assertEqual(path, call.args[0])
+
+    def test_get_xnames_power_state_batches(self):
+        """Test get_xnames_power_state combines the results of each batch."""
+        nodes_by_state = self.capmc_client.get_xnames_power_state(self.xnames)
+        self.assert_posted_batches('get_xname_status')
+        self.assertCountEqual(['on', 'off'], nodes_by_state.keys())
+        self.assertCountEqual([batch[0] for batch in self.batches], nodes_by_state['on'])
+        self.assertCountEqual(['x1000c0s1b0n0', 'x1000c0s3b0n0'], nodes_by_state['off'])
+
+    def test_get_xnames_power_state_batch_api_err(self):
+        """Test get_xnames_power_state when one batch fails."""
+        original_side_effect = self.mock_post.side_effect
+
+        def fail_second_batch(path, json):
+            if json['xnames'] == self.batches[1]:
+                raise APIError('failure')
+            return original_side_effect(path, json)
+
+        self.mock_post.side_effect = fail_second_batch
+        expected_err = rf'Failed to get power state of xname\(s\): {", ".join(self.batches[1])}$'
+        with self.assertRaisesRegex(CAPMCError, expected_err):
+            self.capmc_client.get_xnames_power_state(self.xnames)
+
+    def test_set_xnames_power_state_batches(self):
+        """Test set_xnames_power_state makes a request for each batch."""
+        self.capmc_client.set_xnames_power_state(self.xnames, 'off')
+        self.assert_posted_batches('xname_off')
+
+    def test_set_xnames_power_state_batch_errs_combined(self):
+        """Test set_xnames_power_state combines the errors from each batch."""
+        self.failing_xnames = {self.xnames[0], self.xnames[4]}
+        with self.assertRaisesRegex(CAPMCError, r'Power off operation failed for xname\(s\).') as cm:
+            self.capmc_client.set_xnames_power_state(self.xnames, 'off')
+        self.assertCountEqual(self.failing_xnames, cm.exception.xnames)
+
+    def test_set_xnames_power_state_batch_api_err(self):
+        """Test set_xnames_power_state reports all xnames in a batch whose request failed."""
+        self.failing_xnames = {self.xnames[4]}
+        original_side_effect = self.mock_post.side_effect
+
+        def fail_first_batch(path, json):
+            if json['xnames'] == self.batches[0]:
+                raise APIError('service unavailable')
+            return original_side_effect(path, json)
+
+        self.mock_post.side_effect = fail_first_batch
+        with self.assertRaises(CAPMCError) as cm:
+            self.capmc_client.set_xnames_power_state(self.xnames, 'off')
+        self.assertCountEqual(self.batches[0] + self.batches[2], cm.exception.xnames)
+        self.assertIn(f'xname(s) ({", ".join(self.batches[0])}) failed with e=-1 '
+                      f'and err_msg="service unavailable"', str(cm.exception))
+
+
 if __name__ == '__main__':
     unittest.main()
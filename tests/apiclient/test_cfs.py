@@ -0,0 +1,261 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for sat.apiclient.cfs
+"""
+import unittest
+from unittest.mock import Mock, patch
+
+from kubernetes.client import ApiException
+
+from sat.apiclient import APIError, CFSClient
+from sat.apiclient.cfs import CFSImageConfigurationSession, CFSSessionTracker
+
+
+class TestIterComponents(unittest.TestCase):
+    """Tests for iterating over CFS components with CFSClient.iter_components"""
+
+    def setUp(self):
+        self.components = {
+            f'x3000c0s{slot}b0n0': {
+                'id': f'x3000c0s{slot}b0n0',
+                'configurationStatus': 'configured',
+                'enabled': True,
+                'state': [{'layer': 'history'}]
+            }
+            for slot in range(5)
+        }
+        self.mock_get = patch.object(CFSClient, 'get', side_effect=self.fake_get).start()
+        patch.object(CFSClient, 'COMPONENTS_PAGE_SIZE', 2).start()
+        self.cfs_client = CFSClient(Mock())
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_get(self, *args, params=None):
+        """Fake the CFS components API, which filters by the given IDs"""
+        response = Mock()
+        if 'ids' in params:
+            response.json.return_value = [self.components[component_id]
+                                          for component_id in params['ids'].split(',')]
+        else:
+            response.json.return_value = list(self.components.values())
+        return response
+
+    def test_all_components(self):
+        """Test getting all components in a single request"""
+        self.assertEqual(list(self.components.values()), list(self.cfs_client.iter_components()))
+        self.mock_get.assert_called_once_with('components', params={})
+
+    def test_filters(self):
+        """Test that filters are passed to CFS"""
+        list(self.cfs_client.iter_components(status='failed', enabled=False, config_name='compute'))
+        self.mock_get.assert_called_once_with(
+            'components', params={'status': 'failed', 'enabled': 'false', 'config_name': 'compute'}
+        )
+
+    def test_ids_paged(self):
+        """Test that components requested by ID are requested in pages"""
+        ids = list(self.components)
+        self.assertEqual(ids, [component['id'] for component in self.cfs_client.iter_components(ids=ids)])
+        self.assertEqual(
+            [','.join(ids[0:2]), ','.join(ids[2:4]), ids[4]],
+            [call.kwargs['params']['ids'] for call in self.mock_get.mock_calls]
+        )
+
+    def test_pages_requested_lazily(self):
+        """Test that the next page is not requested until the previous one is consumed"""
+        components = self.cfs_client.iter_components(ids=list(self.components))
+        next(components)
+        next(components)
+        self.mock_get.assert_called_once()
+        next(components)
+        self.assertEqual(2, self.mock_get.call_count)
+
+    def test_fields(self):
+        """Test that only the given fields of each component are kept"""
+        components = list(self.cfs_client.iter_components(fields=['id', 'configurationStatus', 'missing']))
+        self.assertEqual(
+            [{'id': component_id, 'configurationStatus': 'configured'} for component_id in self.components],
+            components
+        )
+
+    def test_api_error(self):
+        """Test that a failed request raises APIError"""
+        self.mock_get.side_effect = APIError('Service unavailable')
+        with self.assertRaisesRegex(APIError, 'Failed to get CFS components: Service unavailable'):
+            list(self.cfs_client.iter_components())
+
+    def test_bad_json(self):
+        """Test that a response with bad JSON raises APIError"""
+        self.mock_get.side_effect = None
+        self.mock_get.return_value.json.side_effect = ValueError('Expecting value')
+        with self.assertRaisesRegex(APIError, 'Failed to parse JSON in response from CFS'):
+            list(self.cfs_client.iter_components())
+
+
+class TestConfigurationCache(unittest.TestCase):
+    """Tests for the cache of configurations in CFSClient"""
+
+    def setUp(self):
+        self.configurations = [{'name': 'compute', 'layers': []}, {'name': 'uan', 'layers': []}]
+        self.mock_get = patch.object(CFSClient, 'get').start()
+        self.mock_get.return_value.json.return_value = self.configurations
+        self.mock_put = patch.object(CFSClient, 'put').start()
+        self.mock_monotonic = patch('sat.apiclient.cfs.time.monotonic', return_value=0).start()
+        self.cfs_client = CFSClient(Mock(), cache_configurations=True)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_get_configuration_from_cache(self):
+        """Test that a configuration is taken from the last list of configurations"""
+        self.cfs_client.get_configurations()
+        self.assertEqual(self.configurations[1], self.cfs_client.get_configuration('uan'))
+        self.mock_get.assert_called_once_with('configurations')
+
+    def test_get_configuration_not_cached(self):
+        """Test that a configuration missing from the cache is requested from CFS"""
+        self.cfs_client.get_configurations()
+        self.cfs_client.get_configuration('other')
+        self.mock_get.assert_called_with('configurations', 'other')
+
+    def test_put_configuration_updates_cache(self):
+        """Test that putting a configuration replaces it in the cache"""
+        self.cfs_client.get_configurations()
+        new_config = {'name': 'compute', 'layers': [{'commit': 'abc'}]}
+        self.mock_put.return_value.json.return_value = new_config
+        self.cfs_client.put_configuration('compute', {'layers': [{'commit': 'abc'}]})
+        self.assertEqual(new_config, self.cfs_client.get_configuration('compute'))
+        self.mock_get.assert_called_once_with('configurations')
+
+    def test_cache_disabled_by_default(self):
+        """Test that configurations are not cached unless caching is enabled"""
+        cfs_client = CFSClient(Mock())
+        cfs_client.get_configurations()
+        cfs_client.get_configuration('uan')
+        self.mock_get.assert_called_with('configurations', 'uan')
+
+    def test_cache_expired(self):
+        """Test that a configuration is requested from CFS when the cache is older than its TTL"""
+        cfs_client = CFSClient(Mock(), cache_configurations=True, cache_ttl=300)
+        cfs_client.get_configurations()
+        self.mock_monotonic.return_value = 299
+        cfs_client.get_configuration('uan')
+        self.mock_get.assert_called_once_with('configurations')
+
+        self.mock_monotonic.return_value = 300
+        cfs_client.get_configuration('uan')
+        self.mock_get.assert_called_with('configurations', 'uan')
+
+
+class TestCFSSessionTracker(unittest.TestCase):
+    """Tests for tracking many CFS sessions with CFSSessionTracker"""
+
+    def setUp(self):
+        self.session_status = {
+            'sat-a': {'session': {'status': 'running', 'job': 'cfs-job-a'}},
+            'sat-b': {'session': {'status': 'pending', 'job': None}},
+        }
+        self.mock_get = patch.object(CFSClient, 'get', side_effect=self.fake_get).start()
+        self.mock_core_v1 = patch('sat.apiclient.cfs.CoreV1Api').start().return_value
+        patch('sat.apiclient.cfs.get_kube_api_client').start()
+        self.mock_core_v1.list_namespaced_pod.return_value.items = [self.get_pod('cfs-job-a', '1')]
+
+        self.cfs_client = CFSClient(Mock())
+        self.tracker = CFSSessionTracker(self.cfs_client)
+        self.sessions = {name: CFSImageConfigurationSession({'name': name}, self.cfs_client, 'image')
+                         for name in self.session_status}
+        for session in self.sessions.values():
+            self.tracker.add_session(session)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_get(self, *args, params=None):
+        """Fake the CFS sessions API"""
+        response = Mock()
+        response.json.return_value = [{'name': name, 'status': status}
+                                      for name, status in self.session_status.items()]
+        return response
+
+    @staticmethod
+    def get_pod(job_name, resource_version):
+        """Get a mock pod for the given Kubernetes job with no containers"""
+        pod = Mock()
+        pod.metadata.labels = {'job-name': job_name}
+        pod.metadata.resource_version = resource_version
+        pod.status.init_container_statuses = []
+        pod.status.container_statuses = []
+        return pod
+
+    def test_update_with_one_request_each(self):
+        """Test that all sessions and pods are updated with one CFS and one Kubernetes request"""
+        self.tracker.update()
+
+        tag_value = self.tracker.tags['sat_session_tracker']
+        self.mock_get.assert_called_once_with('sessions',
+                                              params={'tags': f'sat_session_tracker={tag_value}'})
+        self.mock_core_v1.list_namespaced_pod.assert_called_once_with(
+            'services', label_selector='job-name in (cfs-job-a)'
+        )
+        self.assertEqual('running', self.sessions['sat-a'].session_status)
+        self.assertEqual('pending', self.sessions['sat-b'].session_status)
+        self.assertEqual('1', self.sessions['sat-a'].pod.metadata.resource_version)
+        self.assertIsNone(self.sessions['sat-b'].pod)
+
+    def test_unchanged_pod_not_compared(self):
+        """Test that container statuses are not compared again if the pod is unchanged"""
+        with patch.object(CFSImageConfigurationSession, '_update_container_status') as mock_update:
+            self.tracker.update()
+            self.tracker.update()
+            self.assertEqual(1, mock_update.call_count)
+            self.mock_core_v1.list_namespaced_pod.return_value.items = [self.get_pod('cfs-job-a', '2')]
+            self.tracker.update()
+            self.assertEqual(2, mock_update.call_count)
+
+    def test_untagged_session_queried(self):
+        """Test that a session missing from the query by tags is queried by name"""
+        self.tracker.add_session(CFSImageConfigurationSession({'name': 'sat-c'}, self.cfs_client, 'image'))
+        with patch.object(CFSClient, 'get_session',
+                          return_value={'status': {'session': {'status': 'pending'}}}) as mock_get_session:
+            self.tracker.update()
+        mock_get_session.assert_called_once_with('sat-c')
+
+    def test_complete_sessions_no_longer_tracked(self):
+        """Test that completed sessions are dropped after their final update"""
+        self.session_status['sat-a']['session']['status'] = 'complete'
+        self.tracker.update()
+        self.assertTrue(self.sessions['sat-a'].complete)
+        self.assertEqual(['sat-b'], list(self.tracker.sessions))
+
+    def test_kubernetes_error(self):
+        """Test that a failure to list pods raises APIError"""
+        self.mock_core_v1.list_namespaced_pod.side_effect = ApiException('Service unavailable')
+        with self.assertRaisesRegex(APIError, 'Failed to query Kubernetes for pods'):
+            self.tracker.update()
+
+
+if __name__ == '__main__':
+    unittest.main()
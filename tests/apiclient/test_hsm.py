@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2019-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2019-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -337,6 +337,19 @@ class TestHSMClientRedfishEndpoints(ExtendedTestCase):
             logs.output
         )
 
+    def test_get_redfish_endpoints_inventory(self):
+        """Test getting Redfish endpoints for several xnames in one request."""
+        xnames = ['x1000c0s1b0', 'x1000c0s2b0']
+        endpoints = self.hsm_client.get_redfish_endpoints_inventory(xnames)
+        self.mock_get.assert_called_once_with('Inventory', 'RedfishEndpoints', params={'id': xnames})
+        self.assertEqual(self.mock_get.return_value.json.return_value['RedfishEndpoints'], endpoints)
+
+    def test_get_redfish_endpoints_inventory_missing_key(self):
+        """Test getting Redfish endpoints when the response is missing a key."""
+        self.mock_get.return_value.json.return_value = {}
+        with self.assertRaisesRegex(APIError, 'missing \'RedfishEndpoints\' key'):
+            self.hsm_client.get_redfish_endpoints_inventory(['x1000c0s1b0'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,252 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for sat.apiclient.ims
+"""
+from threading import Barrier
+import unittest
+from unittest.mock import Mock, patch, PropertyMock
+
+from botocore.exceptions import ClientError
+
+from sat.apiclient import APIError, IMSClient
+
+
+class TestCopyManifestArtifacts(unittest.TestCase):
+    """Tests for copying image artifacts in S3 with IMSClient.copy_manifest_artifacts"""
+
+    def setUp(self):
+        self.mock_s3_resource = patch.object(IMSClient, 's3_resource', new_callable=PropertyMock).start()
+        self.mock_s3_client = self.mock_s3_resource.return_value.meta.client
+        self.sizes = {}
+        self.mock_s3_client.head_object.side_effect = lambda Bucket, Key: {
+            'ContentLength': self.sizes.get(Key, 1024),
+            'Metadata': {'md5sum': f'md5-{Key}'}
+        }
+        self.mock_s3_client.copy_object.side_effect = lambda **kwargs: {
+            'CopyObjectResult': {'ETag': f'etag-{kwargs["Key"]}'}
+        }
+        self.mock_s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-id'}
+        self.mock_s3_client.upload_part_copy.side_effect = lambda **kwargs: {
+            'CopyPartResult': {'ETag': f'part-{kwargs["PartNumber"]}'}
+        }
+        self.mock_s3_client.complete_multipart_upload.return_value = {'ETag': 'multipart-etag'}
+
+        self.ims_client = IMSClient(Mock())
+        self.manifest = {
+            'version': '1.0',
+            'artifacts': [
+                {'type': f'application/{name}', 'link': {'type': 's3', 'path': f's3://boot-images/old/{name}'}}
+                for name in ('rootfs', 'kernel', 'initrd')
+            ]
+        }
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_copy_small_artifacts(self):
+        """Test copying artifacts with a single copy each, preserving md5sum and order"""
+        new_manifest = self.ims_client.copy_manifest_artifacts(self.manifest, 'new', 'new-name')
+
+        self.assertEqual(
+            [artifact['link'] for artifact in new_manifest['artifacts']],
+            [{'type': 's3', 'path': f's3://boot-images/new/{name}', 'etag': f'etag-new/{name}'}
+             for name in ('rootfs', 'kernel', 'initrd')]
+        )
+        self.assertEqual(self.mock_s3_client.head_object.call_count, 3)
+        self.mock_s3_client.copy_object.assert_any_call(
+            Bucket='boot-images', Key='new/kernel',
+            CopySource={'Bucket': 'boot-images', 'Key': 'old/kernel'},
+            Metadata={'x-shasta-ims-image-id': 'new', 'x-shasta-ims-image-name': 'new-name',
+                      'md5sum': 'md5-old/kernel'},
+            MetadataDirective='REPLACE'
+        )
+        self.mock_s3_client.create_multipart_upload.assert_not_called()
+
+    def test_copy_artifacts_concurrently(self):
+        """Test that artifacts are copied at the same time"""
+        barrier = Barrier(3, timeout=5)
+
+        def wait_for_all(Bucket, Key):
+            barrier.wait()
+            return {'ContentLength': 1024, 'Metadata': {}}
+
+        self.mock_s3_client.head_object.side_effect = wait_for_all
+        new_manifest = self.ims_client.copy_manifest_artifacts(self.manifest, 'new', 'new-name')
+        self.assertEqual(len(new_manifest['artifacts']), 3)
+
+    def test_multipart_copy_large_artifact(self):
+        """Test that a large artifact is copied in parts covering the whole object"""
+        part_size = IMSClient.multipart_copy_part_size
+        self.sizes['old/rootfs'] = 2 * part_size + 10
+
+        new_manifest = self.ims_client.copy_manifest_artifacts(self.manifest, 'new', 'new-name')
+
+        self.assertEqual(new_manifest['artifacts'][0]['link']['etag'], 'multipart-etag')
+        ranges = sorted(call.kwargs['CopySourceRange']
+                        for call in self.mock_s3_client.upload_part_copy.call_args_list)
+        self.assertEqual(ranges, [
+            f'bytes=0-{part_size - 1}',
+            f'bytes={part_size}-{2 * part_size - 1}',
+            f'bytes={2 * part_size}-{2 * part_size + 9}',
+        ])
+        self.mock_s3_client.complete_multipart_upload.assert_called_once_with(
+            Bucket='boot-images', Key='new/rootfs', UploadId='upload-id',
+            MultipartUpload={'Parts': [{'ETag': f'part-{n}', 'PartNumber': n} for n in (1, 2, 3)]}
+        )
+        self.assertEqual(self.mock_s3_client.copy_object.call_count, 2)
+
+    def test_multipart_copy_failure_aborted(self):
+        """Test that a failed multipart copy is aborted and raises APIError"""
+        self.sizes['old/rootfs'] = IMSClient.multipart_copy_threshold
+        self.mock_s3_client.upload_part_copy.side_effect = ClientError({}, 'UploadPartCopy')
+
+        with self.assertRaisesRegex(APIError, 'Failed to copy artifact old/rootfs'):
+            self.ims_client.copy_manifest_artifacts(self.manifest, 'new', 'new-name')
+
+        self.mock_s3_client.abort_multipart_upload.assert_called_once_with(
+            Bucket='boot-images', Key='new/rootfs', UploadId='upload-id'
+        )
+
+    def test_missing_path(self):
+        """Test that an artifact without a path raises APIError"""
+        del self.manifest['artifacts'][1]['link']['path']
+        with self.assertRaisesRegex(APIError, 'missing path'):
+            self.ims_client.copy_manifest_artifacts(self.manifest, 'new', 'new-name')
+
+    def test_unrecognized_type(self):
+        """Test that an artifact not stored in S3 raises APIError"""
+        self.manifest['artifacts'][0]['link']['type'] = 'http'
+        with self.assertRaisesRegex(APIError, 'unrecognized artifact types: http'):
+            self.ims_client.copy_manifest_artifacts(self.manifest, 'new', 'new-name')
+        self.mock_s3_client.copy_object.assert_not_called()
+
+
+class TestIMSResourceCache(unittest.TestCase):
+    """Tests for the cache of IMS resources in IMSClient"""
+
+    def setUp(self):
+        self.images = [
+            {'id': 'id-1', 'name': 'image-a'},
+            {'id': 'id-2', 'name': 'image-b'},
+            {'id': 'id-3', 'name': 'image-a'},
+        ]
+        self.mock_time = patch('sat.apiclient.ims.time.monotonic', return_value=1000.0).start()
+        self.mock_get = patch.object(IMSClient, 'get').start()
+        self.mock_get.side_effect = self.fake_get
+        self.ims_client = IMSClient(Mock())
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_get(self, *args):
+        """Fake the IMS API, returning the list of images or a single image."""
+        path = '/'.join(args)
+        response = Mock()
+        if path == 'images':
+            response.json.return_value = self.images
+        else:
+            image_id = path.split('/')[-1]
+            response.json.return_value = {'id': image_id, 'name': f'fetched-{image_id}'}
+        return response
+
+    def test_list_cached(self):
+        """Test that the list of resources is requested only once"""
+        self.assertEqual(self.images, self.ims_client.get_matching_resources('image'))
+        self.assertEqual(self.images, self.ims_client.get_matching_resources('image'))
+        self.mock_get.assert_called_once_with('images')
+
+    def test_lookup_by_name(self):
+        """Test looking up resources by name uses the index of the cached list"""
+        self.assertEqual([self.images[0], self.images[2]],
+                         self.ims_client.get_matching_resources('image', name='image-a'))
+        self.assertEqual([self.images[2]],
+                         self.ims_client.get_matching_resources('image', name='image-a', id='id-3'))
+        self.assertEqual([], self.ims_client.get_matching_resources('image', name='missing'))
+        self.mock_get.assert_called_once_with('images')
+
+    def test_lookup_by_id_from_list_cache(self):
+        """Test looking up resources by ID is answered from the fresh list cache"""
+        self.ims_client.get_matching_resources('image')
+        self.assertEqual([self.images[1]],
+                         self.ims_client.get_matching_resources('image', resource_id='id-2'))
+        self.assertEqual(self.images[0], self.ims_client.get_image('id-1'))
+        self.mock_get.assert_called_once_with('images')
+
+    def test_lookup_by_id_not_in_list_cache(self):
+        """Test looking up a resource missing from the list cache requests it once"""
+        self.ims_client.get_matching_resources('image')
+        expected = {'id': 'id-4', 'name': 'fetched-id-4'}
+        self.assertEqual(expected, self.ims_client.get_image('id-4'))
+        self.assertEqual(expected, self.ims_client.get_image('id-4'))
+        self.assertEqual(2, self.mock_get.call_count)
+        self.mock_get.assert_called_with('images', 'id-4')
+
+    def test_ttl_expired(self):
+        """Test that cached resources are requested again once the TTL expires"""
+        self.ims_client.cache_ttl = 60
+        self.ims_client.get_matching_resources('image')
+        self.ims_client.get_image('id-1')
+        self.mock_time.return_value += 59
+        self.ims_client.get_matching_resources('image')
+        self.assertEqual(1, self.mock_get.call_count)
+
+        self.mock_time.return_value += 1
+        self.assertEqual({'id': 'id-1', 'name': 'fetched-id-1'}, self.ims_client.get_image('id-1'))
+        self.ims_client.get_matching_resources('image')
+        self.assertEqual(3, self.mock_get.call_count)
+
+    def test_failure_cached(self):
+        """Test that a failure to get the list of resources is cached"""
+        self.mock_get.side_effect = APIError('IMS unavailable')
+        for _ in range(2):
+            with self.assertRaisesRegex(APIError, 'Failed to get IMS images: IMS unavailable'):
+                self.ims_client.get_matching_resources('image')
+        self.mock_get.assert_called_once_with('images')
+
+    def test_clear_resource_cache(self):
+        """Test clearing the cache of one type of resource"""
+        self.ims_client.get_matching_resources('image')
+        self.ims_client.get_image('id-4')
+        self.ims_client.clear_resource_cache(resource_type='image')
+        self.ims_client.get_matching_resources('image')
+        self.ims_client.get_image('id-4')
+        self.assertEqual(4, self.mock_get.call_count)
+
+    def test_invalidated_on_changes(self):
+        """Test that changes to images made through the client invalidate the cache"""
+        patch.object(IMSClient, 'post').start()
+        patch.object(IMSClient, 'delete').start()
+        for change in [lambda: self.ims_client.create_empty_image('new-image'),
+                       lambda: self.ims_client.delete_image('id-1'),
+                       lambda: self.ims_client.create_image_build_job('new-image', 'recipe', 'key')]:
+            self.ims_client.get_matching_resources('image')
+            self.mock_get.reset_mock()
+            change()
+            self.ims_client.get_matching_resources('image')
+            self.mock_get.assert_called_once_with('images')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,18 +25,74 @@
 Tests for VCS utility classes and functions.
 """
 
+import base64
 from textwrap import dedent
 import subprocess
+from threading import Barrier
 import unittest
-from unittest.mock import patch, PropertyMock
+from unittest.mock import MagicMock, patch, PropertyMock
 
-from sat.apiclient.vcs import VCSError, VCSRepo
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import MaxRetryError
+
+from sat.apiclient.vcs import (
+    REMOTE_REFS_CACHE,
+    VCS_PASSWORD_ENV_VAR,
+    VCSError,
+    VCSRepo,
+    get_vcs_password,
+    prefetch_remote_refs,
+)
+
+
+class TestGetVCSPassword(unittest.TestCase):
+    """Tests for the get_vcs_password function."""
+    def setUp(self):
+        patch('sat.apiclient.vcs._VCS_PASSWORD', None).start()
+        patch('sat.apiclient.vcs.get_kube_api_client').start()
+        self.mock_core_v1 = patch('sat.apiclient.vcs.CoreV1Api').start().return_value
+        self.mock_core_v1.read_namespaced_secret.return_value.data = {
+            'vcs_password': base64.b64encode(b'secret').decode()
+        }
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_get_vcs_password(self):
+        """Test that the password is decoded from the secret and only read once"""
+        self.assertEqual(get_vcs_password(), 'secret')
+        self.assertEqual(get_vcs_password(), 'secret')
+        self.mock_core_v1.read_namespaced_secret.assert_called_once_with(
+            'vcs-user-credentials', 'services'
+        )
+
+    def test_get_vcs_password_api_error(self):
+        """Test that an error reading the secret raises VCSError"""
+        self.mock_core_v1.read_namespaced_secret.side_effect = ApiException(status=404)
+        with self.assertRaisesRegex(VCSError, 'Unable to read VCS credentials'):
+            get_vcs_password()
+
+    def test_get_vcs_password_unreachable(self):
+        """Test that failing to connect to the Kubernetes API raises VCSError"""
+        self.mock_core_v1.read_namespaced_secret.side_effect = MaxRetryError(None, '/api/v1')
+        with self.assertRaisesRegex(VCSError, 'Unable to read VCS credentials'):
+            get_vcs_password()
+
+    def test_get_vcs_password_missing_key(self):
+        """Test that a secret without the password raises VCSError"""
+        self.mock_core_v1.read_namespaced_secret.return_value.data = {}
+        with self.assertRaisesRegex(VCSError, 'Unable to get VCS password'):
+            get_vcs_password()
 
 
 class TestVCSRepo(unittest.TestCase):
     """Tests for the VCSRepo class."""
     def setUp(self):
+        REMOTE_REFS_CACHE.clear()
+        self.addCleanup(REMOTE_REFS_CACHE.clear)
         self.mock_subprocess_run = patch('sat.apiclient.vcs.subprocess.run').start()
+        self.mock_subprocess_run.return_value.stdout = b''
+        patch('sat.apiclient.vcs.get_vcs_password', return_value='secret').start()
 
     def tearDown(self):
         patch.stopall()
@@ -68,6 +124,67 @@ class TestVCSRepo(unittest.TestCase):
         with self.assertRaises(VCSError):
             _ = repo.remote_refs
 
+    def test_password_passed_in_environment(self):
+        """Test that the VCS password is passed to git in the environment, not in the script"""
+        askpass_scripts = []
+
+        def read_askpass_script(*args, **kwargs):
+            with open(kwargs['env']['GIT_ASKPASS']) as f:
+                askpass_scripts.append(f.read())
+            return MagicMock(stdout=b'')
+
+        self.mock_subprocess_run.side_effect = read_askpass_script
+        _ = VCSRepo('foo/bar.git').remote_refs
+        self.assertEqual(self.mock_subprocess_run.call_args.kwargs['env'][VCS_PASSWORD_ENV_VAR],
+                         'secret')
+        self.assertNotIn('secret', askpass_scripts[0])
+
+    def test_remote_refs_cached(self):
+        """Test that remote refs are only queried once for the same repo"""
+        self.mock_subprocess_run.return_value.stdout = b'abc123\trefs/heads/main\n'
+        for _ in range(3):
+            self.assertEqual(VCSRepo('foo/bar.git').get_commit_hash_for_branch('main'), 'abc123')
+        self.mock_subprocess_run.assert_called_once()
+
+    def test_remote_refs_different_repos_not_shared(self):
+        """Test that remote refs are queried separately for different repos"""
+        _ = VCSRepo('foo/bar.git').remote_refs
+        _ = VCSRepo('foo/baz.git').remote_refs
+        self.assertEqual(self.mock_subprocess_run.call_count, 2)
+
+    def test_remote_refs_error_cached(self):
+        """Test that a failure to query a repo is raised again without querying it again"""
+        self.mock_subprocess_run.side_effect = subprocess.CalledProcessError(1, b'git ls-remote')
+        for _ in range(2):
+            with self.assertRaises(VCSError):
+                _ = VCSRepo('foo/bar.git').remote_refs
+        self.mock_subprocess_run.assert_called_once()
+
+    def test_prefetch_remote_refs_concurrently(self):
+        """Test that prefetch_remote_refs queries distinct repos at the same time"""
+        repo_urls = ['https://vcs/foo.git', 'https://vcs/bar.git', 'https://vcs/baz.git']
+        barrier = Barrier(len(repo_urls), timeout=5)
+
+        def wait_for_all(*args, **kwargs):
+            barrier.wait()
+            return MagicMock(stdout=b'abc123\trefs/heads/main\n')
+
+        self.mock_subprocess_run.side_effect = wait_for_all
+        prefetch_remote_refs(repo_urls + repo_urls)
+        self.assertEqual(self.mock_subprocess_run.call_count, len(repo_urls))
+
+        for url in repo_urls:
+            self.assertEqual(VCSRepo(url).get_commit_hash_for_branch('main'), 'abc123')
+        self.assertEqual(self.mock_subprocess_run.call_count, len(repo_urls))
+
+    def test_prefetch_remote_refs_error(self):
+        """Test that prefetch_remote_refs does not raise errors until the refs are used"""
+        self.mock_subprocess_run.side_effect = subprocess.CalledProcessError(1, b'git ls-remote')
+        prefetch_remote_refs(['https://vcs/foo.git'])
+        with self.assertRaises(VCSError):
+            _ = VCSRepo('https://vcs/foo.git').remote_refs
+        self.mock_subprocess_run.assert_called_once()
+
     def test_getting_commit_hashes_for_versions(self):
         """Test getting a commit hash for the current version"""
         with patch('sat.apiclient.vcs.VCSRepo.remote_refs',
@@ -0,0 +1,172 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for sat.cli.bootprep.input.session_template
+"""
+import logging
+import unittest
+from unittest.mock import patch, Mock
+
+from sat.cli.bootprep.errors import InputItemValidateError
+from sat.cli.bootprep.input.session_template import (
+    InputSessionTemplate,
+    InputSessionTemplateCollection,
+    data_is_subset
+)
+
+
+class TestDataIsSubset(unittest.TestCase):
+    """Tests for the data_is_subset function"""
+
+    def test_equal_values(self):
+        """Test that equal values are subsets"""
+        self.assertTrue(data_is_subset('compute', 'compute'))
+        self.assertTrue(data_is_subset(['Compute'], ['Compute']))
+
+    def test_extra_keys(self):
+        """Test that existing data may have keys which are not in the data"""
+        self.assertTrue(data_is_subset({'cfs': {'configuration': 'compute'}},
+                                       {'cfs': {'configuration': 'compute', 'clone_url': ''},
+                                        'tenant': ''}))
+
+    def test_missing_key(self):
+        """Test that data with a key missing from the existing data is not a subset"""
+        self.assertFalse(data_is_subset({'enable_cfs': True}, {}))
+
+    def test_different_nested_value(self):
+        """Test that data with a different nested value is not a subset"""
+        self.assertFalse(data_is_subset({'cfs': {'configuration': 'compute'}},
+                                        {'cfs': {'configuration': 'edited'}}))
+
+    def test_dict_and_non_dict(self):
+        """Test that a dict is not a subset of a value which is not a dict"""
+        self.assertFalse(data_is_subset({'configuration': 'compute'}, 'compute'))
+
+
+class TestInputSessionTemplateMatchesExisting(unittest.TestCase):
+    """Tests for InputSessionTemplate.matches_existing_item"""
+
+    def setUp(self):
+        self.api_data = {
+            'cfs': {'configuration': 'compute-config'},
+            'enable_cfs': True,
+            'name': 'compute-template',
+            'boot_sets': {
+                'compute': {'etag': 'etag-1', 'path': 's3://boot-images/id/manifest.json',
+                            'type': 's3', 'node_roles_groups': ['Compute']}
+            }
+        }
+        self.existing_template = {
+            'cfs': {'configuration': 'compute-config'},
+            'enable_cfs': True,
+            'name': 'compute-template',
+            'tenant': '',
+            'boot_sets': {
+                'compute': {'etag': 'etag-1', 'path': 's3://boot-images/id/manifest.json',
+                            'type': 's3', 'node_roles_groups': ['Compute'], 'arch': 'X86'}
+            }
+        }
+        self.mock_get_bos_api_data = patch.object(InputSessionTemplate, 'get_bos_api_data',
+                                                  return_value=self.api_data).start()
+        self.session_template = InputSessionTemplate({'name': 'compute-template'}, Mock(),
+                                                     Mock(), Mock(), Mock())
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_matches_existing(self):
+        """Test that a session template matches an existing one with extra properties"""
+        self.assertTrue(self.session_template.matches_existing_item(self.existing_template))
+
+    def test_image_rebuilt(self):
+        """Test that a session template does not match when the image etag differs"""
+        self.existing_template['boot_sets']['compute']['etag'] = 'etag-0'
+        self.assertFalse(self.session_template.matches_existing_item(self.existing_template))
+
+    def test_changed_outside_bootprep(self):
+        """Test that a session template does not match when its configuration was changed"""
+        self.existing_template['cfs']['configuration'] = 'other-config'
+        self.assertFalse(self.session_template.matches_existing_item(self.existing_template))
+
+    def test_extra_boot_set(self):
+        """Test that a session template does not match when the existing one has another boot set"""
+        self.existing_template['boot_sets']['uan'] = dict(self.existing_template['boot_sets']['compute'])
+        self.assertFalse(self.session_template.matches_existing_item(self.existing_template))
+
+    def test_image_not_found(self):
+        """Test that a session template does not match when its image cannot be found"""
+        self.mock_get_bos_api_data.side_effect = InputItemValidateError('no image')
+        self.assertFalse(self.session_template.matches_existing_item(self.existing_template))
+
+
+class TestInputSessionTemplateCollectionExisting(unittest.TestCase):
+    """Tests for InputSessionTemplateCollection.handle_existing_items"""
+
+    def setUp(self):
+        self.bos_client = Mock()
+        self.bos_client.get_session_templates.return_value = [{'name': 'compute-template'}]
+        self.collection = InputSessionTemplateCollection(
+            [{'name': 'compute-template'}, {'name': 'uan-template'}],
+            Mock(), self.bos_client, Mock(), Mock()
+        )
+        self.mock_matches = patch.object(InputSessionTemplate, 'matches_existing_item',
+                                         return_value=True).start()
+        self.mock_pester = patch('sat.cli.bootprep.input.base.pester_choices',
+                                 return_value='overwrite').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_skip_unchanged(self):
+        """Test that an unchanged existing session template is skipped without prompting"""
+        with self.assertLogs(level=logging.INFO) as logs_cm:
+            self.collection.handle_existing_items(False, False, False, skip_unchanged=True)
+
+        self.mock_matches.assert_called_once_with({'name': 'compute-template'})
+        self.mock_pester.assert_not_called()
+        self.assertEqual(['compute-template'], [item.name for item in self.collection.skipped_items])
+        self.assertEqual(['uan-template'], [item.name for item in self.collection.items_to_create])
+        self.assertIn('unchanged', logs_cm.records[0].message)
+
+    def test_changed_prompts(self):
+        """Test that a changed existing session template prompts the user"""
+        self.mock_matches.return_value = False
+        with self.assertLogs(level=logging.INFO):
+            self.collection.handle_existing_items(False, False, False, skip_unchanged=True)
+
+        self.mock_pester.assert_called_once()
+        self.assertEqual(['uan-template', 'compute-template'],
+                         [item.name for item in self.collection.items_to_create])
+
+    def test_unchanged_not_skipped_by_default(self):
+        """Test that existing session templates are not compared unless skip_unchanged is True"""
+        with self.assertLogs(level=logging.INFO):
+            self.collection.handle_existing_items(False, False, False)
+
+        self.mock_matches.assert_not_called()
+        self.mock_pester.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -28,14 +28,18 @@ from argparse import Namespace
 import logging
 import os
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, PropertyMock
 
 from sat.apiclient import APIError
 from sat.cli.bootprep.configuration import (
     create_configurations,
-    handle_existing_configs
+    handle_existing_configs,
+    layers_match,
+    prefetch_branch_refs,
+    remove_unchanged_configs
 )
 from sat.cli.bootprep.errors import ConfigurationCreateError
+from sat.cli.bootprep.state import CONFIGURATION_ITEM_TYPE, BootprepState, get_content_hash
 
 
 class TestHandleExistingConfigs(unittest.TestCase):
@@ -195,11 +199,147 @@ class TestHandleExistingConfigs(unittest.TestCase):
                          f'and would be skipped: {", ".join(self.cfs_config_names)}')
 
 
+class TestPrefetchBranchRefs(unittest.TestCase):
+    """Tests for the prefetch_branch_refs function"""
+
+    def setUp(self):
+        self.mock_prefetch = patch('sat.cli.bootprep.configuration.prefetch_remote_refs').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_prefetch_distinct_repos_with_branches(self):
+        """Test that each repo of a layer with a branch is prefetched once"""
+        input_configs = [
+            Mock(layers=[Mock(branch='main', clone_url='https://vcs/foo.git'),
+                         Mock(branch=None, clone_url='https://vcs/bar.git')]),
+            Mock(layers=[Mock(branch='integration', clone_url='https://vcs/foo.git'),
+                         Mock(branch='main', clone_url='https://vcs/baz.git')]),
+        ]
+        prefetch_branch_refs(input_configs)
+        self.mock_prefetch.assert_called_once_with({'https://vcs/foo.git', 'https://vcs/baz.git'})
+
+    def test_prefetch_skips_layer_without_clone_url(self):
+        """Test that a layer whose clone URL cannot be determined is skipped"""
+        bad_layer = Mock(branch='main')
+        type(bad_layer).clone_url = PropertyMock(side_effect=ConfigurationCreateError('no url'))
+        input_configs = [Mock(layers=[bad_layer, Mock(branch='main', clone_url='https://vcs/foo.git')])]
+        prefetch_branch_refs(input_configs)
+        self.mock_prefetch.assert_called_once_with({'https://vcs/foo.git'})
+
+    def test_no_prefetch_without_branches(self):
+        """Test that VCS is not queried when no layers have branches"""
+        prefetch_branch_refs([Mock(layers=[Mock(branch=None)])])
+        self.mock_prefetch.assert_not_called()
+
+
+class TestLayersMatch(unittest.TestCase):
+    """Tests for the layers_match function"""
+
+    def setUp(self):
+        self.input_layers = [
+            {'cloneUrl': 'https://api-gw-service-nmn.local/vcs/cray/cos-config-management.git',
+             'commit': 'abc123', 'name': 'cos', 'playbook': 'site.yml'},
+            {'cloneUrl': 'https://api-gw-service-nmn.local/vcs/cray/uan-config-management.git',
+             'branch': 'integration', 'name': 'uan', 'playbook': 'site.yml'}
+        ]
+        self.cfs_layers = [dict(layer) for layer in self.input_layers]
+        # CFS records the commit it resolved from the branch of a layer
+        self.cfs_layers[1]['commit'] = 'def456'
+
+    def test_layers_match(self):
+        """Test that layers match when CFS only adds the commit resolved from a branch"""
+        self.assertTrue(layers_match(self.cfs_layers, self.input_layers))
+
+    def test_layers_differ_in_commit(self):
+        """Test that layers do not match when the commit differs"""
+        self.cfs_layers[0]['commit'] = 'other'
+        self.assertFalse(layers_match(self.cfs_layers, self.input_layers))
+
+    def test_layers_differ_in_playbook(self):
+        """Test that layers do not match when a layer in CFS was edited"""
+        self.cfs_layers[1]['playbook'] = 'other.yml'
+        self.assertFalse(layers_match(self.cfs_layers, self.input_layers))
+
+    def test_layer_added_in_cfs(self):
+        """Test that layers do not match when CFS has an extra layer"""
+        self.cfs_layers.append(dict(self.input_layers[0]))
+        self.assertFalse(layers_match(self.cfs_layers, self.input_layers))
+
+    def test_layers_reordered(self):
+        """Test that layers do not match when their order differs"""
+        self.assertFalse(layers_match(list(reversed(self.cfs_layers)), self.input_layers))
+
+
+class TestRemoveUnchangedConfigs(unittest.TestCase):
+    """Tests for the remove_unchanged_configs function"""
+
+    def setUp(self):
+        self.cfs_client = Mock()
+        self.cfs_client.get_configurations.return_value = [
+            {'name': 'unchanged', 'layers': [{'cloneUrl': 'url', 'commit': 'unchanged-commit'}]},
+            {'name': 'changed', 'layers': [{'cloneUrl': 'url', 'commit': 'old-commit'}]}
+        ]
+        self.state = BootprepState('unused')
+        self.input_configs = []
+        for name in ('unchanged', 'changed', 'new'):
+            input_config = Mock()
+            input_config.name = name
+            input_config.get_cfs_api_data.return_value = {
+                'layers': [{'cloneUrl': 'url', 'commit': f'{name}-commit'}]
+            }
+            self.input_configs.append(input_config)
+
+    def test_remove_unchanged_configs(self):
+        """Test that configurations whose layers match CFS are removed"""
+        with self.assertLogs(level=logging.INFO) as cm:
+            remaining = remove_unchanged_configs(self.cfs_client, self.input_configs,
+                                                 self.state, False)
+
+        self.assertEqual([config.name for config in remaining], ['changed', 'new'])
+        self.assertIn('unchanged', cm.records[0].message)
+
+    def test_unchanged_config_hash_recorded(self):
+        """Test that the content hash of an unchanged configuration is recorded"""
+        remove_unchanged_configs(self.cfs_client, self.input_configs, self.state, False)
+        self.assertEqual(
+            get_content_hash({'layers': [{'cloneUrl': 'url', 'commit': 'unchanged-commit'}]}),
+            self.state.get_hash(CONFIGURATION_ITEM_TYPE, 'unchanged')
+        )
+        self.assertIsNone(self.state.get_hash(CONFIGURATION_ITEM_TYPE, 'changed'))
+
+    def test_config_changed_outside_bootprep(self):
+        """Test that a configuration changed in CFS is kept even if its recorded hash matches"""
+        self.state.record(CONFIGURATION_ITEM_TYPE, 'unchanged',
+                          get_content_hash(self.input_configs[0].get_cfs_api_data.return_value))
+        self.cfs_client.get_configurations.return_value[0]['layers'][0]['commit'] = 'edited'
+        remaining = remove_unchanged_configs(self.cfs_client, self.input_configs, self.state, False)
+        self.assertEqual(remaining, self.input_configs)
+
+    def test_unchanged_config_deleted_from_cfs(self):
+        """Test that a configuration which no longer exists in CFS is kept"""
+        self.cfs_client.get_configurations.return_value = []
+        remaining = remove_unchanged_configs(self.cfs_client, self.input_configs, self.state, False)
+        self.assertEqual(remaining, self.input_configs)
+
+    def test_cfs_api_data_failure(self):
+        """Test that a configuration whose data cannot be determined is kept"""
+        self.input_configs[0].get_cfs_api_data.side_effect = ConfigurationCreateError('VCS down')
+        remaining = remove_unchanged_configs(self.cfs_client, self.input_configs, self.state, False)
+        self.assertEqual(remaining, self.input_configs)
+
+    def test_cfs_query_failed(self):
+        """Test that a failure to query CFS raises ConfigurationCreateError"""
+        self.cfs_client.get_configurations.side_effect = APIError('CFS down')
+        with self.assertRaises(ConfigurationCreateError):
+            remove_unchanged_configs(self.cfs_client, self.input_configs, self.state, False)
+
+
 class TestCreateCFSConfigurations(unittest.TestCase):
     """Tests for the create_configurations function"""
 
     def setUp(self):
-        """Mock InputConfiguration, CFSClient, SATSession, open, json.dump; create args"""
+        """Mock InputConfiguration, CFSClient, open, json.dump; create args"""
 
         self.config_names = ['compute-1.4.2', 'uan-1.4.2']
         self.instance_data = {
@@ -211,11 +351,9 @@ class TestCreateCFSConfigurations(unittest.TestCase):
             mock_cfs_config = Mock()
             mock_cfs_config.name = config_name
             self.mock_cfs_configs.append(mock_cfs_config)
-        self.mock_instance = Mock(input_configurations=self.mock_cfs_configs)
-
-        self.mock_session = patch('sat.cli.bootprep.configuration.SATSession').start()
-        self.mock_cfs_client_cls = patch('sat.cli.bootprep.configuration.CFSClient').start()
-        self.mock_cfs_client = self.mock_cfs_client_cls.return_value
+        self.mock_cfs_client = Mock()
+        self.mock_instance = Mock(input_configurations=self.mock_cfs_configs,
+                                  cfs_client=self.mock_cfs_client)
 
         def mock_handle_existing(*args):
             """A mock handle_existing_configs that just returns all the input_configs"""
@@ -247,15 +385,8 @@ class TestCreateCFSConfigurations(unittest.TestCase):
         self.assertEqual(1, len(logs_cm.records))
         self.assertEqual('Given input did not define any CFS configurations',
                          logs_cm.records[0].message)
-        self.mock_session.assert_not_called()
-        self.mock_cfs_client_cls.assert_not_called()
         self.mock_handle_existing_configs.assert_not_called()
 
-    def assert_cfs_client_created(self):
-        """Helper to assert CFS client creation"""
-        self.mock_session.assert_called_once_with()
-        self.mock_cfs_client_cls.assert_called_once_with(self.mock_session.return_value)
-
     def assert_config_dumped_to_file(self, config):
         """Assert the given config was dumped to a file
 
@@ -306,7 +437,6 @@ class TestCreateCFSConfigurations(unittest.TestCase):
         with self.assertLogs(level=logging.INFO) as logs_cm:
             create_configurations(self.mock_instance, self.args)
 
-        self.assert_cfs_client_created()
         self.mock_handle_existing_configs.assert_called_once_with(
             self.mock_cfs_client, self.mock_cfs_configs, self.args
         )
@@ -318,6 +448,40 @@ class TestCreateCFSConfigurations(unittest.TestCase):
         ] + self.get_expected_info_logs(self.mock_cfs_configs)
         self.assertEqual(expected_logs, [rec.message for rec in logs_cm.records])
 
+    def test_create_cfs_configurations_skip_unchanged(self):
+        """Test create_configurations removes unchanged configurations when given a state"""
+        mock_remove_unchanged = patch('sat.cli.bootprep.configuration.remove_unchanged_configs',
+                                      return_value=self.mock_cfs_configs[1:]).start()
+        mock_state = Mock()
+        for config in self.mock_cfs_configs:
+            config.get_cfs_api_data.return_value = {'layers': []}
+        self.args.skip_unchanged = True
+        self.args.overwrite_configs = False
+
+        with self.assertLogs(level=logging.INFO):
+            create_configurations(self.mock_instance, self.args, mock_state)
+
+        mock_remove_unchanged.assert_called_once_with(self.mock_cfs_client, self.mock_cfs_configs,
+                                                      mock_state, False)
+        self.mock_handle_existing_configs.assert_called_once_with(
+            self.mock_cfs_client, self.mock_cfs_configs[1:], self.args
+        )
+
+    def test_create_cfs_configurations_overwrite_unchanged(self):
+        """Test create_configurations does not skip unchanged configurations when overwriting"""
+        mock_remove_unchanged = patch('sat.cli.bootprep.configuration.remove_unchanged_configs').start()
+        for config in self.mock_cfs_configs:
+            config.get_cfs_api_data.return_value = {'layers': []}
+        self.args.skip_unchanged = True
+        self.args.overwrite_configs = True
+
+        with self.assertLogs(level=logging.INFO):
+            create_configurations(self.mock_instance, self.args, Mock())
+
+        mock_remove_unchanged.assert_not_called()
+        for config in self.mock_cfs_configs:
+            self.assert_config_put_to_cfs(config)
+
     def test_create_cfs_configurations_one_cfs_data_failure(self):
         """Test create_configurations when one fails in its get_cfs_api_data method"""
         create_err = 'failed to get CFS API data'
@@ -328,7 +492,6 @@ class TestCreateCFSConfigurations(unittest.TestCase):
             with self.assertLogs(level=logging.INFO) as logs_cm:
                 create_configurations(self.mock_instance, self.args)
 
-        self.assert_cfs_client_created()
         self.mock_handle_existing_configs.assert_called_once_with(
             self.mock_cfs_client, self.mock_cfs_configs, self.args
         )
@@ -349,7 +512,6 @@ class TestCreateCFSConfigurations(unittest.TestCase):
         with self.assertLogs(level=logging.INFO) as logs_cm:
             create_configurations(self.mock_instance, self.args)
 
-        self.assert_cfs_client_created()
         self.mock_handle_existing_configs.assert_called_once_with(
             self.mock_cfs_client, self.mock_cfs_configs, self.args
         )
@@ -370,7 +532,6 @@ class TestCreateCFSConfigurations(unittest.TestCase):
         with self.assertLogs(level=logging.INFO) as logs_cm:
             create_configurations(self.mock_instance, self.args)
 
-        self.assert_cfs_client_created()
         self.mock_handle_existing_configs.assert_called_once_with(
             self.mock_cfs_client, self.mock_cfs_configs, self.args
         )
@@ -392,7 +553,6 @@ class TestCreateCFSConfigurations(unittest.TestCase):
             with self.assertLogs(level=logging.INFO) as logs_cm:
                 create_configurations(self.mock_instance, self.args)
 
-        self.assert_cfs_client_created()
         self.mock_handle_existing_configs.assert_called_once_with(
             self.mock_cfs_client, self.mock_cfs_configs, self.args
         )
@@ -28,11 +28,7 @@ import logging
 import unittest
 from unittest.mock import Mock, call, patch
 
-from cray_product_catalog.query import (
-    InstalledProductVersion,
-    ProductCatalog,
-    ProductCatalogError
-)
+from cray_product_catalog.query import InstalledProductVersion, ProductCatalogError
 
 from sat.cli.bootprep.example import (
     EXAMPLE_COS_CONFIG_NAME,
@@ -45,6 +41,7 @@ from sat.cli.bootprep.example import (
     get_example_images_and_templates,
     get_product_recipe_names,
 )
+from sat.product_catalog import ProductCatalogSnapshot
 
 
 def mpatch(path, *args, **kwargs):
@@ -68,7 +65,7 @@ class TestGetExampleInputConfigData(unittest.TestCase):
                           ExampleConfigLayer('analytics', branch, special_playbook)]
 
         err_msg = 'No installed products with name cpe.'
-        mock_product_catalog = Mock(spec=ProductCatalog)
+        mock_product_catalog = Mock(spec=ProductCatalogSnapshot)
         mock_product_catalog.get_product.side_effect = [
             Mock(spec=InstalledProductVersion, version=cos_version),
             ProductCatalogError(err_msg),
@@ -234,11 +231,11 @@ class TestGetExampleCOSAndUANImagesSessionTemplates(unittest.TestCase):
 class TestGetExampleCOSAndUANData(unittest.TestCase):
     """Test get_example_cos_and_uan_data."""
 
-    @mpatch('ProductCatalog')
+    @mpatch('get_product_catalog')
     @mpatch('get_example_cos_and_uan_configs')
     @mpatch('get_example_cos_and_uan_images_session_templates')
     def test_get_example_cos_and_uan_data(self, mock_get_images_st,
-                                          mock_get_configs, mock_product_catalog_cls):
+                                          mock_get_configs, mock_get_product_catalog):
         """Test get_example_cos_and_uan_data."""
         mock_image_data = Mock()
         mock_template_data = Mock()
@@ -252,7 +249,7 @@ class TestGetExampleCOSAndUANData(unittest.TestCase):
         example_data = get_example_cos_and_uan_data()
 
         self.assertEqual(expected_data, example_data)
-        mock_product_catalog = mock_product_catalog_cls.return_value
+        mock_product_catalog = mock_get_product_catalog.return_value
         mock_get_configs.assert_called_once_with(mock_product_catalog)
         mock_get_images_st.assert_called_once_with(mock_product_catalog)
 
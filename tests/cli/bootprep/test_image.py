@@ -0,0 +1,373 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for sat.cli.bootprep.image
+"""
+import logging
+import unittest
+from unittest.mock import Mock, patch
+
+from sat.apiclient import APIError
+from sat.cli.bootprep.errors import ImageCreateError
+from sat.cli.bootprep.image import (
+    ImageCreationGroupWaiter,
+    get_critical_path_lengths,
+    get_image_content_hashes,
+    remove_unchanged_images
+)
+from sat.cli.bootprep.state import CONFIGURATION_ITEM_TYPE, IMAGE_ITEM_TYPE, BootprepState
+from sat.waiting import DependencyGroupMember
+
+
+class FakeImage(DependencyGroupMember):
+    """A fake InputImage whose IMS job and CFS session are finished by the test"""
+
+    def __init__(self, name, base_is_recipe=True, configuration=None, base_name='base',
+                 base_id='base-id'):
+        super().__init__()
+        self.name = name
+        self.base_is_recipe = base_is_recipe
+        self.configuration = configuration
+        self.configuration_group_names = ['Compute'] if configuration else None
+        self.ims_data = {'is_recipe': base_is_recipe, 'name': base_name}
+        self.base_resource_type = ('image', 'recipe')[base_is_recipe]
+        self.base_id = base_id
+        self.build_started = False
+        self.build_done = False
+        self.configure_started = False
+        self.configure_done = False
+        self.configure_error = None
+        self.session_tracker = None
+
+    def __str__(self):
+        return f'image named {self.name}'
+
+    @property
+    def ims_base(self):
+        if self.base_id is None:
+            raise ImageCreateError(f'Found no matches for {self.ims_data["name"]}')
+        return {'id': self.base_id}
+
+    def begin_image_create(self):
+        self.build_started = True
+        if not self.base_is_recipe:
+            self.build_done = True
+
+    begin = begin_image_create
+
+    def begin_image_configure(self, session_tracker=None):
+        if self.configure_error:
+            raise ImageCreateError(self.configure_error)
+        self.configure_started = True
+        self.session_tracker = session_tracker
+
+    @property
+    def awaiting_image_configure(self):
+        return bool(self.build_done and self.configuration and not self.configure_started)
+
+    @property
+    def has_completed(self):
+        if not self.build_done:
+            return False
+        if self.configuration:
+            return self.configure_started and self.configure_done
+        return True
+
+    @property
+    def completed_successfully(self):
+        return True
+
+
+class TestGetCriticalPathLengths(unittest.TestCase):
+    """Tests for the get_critical_path_lengths function"""
+
+    def test_critical_path_lengths(self):
+        """Test that each image gets the length of its longest chain of dependents"""
+        base, middle, leaf, other_leaf, unrelated = [
+            FakeImage(name) for name in ('base', 'middle', 'leaf', 'other-leaf', 'unrelated')
+        ]
+        middle.add_dependency(base)
+        leaf.add_dependency(middle)
+        other_leaf.add_dependency(base)
+
+        lengths = get_critical_path_lengths([base, middle, leaf, other_leaf, unrelated])
+        self.assertEqual(
+            {image.name: length for image, length in lengths.items()},
+            {'base': 3, 'middle': 2, 'leaf': 1, 'other-leaf': 1, 'unrelated': 1}
+        )
+
+
+class TestImageContentHashes(unittest.TestCase):
+    """Tests for get_image_content_hashes and remove_unchanged_images"""
+
+    def setUp(self):
+        self.cfs_client = Mock()
+        self.cfs_client.get_configuration.return_value = {'layers': [{'commit': 'abc'}]}
+        self.state = BootprepState('unused')
+        self.state.record(CONFIGURATION_ITEM_TYPE, 'input-config', 'config-hash')
+
+    def get_hashes(self, images):
+        """Get content hashes of the given images by name"""
+        hashes = get_image_content_hashes(images, self.cfs_client, ['input-config'], self.state)
+        return {image.name: content_hash for image, content_hash in hashes.items()}
+
+    def test_hashes_stable(self):
+        """Test that the same images have the same content hashes"""
+        self.assertEqual(self.get_hashes([FakeImage('a', configuration='input-config')]),
+                         self.get_hashes([FakeImage('a', configuration='input-config')]))
+
+    def test_configuration_change_changes_dependents(self):
+        """Test that changing a configuration changes its image and images built from it"""
+        def get_images():
+            base = FakeImage('base-image', configuration='input-config')
+            derived = FakeImage('derived', base_is_recipe=False, base_name='base-image',
+                                configuration='external-config')
+            unrelated = FakeImage('unrelated')
+            return [base, derived, unrelated]
+
+        before = self.get_hashes(get_images())
+        self.state.record(CONFIGURATION_ITEM_TYPE, 'input-config', 'new-config-hash')
+        after = self.get_hashes(get_images())
+
+        self.assertNotEqual(before['base-image'], after['base-image'])
+        self.assertNotEqual(before['derived'], after['derived'])
+        self.assertEqual(before['unrelated'], after['unrelated'])
+
+    def test_base_id_change_changes_hash(self):
+        """Test that a different base recipe changes the content hash"""
+        self.assertNotEqual(self.get_hashes([FakeImage('a', base_id='recipe-1')]),
+                            self.get_hashes([FakeImage('a', base_id='recipe-2')]))
+
+    def test_unknown_hash(self):
+        """Test that images whose content cannot be determined have no content hash"""
+        self.cfs_client.get_configuration.side_effect = APIError('not found')
+        hashes = self.get_hashes([FakeImage('missing-base', base_id=None),
+                                  FakeImage('missing-config', configuration='external-config'),
+                                  FakeImage('recorded-config', configuration='input-config')])
+        self.assertIsNone(hashes['missing-base'])
+        self.assertIsNone(hashes['missing-config'])
+        self.assertIsNotNone(hashes['recorded-config'])
+
+    def test_remove_unchanged_images(self):
+        """Test that only images recorded with the same hash and existing in IMS are removed"""
+        images = [FakeImage(name) for name in ('unchanged', 'changed', 'deleted', 'new')]
+        hashes = get_image_content_hashes(images, self.cfs_client, [], self.state)
+        by_name = {image.name: image for image in images}
+        self.state.record(IMAGE_ITEM_TYPE, 'unchanged', hashes[by_name['unchanged']], id='id-1')
+        self.state.record(IMAGE_ITEM_TYPE, 'changed', 'old-hash', id='id-2')
+        self.state.record(IMAGE_ITEM_TYPE, 'deleted', hashes[by_name['deleted']], id='id-3')
+        ims_client = Mock()
+        ims_client.get_matching_resources.return_value = [
+            {'name': 'unchanged', 'id': 'id-1'},
+            {'name': 'changed', 'id': 'id-2'},
+            {'name': 'deleted', 'id': 'id-4'},
+        ]
+
+        with self.assertLogs(level=logging.INFO):
+            remaining = remove_unchanged_images(ims_client, images, hashes, self.state, False)
+
+        self.assertEqual([image.name for image in remaining], ['changed', 'deleted', 'new'])
+
+
+class TestImageCreationGroupWaiter(unittest.TestCase):
+    """Tests for the scheduling of images by ImageCreationGroupWaiter"""
+
+    def setUp(self):
+        self.mock_time = patch('sat.cli.bootprep.image.time.monotonic', return_value=0).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_build_slots_limited(self):
+        """Test that no more than the maximum number of builds run at once"""
+        images = [FakeImage(f'image-{i}') for i in range(5)]
+        waiter = ImageCreationGroupWaiter(images, 60, max_image_builds=2)
+        waiter.pre_wait_action()
+
+        self.assertEqual(sum(image.build_started for image in images), 2)
+        self.assertEqual(len(waiter.queued[waiter.BUILD_STAGE]), 3)
+
+        started = [image for image in images if image.build_started]
+        started[0].build_done = True
+        completed = waiter.members_have_completed(set(images))
+
+        self.assertEqual(completed, {started[0]})
+        self.assertEqual(sum(image.build_started for image in images), 3)
+        self.assertEqual(len(waiter.running[waiter.BUILD_STAGE]), 2)
+
+    def test_longest_chain_started_first(self):
+        """Test that images with the longest chain of dependents are built first"""
+        short = FakeImage('short')
+        long_base = FakeImage('long-base')
+        long_dependent = FakeImage('long-dependent')
+        long_dependent.add_dependency(long_base)
+
+        waiter = ImageCreationGroupWaiter([short, long_base, long_dependent], 60,
+                                          max_image_builds=1)
+        waiter.pre_wait_action()
+
+        self.assertTrue(long_base.build_started)
+        self.assertFalse(short.build_started)
+
+    def test_customization_slots_limited(self):
+        """Test that built images wait for a free slot for customization"""
+        images = [FakeImage(f'image-{i}', configuration='config') for i in range(3)]
+        waiter = ImageCreationGroupWaiter(images, 60, max_image_customizations=1)
+        waiter.pre_wait_action()
+
+        for image in images:
+            image.build_done = True
+        waiter.members_have_completed(set(images))
+
+        self.assertEqual(sum(image.configure_started for image in images), 1)
+        self.assertEqual(len(waiter.queued[waiter.CUSTOMIZE_STAGE]), 2)
+        self.assertFalse(waiter.running[waiter.BUILD_STAGE])
+
+    def test_image_base_skips_build_slot(self):
+        """Test that an image based on an existing image does not use a build slot"""
+        recipe_images = [FakeImage(f'recipe-{i}') for i in range(2)]
+        image_based = FakeImage('from-image', base_is_recipe=False)
+        waiter = ImageCreationGroupWaiter(recipe_images + [image_based], 60, max_image_builds=1)
+        waiter.pre_wait_action()
+
+        self.assertTrue(image_based.build_done)
+        self.assertEqual(waiter.members_have_completed(set(waiter.pending)), {image_based})
+
+    def test_customization_start_failure(self):
+        """Test that a failure to start customization fails the image and frees the slot"""
+        failing = FakeImage('failing', configuration='config')
+        failing.configure_error = 'CFS unavailable'
+        waiter = ImageCreationGroupWaiter([failing], 60)
+        waiter.pre_wait_action()
+        failing.build_done = True
+
+        with self.assertLogs(level=logging.ERROR):
+            completed = waiter.members_have_completed({failing})
+
+        self.assertEqual(completed, set())
+        self.assertEqual(waiter.failed, {failing})
+        self.assertFalse(waiter.running[waiter.CUSTOMIZE_STAGE])
+
+    def test_queue_and_run_times(self):
+        """Test that time spent waiting for slots is reported separately from run time"""
+        first, second = FakeImage('first'), FakeImage('second')
+        waiter = ImageCreationGroupWaiter([first, second], 60, max_image_builds=1)
+        waiter.pre_wait_action()
+        running, queued = (first, second) if first.build_started else (second, first)
+
+        self.mock_time.return_value = 100
+        running.build_done = True
+        waiter.members_have_completed({first, second})
+        self.mock_time.return_value = 250
+        queued.build_done = True
+        waiter.members_have_completed({queued})
+
+        self.assertEqual(waiter.get_queue_and_run_times(running), (0, 100))
+        self.assertEqual(waiter.get_queue_and_run_times(queued), (100, 150))
+
+    def test_session_tracker_updated_once_per_poll(self):
+        """Test that the session tracker is updated once per poll while images are customized"""
+        images = [FakeImage(f'image-{i}', configuration='config') for i in range(3)]
+        tracker = Mock()
+        waiter = ImageCreationGroupWaiter(images, 60, session_tracker=tracker)
+        waiter.pre_wait_action()
+        waiter.members_have_completed(set(images))
+        tracker.update.assert_not_called()
+
+        for image in images:
+            image.build_done = True
+        waiter.members_have_completed(set(images))
+        self.assertTrue(all(image.session_tracker is tracker for image in images))
+        waiter.members_have_completed(set(images))
+
+        tracker.update.assert_called_once_with()
+
+    def test_session_tracker_failure(self):
+        """Test that a failure to update the session tracker leaves the images being customized pending"""
+        building = FakeImage('building', configuration='config')
+        customizing = FakeImage('customizing', configuration='config')
+        tracker = Mock()
+        tracker.update.side_effect = APIError('CFS unavailable')
+        waiter = ImageCreationGroupWaiter([building, customizing], 60, session_tracker=tracker)
+        waiter.pre_wait_action()
+        customizing.build_done = True
+        waiter.members_have_completed({building, customizing})
+
+        with self.assertLogs(level=logging.WARNING) as logs_cm:
+            waiter.members_have_completed({building, customizing})
+
+        self.assertIn('will check again: CFS unavailable', logs_cm.records[0].message)
+        self.assertFalse(waiter.failed)
+        self.assertEqual(waiter.running[waiter.CUSTOMIZE_STAGE], {customizing})
+
+    def test_session_tracker_recovers(self):
+        """Test that the count of session tracker failures is reset when an update succeeds"""
+        customizing = FakeImage('customizing', configuration='config')
+        tracker = Mock()
+        waiter = ImageCreationGroupWaiter([customizing], 60, session_tracker=tracker)
+        waiter.pre_wait_action()
+        customizing.build_done = True
+        waiter.members_have_completed({customizing})
+        self.assertEqual(waiter.running[waiter.CUSTOMIZE_STAGE], {customizing})
+
+        tracker.update.side_effect = APIError('CFS unavailable')
+        with self.assertLogs(level=logging.WARNING):
+            for _ in range(waiter.MAX_SESSION_TRACKER_FAILURES - 1):
+                waiter.members_have_completed({customizing})
+        tracker.update.side_effect = None
+        waiter.members_have_completed({customizing})
+
+        self.assertEqual(waiter.session_tracker_failures, 0)
+        self.assertFalse(waiter.failed)
+
+    def test_session_tracker_repeated_failures(self):
+        """Test that repeated failures to update the session tracker fail the images being customized"""
+        building = FakeImage('building', configuration='config')
+        customizing = FakeImage('customizing', configuration='config')
+        tracker = Mock()
+        tracker.update.side_effect = APIError('CFS unavailable')
+        waiter = ImageCreationGroupWaiter([building, customizing], 60, session_tracker=tracker)
+        waiter.pre_wait_action()
+        customizing.build_done = True
+        waiter.members_have_completed({building, customizing})
+
+        with self.assertLogs(level=logging.WARNING):
+            for _ in range(waiter.MAX_SESSION_TRACKER_FAILURES - 1):
+                waiter.members_have_completed({building, customizing})
+        self.assertFalse(waiter.failed)
+
+        with self.assertLogs(level=logging.ERROR):
+            waiter.members_have_completed({building, customizing})
+
+        self.assertEqual(waiter.failed, {customizing})
+        self.assertFalse(waiter.running[waiter.CUSTOMIZE_STAGE])
+
+    def test_invalid_maximum(self):
+        """Test that a maximum less than one is rejected"""
+        with self.assertRaises(ValueError):
+            ImageCreationGroupWaiter([FakeImage('image')], 60, max_image_builds=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
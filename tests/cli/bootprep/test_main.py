@@ -114,7 +114,7 @@ class TestDoBootprepRun(unittest.TestCase):
                               overwrite_templates=self.overwrite_templates,
                               skip_existing_templates=self.skip_existing_templates, dry_run=self.dry_run,
                               view_input_schema=False, generate_schema_docs=False,
-                              bos_version='v1')
+                              bos_version='v1', skip_unchanged=True, resolve_branches=True)
         self.schema_file = 'schema.yaml'
         self.mock_validator_cls = MagicMock()
         self.mock_load_and_validate_instance = patch('sat.cli.bootprep.main.load_and_validate_instance').start()
@@ -128,9 +128,11 @@ class TestDoBootprepRun(unittest.TestCase):
         self.mock_create_configurations = patch('sat.cli.bootprep.main.create_configurations').start()
         self.mock_create_images = patch('sat.cli.bootprep.main.create_images').start()
         self.mock_session_templates = self.mock_input_instance.input_session_templates
-        self.mock_product_catalog_cls = patch('sat.cli.bootprep.main.ProductCatalog').start()
-        self.mock_product_catalog = self.mock_product_catalog_cls.return_value
+        self.mock_get_product_catalog = patch('sat.cli.bootprep.main.get_product_catalog').start()
+        self.mock_product_catalog = self.mock_get_product_catalog.return_value
         self.mock_request_dumper = patch('sat.cli.bootprep.main.RequestDumper').start()
+        self.mock_state = patch('sat.cli.bootprep.main.BootprepState.load').start().return_value
+        self.mock_prefetch_remote_data = patch('sat.cli.bootprep.main.prefetch_remote_data').start()
 
     def tearDown(self):
         patch.stopall()
@@ -145,14 +147,20 @@ class TestDoBootprepRun(unittest.TestCase):
         self.mock_input_instance_cls.assert_called_once_with(
             self.validated_data, self.mock_cfs_client, self.mock_ims_client,
             self.mock_bos_client, self.mock_product_catalog)
-        self.mock_create_configurations.assert_called_once_with(self.mock_input_instance, self.args)
-        self.mock_create_images.assert_called_once_with(self.mock_input_instance, self.args)
+        self.mock_prefetch_remote_data.assert_called_once_with(self.mock_input_instance,
+                                                               resolve_branches=True)
+        self.mock_create_configurations.assert_called_once_with(self.mock_input_instance, self.args,
+                                                                self.mock_state)
+        self.mock_create_images.assert_called_once_with(self.mock_input_instance, self.args,
+                                                        self.mock_state)
         self.mock_session_templates.handle_existing_items.assert_called_once_with(
-            self.overwrite_templates, self.skip_existing_templates, self.dry_run
+            self.overwrite_templates, self.skip_existing_templates, self.dry_run,
+            skip_unchanged=True
         )
         self.mock_session_templates.validate.assert_called_once_with(dry_run=self.dry_run)
         self.mock_session_templates.create_items.assert_called_once_with(
             dumper=self.mock_request_dumper.return_value)
+        self.assertEqual(self.mock_state.save.call_count, 2)
         info_msgs = [r.msg for r in cm.records]
         expected_msgs = [
             f'Validating given input file {self.input_file}',
@@ -160,6 +168,16 @@ class TestDoBootprepRun(unittest.TestCase):
         ]
         self.assertEqual(expected_msgs, info_msgs)
 
+    def test_do_bootprep_run_overwrite_templates(self):
+        """Test do_bootprep_run does not skip unchanged session templates when overwriting them"""
+        self.args.overwrite_templates = True
+        with self.assertLogs(level=logging.INFO):
+            do_bootprep_run(self.mock_validator_cls, self.args)
+
+        self.mock_session_templates.handle_existing_items.assert_called_once_with(
+            True, self.skip_existing_templates, self.dry_run, skip_unchanged=False
+        )
+
     def test_do_bootprep_run_validation_error(self):
         """Test do_bootprep_run when an error occurs loading the input file"""
         validation_err_msg = 'failed to load instance'
@@ -204,7 +222,9 @@ class TestDoBootprepRun(unittest.TestCase):
         self.mock_input_instance_cls.assert_called_once_with(
             self.validated_data, self.mock_cfs_client, self.mock_ims_client,
             self.mock_bos_client, self.mock_product_catalog)
-        self.mock_create_configurations.assert_called_once_with(self.mock_input_instance, self.args)
+        self.mock_create_configurations.assert_called_once_with(self.mock_input_instance, self.args,
+                                                                self.mock_state)
+        self.mock_state.save.assert_called_once_with()
         self.mock_create_images.assert_not_called()
         self.mock_session_templates.handle_existing_items.assert_not_called()
         self.mock_session_templates.validate.assert_not_called()
@@ -226,8 +246,11 @@ class TestDoBootprepRun(unittest.TestCase):
         self.mock_input_instance_cls.assert_called_once_with(
             self.validated_data, self.mock_cfs_client, self.mock_ims_client,
             self.mock_bos_client, self.mock_product_catalog)
-        self.mock_create_configurations.assert_called_once_with(self.mock_input_instance, self.args)
-        self.mock_create_images.assert_called_once_with(self.mock_input_instance, self.args)
+        self.mock_create_configurations.assert_called_once_with(self.mock_input_instance, self.args,
+                                                                self.mock_state)
+        self.mock_create_images.assert_called_once_with(self.mock_input_instance, self.args,
+                                                        self.mock_state)
+        self.assertEqual(self.mock_state.save.call_count, 2)
         self.mock_session_templates.handle_existing_items.assert_not_called()
         self.mock_session_templates.validate.assert_not_called()
         self.mock_session_templates.create_items.assert_not_called()
@@ -0,0 +1,103 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for sat.cli.bootprep.prefetch
+"""
+import logging
+from threading import Barrier
+import unittest
+from unittest.mock import Mock, patch
+
+from sat.apiclient import APIError
+from sat.cli.bootprep.prefetch import get_prefetch_functions, prefetch_remote_data
+
+
+class TestPrefetchRemoteData(unittest.TestCase):
+    """Tests for requesting the remote data referenced by an input instance"""
+
+    def setUp(self):
+        self.recipe_image = Mock(base_is_recipe=True, configuration='compute-config')
+        self.image_image = Mock(base_is_recipe=False, configuration=None)
+        self.instance = Mock(input_configurations=[Mock()],
+                             input_images=[self.recipe_image, self.image_image])
+        self.instance.input_session_templates.items = [Mock()]
+        self.mock_prefetch_branch_refs = patch('sat.cli.bootprep.prefetch.prefetch_branch_refs').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_all_services_requested(self):
+        """Test that IMS, CFS, and VCS are each requested once"""
+        prefetch_remote_data(self.instance)
+        self.instance.ims_client.get_matching_resources.assert_any_call('image')
+        self.instance.ims_client.get_matching_resources.assert_any_call('recipe')
+        self.assertEqual(2, self.instance.ims_client.get_matching_resources.call_count)
+        self.instance.cfs_client.get_configurations.assert_called_once_with()
+        self.mock_prefetch_branch_refs.assert_called_once_with(self.instance.input_configurations)
+
+    def test_requests_concurrent(self):
+        """Test that the requests to different services are made concurrently"""
+        # Each request waits for all the others, so this deadlocks unless they are concurrent
+        barrier = Barrier(4, timeout=5)
+        self.instance.ims_client.get_matching_resources.side_effect = lambda *args: barrier.wait()
+        self.instance.cfs_client.get_configurations.side_effect = barrier.wait
+        self.mock_prefetch_branch_refs.side_effect = lambda configs: barrier.wait()
+        prefetch_remote_data(self.instance)
+        self.assertFalse(barrier.broken)
+
+    def test_only_referenced_data_requested(self):
+        """Test that data which is not referenced by the input is not requested"""
+        self.instance.input_configurations = []
+        self.instance.input_images = [self.image_image]
+        self.instance.input_session_templates.items = []
+        self.assertEqual(['IMS images'],
+                         list(get_prefetch_functions(self.instance, resolve_branches=True)))
+
+    def test_no_branch_resolution(self):
+        """Test that VCS is not requested when branches are not resolved"""
+        prefetch_remote_data(self.instance, resolve_branches=False)
+        self.mock_prefetch_branch_refs.assert_not_called()
+
+    def test_empty_instance(self):
+        """Test that nothing is requested for an input without items"""
+        self.instance.input_configurations = []
+        self.instance.input_images = []
+        self.instance.input_session_templates.items = []
+        prefetch_remote_data(self.instance)
+        self.instance.ims_client.get_matching_resources.assert_not_called()
+        self.instance.cfs_client.get_configurations.assert_not_called()
+
+    def test_failures_ignored(self):
+        """Test that failed requests are logged and do not stop the others"""
+        self.instance.cfs_client.get_configurations.side_effect = APIError('CFS unavailable')
+        with self.assertLogs(level=logging.DEBUG) as logs_cm:
+            prefetch_remote_data(self.instance)
+        self.assertIn('Failed to request CFS configurations referenced by input file: CFS unavailable',
+                      [record.message for record in logs_cm.records])
+        self.assertEqual(2, self.instance.ims_client.get_matching_resources.call_count)
+        self.mock_prefetch_branch_refs.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for sat.cli.bootprep.state
+"""
+import json
+import logging
+import os
+from tempfile import TemporaryDirectory
+import unittest
+
+from sat.cli.bootprep.state import (
+    CONFIGURATION_ITEM_TYPE,
+    IMAGE_ITEM_TYPE,
+    STATE_FILE_VERSION,
+    BootprepState,
+    get_content_hash
+)
+
+
+class TestGetContentHash(unittest.TestCase):
+    """Tests for the get_content_hash function"""
+
+    def test_key_order_ignored(self):
+        """Test that the content hash does not depend on the order of keys"""
+        self.assertEqual(get_content_hash({'a': 1, 'b': [1, 2]}),
+                         get_content_hash({'b': [1, 2], 'a': 1}))
+
+    def test_content_changes_hash(self):
+        """Test that different content has a different content hash"""
+        self.assertNotEqual(get_content_hash({'commit': 'abc'}),
+                            get_content_hash({'commit': 'abd'}))
+
+
+class TestBootprepState(unittest.TestCase):
+    """Tests for the BootprepState class"""
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_path = os.path.join(self.temp_dir.name, 'bootprep', 'state.json')
+
+    def write_state_file(self, content):
+        """Write the given content to the state file"""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path, 'w') as f:
+            f.write(content)
+
+    def test_save_and_load(self):
+        """Test that recorded items are loaded after being saved"""
+        state = BootprepState(self.state_path)
+        state.record(CONFIGURATION_ITEM_TYPE, 'compute', 'hash1')
+        state.record(IMAGE_ITEM_TYPE, 'compute-image', 'hash2', id='image-id')
+        state.save()
+
+        loaded = BootprepState.load(self.state_path)
+        self.assertEqual(loaded.get_hash(CONFIGURATION_ITEM_TYPE, 'compute'), 'hash1')
+        self.assertEqual(loaded.get_record(IMAGE_ITEM_TYPE, 'compute-image'),
+                         {'hash': 'hash2', 'id': 'image-id'})
+        self.assertFalse(os.path.exists(f'{self.state_path}.tmp'))
+
+    def test_load_missing_file(self):
+        """Test that a missing state file results in an empty state"""
+        state = BootprepState.load(self.state_path)
+        self.assertEqual(state.items, {})
+
+    def test_load_invalid_file(self):
+        """Test that an invalid state file results in an empty state with a warning"""
+        self.write_state_file('not json')
+        with self.assertLogs(level=logging.WARNING):
+            state = BootprepState.load(self.state_path)
+        self.assertEqual(state.items, {})
+
+    def test_load_unsupported_version(self):
+        """Test that a state file with an unsupported version is ignored"""
+        self.write_state_file(json.dumps({'version': STATE_FILE_VERSION + 1,
+                                          'items': {IMAGE_ITEM_TYPE: {'a': {'hash': 'h'}}}}))
+        with self.assertLogs(level=logging.WARNING):
+            state = BootprepState.load(self.state_path)
+        self.assertEqual(state.items, {})
+
+    def test_save_failure(self):
+        """Test that a failure to save the state only logs a warning"""
+        self.write_state_file('')
+        state = BootprepState(os.path.join(self.state_path, 'state.json'))
+        with self.assertLogs(level=logging.WARNING):
+            state.save()
+
+    def test_is_unchanged(self):
+        """Test comparing content hashes with the recorded ones"""
+        state = BootprepState(self.state_path)
+        state.record(CONFIGURATION_ITEM_TYPE, 'compute', 'hash1')
+        self.assertTrue(state.is_unchanged(CONFIGURATION_ITEM_TYPE, 'compute', 'hash1'))
+        self.assertFalse(state.is_unchanged(CONFIGURATION_ITEM_TYPE, 'compute', 'hash2'))
+        self.assertFalse(state.is_unchanged(CONFIGURATION_ITEM_TYPE, 'uan', 'hash1'))
+        self.assertFalse(state.is_unchanged(CONFIGURATION_ITEM_TYPE, 'compute', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
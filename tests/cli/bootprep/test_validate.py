@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,6 +25,9 @@
 Unit tests for validation of bootprep input file based on the schema
 """
 from copy import deepcopy
+import os
+import shutil
+from tempfile import mkdtemp
 import unittest
 from unittest.mock import mock_open, patch, Mock
 
@@ -35,6 +38,7 @@ from sat.cli.bootprep.errors import (
 )
 from sat.cli.bootprep.validate import (
     load_and_validate_instance,
+    load_and_validate_schema,
     load_bootprep_schema,
     validate_instance
 )
@@ -160,7 +164,13 @@ class TestValidateInstance(ExtendedTestCase):
         This is only needed once for all tests in this class since these tests
         do not modify the schema_validator.
         """
-        cls.schema_validator = load_bootprep_schema()
+        cache_dir = mkdtemp()
+        try:
+            with patch('sat.cli.bootprep.validate.DEFAULT_SCHEMA_CACHE_FILE',
+                       os.path.join(cache_dir, 'bootprep-schema.json')):
+                cls.schema_validator = load_bootprep_schema()
+        finally:
+            shutil.rmtree(cache_dir)
 
     def assert_valid_instance(self, instance):
         """Helper assertion for asserting instance validates.
@@ -835,16 +845,38 @@ class TestValidateInstance(ExtendedTestCase):
                 ]
                 self.assert_invalid_instance(instance, expected_errs)
 
+    def test_max_errors(self):
+        """Test that validation stops after the maximum number of errors"""
+        instance = {'images': [{'name': name} for name in ('a', 'b', 'c', 'd')]}
+        with self.assertRaises(ValidationErrorCollection) as cm:
+            validate_instance(instance, self.schema_validator, max_errors=2)
+        self.assertEqual(2, len(cm.exception.errors))
+        self.assertTrue(cm.exception.truncated)
+        self.assertIn('Only the first 2 validation errors are shown.', str(cm.exception))
+
+    def test_max_errors_not_reached(self):
+        """Test that no note is added when all errors are reported"""
+        instance = {'images': [{'name': name} for name in ('a', 'b')]}
+        with self.assertRaises(ValidationErrorCollection) as cm:
+            validate_instance(instance, self.schema_validator, max_errors=2)
+        self.assertEqual(2, len(cm.exception.errors))
+        self.assertFalse(cm.exception.truncated)
+        self.assertNotIn('Only the first', str(cm.exception))
+
 
 class TestLoadBootprepSchema(unittest.TestCase):
     """Tests for the load_bootprep_schema function"""
 
     def setUp(self):
-        """Mock the pkgutil.get_data function"""
+        """Mock the pkgutil.get_data function and use a temporary schema cache file"""
         self.mock_get_data = patch('pkgutil.get_data').start()
+        self.cache_dir = mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'cache', 'bootprep-schema.json')
+        patch('sat.cli.bootprep.validate.DEFAULT_SCHEMA_CACHE_FILE', self.cache_path).start()
 
     def tearDown(self):
         patch.stopall()
+        shutil.rmtree(self.cache_dir)
 
     def test_unable_to_open_schema_file(self):
         """Test load_bootprep_schema when unable to open schema file"""
@@ -873,6 +905,7 @@ class TestLoadBootprepSchema(unittest.TestCase):
     @patch('sat.cli.bootprep.validate.safe_load')
     def test_bad_schema(self, mock_safe_load):
         """Test load_bootprep_schema when the schema file is invalid JSON Schema"""
+        self.mock_get_data.return_value = b'properties: [configurations, images, session_templates]'
         mock_safe_load.return_value = {
             'schema': 'https://json-schema.org/draft-07/schema',
             'type': 'object',
@@ -882,6 +915,24 @@ class TestLoadBootprepSchema(unittest.TestCase):
         err_regex = 'bootprep schema file is invalid'
         with self.assertRaisesRegex(BootPrepInternalError, err_regex):
             load_bootprep_schema()
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_schema_cached(self):
+        """Test that a checked schema is loaded from the cache by later calls"""
+        self.mock_get_data.return_value = b'type: object\nrequired: [images]\n'
+        load_bootprep_schema()
+        with patch('sat.cli.bootprep.validate.safe_load') as mock_safe_load:
+            contents, validator = load_and_validate_schema()
+        mock_safe_load.assert_not_called()
+        self.assertEqual(self.mock_get_data.return_value, contents)
+        self.assertEqual({'type': 'object', 'required': ['images']}, validator.schema)
+
+    def test_schema_changed(self):
+        """Test that the schema is loaded and checked again when the schema file changes"""
+        self.mock_get_data.return_value = b'type: object\n'
+        load_bootprep_schema()
+        self.mock_get_data.return_value = b'type: array\n'
+        self.assertEqual({'type': 'array'}, load_bootprep_schema().schema)
 
 
 class TestLoadAndValidateInstance(unittest.TestCase):
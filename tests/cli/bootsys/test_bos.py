@@ -28,21 +28,30 @@ Unit tests for the sat.cli.bootsys.bos module.
 from argparse import Namespace
 import logging
 import math
-import shlex
-import subprocess
 from textwrap import indent
 import unittest
-from unittest.mock import MagicMock, Mock, call, patch
+from unittest.mock import ANY, MagicMock, Mock, patch
 
+from kubernetes.client.rest import ApiException
+from kubernetes.config import ConfigException
+from urllib3.exceptions import ProtocolError
+
+from sat.apiclient import APIError
 from sat.cli.bootsys.bos import (
     BOSFailure,
     BOSLimitString,
-    BOSSessionThread,
-    BOSV2SessionWaiter,
+    BOSSession,
+    BOSSessionMonitor,
     boa_job_successful,
     do_bos_shutdowns,
-    get_session_templates
+    do_parallel_bos_operations,
+    get_active_template_sessions,
+    get_boa_job_conditions,
+    get_session_templates,
+    validate_bos_boots,
+    validate_bos_shutdowns
 )
+from sat.cli.bootsys.service_activity import ServiceCheckError
 from tests.common import ExtendedTestCase
 
 
@@ -61,38 +70,34 @@ class TestBOAJobSuccessful(ExtendedTestCase):
             'Boot Orchestration that are not expected to be '
             'recoverable through additional iterations.'
         )
-        self.get_pod_err = None
-        self.logs_err = None
-
-        def mock_kubectl_run(cmd, **kwargs):
-            """Mock running a kubectl command."""
-            retval = Mock()
-
-            # This is a 'kubectl get pod' command
-            if 'get' in cmd and 'pod' in cmd:
-                if self.get_pod_err:
-                    raise self.get_pod_err
-
-                retval.stdout = '\n'.join([
-                    '{}   0/2   Completed   0    1h'.format(boa_pod)
-                    for boa_pod in self.boa_pods
-                ])
 
-            # This is a 'kubectl logs' command
-            elif 'logs' in cmd:
-                if self.logs_err:
-                    raise self.logs_err
+        patch('sat.cli.bootsys.bos.get_kube_api_client').start()
+        self.mock_core_api = patch('sat.cli.bootsys.bos.CoreV1Api').start().return_value
 
-                retval.stdout = '\n'.join(self.boa_pod_logs)
+        # Return the pods newest first to check that the most recent one is used.
+        self.mock_core_api.list_namespaced_pod.side_effect = lambda *args, **kwargs: Mock(items=[
+            self.make_pod(name, i) for i, name in reversed(list(enumerate(self.boa_pods)))
+        ])
 
-            return retval
+        def mock_read_log(*args, **kwargs):
+            # Split the log into chunks which do not line up with line breaks.
+            log_bytes = '\n'.join(self.boa_pod_logs).encode()
+            return Mock(stream=Mock(return_value=[log_bytes[i:i + 7] for i in range(0, len(log_bytes), 7)]))
 
-        self.mock_run = patch('subprocess.run', side_effect=mock_kubectl_run).start()
+        self.mock_core_api.read_namespaced_pod_log.side_effect = mock_read_log
 
     def tearDown(self):
         """Stop all patches."""
         patch.stopall()
 
+    @staticmethod
+    def make_pod(name, creation_timestamp):
+        """Make a mock pod with the given name and creation timestamp."""
+        pod = Mock()
+        pod.metadata.name = name
+        pod.metadata.creation_timestamp = creation_timestamp
+        return pod
+
     def assert_boa_logs(self, logs):
         """Helper to assert boa pod lines are logged."""
         max_lines_to_log = 50
@@ -106,19 +111,12 @@ class TestBOAJobSuccessful(ExtendedTestCase):
     def test_successful_boa_job(self):
         """Test boa_job_successful on a successful BOA job."""
         self.assertTrue(boa_job_successful(self.boa_job_id))
-        common_kwargs = {
-            'stdout': subprocess.PIPE,
-            'stderr': subprocess.PIPE,
-            'check': True,
-            'encoding': 'utf-8'
-        }
-        self.mock_run.assert_has_calls([
-            call(shlex.split('kubectl -n services get pod --sort-by=.metadata.creationTimestamp '
-                             '--no-headers --selector job-name={}'.format(self.boa_job_id)),
-                 **common_kwargs),
-            call(shlex.split('kubectl -n services logs -c boa {}'.format(self.boa_pods[-1])),
-                 **common_kwargs)
-        ])
+        self.mock_core_api.list_namespaced_pod.assert_called_once_with(
+            'services', label_selector=f'job-name={self.boa_job_id}'
+        )
+        self.mock_core_api.read_namespaced_pod_log.assert_called_once_with(
+            self.boa_pods[-1], 'services', container='boa', _preload_content=False
+        )
 
     def test_successful_boa_job_empty_logs(self):
         """Test boa_job_successful with no boa pod logs."""
@@ -154,21 +152,21 @@ class TestBOAJobSuccessful(ExtendedTestCase):
             self.assertFalse(boa_job_successful(self.boa_job_id))
             self.assert_boa_logs(logs)
 
-    def test_kubectl_get_failure(self):
-        """Test boa_job_successful with 'kubectl get pod' failure."""
-        errs = [subprocess.CalledProcessError(1, 'cmd'), OSError('no such command')]
+    def test_list_pods_failure(self):
+        """Test boa_job_successful with a failure to list pods."""
+        errs = [ApiException(status=500), ConfigException('no config')]
         for err in errs:
             with self.subTest(err=err):
-                self.get_pod_err = err
+                self.mock_core_api.list_namespaced_pod.side_effect = err
                 with self.assertRaisesRegex(BOSFailure, 'failed to find pods'):
                     boa_job_successful(self.boa_job_id)
 
-    def test_kubectl_logs_failure(self):
-        """Test boa_job_successful with 'kubectl logs' failure."""
-        errs = [subprocess.CalledProcessError(1, 'cmd'), OSError('no such command')]
+    def test_read_logs_failure(self):
+        """Test boa_job_successful with a failure to read pod logs."""
+        errs = [ApiException(status=500), ProtocolError('connection broken')]
         for err in errs:
             with self.subTest(err=err):
-                self.logs_err = err
+                self.mock_core_api.read_namespaced_pod_log.side_effect = err
                 with self.assertRaisesRegex(BOSFailure, 'failed to get logs of pod '
                                                         '{}'.format(self.boa_pods[-1])):
                     boa_job_successful(self.boa_job_id)
@@ -231,94 +229,163 @@ class TestBOSLimitString(unittest.TestCase):
             BOSLimitString.from_string(blade_xname, recursive=False)
 
 
-class TestBOSV2SessionWaiter(unittest.TestCase):
-    """Test the BOSV2SessionWaiter class."""
+class TestGetBOAJobConditions(unittest.TestCase):
+    """Tests for the get_boa_job_conditions function."""
+
     def setUp(self):
-        self.session_id = 'abcdef-012345-678901-fdecba'
+        def make_job(name, conditions):
+            job = Mock()
+            job.metadata.name = name
+            job.status.conditions = [Mock(type=condition_type, status=status)
+                                     for condition_type, status in conditions] or None
+            return job
+
+        self.jobs = [
+            make_job('boa-complete', [('Complete', 'True')]),
+            make_job('boa-failed', [('Failed', 'True'), ('Complete', 'False')]),
+            make_job('boa-running', []),
+        ]
+        patch('sat.cli.bootsys.bos.get_kube_api_client').start()
+        self.mock_batch_api = patch('sat.cli.bootsys.bos.BatchV1Api').start().return_value
+        self.mock_batch_api.list_namespaced_job.return_value.items = self.jobs
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_get_boa_job_conditions(self):
+        """Test getting the conditions of all jobs with a single request."""
+        self.assertEqual({'boa-complete': {'Complete'}, 'boa-failed': {'Failed'}, 'boa-running': set()},
+                         get_boa_job_conditions())
+        self.mock_batch_api.list_namespaced_job.assert_called_once_with('services')
 
+    def test_get_boa_job_conditions_api_failure(self):
+        """Test getting the conditions of jobs when the Kubernetes API request fails."""
+        for err in [ApiException(status=500), ConfigException('no config')]:
+            with self.subTest(err=err):
+                self.mock_batch_api.list_namespaced_job.side_effect = err
+                with self.assertRaisesRegex(BOSFailure, 'Failed to get BOA jobs'):
+                    get_boa_job_conditions()
+
+
+class TestBOSSessionMonitor(ExtendedTestCase):
+    """Test the BOSSessionMonitor class."""
+    def setUp(self):
         self.mock_bos_client = MagicMock()
+        patch('sat.cli.bootsys.bos.BOSClientCommon.get_bos_client', return_value=self.mock_bos_client).start()
+        patch('sat.cli.bootsys.bos.SATSession').start()
+        self.bos_version = 'v2'
+        patch('sat.cli.bootsys.bos.get_config_value', side_effect=lambda _: self.bos_version).start()
+
+        self.bos_sessions = []
+        for template in ['cos', 'uan']:
+            bos_session = BOSSession(template, 'boot')
+            bos_session.session_id = f'{template}-session'
+            bos_session.boa_job_id = f'boa-{template}'
+            self.bos_sessions.append(bos_session)
+        self.cos_session, self.uan_session = self.bos_sessions
+
+        self.session_statuses = {'cos-session': 'running', 'uan-session': 'running'}
+        self.mock_bos_client.get_sessions.side_effect = lambda: [
+            {'name': name, 'status': {'status': status}} for name, status in self.session_statuses.items()
+        ]
+        self.mock_bos_client.get_components.return_value = []
         self.mock_bos_client.get_session_status.return_value = {
             'status': 'complete',
             'managed_components_count': 10,
-            'phases': {
-                'percent_complete': 100.0,
-                'percent_powering_on': 0.0,
-                'percent_powering_off': 0.0,
-                'percent_configuring': 0.0,
-            },
             'percent_successful': 100.0,
             'percent_failed': 0.0,
-            'percent_staged': 0.0,
             'error_summary': {},
-            'timing': {
-                'duration': '0:01:00',
-                'end_time': '2022-01-01T00:00:00',
-                'start_time': '2022-01-01T00:01:00',
-            },
         }
-        patch('sat.cli.bootsys.bos.BOSClientCommon.get_bos_client', return_value=self.mock_bos_client).start()
 
-        self.mock_session_thread = MagicMock(session_id=self.session_id)
-        self.mock_session_thread.stopped.return_value = False
-
-        self.waiter = BOSV2SessionWaiter(self.mock_session_thread, math.inf)
+        self.monitor = BOSSessionMonitor(self.bos_sessions, math.inf)
 
     def tearDown(self):
         patch.stopall()
 
-    def test_session_is_completed(self):
-        """Test that the waiter detects a completed session"""
-        self.assertTrue(self.waiter.has_completed())
-
-    def test_session_not_completed(self):
-        """Test that the waiter detects a session that has not completed yet"""
-        self.mock_bos_client.get_session_status.return_value.update({
-            'status': 'running',
-            'phases': {
-                'percent_complete': 50.0,
-                'percent_powering_on': 20.0,
-                'percent_powering_off': 0.0,
-                'percent_configuring': 30.0,
-            },
-            'percent_successful': 50.0,
-        })
-        self.assertFalse(self.waiter.has_completed())
-
-    def test_session_failed(self):
-        """Test that the waiter detects when a session has failed"""
-        self.mock_bos_client.get_session_status.return_value.update({
-            'status': 'running',
-            'phases': {
-                'percent_complete': 50.0,
-                'percent_powering_on': 20.0,
-                'percent_powering_off': 0.0,
-                'percent_configuring': 30.0,
-            },
-            'percent_successful': 50.0,
-            'percent_failed': 50.0,
-        })
-        self.assertFalse(self.waiter.has_completed())
-
-    def test_session_superceded(self):
-        """Test when the waiter's session has its managed components taken by another session"""
+    def test_v2_sessions_checked_together(self):
+        """Test that all sessions are checked with one listing of sessions and components."""
+        self.session_statuses['uan-session'] = 'complete'
+        self.assertEqual({self.uan_session}, self.monitor.members_have_completed(set(self.bos_sessions)))
+        self.mock_bos_client.get_sessions.assert_called_once_with()
+        self.mock_bos_client.get_components.assert_called_once_with()
+        self.mock_bos_client.get_session_status.assert_called_once_with('uan-session')
+
+    def test_v2_session_not_listed(self):
+        """Test that a session which is not yet listed by BOS is not complete."""
+        del self.session_statuses['cos-session']
+        self.assertEqual(set(), self.monitor.members_have_completed({self.cos_session}))
+
+    def test_v2_session_superseded(self):
+        """Test when a session has its managed components taken by another session"""
+        self.session_statuses['cos-session'] = 'complete'
         self.mock_bos_client.get_session_status.return_value.update({
-            'status': 'complete',
             'managed_components_count': 0,
-            'phases': {
-                'percent_complete': 0,
-                'percent_powering_on': 0,
-                'percent_powering_off': 0,
-                'percent_configuring': 0,
-            },
             'percent_successful': 0,
-            'percent_failed': 0,
         })
-        with self.assertLogs(level='WARNING'):
-            self.assertTrue(self.waiter.has_completed())
-
-
-class TestBOSSessionThread(unittest.TestCase):
-    """Test the BOSSessionThread class."""
+        with self.assertLogs(level=logging.WARNING):
+            self.assertEqual({self.cos_session}, self.monitor.members_have_completed({self.cos_session}))
+
+    def test_v2_component_progress(self):
+        """Test that changes in the number of succeeded and failed components are logged."""
+        self.mock_bos_client.get_components.return_value = [
+            {'id': 'x3000c0s1b0n0', 'session': 'cos-session', 'status': {'status': 'stable'}},
+            {'id': 'x3000c0s2b0n0', 'session': 'cos-session', 'status': {'status': 'failed'}},
+            {'id': 'x3000c0s3b0n0', 'session': 'cos-session', 'status': {'status': 'power_on_pending'}},
+            {'id': 'x3000c0s4b0n0', 'session': 'other-session', 'status': {'status': 'stable'}},
+        ]
+        with self.assertLogs(level=logging.INFO) as logs_cm:
+            self.monitor.members_have_completed(set(self.bos_sessions))
+        self.assert_in_element('Session cos-session: 1 components succeeded (+1), '
+                               '1 components failed (+1)', logs_cm.output)
+        self.assert_not_in_element('uan-session:', logs_cm.output)
+
+        self.mock_bos_client.get_components.return_value[2]['status']['status'] = 'stable'
+        with self.assertLogs(level=logging.INFO) as logs_cm:
+            self.monitor.members_have_completed(set(self.bos_sessions))
+        self.assert_in_element('Session cos-session: 2 components succeeded (+1), '
+                               '1 components failed (+0)', logs_cm.output)
+
+    def test_v2_query_failures(self):
+        """Test that sessions fail after the session listing fails too many times in a row."""
+        self.mock_bos_client.get_sessions.side_effect = APIError('service unavailable')
+        with self.assertLogs(level=logging.WARNING):
+            for _ in range(self.cos_session.max_consec_fails + 1):
+                self.assertEqual(set(), self.monitor.members_have_completed(set(self.bos_sessions)))
+        self.assertEqual(set(self.bos_sessions), self.monitor.failed)
+        self.assertIn('Aborting because session status query failed', self.cos_session.fail_msg)
+
+    def test_v2_wait_for_completion(self):
+        """Test waiting until all sessions complete."""
+        self.session_statuses = {'cos-session': 'complete', 'uan-session': 'complete'}
+        self.assertEqual(set(), self.monitor.wait_for_completion())
+        self.assertTrue(self.monitor.completed)
+
+    def test_v1_boa_jobs(self):
+        """Test checking BOS v1 sessions using the conditions of their BOA jobs."""
+        self.bos_version = 'v1'
+        self.monitor = BOSSessionMonitor(self.bos_sessions, math.inf)
+        with patch('sat.cli.bootsys.bos.get_boa_job_conditions',
+                   return_value={'boa-cos': {'Complete'}, 'boa-uan': {'Failed'}}) as mock_get_conditions, \
+                patch('sat.cli.bootsys.bos.boa_job_successful', return_value=True) as mock_successful:
+            with self.assertLogs(level=logging.ERROR):
+                self.assertEqual({self.cos_session}, self.monitor.members_have_completed(set(self.bos_sessions)))
+        mock_get_conditions.assert_called_once_with()
+        mock_successful.assert_called_once_with('boa-cos')
+        self.assertEqual({self.uan_session}, self.monitor.failed)
+
+    def test_v1_boa_job_unsuccessful(self):
+        """Test a BOS v1 session whose BOA job completed but was not successful."""
+        self.bos_version = 'v1'
+        self.monitor = BOSSessionMonitor(self.bos_sessions, math.inf)
+        with patch('sat.cli.bootsys.bos.get_boa_job_conditions', return_value={'boa-cos': {'Complete'}}), \
+                patch('sat.cli.bootsys.bos.boa_job_successful', return_value=False):
+            with self.assertLogs(level=logging.ERROR):
+                self.assertEqual(set(), self.monitor.members_have_completed(set(self.bos_sessions)))
+        self.assertEqual({self.cos_session}, self.monitor.failed)
+
+
+class TestBOSSession(unittest.TestCase):
+    """Test the BOSSession class."""
 
     def setUp(self):
         """Set up some mocks."""
@@ -341,70 +408,113 @@ class TestBOSSessionThread(unittest.TestCase):
         }
         self.mock_bos_client.create_session.return_value.json.return_value = self.mock_create_response
 
-        self.mock_check_interval = patch(
-            'sat.cli.bootsys.bos.PARALLEL_CHECK_INTERVAL', 3).start()
-
     def tearDown(self):
         """Stop all patches."""
         patch.stopall()
 
     def test_init(self):
-        """Test creation of a BOSSessionThread."""
+        """Test creation of a BOSSession."""
         session_template = 'cle-1.3.0'
         operation = 'shutdown'
 
-        bos_thread = BOSSessionThread(session_template, operation)
-
-        self.assertEqual(session_template, bos_thread.session_template)
-        self.assertEqual(operation, bos_thread.operation)
-        self.assertEqual(False, bos_thread.complete)
-        self.assertEqual(False, bos_thread.failed)
-        self.assertEqual('', bos_thread.fail_msg)
-        self.assertEqual(None, bos_thread.session_id)
-        self.assertEqual(None, bos_thread.boa_job_id)
-        self.assertEqual(3, bos_thread.max_consec_fails)
-        self.assertEqual(0, bos_thread.consec_stat_fails)
-        self.assertEqual(self.mock_check_interval, bos_thread.check_interval)
-        self.assertFalse(bos_thread.stopped())
-
-    def test_stop(self):
-        """Test stop method of BOSSessionThread."""
-        bos_thread = BOSSessionThread('cle-1.3.0', 'boot')
-        self.assertFalse(bos_thread.stopped())
-        bos_thread.stop()
-        self.assertTrue(bos_thread.stopped())
+        bos_session = BOSSession(session_template, operation)
+
+        self.assertEqual(session_template, bos_session.session_template)
+        self.assertEqual(operation, bos_session.operation)
+        self.assertEqual(False, bos_session.complete)
+        self.assertEqual(False, bos_session.failed)
+        self.assertEqual('', bos_session.fail_msg)
+        self.assertEqual(None, bos_session.session_id)
+        self.assertEqual(None, bos_session.boa_job_id)
+        self.assertEqual(3, bos_session.max_consec_fails)
+        self.assertEqual(0, bos_session.consec_stat_fails)
 
     def test_mark_failed(self):
-        """Test mark_failed method of BOSSessionThread."""
+        """Test mark_failed method of BOSSession."""
         session_template = 'uan'
-        bos_thread = BOSSessionThread(session_template, 'boot')
+        bos_session = BOSSession(session_template, 'boot')
         fail_msg = 'the bos session failed'
-        bos_thread.mark_failed(fail_msg)
-        self.assertTrue(bos_thread.failed)
-        self.assertTrue(bos_thread.complete)
-        self.assertEqual(fail_msg, bos_thread.fail_msg)
+        bos_session.mark_failed(fail_msg)
+        self.assertTrue(bos_session.failed)
+        self.assertTrue(bos_session.complete)
+        self.assertEqual(fail_msg, bos_session.fail_msg)
 
     def test_record_stat_failure(self):
-        """Test record_stat_failure method of BOSSessionThread."""
-        bos_thread = BOSSessionThread('uan', 'shutdown')
-        with patch.object(bos_thread, 'mark_failed') as mock_mark_failed:
-            for _ in range(bos_thread.max_consec_fails):
-                bos_thread.record_stat_failure()
+        """Test record_stat_failure method of BOSSession."""
+        bos_session = BOSSession('uan', 'shutdown')
+        with patch.object(bos_session, 'mark_failed') as mock_mark_failed:
+            for _ in range(bos_session.max_consec_fails):
+                bos_session.record_stat_failure()
                 mock_mark_failed.assert_not_called()
 
-            bos_thread.record_stat_failure()
+            bos_session.record_stat_failure()
             mock_mark_failed.assert_called_once_with(
                 'Aborting because session status query failed {} times in a '
-                'row.'.format(bos_thread.max_consec_fails + 1)
+                'row.'.format(bos_session.max_consec_fails + 1)
             )
 
     def test_create_session(self):
-        """Test create_session method of BOSSessionThread."""
-        bos_thread = BOSSessionThread('cle-1.3.0', 'boot')
-        bos_thread.create_session()
-        self.assertEqual(self.mock_session_id, bos_thread.session_id)
+        """Test create_session method of BOSSession."""
+        bos_session = BOSSession('cle-1.3.0', 'boot')
+        bos_session.create_session()
+        self.assertEqual(self.mock_session_id, bos_session.session_id)
         self.assertEqual(self.mock_create_response['links'][0]['jobId'],
-                         bos_thread.boa_job_id)
+                         bos_session.boa_job_id)
+
+
+class TestDoParallelBOSOperations(ExtendedTestCase):
+    """Tests for the do_parallel_bos_operations function."""
+
+    def setUp(self):
+        self.mock_bos_session_cls = patch('sat.cli.bootsys.bos.BOSSession').start()
+        self.bos_sessions = {}
+
+        def make_bos_session(session_template, operation, limit=None):
+            bos_session = Mock(session_template=session_template, operation=operation, failed=False)
+            self.bos_sessions[session_template] = bos_session
+            return bos_session
+
+        self.mock_bos_session_cls.side_effect = make_bos_session
+        self.mock_monitor_cls = patch('sat.cli.bootsys.bos.BOSSessionMonitor').start()
+        self.mock_monitor = self.mock_monitor_cls.return_value
+        self.mock_monitor.failed = set()
+        self.mock_monitor.wait_for_completion.return_value = set()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_all_sessions_monitored_together(self):
+        """Test that all sessions are created and then monitored by one monitor."""
+        do_parallel_bos_operations(['cos', 'uan'], 'boot', 600)
+        for bos_session in self.bos_sessions.values():
+            bos_session.create_session.assert_called_once_with()
+        self.mock_monitor_cls.assert_called_once_with(list(self.bos_sessions.values()), 600)
+        self.mock_monitor.wait_for_completion.assert_called_once_with()
+
+    def test_session_creation_failed(self):
+        """Test that sessions which failed to be created are not monitored."""
+        self.mock_bos_session_cls.side_effect = lambda template, operation, limit=None: (
+            Mock(session_template=template, operation=operation, failed=(template == 'uan'))
+        )
+        with self.assertLogs(level=logging.ERROR):
+            with self.assertRaisesRegex(BOSFailure, 'Boot failed or timed out for session template: uan'):
+                do_parallel_bos_operations(['cos', 'uan'], 'boot', 600)
+        monitored_sessions = self.mock_monitor_cls.call_args.args[0]
+        self.assertEqual(['cos'], [bos_session.session_template for bos_session in monitored_sessions])
+
+    def test_sessions_failed_and_timed_out(self):
+        """Test that failed and timed out sessions are reported."""
+        def wait_for_completion():
+            self.mock_monitor.failed = {self.bos_sessions['cos']}
+            return {self.bos_sessions['uan']}
+
+        self.mock_monitor.wait_for_completion.side_effect = wait_for_completion
+        with self.assertLogs(level=logging.ERROR) as logs_cm:
+            with self.assertRaisesRegex(BOSFailure, 'Shutdown failed or timed out for session '
+                                                    'templates: cos, uan'):
+                do_parallel_bos_operations(['cos', 'uan', 'other'], 'shutdown', 600)
+        self.assert_in_element('BOS shutdown timed out after 600 seconds for session template: uan.',
+                               logs_cm.output)
 
 
 class TestGetSessionTemplates(ExtendedTestCase):
@@ -521,5 +631,99 @@ class TestDoBosShutdowns(ExtendedTestCase):
         self.mock_do_bos_ops.assert_called_once_with('shutdown', 60, limit=self.limit, recursive=False)
 
 
+class TestGetActiveTemplateSessions(unittest.TestCase):
+    """Tests for the get_active_template_sessions() function."""
+    def setUp(self):
+        self.bos_version = 'v2'
+        self.mock_get_config = patch('sat.cli.bootsys.bos.get_config_value',
+                                     side_effect=self.fake_get_config_value).start()
+        patch('sat.cli.bootsys.bos.SATSession').start()
+        self.mock_v1_checker_cls = patch('sat.cli.bootsys.bos.BOSV1ActivityChecker').start()
+        self.mock_v1_checker_cls.return_value.template_field_name = 'session_template_id'
+        self.mock_v2_checker_cls = patch('sat.cli.bootsys.bos.BOSV2ActivityChecker').start()
+        self.mock_v2_checker_cls.return_value.template_field_name = 'template_name'
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_get_config_value(self, option):
+        return {'bos.api_version': self.bos_version, 'bootsys.session_check_timeout': 120}[option]
+
+    def test_v2_sessions_for_templates(self):
+        """Test getting the active BOS v2 sessions for the session templates."""
+        sessions = [{'name': 'session-1', 'template_name': 'cos-template'},
+                    {'name': 'session-2', 'template_name': 'other-template'}]
+        self.mock_v2_checker_cls.return_value.get_active_sessions.return_value = sessions
+        self.assertEqual([sessions[0]], get_active_template_sessions(['cos-template', 'uan-template']))
+        self.mock_v2_checker_cls.assert_called_once_with(ANY, 120)
+        self.mock_v1_checker_cls.assert_not_called()
+
+    def test_v1_sessions_for_templates(self):
+        """Test getting the active BOS v1 sessions for the session templates."""
+        self.bos_version = 'v1'
+        sessions = [{'session_id': 'session-1', 'session_template_id': 'uan-template'}]
+        self.mock_v1_checker_cls.return_value.get_active_sessions.return_value = sessions
+        self.assertEqual(sessions, get_active_template_sessions(['cos-template', 'uan-template']))
+        self.mock_v2_checker_cls.assert_not_called()
+
+
+class TestValidateBosOperations(unittest.TestCase):
+    """Tests for the validate_bos_shutdowns() and validate_bos_boots() functions."""
+    def setUp(self):
+        self.session_templates = ['cos-template', 'uan-template']
+        self.mock_get_templates = patch('sat.cli.bootsys.bos.get_session_templates',
+                                        return_value=self.session_templates).start()
+        self.mock_get_active = patch('sat.cli.bootsys.bos.get_active_template_sessions',
+                                     return_value=[]).start()
+        self.mock_get_needing_op = patch('sat.cli.bootsys.bos.get_templates_needing_operation',
+                                         return_value=[]).start()
+        self.args = Namespace()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_shutdown_complete(self):
+        """Test that shutdown validation passes when no sessions are active and nodes are off."""
+        self.assertTrue(validate_bos_shutdowns(self.args))
+        self.mock_get_active.assert_called_once_with(self.session_templates)
+        self.mock_get_needing_op.assert_called_once_with(self.session_templates, 'shutdown')
+
+    def test_boot_complete(self):
+        """Test that boot validation passes when no sessions are active and nodes are ready."""
+        self.assertTrue(validate_bos_boots(self.args))
+        self.mock_get_needing_op.assert_called_once_with(self.session_templates, 'boot')
+
+    def test_active_sessions(self):
+        """Test that validation fails when BOS sessions for the templates are active."""
+        self.mock_get_active.return_value = [{'name': 'session-1', 'template_name': 'cos-template'}]
+        with self.assertLogs(level=logging.INFO) as logs_cm:
+            self.assertFalse(validate_bos_shutdowns(self.args))
+        self.assertIn('1 BOS session for the session templates is still active.',
+                      logs_cm.records[0].message)
+        self.mock_get_needing_op.assert_not_called()
+
+    def test_active_sessions_check_failed(self):
+        """Test that validation fails when active BOS sessions cannot be queried."""
+        self.mock_get_active.side_effect = ServiceCheckError('BOS unavailable')
+        with self.assertLogs(level=logging.WARNING):
+            self.assertFalse(validate_bos_shutdowns(self.args))
+        self.mock_get_needing_op.assert_not_called()
+
+    def test_templates_needing_operation(self):
+        """Test that validation fails when nodes are not in the expected state."""
+        self.mock_get_needing_op.return_value = ['uan-template']
+        with self.assertLogs(level=logging.INFO) as logs_cm:
+            self.assertFalse(validate_bos_boots(self.args))
+        self.assertIn("The 'boot' operation is still needed for session template: uan-template",
+                      logs_cm.records[0].message)
+
+    def test_no_session_templates(self):
+        """Test that validation fails when no session templates are specified."""
+        self.mock_get_templates.side_effect = BOSFailure('No BOS templates were specified.')
+        with self.assertLogs(level=logging.WARNING):
+            self.assertFalse(validate_bos_shutdowns(self.args))
+        self.mock_get_active.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -26,9 +26,16 @@ Unit tests for the sat.cli.bootsys.cabinet_power module.
 """
 
 from argparse import Namespace
+import logging
 from unittest.mock import patch
 
-from sat.cli.bootsys.cabinet_power import do_cabinets_power_off
+from sat.apiclient import APIError
+from sat.cli.bootsys.cabinet_power import (
+    do_cabinets_power_off,
+    validate_cabinets_powered_off,
+    validate_cabinets_powered_on
+)
+from sat.hms_discovery import HMSDiscoveryError
 
 from tests.common import ExtendedTestCase
 
@@ -69,3 +76,81 @@ class TestCabinetsPowerOff(ExtendedTestCase):
 
         self.mock_liquid_cooled.assert_called_once_with(self.args)
         self.mock_air_cooled.assert_called_once_with(self.args)
+
+
+class TestValidateCabinetsPower(ExtendedTestCase):
+    """Tests for the validate_cabinets_powered_off() and validate_cabinets_powered_on() functions."""
+    def setUp(self):
+        self.liquid_cooled_xnames = ['x1000c0r7b0', 'x1000c0s0b0', 'x1000c0']
+        self.mock_get_xnames = patch('sat.cli.bootsys.cabinet_power.get_xnames_for_power_action',
+                                     return_value=list(self.liquid_cooled_xnames)).start()
+        self.mock_hsm_client = patch('sat.cli.bootsys.cabinet_power.HSMClient').start().return_value
+        self.mock_hsm_client.get_component_xnames.side_effect = [
+            ['x3000c0s1b0n0', 'x3000c0s3b0n0'],
+            ['x3000c0s1b0n0']
+        ]
+        self.mock_capmc_client = patch('sat.cli.bootsys.cabinet_power.CAPMCClient').start().return_value
+        self.mock_cron_job = patch('sat.cli.bootsys.cabinet_power.HMSDiscoveryCronJob').start()
+        self.mock_cron_job.return_value.get_suspend_status.return_value = True
+        patch('sat.cli.bootsys.cabinet_power.SATSession').start()
+
+        self.args = Namespace()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_powered_off(self):
+        """Test that power off validation passes when discovery is suspended and components are off."""
+        self.mock_capmc_client.get_xnames_power_state.return_value = {
+            'off': self.liquid_cooled_xnames + ['x3000c0s3b0n0']
+        }
+        self.assertTrue(validate_cabinets_powered_off(self.args))
+        self.mock_capmc_client.get_xnames_power_state.assert_called_once_with(
+            self.liquid_cooled_xnames + ['x3000c0s3b0n0']
+        )
+
+    def test_powered_off_some_on(self):
+        """Test that power off validation fails when some components are on."""
+        self.mock_capmc_client.get_xnames_power_state.return_value = {
+            'off': self.liquid_cooled_xnames,
+            'on': ['x3000c0s3b0n0']
+        }
+        with self.assertLogs(level=logging.INFO) as logs_cm:
+            self.assertFalse(validate_cabinets_powered_off(self.args))
+        self.assert_in_element('The following components are not powered off: x3000c0s3b0n0',
+                               logs_cm.output)
+
+    def test_powered_off_discovery_resumed(self):
+        """Test that power off validation fails when discovery is not suspended."""
+        self.mock_cron_job.return_value.get_suspend_status.return_value = False
+        with self.assertLogs(level=logging.INFO):
+            self.assertFalse(validate_cabinets_powered_off(self.args))
+        self.mock_capmc_client.get_xnames_power_state.assert_not_called()
+
+    def test_powered_off_discovery_error(self):
+        """Test that power off validation fails when the discovery status cannot be queried."""
+        self.mock_cron_job.return_value.get_suspend_status.side_effect = HMSDiscoveryError('k8s unavailable')
+        with self.assertLogs(level=logging.WARNING):
+            self.assertFalse(validate_cabinets_powered_off(self.args))
+        self.mock_capmc_client.get_xnames_power_state.assert_not_called()
+
+    def test_powered_off_hsm_error(self):
+        """Test that power off validation fails when the components cannot be listed."""
+        self.mock_hsm_client.get_component_xnames.side_effect = APIError('HSM unavailable')
+        with self.assertLogs(level=logging.WARNING):
+            self.assertFalse(validate_cabinets_powered_off(self.args))
+        self.mock_capmc_client.get_xnames_power_state.assert_not_called()
+
+    def test_powered_on(self):
+        """Test that power on validation passes when discovery is resumed and components are on."""
+        self.mock_cron_job.return_value.get_suspend_status.return_value = False
+        self.mock_capmc_client.get_xnames_power_state.return_value = {'on': self.liquid_cooled_xnames}
+        self.assertTrue(validate_cabinets_powered_on(self.args))
+        self.mock_capmc_client.get_xnames_power_state.assert_called_once_with(self.liquid_cooled_xnames)
+
+    def test_powered_on_capmc_error(self):
+        """Test that power on validation fails when the power state cannot be queried."""
+        self.mock_cron_job.return_value.get_suspend_status.return_value = False
+        self.mock_capmc_client.get_xnames_power_state.side_effect = APIError('CAPMC unavailable')
+        with self.assertLogs(level=logging.WARNING):
+            self.assertFalse(validate_cabinets_powered_on(self.args))
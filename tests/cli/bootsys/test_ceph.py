@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -62,7 +62,8 @@ class TestCephWaiter(unittest.TestCase):
 
         self.mock_ssh_client = MagicMock()
         self.mock_ssh_client.exec_command.side_effect = mock_ceph_exec_command
-        patch('sat.cli.bootsys.ceph.get_ssh_client', return_value=self.mock_ssh_client).start()
+        self.mock_ssh_pool = patch('sat.cli.bootsys.ceph.get_ssh_connection_pool').start().return_value
+        self.mock_ssh_pool.get_client.return_value = self.mock_ssh_client
 
     def tearDown(self):
         patch.stopall()
@@ -81,23 +82,21 @@ class TestCephWaiter(unittest.TestCase):
     def test_ceph_restart_services(self):
         """Test that Ceph services can be restarted before retrying."""
         self.waiter.on_retry_action()
-        self.mock_ssh_client.connect.assert_has_calls([
-            call(host) for host in self.storage_hosts
-        ])
+        self.assertEqual(self.mock_ssh_pool.get_client.call_args_list,
+                         [call(host) for host in self.storage_hosts])
         self.mock_ssh_client.exec_command.assert_has_calls([
             call('cephadm ls'),
             call('systemctl restart "foo"')
         ])
-        self.mock_ssh_client.close.assert_called()
+        self.mock_ssh_client.close.assert_not_called()
 
     def test_ceph_restart_services_fails_on_ssh_connect(self):
         """Test that warnings are logged when service restart encounters SSH errors"""
         for exc in [SSHException, socket.error]:
-            self.mock_ssh_client.connect.side_effect = exc
+            self.mock_ssh_pool.get_client.side_effect = exc
             with self.assertLogs(level='WARNING'):
                 self.waiter.on_retry_action()
             self.mock_ssh_client.exec_command.assert_not_called()
-            self.mock_ssh_client.close.assert_called()
 
             self.mock_ssh_client.reset_mock()
 
@@ -106,7 +105,6 @@ class TestCephWaiter(unittest.TestCase):
         self.mock_ssh_client.exec_command.side_effect = partial(mock_ceph_exec_command, stderr=b'something went wrong')
         with self.assertLogs(level='WARNING'):
             self.waiter.on_retry_action()
-        self.mock_ssh_client.close.assert_called()
 
     def test_ceph_restart_fails_with_systemctl(self):
         """Test that warnings are logged when service restart fails from cephadm call"""
@@ -117,7 +115,6 @@ class TestCephWaiter(unittest.TestCase):
         self.mock_ssh_client.exec_command.side_effect = call_results
         with self.assertLogs(level='WARNING'):
             self.waiter.on_retry_action()
-        self.mock_ssh_client.close.assert_called()
 
 
 class TestToggleCephFreezeFlags(ExtendedTestCase):
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -43,8 +43,8 @@ class TestSaveEtcdSnapshotOnHost(unittest.TestCase):
     def setUp(self):
         """Set up some mocks."""
         self.hostname = 'ncn-m001'
-        self.mock_get_ssh_client = mock.patch('sat.cli.bootsys.etcd.get_ssh_client').start()
-        self.mock_ssh_client = self.mock_get_ssh_client.return_value
+        self.mock_ssh_pool = mock.patch('sat.cli.bootsys.etcd.get_ssh_connection_pool').start().return_value
+        self.mock_ssh_client = self.mock_ssh_pool.get_client.return_value
         # Whether the corresponding exec_command should raise SSHException
         self.systemctl_raises = False
         self.mkdir_raises = False
@@ -88,9 +88,8 @@ class TestSaveEtcdSnapshotOnHost(unittest.TestCase):
         mock.patch.stopall()
 
     def assert_ssh_client_connect(self):
-        """Assert the SSHClient was created and connected to the hostname."""
-        self.mock_get_ssh_client.assert_called_once_with()
-        self.mock_ssh_client.connect.assert_called_once_with(self.hostname)
+        """Assert an SSHClient connected to the hostname was obtained from the pool."""
+        self.mock_ssh_pool.get_client.assert_called_once_with(self.hostname)
 
     def assert_exec_commands(self):
         """Assert the appropriate exec_command calls were made on the SSHClient."""
@@ -116,7 +115,7 @@ class TestSaveEtcdSnapshotOnHost(unittest.TestCase):
 
     def test_save_etcd_snapshot_ssh_exception(self):
         """Test saving an etcd snapshot on a host when connect raises SSHException."""
-        self.mock_ssh_client.connect.side_effect = SSHException
+        self.mock_ssh_pool.get_client.side_effect = SSHException
 
         with self.assertRaisesRegex(EtcdSnapshotFailure, f'Failed to connect to {self.hostname}'):
             save_etcd_snapshot_on_host(self.hostname)
@@ -126,7 +125,7 @@ class TestSaveEtcdSnapshotOnHost(unittest.TestCase):
 
     def test_save_etcd_snapshot_socket_error(self):
         """Test saving an etcd snapshot on a host when connect raises a socket.error."""
-        self.mock_ssh_client.connect.side_effect = socket.error
+        self.mock_ssh_pool.get_client.side_effect = socket.error
 
         with self.assertRaisesRegex(EtcdSnapshotFailure, f'Failed to connect to {self.hostname}'):
             save_etcd_snapshot_on_host(self.hostname)
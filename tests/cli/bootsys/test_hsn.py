@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -27,6 +27,7 @@ Unit tests for the sat.cli.bootsys.hsn module.
 import unittest
 from unittest.mock import patch
 
+from sat.apiclient import APIError
 from sat.cli.bootsys.hsn import HSNBringupWaiter, HSNPort
 from sat.cli.bootsys.state_recorder import StateError
 
@@ -51,7 +52,7 @@ class TestHSNBringupWaiter(unittest.TestCase):
                 'x3000c0r24j16p1',  # exists, is disabled, was not present before shutdown
             ]
         }
-        self.mock_fabric_client.get_fabric_edge_ports_enabled_status.return_value = {
+        self.current_hsn_state = {
             'fabric-ports': {
                 'x3000c0r24j4p0': True,
                 'x3000c0r24j4p1': False,
@@ -65,6 +66,8 @@ class TestHSNBringupWaiter(unittest.TestCase):
                 'x3000c0r24j16p1': False
             }
         }
+        self.mock_fabric_client.get_port_set_enabled_status.side_effect = \
+            lambda port_set: self.current_hsn_state[port_set]
 
         mock_hsn_recorder_cls = patch('sat.cli.bootsys.hsn.HSNStateRecorder').start()
         self.mock_hsn_recorder = mock_hsn_recorder_cls.return_value
@@ -99,10 +102,62 @@ class TestHSNBringupWaiter(unittest.TestCase):
         self.assertEqual(self.mock_hsn_recorder, self.waiter.hsn_state_recorder)
         self.assertEqual({}, self.waiter.current_hsn_state)
 
-    def test_on_check_action(self):
-        """Test that on_check_action calls appropriate fabric client method."""
-        self.waiter.on_check_action()
-        self.mock_fabric_client.get_fabric_edge_ports_enabled_status.assert_called_once_with()
+    def update_current_hsn_state(self):
+        """Query the current state of all the ports through the waiter."""
+        self.waiter.members_have_completed({
+            HSNPort(port_set, port_xname)
+            for port_set, port_xnames in self.mock_fabric_client.get_fabric_edge_ports.return_value.items()
+            for port_xname in port_xnames
+        })
+
+    def test_members_have_completed(self):
+        """Test that members_have_completed queries each port set once and finds completed ports."""
+        self.waiter.pre_wait_action()
+        with self.assertLogs(level='INFO') as cm:
+            completed = self.waiter.members_have_completed(self.waiter.members)
+
+        self.assertEqual(
+            {HSNPort('fabric-ports', 'x3000c0r24j4p0'), HSNPort('fabric-ports', 'x3000c0r24j4p1'),
+             HSNPort('fabric-ports', 'x3000c0r24j8p1'), HSNPort('edge-ports', 'x3000c0r24j14p0')},
+            completed
+        )
+        self.assertEqual(2, self.mock_fabric_client.get_port_set_enabled_status.call_count)
+        self.mock_fabric_client.get_fabric_edge_ports_enabled_status.assert_not_called()
+        self.assertEqual(['INFO:sat.cli.bootsys.hsn:Port set fabric-ports: 3 of 4 ports up (75%)',
+                          'INFO:sat.cli.bootsys.hsn:Port set edge-ports: 1 of 4 ports up (25%)'],
+                         sorted(cm.output, reverse=True))
+
+    def test_members_have_completed_only_pending_port_sets(self):
+        """Test that only port sets with pending ports are queried."""
+        self.waiter.pre_wait_action()
+        pending = {HSNPort('edge-ports', 'x3000c0r24j14p1')}
+        with self.assertLogs(level='INFO'):
+            self.assertEqual(set(), self.waiter.members_have_completed(pending))
+        self.mock_fabric_client.get_port_set_enabled_status.assert_called_once_with('edge-ports')
+
+    def test_members_have_completed_progress_logged_on_change(self):
+        """Test that the progress of a port set is only logged when it changes."""
+        self.waiter.pre_wait_action()
+        pending = {HSNPort('edge-ports', 'x3000c0r24j14p1'), HSNPort('edge-ports', 'x3000c0r24j16p0'),
+                   HSNPort('edge-ports', 'x3000c0r24j16p1')}
+        with self.assertLogs(level='INFO') as cm:
+            self.waiter.members_have_completed(pending)
+            self.waiter.members_have_completed(pending)
+            self.current_hsn_state['edge-ports']['x3000c0r24j14p1'] = True
+            self.assertEqual({HSNPort('edge-ports', 'x3000c0r24j14p1')},
+                             self.waiter.members_have_completed(pending))
+
+        self.assertEqual(['INFO:sat.cli.bootsys.hsn:Port set edge-ports: 1 of 4 ports up (25%)',
+                          'INFO:sat.cli.bootsys.hsn:Port set edge-ports: 2 of 4 ports up (50%)'],
+                         cm.output)
+
+    def test_members_have_completed_api_error(self):
+        """Test that ports in a port set whose status cannot be queried are not completed."""
+        self.mock_fabric_client.get_port_set_enabled_status.side_effect = APIError('unavailable')
+        with self.assertLogs(level='WARNING') as cm:
+            self.update_current_hsn_state()
+        self.assertIn('Failed to get port status for port set', cm.output[0])
+        self.assertEqual({}, self.waiter.current_hsn_state)
 
     def test_stored_hsn_state(self):
         """Test that the stored_hsn_state gets its info from the HSNStateRecorder and caches itself."""
@@ -143,36 +198,36 @@ class TestHSNBringupWaiter(unittest.TestCase):
             HSNPort('edge-ports', 'x3000c0r24j14p0')
         ]
         # Have to call this to get self.waiter.current_hsn_state updated
-        self.waiter.on_check_action()
+        self.update_current_hsn_state()
         for port in ports:
             self.assertTrue(self.waiter.member_has_completed(port))
 
     def test_port_disabled_before_and_after(self):
         """Test that a disabled port that was disabled before shutdown is complete."""
-        self.waiter.on_check_action()
+        self.update_current_hsn_state()
         self.assertTrue(self.waiter.member_has_completed(HSNPort('fabric-ports', 'x3000c0r24j4p1')))
 
     def test_port_enabled_before_disabled_after(self):
         """Test that a disabled port that was enabled before shutdown is not complete."""
-        self.waiter.on_check_action()
+        self.update_current_hsn_state()
         self.assertFalse(self.waiter.member_has_completed(HSNPort('edge-ports', 'x3000c0r24j14p1')))
 
     def test_port_enabled_before_missing_after(self):
         """Test that a port that was enabled before shutdown, now missing status is not complete."""
-        self.waiter.on_check_action()
+        self.update_current_hsn_state()
         self.assertFalse(self.waiter.member_has_completed(HSNPort('fabric-ports', 'x3000c0r24j8p0')))
 
     def test_port_missing_before_enabled_after(self):
         """Test that a port that was missing before shutdown, enabled after is complete."""
-        self.waiter.on_check_action()
+        self.update_current_hsn_state()
         self.assertTrue(self.waiter.member_has_completed(HSNPort('fabric-ports', 'x3000c0r24j8p1')))
 
     def test_port_disabled_before_missing_after(self):
         """Test that a port that was disabled before shutdown, missing after is not complete."""
-        self.waiter.on_check_action()
+        self.update_current_hsn_state()
         self.assertFalse(self.waiter.member_has_completed(HSNPort('edge-ports', 'x3000c0r24j16p0')))
 
     def test_port_missing_before_disabled_after(self):
         """Test that a port that was missing before shutdown, disabled after is not complete."""
-        self.waiter.on_check_action()
+        self.update_current_hsn_state()
         self.assertFalse(self.waiter.member_has_completed(HSNPort('edge-ports', 'x3000c0r24j16p1')))
@@ -0,0 +1,142 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for the sat.cli.bootsys.ipmi_power module.
+"""
+import subprocess
+import unittest
+from unittest.mock import MagicMock, patch
+
+from sat.cli.bootsys.ipmi_power import IPMICommandResult, IPMIPowerClient
+
+
+class TestIPMIPowerClient(unittest.TestCase):
+    """Tests for the IPMIPowerClient class."""
+
+    def setUp(self):
+        self.mock_subprocess_run = patch('sat.cli.bootsys.ipmi_power.subprocess.run').start()
+        self.mock_subprocess_run.return_value = MagicMock(returncode=0, stdout='Chassis Power is on',
+                                                          stderr='')
+        self.mock_sleep = patch('sat.cli.bootsys.ipmi_power.time.sleep').start()
+        self.hosts = ['ncn-w001', 'ncn-w002', 'ncn-s001']
+        self.client = IPMIPowerClient('root', 'secret', timeout=5, retries=2, retry_delay=3)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_get_ipmi_command(self):
+        """Test that the ipmitool command line does not contain the password."""
+        self.assertEqual(
+            ['ipmitool', '-I', 'lanplus', '-U', 'root', '-E', '-H', 'ncn-w001-mgmt',
+             'chassis', 'power', 'status'],
+            self.client.get_ipmi_command('ncn-w001', 'chassis power status')
+        )
+
+    def test_run_command(self):
+        """Test running a successful ipmitool command passes the password in the environment."""
+        result = self.client.run_command('ncn-w001', 'chassis power status')
+
+        self.mock_subprocess_run.assert_called_once()
+        kwargs = self.mock_subprocess_run.call_args[1]
+        self.assertEqual(5, kwargs['timeout'])
+        self.assertEqual('secret', kwargs['env']['IPMITOOL_PASSWORD'])
+        self.assertEqual(('ncn-w001', 0, 'Chassis Power is on', ''),
+                         (result.host, result.returncode, result.stdout, result.stderr))
+        self.assertEqual(1, result.attempts)
+        self.mock_sleep.assert_not_called()
+
+    def test_run_command_retries_failures(self):
+        """Test that failed and timed out ipmitool commands are retried."""
+        self.mock_subprocess_run.side_effect = [
+            MagicMock(returncode=1, stdout='', stderr='Error: Unable to establish IPMI session'),
+            subprocess.TimeoutExpired('ipmitool', 5),
+            MagicMock(returncode=0, stdout='Chassis Power is off', stderr=''),
+        ]
+        result = self.client.run_command('ncn-w001', 'chassis power status')
+
+        self.assertEqual(0, result.returncode)
+        self.assertEqual('Chassis Power is off', result.stdout)
+        self.assertEqual(3, result.attempts)
+        self.assertEqual(2, self.mock_sleep.call_count)
+        self.mock_sleep.assert_called_with(3)
+
+    def test_run_command_retries_exhausted(self):
+        """Test that the last failure is returned when all retries fail."""
+        self.mock_subprocess_run.side_effect = subprocess.TimeoutExpired('ipmitool', 5)
+        result = self.client.run_command('ncn-w001', 'chassis power status')
+
+        self.assertIsNone(result.returncode)
+        self.assertEqual('timed out after 5 seconds', result.stderr)
+        self.assertEqual(3, result.attempts)
+        self.assertEqual(3, self.mock_subprocess_run.call_count)
+
+    def test_run_command_no_retries(self):
+        """Test that retries can be disabled for a single command."""
+        self.mock_subprocess_run.return_value.returncode = 1
+        result = self.client.run_command('ncn-w001', 'chassis power status', retries=0)
+
+        self.assertEqual(1, result.returncode)
+        self.mock_subprocess_run.assert_called_once()
+        self.mock_sleep.assert_not_called()
+
+    def test_run_command_missing_ipmitool(self):
+        """Test that an OSError from running ipmitool is not retried."""
+        self.mock_subprocess_run.side_effect = FileNotFoundError('ipmitool')
+        with self.assertRaises(OSError):
+            self.client.run_command('ncn-w001', 'chassis power status')
+        self.mock_subprocess_run.assert_called_once()
+
+    def test_run_command_on_hosts(self):
+        """Test running a command against many BMCs returns a result for each host."""
+        results = self.client.run_command_on_hosts(self.hosts, 'chassis power status')
+
+        self.assertEqual(set(self.hosts), set(results))
+        for host, result in results.items():
+            self.assertIsInstance(result, IPMICommandResult)
+            self.assertEqual(host, result.host)
+        self.assertEqual(len(self.hosts), self.mock_subprocess_run.call_count)
+
+    def test_run_command_on_no_hosts(self):
+        """Test running a command against no hosts does nothing."""
+        self.assertEqual({}, self.client.run_command_on_hosts([], 'chassis power status'))
+        self.mock_subprocess_run.assert_not_called()
+
+    def test_set_power_state(self):
+        """Test that set_power_state sends the power command to each host."""
+        self.client.set_power_state(self.hosts, 'off')
+        for host in self.hosts:
+            self.mock_subprocess_run.assert_any_call(
+                self.client.get_ipmi_command(host, 'chassis power off'),
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8',
+                timeout=5, env=unittest.mock.ANY
+            )
+
+    def test_invalid_max_workers(self):
+        """Test that max_workers must be at least one."""
+        with self.assertRaises(ValueError):
+            IPMIPowerClient('root', 'secret', max_workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the sat.cli.bootsys.journal module.
+"""
+from argparse import Namespace
+import json
+import os
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import patch
+
+from sat.cli.bootsys.journal import BootsysJournal, get_stage_inputs
+
+
+class TestGetStageInputs(unittest.TestCase):
+    """Tests for the get_stage_inputs function."""
+
+    def test_get_stage_inputs(self):
+        """Test that stage inputs include only the relevant arguments, with sets sorted."""
+        args = Namespace(excluded_ncns={'ncn-w003', 'ncn-w002'}, bos_templates=['cos', 'uan'],
+                         disruptive=True, stage='ncn-power')
+        inputs = get_stage_inputs(args)
+        self.assertEqual(['ncn-w002', 'ncn-w003'], inputs['excluded_ncns'])
+        self.assertEqual(['cos', 'uan'], inputs['bos_templates'])
+        self.assertIsNone(inputs['bos_limit'])
+        self.assertNotIn('disruptive', inputs)
+        self.assertNotIn('stage', inputs)
+        # The inputs must be stored in the journal as JSON
+        json.dumps(inputs)
+
+
+class TestBootsysJournal(unittest.TestCase):
+    """Tests for the BootsysJournal class."""
+
+    def setUp(self):
+        """Create a temporary directory for the journal."""
+        self.temp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'bootsys', 'journal.json')
+        self.inputs = {'excluded_ncns': ['ncn-w002']}
+        self.mock_timestamp = patch.object(BootsysJournal, '_get_timestamp',
+                                           return_value='2022-05-04T12:00:00').start()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        patch.stopall()
+        self.temp_dir.cleanup()
+
+    def test_new_journal(self):
+        """Test a journal which does not exist yet is empty."""
+        journal = BootsysJournal(self.path)
+        self.assertEqual({}, journal.entries)
+        self.assertIsNone(journal.get_completed_entry('shutdown', 'capture-state', self.inputs))
+
+    def test_record_stage(self):
+        """Test recording the start and completion of a stage."""
+        journal = BootsysJournal(self.path)
+        journal.record_start('shutdown', 'capture-state', self.inputs)
+        self.assertIsNone(BootsysJournal(self.path).get_completed_entry('shutdown', 'capture-state',
+                                                                        self.inputs))
+
+        journal.record_completion('shutdown', 'capture-state')
+        expected = {'inputs': self.inputs, 'started': '2022-05-04T12:00:00',
+                    'completed': '2022-05-04T12:00:00'}
+        self.assertEqual(expected, BootsysJournal(self.path).get_completed_entry('shutdown', 'capture-state',
+                                                                                 self.inputs))
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+    def test_different_inputs(self):
+        """Test that a stage which completed with different inputs is not considered completed."""
+        journal = BootsysJournal(self.path)
+        journal.record_start('boot', 'ncn-power', self.inputs)
+        journal.record_completion('boot', 'ncn-power')
+        with self.assertLogs(level='INFO') as logs_cm:
+            self.assertIsNone(journal.get_completed_entry('boot', 'ncn-power', {'excluded_ncns': []}))
+        self.assertEqual('Stage ncn-power of boot completed at 2022-05-04T12:00:00 with different '
+                         'options, so it will be run again.', logs_cm.records[0].message)
+
+    def test_other_action_cleared(self):
+        """Test that starting a stage of one action clears the stages of the other action."""
+        journal = BootsysJournal(self.path)
+        journal.record_start('shutdown', 'capture-state', self.inputs)
+        journal.record_completion('shutdown', 'capture-state')
+        journal.record_start('shutdown', 'session-checks', self.inputs)
+        journal.record_completion('shutdown', 'session-checks')
+        journal.record_start('boot', 'ncn-power', self.inputs)
+
+        reloaded = BootsysJournal(self.path)
+        self.assertEqual(['boot'], list(reloaded.entries))
+        self.assertIsNone(reloaded.get_completed_entry('shutdown', 'capture-state', self.inputs))
+
+    def test_same_action_kept(self):
+        """Test that starting a stage keeps the other stages of the same action."""
+        journal = BootsysJournal(self.path)
+        journal.record_start('shutdown', 'capture-state', self.inputs)
+        journal.record_completion('shutdown', 'capture-state')
+        journal.record_start('shutdown', 'session-checks', self.inputs)
+        self.assertIsNotNone(BootsysJournal(self.path).get_completed_entry('shutdown', 'capture-state',
+                                                                           self.inputs))
+
+    def test_invalid_journal(self):
+        """Test that a journal which is not valid JSON is ignored."""
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{"shutdown": ')
+        with self.assertLogs(level='WARNING'):
+            journal = BootsysJournal(self.path)
+        self.assertEqual({}, journal.entries)
+
+    def test_journal_not_object(self):
+        """Test that a journal which is not a JSON object is ignored."""
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            json.dump(['shutdown'], f)
+        with self.assertLogs(level='WARNING'):
+            journal = BootsysJournal(self.path)
+        self.assertEqual({}, journal.entries)
+
+    def test_write_failure(self):
+        """Test that failing to write the journal is only a warning."""
+        journal = BootsysJournal(self.path)
+        with patch('sat.cli.bootsys.journal.os.replace', side_effect=PermissionError('denied')):
+            with self.assertLogs(level='WARNING') as logs_cm:
+                journal.record_start('shutdown', 'capture-state', self.inputs)
+        self.assertEqual(f'Failed to write bootsys journal {self.path}: denied',
+                         logs_cm.records[0].message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -88,3 +88,41 @@ class TestK8sPodWaiter(unittest.TestCase):
 
         waiter = KubernetesPodStatusWaiter(self.timeout)
         self.assertFalse(waiter.member_has_completed(('galaxies', 'andromeda')))
+
+    def test_k8s_pod_waiter_watch_event_updates_status(self):
+        """Test that a watch event updates the phase of a pending pod"""
+        self.mock_k8s_api.return_value.list_pod_for_all_namespaces.return_value.items = [
+            generate_mock_pod('galaxies', 'm83', 'Pending')
+        ]
+        waiter = KubernetesPodStatusWaiter(self.timeout)
+        # Members are pending once waiting begins
+        waiter.pending = set(waiter.members)
+
+        self.assertTrue(waiter.handle_watch_event('MODIFIED', generate_mock_pod('galaxies', 'm83', 'Succeeded')))
+        self.assertEqual('Succeeded', waiter.k8s_pod_status['galaxies']['m83'])
+        self.assertTrue(waiter.member_has_completed(('galaxies', 'm83')))
+
+    def test_k8s_pod_waiter_watch_event_no_change(self):
+        """Test that a watch event which does not change the phase is not relevant"""
+        self.mock_k8s_api.return_value.list_pod_for_all_namespaces.return_value.items = [
+            generate_mock_pod('galaxies', 'm83', 'Pending')
+        ]
+        waiter = KubernetesPodStatusWaiter(self.timeout)
+        waiter.pending = set(waiter.members)
+        self.assertFalse(waiter.handle_watch_event('MODIFIED', generate_mock_pod('galaxies', 'm83', 'Pending')))
+
+    def test_k8s_pod_waiter_lists_pods_once_while_watching(self):
+        """Test that pods are not listed on every check while watching"""
+        mock_list_pods = self.mock_k8s_api.return_value.list_pod_for_all_namespaces
+        mock_list_pods.return_value.items = [generate_mock_pod('galaxies', 'm83', 'Pending')]
+        mock_list_pods.return_value.metadata.resource_version = '1234'
+        waiter = KubernetesPodStatusWaiter(self.timeout)
+
+        waiter.on_check_action()
+        mock_list_pods.assert_called_once_with()
+        self.assertEqual('1234', waiter.watch_resource_version)
+        self.assertEqual((mock_list_pods, (), {}), waiter.get_watch_source())
+
+        waiter.watching = False
+        waiter.on_check_action()
+        self.assertEqual(2, mock_list_pods.call_count)
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,9 +25,88 @@
 Unit tests for the sat.cli.bootsys.main module.
 """
 
+from argparse import Namespace
 import unittest
+from unittest.mock import Mock, patch
+
+from sat.cli.bootsys.main import do_bootsys
+
+
+class TestDoBootsysResume(unittest.TestCase):
+    """Tests for resuming stages in do_bootsys."""
+
+    def setUp(self):
+        """Set up mocks."""
+        self.mock_journal = patch('sat.cli.bootsys.main.BootsysJournal').start().return_value
+        self.mock_journal.get_completed_entry.return_value = None
+        self.stage_funcs = {
+            'do_state_capture': Mock(),
+            'validate_state_capture': Mock(return_value=True),
+            'do_service_activity_check': Mock(),
+        }
+        patch('sat.cli.bootsys.main.load_stage',
+              side_effect=lambda module, func: self.stage_funcs[func]).start()
+        self.args = Namespace(action='shutdown', stage='capture-state', list_stages=False,
+                              excluded_ncns=set(), resume=False)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_stage_recorded(self):
+        """Test that running a stage records its start and completion."""
+        do_bootsys(self.args)
+        self.stage_funcs['do_state_capture'].assert_called_once_with(self.args)
+        self.mock_journal.get_completed_entry.assert_not_called()
+        self.mock_journal.record_start.assert_called_once()
+        self.mock_journal.record_completion.assert_called_once_with('shutdown', 'capture-state')
+
+    def test_failed_stage_not_completed(self):
+        """Test that a stage which fails is not recorded as completed."""
+        self.stage_funcs['do_state_capture'].side_effect = SystemExit(1)
+        with self.assertRaises(SystemExit):
+            do_bootsys(self.args)
+        self.mock_journal.record_start.assert_called_once()
+        self.mock_journal.record_completion.assert_not_called()
+
+    def test_resume_not_completed(self):
+        """Test that resuming runs a stage which has not completed."""
+        self.args.resume = True
+        do_bootsys(self.args)
+        self.stage_funcs['do_state_capture'].assert_called_once_with(self.args)
+        self.mock_journal.record_completion.assert_called_once_with('shutdown', 'capture-state')
+
+    def test_resume_completed(self):
+        """Test that resuming skips a completed stage when its revalidation passes."""
+        self.args.resume = True
+        self.mock_journal.get_completed_entry.return_value = {'completed': '2022-05-04T12:00:00'}
+        with self.assertLogs(level='INFO') as logs_cm:
+            do_bootsys(self.args)
+        self.stage_funcs['validate_state_capture'].assert_called_once_with(self.args)
+        self.stage_funcs['do_state_capture'].assert_not_called()
+        self.mock_journal.record_start.assert_not_called()
+        self.assertEqual('Skipping stage capture-state of shutdown, which completed at '
+                         '2022-05-04T12:00:00.', logs_cm.records[-1].message)
+
+    def test_resume_revalidation_failed(self):
+        """Test that resuming runs a completed stage again when its revalidation fails."""
+        self.args.resume = True
+        self.mock_journal.get_completed_entry.return_value = {'completed': '2022-05-04T12:00:00'}
+        self.stage_funcs['validate_state_capture'].return_value = False
+        with self.assertLogs(level='INFO'):
+            do_bootsys(self.args)
+        self.stage_funcs['do_state_capture'].assert_called_once_with(self.args)
+        self.mock_journal.record_completion.assert_called_once_with('shutdown', 'capture-state')
+
+    def test_resume_completed_without_revalidation(self):
+        """Test that resuming skips a completed stage which has no revalidation."""
+        self.args.resume = True
+        self.args.stage = 'session-checks'
+        self.mock_journal.get_completed_entry.return_value = {'completed': '2022-05-04T12:00:00'}
+        with self.assertLogs(level='INFO'):
+            do_bootsys(self.args)
+        self.stage_funcs['do_service_activity_check'].assert_not_called()
+        self.stage_funcs['validate_state_capture'].assert_not_called()
 
-# TODO: tests for main
 
 if __name__ == '__main__':
     unittest.main()
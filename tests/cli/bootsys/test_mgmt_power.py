@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,16 +25,23 @@
 Tests for the sat.cli.bootsys.mgmt_power module.
 """
 from argparse import Namespace
+import logging
+import subprocess
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import call, MagicMock, patch
 
 from paramiko.ssh_exception import SSHException, NoValidConnectionsError
 
+from sat.cli.bootsys.ipmi_power import IPMI_COMMAND_RETRIES, IPMI_COMMAND_TIMEOUT
 from sat.cli.bootsys.mgmt_power import (
     do_power_off_ncns,
+    SSH_CONNECT_TIMEOUT,
     SSHAvailableWaiter,
     IPMIPowerStateWaiter,
+    start_shutdown,
+    validate_ncns_powered_on,
 )
+from sat.cli.bootsys.util import FatalBootsysError
 from sat.waiting import WaitingFailure
 
 
@@ -72,10 +79,36 @@ class TestSSHAvailableWaiter(unittest.TestCase):
             {('127.0.0.1', '22'): 'Something happened'})
         self.assertFalse(waiter.member_has_completed(self.members[0]))
 
+    def test_ssh_connect_timeout(self):
+        """Test the SSH waiter passes the per-member timeout to connect"""
+        waiter = SSHAvailableWaiter(self.members, self.timeout, member_timeout=5)
+        waiter.member_has_completed(self.members[0])
+        self.mock_ssh_client.connect.assert_called_once_with(self.members[0], timeout=5)
+
+    def test_ssh_concurrent_checks_use_separate_clients(self):
+        """Test the SSH waiter uses and closes a separate client per concurrent check"""
+        per_check_clients = [MagicMock() for _ in self.members]
+        self.mock_get_ssh_client.side_effect = [self.mock_ssh_client] + per_check_clients
+        waiter = SSHAvailableWaiter(self.members, self.timeout, max_workers=2)
+
+        self.assertEqual(set(self.members), waiter.members_have_completed(set(self.members)))
+        self.mock_ssh_client.connect.assert_not_called()
+        for client in per_check_clients:
+            client.connect.assert_called_once()
+            client.close.assert_called_once_with()
+
+    def test_ssh_serial_checks_use_shared_client(self):
+        """Test the SSH waiter reuses its client when checking hosts one at a time"""
+        waiter = SSHAvailableWaiter(self.members, self.timeout, max_workers=1)
+        self.assertEqual(set(self.members), waiter.members_have_completed(set(self.members)))
+        self.assertEqual(len(self.members), self.mock_ssh_client.connect.call_count)
+        self.mock_ssh_client.close.assert_not_called()
+
 
 class TestIPMIPowerStateWaiter(unittest.TestCase):
     def setUp(self):
-        self.mock_subprocess_run = patch('sat.cli.bootsys.mgmt_power.subprocess.run').start()
+        self.mock_subprocess_run = patch('sat.cli.bootsys.ipmi_power.subprocess.run').start()
+        patch('sat.cli.bootsys.ipmi_power.time.sleep').start()
         self.mock_subprocess_run.return_value.stdout = 'Chassis power is on'
         self.mock_subprocess_run.return_value.returncode = 0
         self.members = ['ncn-w002', 'ncn-s003', 'ncn-m001']
@@ -93,7 +126,35 @@ class TestIPMIPowerStateWaiter(unittest.TestCase):
                                       send_command=True)
 
         waiter.pre_wait_action()
-        self.mock_subprocess_run.assert_called()
+        self.assertEqual(len(self.members), self.mock_subprocess_run.call_count)
+        for member in self.members:
+            self.mock_subprocess_run.assert_any_call(
+                ['ipmitool', '-I', 'lanplus', '-U', self.username, '-E', '-H', f'{member}-mgmt',
+                 'chassis', 'power', 'on'],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8',
+                timeout=IPMI_COMMAND_TIMEOUT, env=unittest.mock.ANY
+            )
+
+    def test_sending_ipmi_commands_retries_failures(self):
+        """Test that a failed IPMI power command is retried and then logged"""
+        self.mock_subprocess_run.return_value.returncode = 1
+        self.mock_subprocess_run.return_value.stderr = 'Unable to establish session'
+        waiter = IPMIPowerStateWaiter(self.members[:1], 'on', self.timeout, self.username,
+                                      self.password, send_command=True)
+        with self.assertLogs(level='ERROR') as cm:
+            waiter.pre_wait_action()
+
+        self.assertEqual(IPMI_COMMAND_RETRIES + 1, self.mock_subprocess_run.call_count)
+        self.assertIn('Unable to establish session', cm.output[0])
+
+    def test_sending_ipmi_commands_no_ipmitool(self):
+        """Test that a missing ipmitool is logged when sending IPMI commands"""
+        self.mock_subprocess_run.side_effect = FileNotFoundError('No such file: ipmitool')
+        waiter = IPMIPowerStateWaiter(self.members, 'on', self.timeout, self.username, self.password,
+                                      send_command=True)
+        with self.assertLogs(level='ERROR') as cm:
+            waiter.pre_wait_action()
+        self.assertIn('Unable to find ipmitool', cm.output[0])
 
     def test_not_sending_ipmi_commands(self):
         """Test that the waiter does not sends IPMI commands if not desired"""
@@ -146,6 +207,80 @@ class TestIPMIPowerStateWaiter(unittest.TestCase):
             for _ in range(self.threshold):
                 waiter.member_has_completed(self.members[0])
 
+    def test_ipmi_command_timeout(self):
+        """Test that the ipmitool command is limited to the per-member timeout"""
+        waiter = IPMIPowerStateWaiter(self.members, 'on', self.timeout, self.username, self.password,
+                                      member_timeout=5)
+        waiter.member_has_completed(self.members[0])
+        self.assertEqual(5, self.mock_subprocess_run.call_args[1]['timeout'])
+
+    def test_ipmi_command_repeat_timeouts(self):
+        """Test that repeated ipmitool timeouts mark a member as failed."""
+        self.mock_subprocess_run.side_effect = subprocess.TimeoutExpired('ipmitool', 5)
+        waiter = IPMIPowerStateWaiter(self.members, 'on', self.timeout, self.username, self.password,
+                                      failure_threshold=self.threshold)
+        for _ in range(self.threshold - 1):
+            self.assertFalse(waiter.member_has_completed(self.members[0]))
+        with self.assertRaises(WaitingFailure):
+            waiter.member_has_completed(self.members[0])
+
+    def test_ipmi_members_checked_concurrently(self):
+        """Test that the IPMI waiter checks all members through its worker pool."""
+        waiter = IPMIPowerStateWaiter(self.members, 'on', self.timeout, self.username, self.password,
+                                      max_workers=3)
+        self.assertEqual(set(self.members), waiter.members_have_completed(set(self.members)))
+        self.assertEqual(len(self.members), self.mock_subprocess_run.call_count)
+
+    def test_ipmi_members_no_ipmitool(self):
+        """Test that all members are marked failed when ipmitool cannot be run."""
+        self.mock_subprocess_run.side_effect = FileNotFoundError('No such file: ipmitool')
+        waiter = IPMIPowerStateWaiter(self.members, 'on', self.timeout, self.username, self.password)
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(set(), waiter.members_have_completed(set(self.members)))
+        self.assertEqual(set(self.members), waiter.failed)
+
+    def test_ipmi_members_repeat_fails(self):
+        """Test that members which fail repeatedly are marked failed by the batch check."""
+        self.mock_subprocess_run.return_value.returncode = 1
+        waiter = IPMIPowerStateWaiter(self.members, 'on', self.timeout, self.username, self.password,
+                                      failure_threshold=self.threshold)
+        with self.assertLogs(level='WARNING'):
+            for _ in range(self.threshold):
+                self.assertEqual(set(), waiter.members_have_completed(set(self.members)))
+        self.assertEqual(set(self.members), waiter.failed)
+        # Status checks are not retried within a single poll.
+        self.assertEqual(self.threshold * len(self.members), self.mock_subprocess_run.call_count)
+
+
+class TestStartShutdown(unittest.TestCase):
+    """Tests for the start_shutdown() function"""
+    def setUp(self):
+        self.hosts = ['ncn-w002', 'ncn-s001']
+        self.mock_ssh_pool = patch('sat.cli.bootsys.mgmt_power.get_ssh_connection_pool').start().return_value
+        self.mock_ssh_client = self.mock_ssh_pool.get_client.return_value
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_start_shutdown(self):
+        """Test that the shutdown command is sent to each host and its connection closed."""
+        start_shutdown(self.hosts)
+        self.assertEqual([call(host) for host in self.hosts],
+                         self.mock_ssh_pool.get_client.call_args_list)
+        self.assertEqual([call('shutdown -h now')] * len(self.hosts),
+                         self.mock_ssh_client.exec_command.call_args_list)
+        self.assertEqual([call(host) for host in self.hosts],
+                         self.mock_ssh_pool.close_client.call_args_list)
+
+    def test_start_shutdown_connect_failure(self):
+        """Test that a failure to connect to a host does not stop other hosts being shut down."""
+        self.mock_ssh_pool.get_client.side_effect = [SSHException('ssh failed'), self.mock_ssh_client]
+        with self.assertLogs(level=logging.WARNING) as logs_cm:
+            start_shutdown(self.hosts)
+        self.assertEqual(['Unable to connect to host "ncn-w002": ssh failed'],
+                         [record.getMessage() for record in logs_cm.records])
+        self.mock_ssh_client.exec_command.assert_called_once_with('shutdown -h now')
+
 
 class TestDoPowerOffNcns(unittest.TestCase):
     """Tests for the do_power_off_ncns() function"""
@@ -153,7 +288,6 @@ class TestDoPowerOffNcns(unittest.TestCase):
         self.mock_get_user_pass = patch('sat.cli.bootsys.mgmt_power.get_username_and_password_interactively').start()
         self.mock_get_user_pass.return_value = ('user', 'pass')
 
-        self.mock_get_ssh_client = patch('sat.cli.bootsys.mgmt_power.get_ssh_client').start()
         self.mock_prompt_continue = patch('sat.cli.bootsys.mgmt_power.prompt_continue').start()
         self.mock_do_mgmt_shutdown_power = patch('sat.cli.bootsys.mgmt_power.do_mgmt_shutdown_power').start()
 
@@ -174,3 +308,45 @@ class TestDoPowerOffNcns(unittest.TestCase):
         do_power_off_ncns(self.args)
         self.mock_prompt_continue.assert_not_called()
         self.mock_do_mgmt_shutdown_power.assert_called_once()
+
+
+class TestValidateNcnsPoweredOn(unittest.TestCase):
+    """Tests for the validate_ncns_powered_on() function"""
+    def setUp(self):
+        self.ncn_groups = {
+            'managers': ['ncn-m002', 'ncn-m003'],
+            'storage': ['ncn-s001'],
+            'workers': ['ncn-w001'],
+        }
+        self.mock_get_mgmt_ncn_groups = patch('sat.cli.bootsys.mgmt_power.get_mgmt_ncn_groups').start()
+        self.mock_get_mgmt_ncn_groups.return_value = (self.ncn_groups, {})
+        self.mock_ssh_waiter_cls = patch('sat.cli.bootsys.mgmt_power.SSHAvailableWaiter').start()
+        self.mock_ssh_waiter = self.mock_ssh_waiter_cls.return_value
+        self.mock_ssh_waiter.wait_for_completion.return_value = set()
+        self.args = Namespace(excluded_ncns={'ncn-w002'})
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_all_accessible(self):
+        """Test that validation passes when all NCNs are accessible via SSH."""
+        self.assertTrue(validate_ncns_powered_on(self.args))
+        self.mock_get_mgmt_ncn_groups.assert_called_once_with({'ncn-w002', 'ncn-m001'})
+        self.mock_ssh_waiter_cls.assert_called_once_with(
+            {'ncn-m002', 'ncn-m003', 'ncn-s001', 'ncn-w001'}, SSH_CONNECT_TIMEOUT
+        )
+
+    def test_some_inaccessible(self):
+        """Test that validation fails when some NCNs are not accessible via SSH."""
+        self.mock_ssh_waiter.wait_for_completion.return_value = {'ncn-s001'}
+        with self.assertLogs(level='INFO') as logs_cm:
+            self.assertFalse(validate_ncns_powered_on(self.args))
+        self.assertIn('The following NCNs are not accessible via SSH: ncn-s001',
+                      logs_cm.records[0].message)
+
+    def test_ncn_groups_failure(self):
+        """Test that validation fails when the NCNs cannot be identified."""
+        self.mock_get_mgmt_ncn_groups.side_effect = FatalBootsysError('no NCNs')
+        with self.assertLogs(level='WARNING'):
+            self.assertFalse(validate_ncns_powered_on(self.args))
+        self.mock_ssh_waiter_cls.assert_not_called()
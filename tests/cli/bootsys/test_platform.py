@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -40,21 +40,30 @@ from sat.cli.bootsys.platform import (
     ContainerStopThread,
     do_ceph_freeze,
     do_ceph_unfreeze,
+    do_containerd_start,
+    do_containerd_stop,
     do_etcd_snapshot,
     do_etcd_start,
     do_etcd_stop,
+    do_kubelet_start,
     do_platform_action,
     do_platform_start,
     do_platform_stop,
     do_service_action_on_hosts,
     do_stop_containers,
     FatalPlatformError,
+    get_critical_path,
+    get_step_runners,
+    MAX_CONCURRENT_SERVICE_ACTIONS,
     NonFatalPlatformError,
     PlatformServicesStep,
+    PlatformServicesStepWaiter,
     RemoteServiceWaiter,
     SERVICE_ACTION_TIMEOUT,
+    STEPS_BY_ACTION,
 )
 from sat.cli.bootsys.util import FatalBootsysError
+from sat.waiting import WaiterScheduler
 
 
 class TestContainerStopThread(unittest.TestCase):
@@ -63,8 +72,8 @@ class TestContainerStopThread(unittest.TestCase):
     def setUp(self):
         """Set up some mocks and a ContainerStopThread"""
         self.host = 'ncn-w001'
-        self.get_ssh_client = mock.patch('sat.cli.bootsys.platform.get_ssh_client').start()
-        self.ssh_client = self.get_ssh_client.return_value
+        self.ssh_pool = mock.patch('sat.cli.bootsys.platform.get_ssh_connection_pool').start().return_value
+        self.ssh_client = self.ssh_pool.get_client.return_value
 
         self.cst = ContainerStopThread(self.host)
 
@@ -72,9 +81,8 @@ class TestContainerStopThread(unittest.TestCase):
         mock.patch.stopall()
 
     def assert_ssh_connected(self):
-        """Assert the SSHClient is created and connected."""
-        self.get_ssh_client.assert_called_once_with()
-        self.ssh_client.connect.assert_called_once_with(self.host)
+        """Assert an SSHClient connected to the host is obtained from the pool."""
+        self.ssh_pool.get_client.assert_called_once_with(self.host)
 
     @contextmanager
     def assert_exits_with_err(self, err_msg, log_level=logging.ERROR):
@@ -143,15 +151,15 @@ class TestContainerStopThread(unittest.TestCase):
         self.assertEqual(self.ssh_client, ssh_client)
         self.assert_ssh_connected()
         # Check that the property is cached by accessing it again and verifying
-        # that the SSHClient and its methods are not called again.
+        # that the pool is not asked for a client again.
         _ = self.cst.ssh_client
         # The below assertion uses assert_called_once_with, which will fail if
         # methods are called multiple times.
         self.assert_ssh_connected()
 
     def test_ssh_client_ssh_exception(self):
-        """Test the ssh_client property when SSHException is raised by connect."""
-        self.ssh_client.connect.side_effect = SSHException('ssh failed')
+        """Test the ssh_client property when SSHException is raised connecting."""
+        self.ssh_pool.get_client.side_effect = SSHException('ssh failed')
 
         with self.assert_exits_with_err(f'Failed to connect to host {self.host}: ssh failed'):
             _ = self.cst.ssh_client
@@ -159,8 +167,8 @@ class TestContainerStopThread(unittest.TestCase):
         self.assert_ssh_connected()
 
     def test_ssh_client_socket_error(self):
-        """Test the ssh_client property when socket.error is raised by connect."""
-        self.ssh_client.connect.side_effect = socket.error
+        """Test the ssh_client property when socket.error is raised connecting."""
+        self.ssh_pool.get_client.side_effect = socket.error
         with self.assert_exits_with_err(f'Failed to connect to host {self.host}: '):
             _ = self.cst.ssh_client
 
@@ -397,8 +405,8 @@ class TestRemoteServiceWaiter(unittest.TestCase):
         # set self.systemctl_works to False to mimic cases when running the command does not
         # change the service's status
         self.systemctl_works = True
-        self.get_ssh_client = mock.patch('sat.cli.bootsys.platform.get_ssh_client').start()
-        self.ssh_client = self.get_ssh_client.return_value
+        self.ssh_pool = mock.patch('sat.cli.bootsys.platform.get_ssh_connection_pool').start().return_value
+        self.ssh_client = self.ssh_pool.get_client.return_value
         self.ssh_client.exec_command.side_effect = self._fake_ssh_command
         self.ssh_return_values = mock.Mock(), mock.Mock(), mock.Mock()
         self.ssh_return_values[1].channel.recv_exit_status.return_value = 0
@@ -422,9 +430,8 @@ class TestRemoteServiceWaiter(unittest.TestCase):
         return self.ssh_return_values
 
     def assert_ssh_connected(self):
-        """Assert the SSH client connected to the host."""
-        self.get_ssh_client.assert_called_once_with()
-        self.ssh_client.connect.assert_called_once_with(self.host)
+        """Assert the SSH client connected to the host was obtained from the pool."""
+        self.ssh_pool.get_client.assert_called_once_with(self.host)
 
     def test_init(self):
         """Test creating a RemoteServiceWaiter."""
@@ -586,6 +593,15 @@ class TestRemoteServiceWaiter(unittest.TestCase):
             with self.assertLogs(level=logging.ERROR):
                 self.assertFalse(self.waiter.wait_for_completion())
 
+    def test_ssh_error_in_scheduler(self):
+        """SSH errors should fail the waiter without stopping a WaiterScheduler."""
+        self.ssh_pool.get_client.side_effect = socket.error('Connection refused')
+        scheduler = WaiterScheduler([self.waiter])
+        with self.assertLogs(level=logging.ERROR) as logs_cm:
+            self.assertFalse(scheduler.wait_for_completion())
+        self.assertEqual(['Connection refused'], [record.getMessage() for record in logs_cm.records])
+        self.assertFalse(self.waiter.completed)
+
     def test_unknown_state_start(self):
         """When starting a service in 'unknown' state, the waiter should time out."""
         self.service_status = b'unknown\n'
@@ -612,11 +628,12 @@ class TestDoPlatformAction(unittest.TestCase):
         self.mock_steps = {
             self.known_action: [
                 PlatformServicesStep('first step', self.mock_first_step),
-                PlatformServicesStep('second step', self.mock_second_step)
+                PlatformServicesStep('second step', self.mock_second_step, (self.mock_first_step,))
             ]
             # Not necessary to test another valid action. Code path is the same.
         }
         mock.patch('sat.cli.bootsys.platform.STEPS_BY_ACTION', self.mock_steps).start()
+        mock.patch('sat.waiting.time.sleep').start()
 
         self.mock_get_and_verify_ncn_groups = mock.patch(
             'sat.cli.bootsys.platform.get_and_verify_ncn_groups').start()
@@ -653,6 +670,37 @@ class TestDoPlatformAction(unittest.TestCase):
         self.mock_get_and_verify_ncn_groups.assert_called_once_with(self.mock_args.excluded_ncns)
         self.assertEqual(cm.records[0].message, 'Executing step: first step')
         self.assertEqual(cm.records[1].message, 'Executing step: second step')
+        self.assertRegex(cm.records[2].message,
+                         r'Platform services start took [\d.]+ seconds. Critical path: '
+                         r'"first step" \([\d.]+ seconds\) -> "second step" \([\d.]+ seconds\)')
+        ncn_groups = self.mock_get_and_verify_ncn_groups.return_value
+        self.mock_first_step.assert_called_once_with(ncn_groups)
+        self.mock_second_step.assert_called_once_with(ncn_groups)
+
+    def test_do_platform_action_independent_steps(self):
+        """Test do_platform_action runs steps which do not depend on each other at the same time."""
+        first_started = threading.Event()
+        second_started = threading.Event()
+
+        def first_step(ncn_groups):
+            first_started.set()
+            if not second_started.wait(timeout=5):
+                raise FatalPlatformError('second step did not start')
+
+        def second_step(ncn_groups):
+            second_started.set()
+            if not first_started.wait(timeout=5):
+                raise FatalPlatformError('first step did not start')
+
+        self.mock_steps[self.known_action] = [
+            PlatformServicesStep('first step', first_step),
+            PlatformServicesStep('second step', second_step)
+        ]
+        with self.assertLogs(level=logging.INFO) as cm:
+            do_platform_action(self.mock_args, self.known_action)
+
+        self.assertEqual({'Executing step: first step', 'Executing step: second step'},
+                         {record.message for record in cm.records[:2]})
 
     def test_do_platform_action_fatal_step(self):
         """Test do_platform_action when a step fails fatally."""
@@ -667,6 +715,7 @@ class TestDoPlatformAction(unittest.TestCase):
         self.assertEqual(cm.records[1].message, f'Fatal error in step "first step" of '
                                                 f'platform services {self.known_action}: fail')
         self.assertEqual(cm.records[1].levelno, logging.ERROR)
+        self.mock_second_step.assert_not_called()
 
     @mock.patch('sat.cli.bootsys.platform.pester_choices', return_value='no')
     def test_do_platform_action_non_fatal_step_abort(self, mock_pester_choices):
@@ -685,6 +734,7 @@ class TestDoPlatformAction(unittest.TestCase):
         self.assertEqual(cm.records[1].levelno, logging.WARNING)
         self.assertEqual(cm.records[2].message, 'Aborting.')
         self.assertEqual(cm.records[2].levelno, logging.INFO)
+        self.mock_second_step.assert_not_called()
 
     @mock.patch('sat.cli.bootsys.platform.pester_choices', return_value='yes')
     def test_do_platform_action_non_fatal_step_continue(self, mock_pester_choices):
@@ -704,6 +754,67 @@ class TestDoPlatformAction(unittest.TestCase):
         self.assertEqual(cm.records[2].levelno, logging.INFO)
         self.assertEqual(cm.records[3].message, 'Executing step: second step')
         self.assertEqual(cm.records[3].levelno, logging.INFO)
+        self.assertRegex(cm.records[-1].message, r'Critical path: "first step" .* -> "second step"')
+
+
+class TestPlatformServicesSteps(unittest.TestCase):
+    """Tests for the dependencies between platform services steps."""
+
+    def get_runners_by_action(self, action):
+        """Get the step runners for the given action keyed by the action function."""
+        runners = get_step_runners(STEPS_BY_ACTION[action], {}, mock.Mock())
+        return {runner.step.action: runner for runner in runners}
+
+    def test_start_dependencies(self):
+        """kubelet should start after containerd, etcd and Ceph, which start at the same time."""
+        runners = self.get_runners_by_action('start')
+        independent_actions = {do_containerd_start, do_etcd_start, do_ceph_unfreeze}
+        for action in independent_actions:
+            self.assertFalse(runners[action].has_dependencies())
+        self.assertEqual({runners[action] for action in independent_actions},
+                         runners[do_kubelet_start].dependencies)
+
+    def test_stop_dependencies(self):
+        """Nothing should be stopped until the etcd snapshot has been created."""
+        runners = self.get_runners_by_action('stop')
+        snapshot = runners[do_etcd_snapshot]
+        self.assertFalse(snapshot.has_dependencies())
+        for action, runner in runners.items():
+            if action is not do_etcd_snapshot:
+                self.assertIn(snapshot, runner.full_dependencies())
+        self.assertNotIn(runners[do_etcd_stop], runners[do_ceph_freeze].full_dependencies())
+        self.assertIn(runners[do_containerd_stop], runners[do_ceph_freeze].full_dependencies())
+
+    def test_waiter_outside_dependencies_satisfied(self):
+        """Steps whose dependencies are not in the waiter should begin without changing dependencies."""
+        steps = [PlatformServicesStep('a', 'a'),
+                 PlatformServicesStep('b', 'b', ('a',)),
+                 PlatformServicesStep('c', 'c', ('b',))]
+        runner_a, runner_b, runner_c = get_step_runners(steps, {}, mock.Mock())
+
+        waiter = PlatformServicesStepWaiter([runner_b, runner_c], 'start')
+
+        self.assertEqual({runner_b}, waiter.pending)
+        self.assertEqual({runner_a}, runner_b.dependencies)
+        self.assertEqual({runner_b}, runner_a.dependents)
+
+    def test_get_critical_path(self):
+        """The critical path should follow the dependencies which finished last."""
+        steps = [PlatformServicesStep('a', 'a'),
+                 PlatformServicesStep('b', 'b'),
+                 PlatformServicesStep('c', 'c', ('a', 'b')),
+                 PlatformServicesStep('d', 'd', ('a',))]
+        runners = get_step_runners(steps, {}, mock.Mock())
+        times = {'a': (0, 10), 'b': (0, 20), 'c': (20, 25), 'd': (10, 30)}
+        for runner in runners:
+            runner.start_time, runner.end_time = times[runner.step.action]
+
+        self.assertEqual(['a', 'd'], [runner.step.action for runner in get_critical_path(runners)])
+
+    def test_get_critical_path_nothing_finished(self):
+        """The critical path should be empty when no steps finished."""
+        runners = get_step_runners([PlatformServicesStep('a', 'a')], {}, mock.Mock())
+        self.assertEqual([], get_critical_path(runners))
 
 
 class TestDoPlatformStartStop(unittest.TestCase):
@@ -858,6 +969,20 @@ class TestDoServiceActionOnHosts(unittest.TestCase):
         self.mock_waiters = [mock.Mock(completed=True) for _ in self.hosts]
         self.mock_waiter = mock.patch('sat.cli.bootsys.platform.RemoteServiceWaiter',
                                       side_effect=self.mock_waiters).start()
+        self.mock_scheduler_cls = mock.patch('sat.cli.bootsys.platform.WaiterScheduler').start()
+        self.mock_scheduler = self.mock_scheduler_cls.return_value
+        self.mock_scheduler.wait_for_completion.return_value = True
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def assert_waited_for_all_hosts(self):
+        """Assert that all hosts were waited for by a single scheduler."""
+        self.mock_scheduler_cls.assert_called_once_with(self.mock_waiters,
+                                                        max_workers=MAX_CONCURRENT_SERVICE_ACTIONS)
+        self.mock_scheduler.wait_for_completion.assert_called_once_with()
+        for waiter in self.mock_waiters:
+            waiter.wait_for_completion_async.assert_not_called()
 
     def test_all_successful(self):
         """Test doing a service action when it is successful on all hosts."""
@@ -868,14 +993,13 @@ class TestDoServiceActionOnHosts(unittest.TestCase):
                       timeout=SERVICE_ACTION_TIMEOUT, target_enabled=self.target_enabled)
             for host in self.hosts
         ])
-        for waiter in self.mock_waiters:
-            waiter.wait_for_completion_async.assert_called_once_with()
-            waiter.wait_for_completion_await.assert_called_once_with()
+        self.assert_waited_for_all_hosts()
 
     def test_one_failure(self):
         """Test doing a service action when it fails on a single host."""
         # Pick a host in the middle
         self.mock_waiters[2].completed = False
+        self.mock_scheduler.wait_for_completion.return_value = False
         err_regex = (f'Failed to ensure {self.service} is {self.target_state} '
                      f'and {self.target_enabled} on all hosts.')
         with self.assertRaisesRegex(FatalPlatformError, err_regex):
@@ -886,9 +1010,7 @@ class TestDoServiceActionOnHosts(unittest.TestCase):
                       timeout=SERVICE_ACTION_TIMEOUT, target_enabled=self.target_enabled)
             for host in self.hosts
         ])
-        for waiter in self.mock_waiters:
-            waiter.wait_for_completion_async.assert_called_once_with()
-            waiter.wait_for_completion_await.assert_called_once_with()
+        self.assert_waited_for_all_hosts()
 
 
 class TestDoEtcdSnapshotStartStop(unittest.TestCase):
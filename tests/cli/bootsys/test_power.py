@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -98,6 +98,26 @@ class TestCAPMCPowerWaiter(ExtendedTestCase):
             self.assertFalse(self.waiter.member_has_completed(member))
         self.assert_in_element(f'Failed to query power state: {api_err_msg}', cm.output)
 
+    def test_members_have_completed(self):
+        """Test members_have_completed queries all members in one request."""
+        self.mock_capmc_client.get_xnames_power_state.return_value = {
+            'on': ['x5000c0s1b0n0'],
+            'off': ['x5000c0s0b0n0', 'x5000c0s2b0n0']
+        }
+        self.assertEqual({'x5000c0s0b0n0'}, self.waiter.members_have_completed(self.members))
+        self.mock_capmc_client.get_xnames_power_state.assert_called_once()
+        self.assertEqual(self.members,
+                         set(self.mock_capmc_client.get_xnames_power_state.call_args[0][0]))
+        self.mock_capmc_client.get_xname_power_state.assert_not_called()
+
+    def test_members_have_completed_api_error(self):
+        """Test members_have_completed when the CAPMCClient raises an APIError."""
+        api_err_msg = 'CAPMC failure'
+        self.mock_capmc_client.get_xnames_power_state.side_effect = APIError(api_err_msg)
+        with self.assertLogs(level=logging.DEBUG) as cm:
+            self.assertEqual(set(), self.waiter.members_have_completed(self.members))
+        self.assert_in_element(f'Failed to query power state: {api_err_msg}', cm.output)
+
 
 class TestDoNodesPowerOff(ExtendedTestCase):
     """Test the do_nodes_power_off function."""
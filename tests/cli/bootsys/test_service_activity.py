@@ -29,6 +29,7 @@ from kubernetes.config.config_exception import ConfigException
 from kubernetes.client.rest import ApiException
 import logging
 import socket
+import threading
 import unittest
 from unittest.mock import call, MagicMock, Mock, patch
 
@@ -49,6 +50,7 @@ from sat.cli.bootsys.service_activity import (
     _report_active_sessions,
     do_service_activity_check
 )
+from sat.cli.bootsys.util import RemoteCommandResult
 from sat.report import Report
 
 
@@ -103,84 +105,80 @@ class TestServiceActivityChecker(unittest.TestCase):
 class TestSDUActivityChecker(ExtendedTestCase):
     """Test the SDUActivityChecker class."""
     def setUp(self):
-        self.mock_channel = MagicMock()
-        self.mock_channel.recv_exit_status.side_effect = [1, 1, 1]
-
-        self.mock_transport = MagicMock()
-        self.mock_transport.open_session.return_value = self.mock_channel
-
-        self.mock_ssh_client_instance = MagicMock()
-        self.mock_ssh_client_instance.get_transport.return_value = self.mock_transport
+        self.managers = ['ncn-m001', 'ncn-m002', 'ncn-m003']
+        self.exit_statuses = [1, 1, 1]
+        self.errors = [None, None, None]
+
+        def mock_run_command_on_hosts(hosts, command, timeout=None):
+            return {
+                host: RemoteCommandResult(host, None if error else exit_status,
+                                          None if error else '', None if error else 'stderr', error)
+                for host, exit_status, error in zip(hosts, self.exit_statuses, self.errors)
+            }
 
-        self.mock_ssh_client = patch('sat.cli.bootsys.service_activity.get_ssh_client').start()
-        self.mock_ssh_client.return_value = self.mock_ssh_client_instance
+        self.mock_pool = patch('sat.cli.bootsys.service_activity.get_ssh_connection_pool').start().return_value
+        self.mock_pool.run_command_on_hosts.side_effect = mock_run_command_on_hosts
 
         self.mock_get_mgmt_ncn_groups = patch('sat.cli.bootsys.service_activity.get_mgmt_ncn_groups').start()
-        self.mock_get_mgmt_ncn_groups.return_value = ({'managers': ['ncn-m001', 'ncn-m002', 'ncn-m003']}, {})
+        self.mock_get_mgmt_ncn_groups.return_value = ({'managers': self.managers}, {})
 
     def tearDown(self):
         patch.stopall()
 
-    def assert_ssh_client_set_up(self):
-        self.mock_ssh_client_instance.connect.assert_called()
-        self.mock_ssh_client_instance.close.assert_called()
+    def assert_command_run_on_managers(self):
+        self.mock_pool.run_command_on_hosts.assert_called_with(self.managers, 'sdu bash pgrep sdu',
+                                                               timeout=None)
 
     def test_getting_sdu_sessions_none_running(self):
         """Test no active SDU sessions returned when no dumps are occurring."""
         s = SDUActivityChecker()
 
         self.assertEqual(s.get_active_sessions(), [])
-        self.assert_ssh_client_set_up()
+        self.assert_command_run_on_managers()
 
     def test_getting_sdu_sessions_one_running(self):
         """Test active SDU sessions are returned when remote dumps are occurring."""
         s = SDUActivityChecker()
-        self.mock_channel.recv_exit_status.side_effect = [1, 0, 1]
+        self.exit_statuses = [1, 0, 1]
 
         self.assertEqual(s.get_active_sessions(), [OrderedDict([('ncn', 'ncn-m002')])])
-        self.assert_ssh_client_set_up()
+        self.assert_command_run_on_managers()
+
+    def test_getting_sdu_sessions_in_manager_order(self):
+        """Test active SDU sessions are returned in the order of the managers."""
+        self.exit_statuses = [0, 1, 0]
+        self.mock_pool.run_command_on_hosts.side_effect = None
+        self.mock_pool.run_command_on_hosts.return_value = {
+            host: RemoteCommandResult(host, exit_status, '', '', None)
+            for host, exit_status in reversed(list(zip(self.managers, self.exit_statuses)))
+        }
+
+        self.assertEqual(SDUActivityChecker().get_active_sessions(),
+                         [OrderedDict([('ncn', 'ncn-m001')]), OrderedDict([('ncn', 'ncn-m003')])])
 
     def test_exception_thrown_on_ssh_error(self):
         """Test an exception is thrown when SSH error occurs when checking SDU sessions."""
         mock_bad_host_key_exception = BadHostKeyException('ncn-m002', MagicMock(), MagicMock())
-        for err_type in [mock_bad_host_key_exception, AuthenticationException,
-                         SSHException, socket.error]:
+        for err in [mock_bad_host_key_exception, AuthenticationException(),
+                    SSHException(), socket.error()]:
+            self.errors = [None, err, None]
             s = SDUActivityChecker()
-            self.mock_ssh_client_instance.connect.side_effect = err_type
             with self.assertRaises(ServiceCheckError):
-                self.assertEqual(s.get_active_sessions(), [])
-        self.assert_ssh_client_set_up()
-
-    def test_exception_thrown_on_open_session_error(self):
-        """Test an exception is thrown when there is a problem opening the SSH channel."""
-        self.mock_transport.open_session.side_effect = SSHException
-        with self.assertRaises(ServiceCheckError):
-            SDUActivityChecker().get_active_sessions()
-        self.assert_ssh_client_set_up()
-
-    def test_exception_thrown_on_exec_command_error(self):
-        """Test an exception is thrown when there is a problem executing remote commands."""
-        self.mock_channel.exec_command.side_effect = SSHException
-        with self.assertRaises(ServiceCheckError):
-            SDUActivityChecker().get_active_sessions()
-        self.assert_ssh_client_set_up()
+                s.get_active_sessions()
+        self.assert_command_run_on_managers()
 
     def test_exception_thrown_on_remote_pgrep_error(self):
         """Test that exceptions are thrown when error return codes are given from remote pgrep."""
-        self.mock_channel.recv_exit_status.side_effect = None
-
         for returncode in [2, 3, 5]:
-            self.mock_channel.recv_exit_status.return_value = returncode
+            self.exit_statuses = [returncode] * 3
             s = SDUActivityChecker()
             with self.assertRaises(ServiceCheckError):
                 s.get_active_sessions()
 
     def test_exception_not_thrown_when_sdu_not_installed_or_configured(self):
         """Test that exceptions are not thrown when SDU cannot be accessed."""
-        self.mock_channel.recv_exit_status.side_effect = None
-
         for returncode in [125, 127]:
-            self.mock_channel.recv_exit_status.return_value = returncode
+            self.exit_statuses = [returncode] * 3
             s = SDUActivityChecker()
             try:
                 s.get_active_sessions()
@@ -264,8 +262,8 @@ class TestBOSV1ActivityChecker(ExtendedTestCase):
                                     if pod.label_value == label_value])
             return MockPodList(self.pods)
 
-        self.mock_load_kube_config = patch(
-            'sat.cli.bootsys.service_activity.load_kube_config').start()
+        self.mock_get_kube_api_client = patch(
+            'sat.cli.bootsys.service_activity.get_kube_api_client').start()
         self.mock_kube_client = Mock()
         self.mock_kube_client.list_namespaced_pod = mock_list_pods
         patch('sat.cli.bootsys.service_activity.CoreV1Api',
@@ -377,19 +375,10 @@ class TestBOSV1ActivityChecker(ExtendedTestCase):
     def test_get_active_sessions_kube_config_err(self):
         """Test get_active_sessions with failure to load kube_config."""
         config_err_msg = 'invalid config'
-        # Newer version of kubernetes raise this
-        self.mock_load_kube_config.side_effect = ConfigException(config_err_msg)
-        err_regex_template = ('^Unable to get active BOS sessions: Failed to '
-                              'load kubernetes config to get BOA pod status: {}')
-        err_regex = err_regex_template.format(config_err_msg)
-
-        with self.assertRaisesRegex(ServiceCheckError, err_regex):
-            self.bos_checker.get_active_sessions()
+        self.mock_get_kube_api_client.side_effect = ConfigException(config_err_msg)
+        err_regex = ('^Unable to get active BOS sessions: Failed to '
+                     'load kubernetes config to get BOA pod status: {}'.format(config_err_msg))
 
-        file_err_msg = 'file not found'
-        # Older versions of kubernetes raise this
-        self.mock_load_kube_config.side_effect = FileNotFoundError(file_err_msg)
-        err_regex = err_regex_template.format(file_err_msg)
         with self.assertRaisesRegex(ServiceCheckError, err_regex):
             self.bos_checker.get_active_sessions()
 
@@ -531,6 +520,12 @@ class TestCFSActivityChecker(unittest.TestCase):
         self.assertEqual('cfs sessions describe', self.cfs_checker.cray_cli_args)
         self.assertEqual('name', self.cfs_checker.id_field_name)
 
+    def test_get_active_sessions_timeout(self):
+        """Test get_active_sessions limits each request to the timeout of the checker."""
+        session = Mock()
+        CFSActivityChecker(session, timeout=30).get_active_sessions()
+        self.mock_cfs_client.assert_called_once_with(session, timeout=30)
+
     def test_get_active_sessions_two_active(self):
         """Test get_active_sessions with two active sessions."""
         self.cfs_sessions[0]['status']['session']['status'] = 'running'
@@ -1028,6 +1023,77 @@ class TestReportActiveSessions(ExtendedTestCase):
 
         self.mock_report_cls.assert_not_called()
 
+    def test_report_active_sessions_concurrently(self):
+        """Test _report_active_sessions queries all the services at the same time."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait_for_other_checker():
+            # Fails with BrokenBarrierError unless both checks run at once.
+            barrier.wait()
+            return []
+
+        checkers = [
+            self.get_mock_service_checker(service_name=name,
+                                          active_sessions_desc=f'active {name} sessions')
+            for name in ('CFS', 'FOO')
+        ]
+        for checker in checkers:
+            checker.get_active_sessions.side_effect = wait_for_other_checker
+
+        with self.assertLogs(level=logging.INFO):
+            active, failed = _report_active_sessions(checkers, timeout=10)
+
+        self.assertEqual([], active)
+        self.assertEqual([], failed)
+
+    def test_report_active_sessions_timeout(self):
+        """Test _report_active_sessions treats services which time out as failed."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        checkers = [
+            self.get_mock_service_checker(
+                num_sessions=0, service_name='CFS',
+                active_sessions_desc='active CFS sessions',
+            ),
+            self.get_mock_service_checker(
+                service_name='FOO',
+                active_sessions_desc='active FOO sessions',
+            ),
+        ]
+        checkers[1].get_active_sessions.side_effect = release.wait
+
+        with self.assertLogs(level=logging.INFO) as cm:
+            active, failed = _report_active_sessions(checkers, timeout=0.1)
+
+        self.assertEqual([], active)
+        self.assertEqual(['FOO'], failed)
+        self.assert_in_element('Found no active CFS sessions.', cm.output)
+        self.assert_in_element('Timed out after 0.1 seconds while checking for '
+                               'active FOO sessions.', cm.output)
+
+    def test_report_active_sessions_daemon_threads(self):
+        """Test _report_active_sessions runs checks in daemon threads that do not block exit."""
+        daemon_flags = []
+
+        def record_daemon():
+            daemon_flags.append(threading.current_thread().daemon)
+            return []
+
+        checker = self.get_mock_service_checker()
+        checker.get_active_sessions.side_effect = record_daemon
+        with self.assertLogs(level=logging.INFO):
+            _report_active_sessions([checker], timeout=10)
+
+        self.assertEqual([True], daemon_flags)
+
+    def test_report_active_sessions_unexpected_error(self):
+        """Test _report_active_sessions raises errors other than ServiceCheckError."""
+        checker = self.get_mock_service_checker()
+        checker.get_active_sessions.side_effect = ValueError('unexpected')
+        with self.assertLogs(level=logging.INFO):
+            with self.assertRaisesRegex(ValueError, 'unexpected'):
+                _report_active_sessions([checker], timeout=10)
+
 
 class TestDoServiceActivityCheck(ExtendedTestCase):
     """Test the do_service_activity_check function."""
@@ -1048,6 +1114,7 @@ class TestDoServiceActivityCheck(ExtendedTestCase):
 
         self.mock_get_config_value = patch('sat.cli.bootsys.service_activity.get_config_value',
                                            return_value='v1').start()
+        self.mock_sat_session = patch('sat.cli.bootsys.service_activity.SATSession').start()
 
         self.mock_args = Mock()
 
@@ -1069,6 +1136,24 @@ class TestDoServiceActivityCheck(ExtendedTestCase):
             'the sessions to complete or cancel them before proceeding.'
         )
 
+    def test_do_service_activity_check_shared_session(self):
+        """Test do_service_activity_check gives the API checkers one shared session and the timeout."""
+        config = {'bos.api_version': 'v1', 'bootsys.session_check_timeout': 120}
+        self.mock_get_config_value.side_effect = config.get
+        self.mock_report_active_sessions.return_value = [], []
+        do_service_activity_check(self.mock_args)
+
+        self.mock_sat_session.assert_called_once_with()
+        session = self.mock_sat_session.return_value
+        bos_v1, _, cfs, crus, fas, nmd, sdu = self.checkers
+        for checker_cls in (bos_v1, cfs, crus, fas, nmd):
+            checker_cls.assert_called_once_with(session, 120)
+        sdu.assert_called_once_with(120)
+        self.mock_report_active_sessions.assert_called_once_with(
+            [checker_cls.return_value for checker_cls in (bos_v1, cfs, crus, fas, nmd, sdu)],
+            timeout=120
+        )
+
     def test_do_service_activity_check_inactive(self):
         """Test do_service_activity_check with no active services."""
         self.mock_report_active_sessions.return_value = [], []
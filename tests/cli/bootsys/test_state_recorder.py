@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,17 +25,26 @@
 Unit tests for the service_activity module.
 """
 from boto3.exceptions import Boto3Error
+from botocore.exceptions import ClientError
 from kubernetes.config import ConfigException
-import datetime
+import copy
+import gzip
+import io
+import json
 import os
+import shutil
+import tempfile
 import unittest
 from unittest.mock import call, patch, Mock
 
-from sat.cli.bootsys.defaults import DEFAULT_LOCAL_STATE_DIR
 from sat.cli.bootsys.state_recorder import (
+    apply_state_delta,
+    get_state_delta,
     HSNStateRecorder,
+    MAX_DELTAS_PER_FULL_STATE,
     PodStateError, PodStateRecorder,
     StateError, StateRecorder,
+    validate_state_capture,
 )
 
 
@@ -52,329 +61,413 @@ class SimpleRecorder(StateRecorder):
         return self.CONST_DATA
 
 
+class FakeS3:
+    """An in-memory stand-in for a boto3 S3 ServiceResource with a single bucket."""
+
+    def __init__(self):
+        # Maps from key to contents, in the order the objects were written
+        self.objects = {}
+        self.requests = []
+
+    def _not_found(self, operation):
+        return ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Not Found'}}, operation)
+
+    def Bucket(self, bucket_name):
+        bucket = Mock()
+
+        def filter_objects(Prefix):
+            self.requests.append(('list', Prefix))
+            return [Mock(key=key, last_modified=idx) for idx, key in enumerate(self.objects)
+                    if key.startswith(Prefix)]
+
+        bucket.objects.filter.side_effect = filter_objects
+        return bucket
+
+    def Object(self, bucket_name, key):
+        s3_object = Mock()
+
+        def get():
+            self.requests.append(('get', key))
+            if key not in self.objects:
+                raise self._not_found('GetObject')
+            return {'Body': io.BytesIO(self.objects[key])}
+
+        def put(Body):
+            self.requests.append(('put', key))
+            self.objects[key] = Body
+
+        def upload_file(path):
+            self.requests.append(('upload', key))
+            with open(path, 'rb') as f:
+                self.objects[key] = f.read()
+
+        def download_file(path):
+            self.requests.append(('download', key))
+            if key not in self.objects:
+                raise self._not_found('HeadObject')
+            with open(path, 'wb') as f:
+                f.write(self.objects[key])
+
+        def delete():
+            self.requests.append(('delete', key))
+            self.objects.pop(key, None)
+
+        s3_object.get.side_effect = get
+        s3_object.put.side_effect = put
+        s3_object.upload_file.side_effect = upload_file
+        s3_object.download_file.side_effect = download_file
+        s3_object.delete.side_effect = delete
+        return s3_object
+
+    def state_file_keys(self):
+        """Get the keys of all the objects other than the manifest."""
+        return [key for key in self.objects if not key.endswith('.manifest.json')]
+
+
+class TestStateDelta(unittest.TestCase):
+    """Tests for the get_state_delta and apply_state_delta functions."""
+
+    def test_round_trip(self):
+        """Test that applying a delta to its base gives the new state."""
+        base = {
+            'services': {'cray-bos': 'Running', 'cray-cfs': 'Running', 'old-pod': 'Failed'},
+            'default': {'foo': 'Running'},
+            'removed-ns': {'bar': 'Running'},
+            'scalar': 1,
+        }
+        new = {
+            'services': {'cray-bos': 'Running', 'cray-cfs': 'Pending', 'new-pod': 'Running'},
+            'default': {'foo': 'Running'},
+            'added-ns': {'baz': 'Succeeded'},
+            'scalar': {'now': 'a dict'},
+        }
+        delta = get_state_delta(base, new)
+        self.assertEqual(new, apply_state_delta(base, delta))
+        self.assertEqual(['removed-ns'], delta['removed'])
+        self.assertEqual({'services'}, set(delta['nested']))
+        self.assertNotIn('default', delta['changed'])
+
+    def test_no_changes(self):
+        """Test that the delta between identical states is empty."""
+        state = {'x1000c0r0j100p0': {'enabled': True}}
+        delta = get_state_delta(state, state)
+        self.assertFalse(any(delta.values()))
+        self.assertEqual(state, apply_state_delta(state, delta))
+
+    def test_apply_does_not_modify_base(self):
+        """Test that apply_state_delta does not modify its base."""
+        base = {'ns': {'pod': 'Running'}}
+        apply_state_delta(base, get_state_delta(base, {'ns': {'pod': 'Failed'}}))
+        self.assertEqual({'ns': {'pod': 'Running'}}, base)
+
+
 class TestStateRecorder(unittest.TestCase):
     """Test the StateRecorder abstract base class.
     """
 
     def setUp(self):
         """Create an object and set up mocks."""
-        self.dir_path = 'states'
+        self.dir_path = 'states/'
         self.file_prefix = 'simple'
         self.num_to_keep = 5
         self.file_suffix = '.json'
-        self.mock_s3 = Mock()
+        self.fake_s3 = FakeS3()
         self.bucket_name = 'sat'
+        self.manifest_key = 'states/simple.manifest.json'
 
-        self.simple_recorder = SimpleRecorder(
-            self.dir_path, self.file_prefix, self.num_to_keep, self.mock_s3, self.bucket_name
-        )
+        self.local_state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.local_state_dir)
+        patch('sat.cli.bootsys.state_recorder.DEFAULT_LOCAL_STATE_DIR', self.local_state_dir).start()
 
-        self.mock_s3_bucket = self.mock_s3.Bucket.return_value
-        self.bucket_files = [
-            Mock(key='states/simple.2020-09-07T18:05:14.json',
-                 last_modified=datetime.datetime(2020, 9, 7, 18, 5, 14, 266170))
-        ]
-        self.mock_s3_bucket.objects.filter.return_value = self.bucket_files
-
-        self.mock_open = patch('builtins.open').start()
-        self.mock_date_str = '2020-09-07T18:05:14'
-        self.expected_new_file_name = os.path.join(
-            self.dir_path, f'{self.file_prefix}.{self.mock_date_str}{self.file_suffix}'
-        )
-        self.expected_local_new_file_name = os.path.join(
-            DEFAULT_LOCAL_STATE_DIR, self.expected_new_file_name
-        )
-        self.mock_datetime = patch('sat.cli.bootsys.state_recorder.datetime').start()
-        self.mock_utcnow = Mock()
-        self.mock_datetime.utcnow = self.mock_utcnow
-        self.mock_utcnow.return_value.strftime.return_value = self.mock_date_str
+        self.timestamps = (f'2020-09-07T18:{minute:02}:14' for minute in range(60))
+        mock_datetime = patch('sat.cli.bootsys.state_recorder.datetime').start()
+        mock_datetime.utcnow.return_value.strftime.side_effect = lambda _: next(self.timestamps)
 
-        self.local_dir_path = os.path.join(DEFAULT_LOCAL_STATE_DIR, self.dir_path)
-        self.mock_remove = patch('os.remove').start()
-        self.mock_makedirs = patch('os.makedirs').start()
-        self.mock_json_dump = patch('json.dump').start()
-        self.mock_json_load = patch('json.load').start()
+        self.state_data = {'ns': {'pod-a': 'Running', 'pod-b': 'Running'}}
+        self.simple_recorder = self.get_recorder()
 
     def tearDown(self):
         """Stop all mock patches."""
         patch.stopall()
 
-    def set_up_mock_create_new_file(self):
-        """Mock some of the StateRecorder methods to help test higher-level methods."""
-        self.mock_create_new_file = patch('sat.cli.bootsys.state_recorder.StateRecorder._create_new_file').start()
-        self.mock_create_new_file.return_value = self.expected_new_file_name
+    def get_recorder(self, s3=None):
+        """Get a SimpleRecorder which records `self.state_data`."""
+        recorder = SimpleRecorder(
+            self.dir_path, self.file_prefix, self.num_to_keep, s3 or self.fake_s3, self.bucket_name
+        )
+        recorder.get_state_data = lambda: copy.deepcopy(self.state_data)
+        return recorder
+
+    def get_manifest(self):
+        """Get the manifest stored in the fake S3 bucket."""
+        return json.loads(self.fake_s3.objects[self.manifest_key])
+
+    def dump_states(self, count):
+        """Dump the given number of states, changing one pod each time."""
+        for idx in range(count):
+            self.state_data['ns']['pod-b'] = f'Phase{idx}'
+            self.simple_recorder.dump_state()
 
-    def assert_instance_variables(self):
-        """Check that self.simple_recorder has the expected instance variables"""
+    def test_init(self):
+        """Test instantiation of a simple subclass of StateRecorder."""
         self.assertEqual(self.dir_path, self.simple_recorder.dir_path)
         self.assertEqual(self.file_prefix, self.simple_recorder.file_prefix)
         self.assertEqual(self.num_to_keep, self.simple_recorder.num_to_keep)
         self.assertEqual(self.file_suffix, self.simple_recorder.file_suffix)
-        self.assertEqual(self.mock_s3, self.simple_recorder.s3)
+        self.assertEqual(self.fake_s3, self.simple_recorder.s3)
         self.assertEqual(self.bucket_name, self.simple_recorder.bucket_name)
+        self.assertEqual(self.manifest_key, self.simple_recorder.manifest_key)
 
-    def test_init(self):
-        """Test instantiation of a simple subclass of StateRecorder."""
-        self.assert_instance_variables()
-
-    def test_init_non_default_values(self):
-        """Test instantiation of a simple subclass of StateRecorder with non-default num_to_keep and suffix"""
-        self.num_to_keep = 10
-        self.file_suffix = '.yaml'
-        self.simple_recorder = SimpleRecorder(
-            self.dir_path, self.file_prefix, self.num_to_keep, self.mock_s3, self.bucket_name, self.file_suffix
-        )
-        self.assert_instance_variables()
-
-    def test_remove_old_files_none(self):
-        """Test _remove_old_files with no files removes no files."""
-        self.mock_s3_bucket.objects.filter.return_value = []
-        self.simple_recorder._remove_old_files()
-        self.mock_s3.Bucket.assert_called_with(self.bucket_name)
-        self.mock_s3.Bucket.return_value.objects.filter.assert_called_with(Prefix=self.dir_path)
-        self.mock_s3.Object.return_value.delete.assert_not_called()
-
-    def test_remove_old_files_below_limit(self):
-        """Test _remove_old_files with the number of files below the limit removes no files."""
-        self.simple_recorder._remove_old_files()
-        self.mock_s3.Bucket.assert_called_with(self.bucket_name)
-        self.mock_s3.Bucket.return_value.objects.filter.assert_called_with(Prefix=self.dir_path)
-        self.mock_s3.Object.return_value.delete.assert_not_called()
-
-    def test_remove_old_files_at_limit(self):
-        """Test _remove_old_files with the number of files at the limit removes no files."""
-        bucket_files = [
-            Mock(key=f'states/simple.2020-09-07T18:0{i}:14.json',
-                 last_modified=datetime.datetime(2020, 9, 7, 18, i, 14, 266170))
-            for i in range(self.num_to_keep)
-        ]
-        self.mock_s3_bucket.objects.filter.return_value = bucket_files
-        self.simple_recorder._remove_old_files()
-        self.mock_s3.Bucket.assert_called_with(self.bucket_name)
-        self.mock_s3.Bucket.return_value.objects.filter.assert_called_with(Prefix=self.dir_path)
-        self.mock_s3.Object.return_value.delete.assert_not_called()
-
-    def test_remove_old_files_over_limit(self):
-        """Test _remove_old_files with the number of files over the limit."""
-        bucket_files = [
-            Mock(key=f'states/simple.2020-09-07T18:0{i}:14.json',
-                 last_modified=datetime.datetime(2020, 9, 7, 18, i, 14, 266170))
-            for i in range(self.num_to_keep + 1)
-        ]
-        self.mock_s3.Bucket.return_value.objects.filter.return_value = bucket_files
-        self.simple_recorder._remove_old_files()
-        self.mock_s3.Bucket.assert_called_with(self.bucket_name)
-        self.mock_s3.Bucket.return_value.objects.filter.assert_called_with(Prefix=self.dir_path)
-        self.mock_s3.Object.return_value.delete.called_once_with(bucket_files[0])
-
-    def test_remove_old_files_s3_list_error(self):
-        """Test _remove_old_files when S3 can't list files raises a StateError."""
-        self.mock_s3.Bucket.return_value.objects.filter.side_effect = Boto3Error
-        with self.assertRaisesRegex(StateError, 'Unable to list files in S3 Bucket'):
-            self.simple_recorder._remove_old_files()
-        self.mock_s3.Bucket.assert_called_with(self.bucket_name)
-        self.mock_s3.Bucket.return_value.objects.filter.assert_called_with(Prefix=self.dir_path)
-        self.mock_s3.Object.return_value.delete.assert_not_called()
-
-    def test_remove_old_files_irrelevant_file(self):
-        """Test _remove_old_files under the limit but with an extra file that should be ignored"""
-        bucket_files = [
-            Mock(key=f'states/simple.2020-09-07T18:0{i}:14.json',
-                 last_modified=datetime.datetime(2020, 9, 7, 18, i, 14, 266170))
-            for i in range(self.num_to_keep)] + [
-            Mock(key='some-other-file',
-                 last_modified=datetime.datetime(2018, 9, 7, 19, 0, 14, 266170))
-            ]
-        self.mock_s3_bucket.objects.filter.return_value = bucket_files
-        self.simple_recorder._remove_old_files()
-        self.mock_s3.Bucket.assert_called_with(self.bucket_name)
-        self.mock_s3.Bucket.return_value.objects.filter.assert_called_with(Prefix=self.dir_path)
-        self.mock_s3.Object.return_value.delete.assert_not_called()
-
-    def test_create_new_file_success(self):
-        """Test _create_new_file in the successful case."""
-        self.simple_recorder._create_new_file()
-        self.mock_open.assert_called_once_with(self.expected_local_new_file_name, 'w')
-        self.mock_open.return_value.__enter__.return_value.write.assert_called_once_with('')
-
-    def test_create_new_file_open_failure(self):
-        """Test _create_new_file when open fails."""
-        self.mock_open.side_effect = OSError
-        with self.assertRaises(StateError):
-            self.simple_recorder._create_new_file()
-        self.mock_open.assert_called_once_with(self.expected_local_new_file_name, 'w')
-        self.mock_open.return_value.__enter__.assert_not_called()
-
-    def test_create_new_file_write_failure(self):
-        """Test _create_new_file when write fails."""
-        self.mock_open.return_value.__enter__.return_value.write.side_effect = OSError
-        with self.assertRaises(StateError):
-            self.simple_recorder._create_new_file()
-        self.mock_open.assert_called_once_with(
-            self.expected_local_new_file_name, 'w'
-        )
-        self.mock_open.return_value.__enter__.return_value.write.assert_called_once_with('')
+    def test_has_no_stored_state(self):
+        """Test has_stored_state when no state has been stored."""
+        self.assertFalse(self.simple_recorder.has_stored_state())
+
+    def test_dump_state_first(self):
+        """Test that the first state is stored in full, compressed, and recorded in the manifest."""
+        self.simple_recorder.dump_state()
 
-    def test_dump_state(self):
-        """Test dump_state method in the successful case."""
-        self.set_up_mock_create_new_file()
+        expected_key = 'states/simple.2020-09-07T18:00:14.json.gz'
+        self.assertEqual([expected_key], self.fake_s3.state_file_keys())
+        self.assertEqual(self.state_data,
+                         json.loads(gzip.decompress(self.fake_s3.objects[expected_key])))
+        self.assertEqual({'version': 1, 'states': [{'key': expected_key, 'base': None}],
+                          'deltas_since_full': 0},
+                         self.get_manifest())
+        self.assertTrue(self.simple_recorder.has_stored_state())
+        # No local files are left behind.
+        self.assertEqual([], os.listdir(os.path.join(self.local_state_dir, self.dir_path)))
+
+    def test_dump_state_delta(self):
+        """Test that a later state is stored as a delta against the full state."""
+        self.dump_states(2)
+
+        full_key, delta_key = self.fake_s3.state_file_keys()
+        delta_data = json.loads(gzip.decompress(self.fake_s3.objects[delta_key]))
+        self.assertEqual(full_key, delta_data['base'])
+        self.assertEqual({'ns'}, set(delta_data['delta']['nested']))
+        self.assertEqual({'key': delta_key, 'base': full_key}, self.get_manifest()['states'][-1])
+        self.assertEqual(self.state_data, self.simple_recorder.get_stored_state())
+
+    def test_dump_state_full_after_max_deltas(self):
+        """Test that a full state is stored again after the maximum number of deltas."""
+        self.num_to_keep = MAX_DELTAS_PER_FULL_STATE + 5
+        self.simple_recorder = self.get_recorder()
+        self.dump_states(MAX_DELTAS_PER_FULL_STATE + 2)
+
+        bases = [state['base'] for state in self.get_manifest()['states']]
+        self.assertIsNone(bases[0])
+        self.assertIsNone(bases[MAX_DELTAS_PER_FULL_STATE + 1])
+        self.assertEqual(MAX_DELTAS_PER_FULL_STATE, bases.count(bases[1]))
+        self.assertEqual(self.state_data, self.simple_recorder.get_stored_state())
+
+    def test_dump_state_non_dict_stored_in_full(self):
+        """Test that state data which is not a dict is never stored as a delta."""
+        self.state_data = ['a', 'b']
         self.simple_recorder.dump_state()
-        self.mock_makedirs.assert_called_once_with(self.local_dir_path, exist_ok=True)
-        self.mock_create_new_file.assert_called_once_with()
-        self.mock_open.assert_called_once_with(self.expected_local_new_file_name, 'w')
-        self.mock_s3.Object.assert_called_once_with(self.bucket_name, self.expected_new_file_name)
-        self.mock_s3.Object.return_value.upload_file.assert_called_once_with(self.expected_local_new_file_name)
-        self.mock_remove.assert_called_once_with(self.expected_local_new_file_name)
-        self.mock_json_dump.assert_called_once_with(SimpleRecorder.CONST_DATA,
-                                                    self.mock_open.return_value.__enter__.return_value)
+        self.simple_recorder.dump_state()
+        self.assertEqual([None, None], [state['base'] for state in self.get_manifest()['states']])
+        self.assertEqual(['a', 'b'], self.simple_recorder.get_stored_state())
+
+    def test_remove_old_files(self):
+        """Test that old states are removed but full states used by deltas are kept."""
+        self.dump_states(self.num_to_keep + 2)
+
+        states = self.get_manifest()['states']
+        keys = [state['key'] for state in states]
+        # The first full state is still the base of the deltas which are kept.
+        self.assertEqual(self.num_to_keep + 1, len(states))
+        self.assertIsNone(states[0]['base'])
+        self.assertTrue(all(state['base'] == keys[0] for state in states[1:]))
+        self.assertEqual(sorted(keys), sorted(self.fake_s3.state_file_keys()))
+        self.assertEqual(self.state_data, self.simple_recorder.get_stored_state())
+
+    def test_remove_old_files_unused_full_state(self):
+        """Test that a full state is removed once no remaining delta uses it."""
+        self.num_to_keep = 2
+        self.simple_recorder = self.get_recorder()
+        self.dump_states(MAX_DELTAS_PER_FULL_STATE + 3)
+
+        states = self.get_manifest()['states']
+        self.assertEqual(2, len(states))
+        self.assertIsNone(states[0]['base'])
+        self.assertEqual(states[0]['key'], states[1]['base'])
+        self.assertEqual([state['key'] for state in states], self.fake_s3.state_file_keys())
+
+    def test_remove_old_files_delete_error(self):
+        """Test that a failure to remove an old file is only a warning."""
+        self.num_to_keep = 1
+        self.state_data = ['not', 'a', 'dict']
+        mock_s3 = Mock(wraps=self.fake_s3)
+        self.simple_recorder = self.get_recorder(mock_s3)
+        self.simple_recorder.dump_state()
+
+        def object_with_failing_delete(bucket_name, key):
+            s3_object = self.fake_s3.Object(bucket_name, key)
+            s3_object.delete.side_effect = Boto3Error('delete failed')
+            return s3_object
+
+        mock_s3.Object.side_effect = object_with_failing_delete
+        with self.assertLogs(level='WARNING') as cm:
+            self.simple_recorder.dump_state()
+
+        self.assertIn('Failed to remove old file states/simple.2020-09-07T18:00:14.json.gz',
+                      cm.output[0])
+        self.assertEqual(1, len(self.get_manifest()['states']))
+
+    def test_dump_state_uses_manifest(self):
+        """Test that storing and loading state does not list the bucket once there is a manifest."""
+        self.dump_states(3)
+        self.fake_s3.requests.clear()
+
+        self.simple_recorder.dump_state()
+        self.simple_recorder.get_stored_state()
+        self.assertFalse([request for request in self.fake_s3.requests if request[0] == 'list'])
+
+    def test_legacy_state_files(self):
+        """Test that uncompressed state files stored without a manifest are used."""
+        for idx in range(3):
+            self.fake_s3.objects[f'states/simple.2020-09-0{idx + 1}T00:00:00.json'] = \
+                json.dumps({'old': idx}).encode()
+        self.fake_s3.objects['states/some-other-file.json'] = b'{}'
+
+        self.assertTrue(self.simple_recorder.has_stored_state())
+        self.assertEqual({'old': 2}, self.simple_recorder.get_stored_state())
+
+        self.simple_recorder.dump_state()
+        states = self.get_manifest()['states']
+        self.assertEqual(4, len(states))
+        self.assertEqual('states/simple.2020-09-03T00:00:00.json', states[-1]['base'])
+        self.assertEqual(self.state_data, self.simple_recorder.get_stored_state())
+
+    def test_dump_state_base_download_error(self):
+        """Test that the full state is stored if the previous full state cannot be loaded."""
+        self.simple_recorder.dump_state()
+        del self.fake_s3.objects[self.fake_s3.state_file_keys()[0]]
+
+        with self.assertLogs(level='WARNING') as cm:
+            self.simple_recorder.dump_state()
+
+        self.assertIn('the full state will be stored', cm.output[0])
+        self.assertIsNone(self.get_manifest()['states'][-1]['base'])
+        self.assertEqual(self.state_data, self.simple_recorder.get_stored_state())
 
     def test_dump_state_makedirs_file_exists(self):
         """Test dump_state method when the dir or a leading part of the path is a file."""
-        self.set_up_mock_create_new_file()
-        for err in [FileExistsError, NotADirectoryError]:
-            self.mock_makedirs.side_effect = err
-            with self.assertRaisesRegex(StateError, 'is not a directory'):
-                self.simple_recorder.dump_state()
-
-        self.mock_makedirs.assert_called_with(self.local_dir_path, exist_ok=True)
-        self.mock_create_new_file.assert_not_called()
-        self.mock_open.assert_not_called()
-        self.mock_json_dump.assert_not_called()
-        self.mock_s3.Object.assert_not_called()
+        with patch('os.makedirs') as mock_makedirs:
+            for err in [FileExistsError, NotADirectoryError]:
+                mock_makedirs.side_effect = err
+                with self.assertRaisesRegex(StateError, 'is not a directory'):
+                    self.simple_recorder.dump_state()
+        self.assertEqual([], self.fake_s3.requests)
 
     def test_dump_state_makedirs_failure(self):
         """Test dump_state method when it fails to create the dir."""
-        self.set_up_mock_create_new_file()
-        self.mock_makedirs.side_effect = OSError
-        with self.assertRaisesRegex(StateError, f'Failed to ensure state directory {self.local_dir_path} exists'):
-            self.simple_recorder.dump_state()
-        self.mock_makedirs.assert_called_once_with(self.local_dir_path, exist_ok=True)
-        self.mock_create_new_file.assert_not_called()
-        self.mock_open.assert_not_called()
-        self.mock_json_dump.assert_not_called()
-        self.mock_s3.Object.assert_not_called()
+        local_dir_path = os.path.join(self.local_state_dir, self.dir_path)
+        with patch('os.makedirs', side_effect=OSError):
+            with self.assertRaisesRegex(StateError,
+                                        f'Failed to ensure state directory {local_dir_path} exists'):
+                self.simple_recorder.dump_state()
+        self.assertEqual([], self.fake_s3.requests)
 
     def test_dump_state_file_open_failure(self):
         """Test dump_state when it fails to open the file to write to."""
-        self.set_up_mock_create_new_file()
-        self.mock_open.side_effect = OSError
-
-        with self.assertRaisesRegex(StateError, 'Failed to write state to file'):
-            self.simple_recorder.dump_state()
-
-        self.mock_makedirs.assert_called_once_with(self.local_dir_path, exist_ok=True)
-        self.mock_create_new_file.assert_called_once_with()
-        self.mock_json_dump.assert_not_called()
-        self.mock_s3.Object.assert_not_called()
-        self.mock_open.assert_called_once_with(self.expected_local_new_file_name, 'w')
-        self.mock_json_dump.assert_not_called()
+        with patch('sat.cli.bootsys.state_recorder.gzip.open', side_effect=OSError):
+            with self.assertRaisesRegex(StateError, 'Failed to write state to file'):
+                self.simple_recorder.dump_state()
+        self.assertEqual({}, self.fake_s3.objects)
 
     def test_dump_state_s3_dump_error(self):
         """Test dump_state when uploading to S3 fails raises a StateError"""
-        self.set_up_mock_create_new_file()
-        self.mock_s3.Object.return_value.upload_file.side_effect = Boto3Error
+        mock_s3 = Mock()
+        mock_s3.Object.return_value.get.side_effect = ClientError({'Error': {'Code': '404'}}, 'GetObject')
+        mock_s3.Bucket.return_value.objects.filter.return_value = []
+        mock_s3.Object.return_value.upload_file.side_effect = Boto3Error
+        self.simple_recorder = self.get_recorder(mock_s3)
+
         with self.assertRaisesRegex(StateError, 'Failed to dump state to S3'):
             self.simple_recorder.dump_state()
-        self.mock_makedirs.assert_called_once_with(self.local_dir_path, exist_ok=True)
-        self.mock_create_new_file.assert_called_once_with()
-        self.mock_open.assert_called_once_with(self.expected_local_new_file_name, 'w')
-        self.mock_s3.Object.assert_called_once_with(self.bucket_name, self.expected_new_file_name)
-        self.mock_json_dump.assert_called_once_with(SimpleRecorder.CONST_DATA,
-                                                    self.mock_open.return_value.__enter__.return_value)
-        self.mock_remove.assert_called_once_with(self.expected_local_new_file_name)
-
-    def test_get_stored_state(self):
-        """Test get_stored_state method in the successful case."""
-        bucket_files = [
-            Mock(key=f'states/simple.2020-09-07T18:0{i}:14.json',
-                 last_modified=datetime.datetime(2020, 9, 7, 18, i, 14, 266170))
-            for i in range(5)
-        ]
-        self.mock_s3_bucket.objects.filter.return_value = bucket_files
-        expected_latest_file = bucket_files[-1].key
-        expected_local_path = os.path.join(DEFAULT_LOCAL_STATE_DIR, expected_latest_file)
-
-        stored_state = self.simple_recorder.get_stored_state()
-
-        # Assert file was downloaded from S3
-        self.mock_s3_bucket.objects.filter.assert_called_once_with(Prefix=self.dir_path)
-        self.mock_s3.Object.assert_called_once_with(self.bucket_name, expected_latest_file)
-        self.mock_s3.Object.return_value.download_file.assert_called_once_with(expected_local_path)
-
-        # Assert file was saved locally and opened
-        self.mock_makedirs.assert_called_once_with(self.local_dir_path, exist_ok=True)
-        self.assertEqual(self.mock_json_load.return_value, stored_state)
-        self.mock_open.assert_called_once_with(expected_local_path)
-        self.mock_json_load.assert_called_once_with(self.mock_open.return_value.__enter__.return_value)
-        self.mock_remove.assert_called_once_with(expected_local_path)
+        mock_s3.Object.return_value.put.assert_not_called()
+        self.assertEqual([], os.listdir(os.path.join(self.local_state_dir, self.dir_path)))
+
+    def test_dump_state_manifest_upload_error(self):
+        """Test dump_state when uploading the manifest fails raises a StateError"""
+        mock_s3 = Mock(wraps=self.fake_s3)
+        self.simple_recorder = self.get_recorder(mock_s3)
+
+        def object_with_failing_put(bucket_name, key):
+            s3_object = self.fake_s3.Object(bucket_name, key)
+            s3_object.put.side_effect = Boto3Error('put failed')
+            return s3_object
+
+        mock_s3.Object.side_effect = object_with_failing_put
+        with self.assertRaisesRegex(StateError, f'Failed to upload {self.manifest_key} to S3'):
+            self.simple_recorder.dump_state()
 
     def test_get_stored_state_no_state(self):
-        """Test get_stored_state when no files are returned from S3."""
-        self.mock_s3_bucket.objects.filter.return_value = []
+        """Test get_stored_state when no state has been stored."""
         with self.assertRaisesRegex(StateError, 'No stored state found'):
             self.simple_recorder.get_stored_state()
-        self.mock_s3_bucket.objects.filter.assert_called_once_with(Prefix=self.dir_path)
-        self.mock_open.assert_not_called()
-        self.mock_json_load.assert_not_called()
-        self.mock_remove.assert_not_called()
 
     def test_get_stored_state_irrelevant_file(self):
         """Test get_stored state when a file exists but should be ignored."""
-        bucket_files = [
-            Mock(key=f'states/some-random-file.json',
-                 last_modified=datetime.datetime(2020, 9, 7, 18, 0, 14, 266170))
-        ]
-        self.mock_s3_bucket.objects.filter.return_value = bucket_files
+        self.fake_s3.objects['states/some-random-file.json'] = b'{}'
         with self.assertRaisesRegex(StateError, 'No stored state found'):
             self.simple_recorder.get_stored_state()
-        self.mock_s3_bucket.objects.filter.assert_called_once_with(Prefix=self.dir_path)
-        self.mock_open.assert_not_called()
-        self.mock_json_load.assert_not_called()
-        self.mock_remove.assert_not_called()
-
-    def test_get_stored_state_os_error(self):
-        """Test get_stored_state method when fails to open file."""
-        self.mock_open.side_effect = OSError
-        expected_local_file = os.path.join(
-            DEFAULT_LOCAL_STATE_DIR, self.bucket_files[0].key
-        )
-
-        with self.assertRaisesRegex(StateError, 'Failed to open downloaded file'):
-            self.simple_recorder.get_stored_state()
-
-        self.mock_open.assert_called_once_with(expected_local_file)
-        self.mock_json_load.assert_not_called()
-        self.mock_remove.assert_called_once_with(expected_local_file)
 
     def test_get_stored_state_json_error(self):
         """Test get_stored_state method when fails to parse JSON from file data."""
-        self.mock_json_load.side_effect = ValueError
-        expected_local_file = os.path.join(
-            DEFAULT_LOCAL_STATE_DIR, self.bucket_files[0].key
-        )
+        self.simple_recorder.dump_state()
+        self.fake_s3.objects[self.fake_s3.state_file_keys()[0]] = gzip.compress(b'not json')
 
         with self.assertRaisesRegex(StateError, 'Failed to parse JSON from downloaded file'):
             self.simple_recorder.get_stored_state()
 
-        self.mock_open.assert_called_once_with(expected_local_file)
-        self.mock_json_load.assert_called_once_with(self.mock_open.return_value.__enter__.return_value)
-        self.mock_remove.assert_called_once_with(expected_local_file)
+    def test_get_stored_state_os_error(self):
+        """Test get_stored_state method when fails to open file."""
+        self.simple_recorder.dump_state()
+        with patch('sat.cli.bootsys.state_recorder.gzip.open', side_effect=OSError):
+            with self.assertRaisesRegex(StateError, 'Failed to open downloaded file'):
+                self.simple_recorder.get_stored_state()
+
+    def test_get_stored_state_manifest_json_error(self):
+        """Test get_stored_state when the manifest cannot be parsed."""
+        self.fake_s3.objects[self.manifest_key] = b'not json'
+        with self.assertRaisesRegex(StateError, f'Failed to parse JSON from {self.manifest_key}'):
+            self.simple_recorder.get_stored_state()
+
+    def test_get_stored_state_manifest_invalid(self):
+        """Test get_stored_state when the manifest does not list states."""
+        self.fake_s3.objects[self.manifest_key] = b'{"version": 1}'
+        with self.assertRaisesRegex(StateError, 'does not contain a list of states'):
+            self.simple_recorder.get_stored_state()
+
+    def test_get_stored_state_manifest_download_error(self):
+        """Test get_stored_state when the manifest cannot be downloaded."""
+        mock_s3 = Mock()
+        mock_s3.Object.return_value.get.side_effect = ClientError({'Error': {'Code': 'AccessDenied'}},
+                                                                  'GetObject')
+        self.simple_recorder = self.get_recorder(mock_s3)
+        with self.assertRaisesRegex(StateError, f'Unable to download {self.manifest_key}'):
+            self.simple_recorder.get_stored_state()
+        mock_s3.Bucket.assert_not_called()
 
     def test_get_stored_state_s3_list_error(self):
         """Test get_stored_state when S3 can't list files raises a StateError."""
-        self.mock_s3_bucket.objects.filter.side_effect = Boto3Error
+        mock_s3 = Mock(wraps=self.fake_s3)
+        mock_s3.Bucket.return_value.objects.filter.side_effect = Boto3Error
+        mock_s3.Bucket.side_effect = None
+        self.simple_recorder = self.get_recorder(mock_s3)
 
         with self.assertRaisesRegex(StateError, 'Unable to list files in S3 Bucket'):
             self.simple_recorder.get_stored_state()
-        self.mock_remove.assert_not_called()
 
     def test_get_stored_state_s3_download_error(self):
         """Test get_stored_state when S3 can't download a file raises a StateError."""
-        self.mock_s3.Object.return_value.download_file.side_effect = Boto3Error
+        self.simple_recorder.dump_state()
+        del self.fake_s3.objects[self.fake_s3.state_file_keys()[0]]
 
         with self.assertRaisesRegex(StateError, 'Unable to download'):
             self.simple_recorder.get_stored_state()
-        self.mock_remove.assert_not_called()
 
 
 def get_fake_pod_list(pods):
@@ -480,6 +573,39 @@ class TestPodStateRecorder(unittest.TestCase):
             PodStateRecorder().get_state_data()
 
 
+class TestValidateStateCapture(unittest.TestCase):
+    """Test the validate_state_capture function."""
+
+    def setUp(self):
+        """Set up mocks."""
+        self.mock_recorder = patch('sat.cli.bootsys.state_recorder.PodStateRecorder').start().return_value
+        self.mock_recorder.description = 'kubernetes pod state'
+        self.args = Mock()
+
+    def tearDown(self):
+        """Stop all patches."""
+        patch.stopall()
+
+    def test_state_stored(self):
+        """Test that validation passes when pod state is stored."""
+        self.mock_recorder.has_stored_state.return_value = True
+        self.assertTrue(validate_state_capture(self.args))
+
+    def test_no_state_stored(self):
+        """Test that validation fails when no pod state is stored."""
+        self.mock_recorder.has_stored_state.return_value = False
+        with self.assertLogs(level='INFO'):
+            self.assertFalse(validate_state_capture(self.args))
+
+    def test_state_error(self):
+        """Test that validation fails when the stored state cannot be listed."""
+        self.mock_recorder.has_stored_state.side_effect = StateError('S3 unavailable')
+        with self.assertLogs(level='WARNING') as logs_cm:
+            self.assertFalse(validate_state_capture(self.args))
+        self.assertEqual('Unable to check for stored kubernetes pod state: S3 unavailable',
+                         logs_cm.records[0].message)
+
+
 class TestHSNStateRecorder(unittest.TestCase):
     """Test the HSNStateRecorder class."""
 
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,17 +25,23 @@
 Tests for common bootsys code.
 """
 import logging
+import socket
 from textwrap import dedent
 import unittest
 from unittest.mock import call, mock_open, patch, Mock
 
+from paramiko import SSHException
+
 from sat.cli.bootsys.util import (
     get_mgmt_ncn_hostnames,
     get_and_verify_ncn_groups,
     get_mgmt_ncn_groups,
     get_ssh_client,
+    get_ssh_connection_pool,
     prompt_for_ncn_verification,
-    FatalBootsysError
+    FatalBootsysError,
+    RemoteCommandResult,
+    SSHConnectionPool
 )
 
 
@@ -373,3 +379,118 @@ class TestGetSSHClient(unittest.TestCase):
         self.mock_ssh_client.set_missing_host_key_policy.assert_called_once_with(
             self.mock_warning_policy
         )
+
+
+class TestSSHConnectionPool(unittest.TestCase):
+    """Tests for the SSHConnectionPool class."""
+
+    def setUp(self):
+        """Set up a mock get_ssh_client which returns a new mock client for each call."""
+        self.mock_get_ssh_client = patch('sat.cli.bootsys.util.get_ssh_client',
+                                         side_effect=lambda: Mock()).start()
+        self.pool = SSHConnectionPool(connect_timeout=5)
+
+    def tearDown(self):
+        patch.stopall()
+
+    @staticmethod
+    def set_up_exec_command(client, exit_status, stdout=b'', stderr=b''):
+        """Set up the return value of exec_command on a mock client."""
+        mock_stdout = Mock()
+        mock_stdout.read.return_value = stdout
+        mock_stdout.channel.recv_exit_status.return_value = exit_status
+        mock_stderr = Mock()
+        mock_stderr.read.return_value = stderr
+        client.exec_command.return_value = Mock(), mock_stdout, mock_stderr
+
+    def test_get_client(self):
+        """Test getting a new client connects to the host."""
+        client = self.pool.get_client('ncn-w001')
+        client.connect.assert_called_once_with('ncn-w001', timeout=5)
+
+    def test_get_client_reused(self):
+        """Test that the client for a host is reused while its connection is active."""
+        client = self.pool.get_client('ncn-w001')
+        self.assertIs(client, self.pool.get_client('ncn-w001'))
+        self.assertIsNot(client, self.pool.get_client('ncn-w002'))
+        self.assertEqual(2, self.mock_get_ssh_client.call_count)
+
+    def test_get_client_reconnects_inactive(self):
+        """Test that a new client is connected when the existing connection is closed."""
+        client = self.pool.get_client('ncn-w001')
+        client.get_transport.return_value.is_active.return_value = False
+        new_client = self.pool.get_client('ncn-w001')
+        self.assertIsNot(client, new_client)
+        client.close.assert_called_once_with()
+        new_client.connect.assert_called_once_with('ncn-w001', timeout=5)
+
+    def test_get_client_connect_failure(self):
+        """Test that a failed connection is not kept in the pool."""
+        failed_client = Mock()
+        failed_client.connect.side_effect = socket.error('Connection refused')
+        self.mock_get_ssh_client.side_effect = [failed_client, Mock()]
+        with self.assertRaises(socket.error):
+            self.pool.get_client('ncn-w001')
+        self.assertIsNot(failed_client, self.pool.get_client('ncn-w001'))
+
+    def test_close(self):
+        """Test closing individual clients and the whole pool."""
+        clients = [self.pool.get_client(host) for host in ['ncn-w001', 'ncn-w002', 'ncn-w003']]
+        self.pool.close_client('ncn-w001')
+        clients[0].close.assert_called_once_with()
+        self.pool.close()
+        for client in clients:
+            client.close.assert_called_once_with()
+
+    def test_run_command(self):
+        """Test running a command on a host."""
+        client = self.pool.get_client('ncn-w001')
+        self.set_up_exec_command(client, 1, b'out', b'err')
+        result = self.pool.run_command('ncn-w001', 'true', timeout=10)
+        client.exec_command.assert_called_once_with('true', timeout=10)
+        self.assertEqual(RemoteCommandResult('ncn-w001', 1, 'out', 'err', None), result)
+
+    def test_run_command_connect_timeout(self):
+        """Test that the timeout of a command also limits connecting to the host."""
+        self.mock_get_ssh_client.side_effect = None
+        client = self.mock_get_ssh_client.return_value
+        self.set_up_exec_command(client, 0)
+        self.pool.run_command('ncn-w001', 'true', timeout=10)
+        client.connect.assert_called_once_with('ncn-w001', timeout=10)
+
+    def test_run_command_ssh_exception(self):
+        """Test running a command when the SSH connection fails."""
+        client = self.pool.get_client('ncn-w001')
+        err = SSHException('ssh failed')
+        client.exec_command.side_effect = err
+        self.assertEqual(RemoteCommandResult('ncn-w001', None, None, None, err),
+                         self.pool.run_command('ncn-w001', 'true'))
+
+    def test_run_command_on_hosts(self):
+        """Test running a command on multiple hosts and aggregating the results."""
+        hosts = ['ncn-w001', 'ncn-w002', 'ncn-w003']
+        for exit_status, host in enumerate(hosts):
+            self.set_up_exec_command(self.pool.get_client(host), exit_status, b'out')
+        self.pool.get_client('ncn-w003').exec_command.side_effect = socket.error('Connection reset')
+
+        results = self.pool.run_command_on_hosts(hosts, 'true', max_workers=2)
+
+        self.assertEqual(set(hosts), set(results))
+        self.assertEqual(RemoteCommandResult('ncn-w001', 0, 'out', '', None), results['ncn-w001'])
+        self.assertEqual(RemoteCommandResult('ncn-w002', 1, 'out', '', None), results['ncn-w002'])
+        self.assertIsInstance(results['ncn-w003'].error, socket.error)
+
+    def test_run_command_on_no_hosts(self):
+        """Test running a command on no hosts."""
+        self.assertEqual({}, self.pool.run_command_on_hosts([], 'true'))
+
+
+class TestGetSSHConnectionPool(unittest.TestCase):
+    """Tests for the get_ssh_connection_pool function."""
+
+    def test_pool_shared(self):
+        """Test that the same pool is returned each time."""
+        with patch('sat.cli.bootsys.util._SSH_CONNECTION_POOL', None):
+            pool = get_ssh_connection_pool()
+            self.assertIsInstance(pool, SSHConnectionPool)
+            self.assertIs(pool, get_ssh_connection_pool())
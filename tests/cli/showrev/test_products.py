@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020-2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -68,8 +68,8 @@ class TestGetProducts(ExtendedTestCase):
 
     def setUp(self):
         """Sets up patches."""
-        self.mock_product_catalog_cls = patch('sat.cli.showrev.products.ProductCatalog').start()
-        self.mock_product_catalog = self.mock_product_catalog_cls.return_value
+        self.mock_get_product_catalog = patch('sat.cli.showrev.products.get_product_catalog').start()
+        self.mock_product_catalog = self.mock_get_product_catalog.return_value
         self.mock_cos_product = get_mock_installed_product_version(
             'cos', '1.4.0', image_names=[COS_IMAGE_NAME], recipe_names=[COS_RECIPE_NAME]
         )
@@ -96,7 +96,7 @@ class TestGetProducts(ExtendedTestCase):
             ['pbs', '0.1.0', 'N/A', '-', '-']
         ]
         actual_headers, actual_fields = get_product_versions()
-        self.mock_product_catalog_cls.assert_called_once_with()
+        self.mock_get_product_catalog.assert_called_once_with()
         self.assertEqual(self.expected_headers, actual_headers)
         self.assertEqual(expected_fields, actual_fields)
 
@@ -115,7 +115,7 @@ class TestGetProducts(ExtendedTestCase):
             ['pbs', '0.1.0', 'N/A', '-', '-']
         ]
         actual_headers, actual_fields = get_product_versions()
-        self.mock_product_catalog_cls.assert_called_once_with()
+        self.mock_get_product_catalog.assert_called_once_with()
         self.assertEqual(self.expected_headers, actual_headers)
         self.assertEqual(expected_fields, actual_fields)
 
@@ -131,14 +131,14 @@ class TestGetProducts(ExtendedTestCase):
             ['pbs', '0.1.0', 'N/A', '-', '-']
         ]
         actual_headers, actual_fields = get_product_versions()
-        self.mock_product_catalog_cls.assert_called_once_with()
+        self.mock_get_product_catalog.assert_called_once_with()
         self.assertEqual(self.expected_headers, actual_headers)
         self.assertEqual(expected_fields, actual_fields)
 
     def test_get_product_versions_product_catalog_error(self):
         """Test when a ProductCatalogError occurs when loading the product catalog data"""
         pc_err_msg = 'failed to load K8s config'
-        self.mock_product_catalog_cls.side_effect = ProductCatalogError(pc_err_msg)
+        self.mock_get_product_catalog.side_effect = ProductCatalogError(pc_err_msg)
 
         with self.assertLogs(level=logging.ERROR) as logs:
             self.assertEqual(get_product_versions(), ([], []))
@@ -163,7 +163,7 @@ class TestGetProducts(ExtendedTestCase):
             ['pbs', '0.1.0', 'N/A', '-', '-']
         ]
         actual_headers, actual_fields = get_product_versions()
-        self.mock_product_catalog_cls.assert_called_once_with()
+        self.mock_get_product_catalog.assert_called_once_with()
         self.assertEqual(self.expected_headers, actual_headers)
         self.assertEqual(expected_fields, actual_fields)
 
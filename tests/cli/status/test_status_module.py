@@ -33,6 +33,7 @@ from sat.apiclient.gateway import APIError
 import sat.cli.status.status_module as status_module_module
 from sat.cli.status.status_module import (
     BOSStatusModule,
+    CFSStatusModule,
     StatusModule,
     StatusModuleException,
 )
@@ -452,3 +453,33 @@ class TestBOSStatusModule(BaseStatusModuleTestCase):
             'Most Recent BOS Session': self.bos_session,
             'Most Recent Image': self.img_name,
         })
+
+
+class TestCFSStatusModule(BaseStatusModuleTestCase):
+    """Tests for the CFSStatusModule class"""
+
+    def setUp(self):
+        super().setUp()
+        self.session = MagicMock()
+        self.mock_cfs_client = patch('sat.cli.status.status_module.CFSClient').start().return_value
+        self.cfs_components = [
+            {'id': 'x1000c0s0b0n0', 'desiredConfig': 'compute', 'configurationStatus': 'configured',
+             'errorCount': 0},
+            {'id': 'x1000c0s0b0n1', 'desiredConfig': 'compute', 'configurationStatus': 'failed',
+             'errorCount': 3},
+        ]
+        self.mock_cfs_client.iter_components.return_value = iter(self.cfs_components)
+
+    def test_rows(self):
+        """Test that only the displayed fields of CFS components are requested"""
+        rows = list(CFSStatusModule(session=self.session).rows)
+        self.assertEqual(self.cfs_components, rows)
+        self.mock_cfs_client.iter_components.assert_called_once_with(
+            fields=['id', 'desiredConfig', 'configurationStatus', 'errorCount']
+        )
+
+    def test_rows_api_error(self):
+        """Test that a failure to query CFS raises StatusModuleException"""
+        self.mock_cfs_client.iter_components.side_effect = APIError('CFS unavailable')
+        with self.assertRaisesRegex(StatusModuleException, 'Failed to query CFS for component information'):
+            list(CFSStatusModule(session=self.session).rows)
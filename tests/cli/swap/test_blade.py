@@ -810,6 +810,34 @@ class TestMergeInterfaceMappings(BaseBladeSwapProcedureTest):
             SwapInProcedure.merge_mappings(self.src_mapping, self.dst_mapping)
 
 
+class TestRedfishEndpointDiscoveryWaiter(unittest.TestCase):
+    """Tests for the RedfishEndpointDiscoveryWaiter"""
+    def setUp(self):
+        self.mock_hsm_client = MagicMock(autospec=HSMClient)
+        self.mock_hsm_client.query_components.return_value = [
+            {'ID': 'x1000c0s0b0'}, {'ID': 'x1000c0s0b1'}, {'ID': 'x1000c0s0b2'}
+        ]
+        self.waiter = RedfishEndpointDiscoveryWaiter(['x1000c0s0'], self.mock_hsm_client, timeout=10)
+
+    def test_members_have_completed(self):
+        """Test that all endpoints are checked with a single HSM query"""
+        self.mock_hsm_client.get_redfish_endpoints_inventory.return_value = [
+            {'ID': 'x1000c0s0b0', 'DiscoveryInfo': {'LastDiscoveryStatus': 'DiscoverOK'}},
+            {'ID': 'x1000c0s0b1', 'DiscoveryInfo': {'LastDiscoveryStatus': 'DiscoveryStarted'}},
+        ]
+        self.assertEqual({'x1000c0s0b0'}, self.waiter.members_have_completed(self.waiter.members))
+        self.mock_hsm_client.get_redfish_endpoints_inventory.assert_called_once_with(self.waiter.members)
+        self.mock_hsm_client.get_redfish_endpoint_inventory.assert_not_called()
+        self.assertEqual(set(), self.waiter.failed)
+
+    def test_members_have_completed_api_error(self):
+        """Test that all checked endpoints fail when HSM cannot be queried"""
+        self.mock_hsm_client.get_redfish_endpoints_inventory.side_effect = APIError('HSM down')
+        with self.assertLogs(level=logging.ERROR):
+            self.assertEqual(set(), self.waiter.members_have_completed(self.waiter.members))
+        self.assertEqual(self.waiter.members, self.waiter.failed)
+
+
 class TestSwapInProcedure(unittest.TestCase):
     """Test that the swap in procedure calls the appropriate stages"""
     def setUp(self):
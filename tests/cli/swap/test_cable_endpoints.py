@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2021-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -27,8 +27,12 @@ Unit tests for sat.cli.swap.cable_endpoints
 
 import logging
 import os
+from tempfile import TemporaryDirectory
 import unittest
 from unittest import mock
+from unittest.mock import patch
+
+from kubernetes.config import ConfigException
 
 from sat.cli.swap.cable_endpoints import CableEndpoints
 
@@ -241,5 +245,89 @@ class TestCableEndpoints(unittest.TestCase):
         mock.patch.stopall()
 
 
+class TestCopyShastaP2PFile(unittest.TestCase):
+    """Unit tests for the CableEndpoints.copy_shasta_p2p_file method"""
+
+    def setUp(self):
+        self.mock_get_kube_api_client = patch('sat.cli.swap.cable_endpoints.get_kube_api_client').start()
+        self.mock_api_client_cls = patch('sat.cli.swap.cable_endpoints.ApiClient').start()
+        self.mock_core_api_cls = patch('sat.cli.swap.cable_endpoints.CoreV1Api').start()
+        self.mock_core_api = self.mock_core_api_cls.return_value
+        self.mock_pod = mock.Mock()
+        self.mock_pod.metadata.name = 'slingshot-fabric-manager-abcde'
+        self.mock_core_api.list_namespaced_pod.return_value.items = [self.mock_pod]
+
+        self.stdout_chunks = ['cable_id,src_conn_a\n', 'x3000c0r1j1,x3000c0r2j1\n']
+        self.stderr_chunks = []
+        self.returncode = 0
+        self.mock_stream = patch('sat.cli.swap.cable_endpoints.stream', side_effect=self.fake_stream).start()
+
+        self.dest_dir = TemporaryDirectory()
+        self.cable_endpoints = CableEndpoints()
+        self.cable_endpoints.dest_dir = self.dest_dir.name
+        self.dest_file = os.path.join(self.dest_dir.name, self.cable_endpoints.p2p_file)
+
+    def tearDown(self):
+        patch.stopall()
+        self.dest_dir.cleanup()
+
+    def fake_stream(self, *args, **kwargs):
+        """Fake an exec stream which receives stdout and stderr in chunks."""
+        updates = [('stdout', chunk) for chunk in self.stdout_chunks]
+        updates.extend(('stderr', chunk) for chunk in self.stderr_chunks)
+        exec_stream = mock.Mock(returncode=self.returncode)
+        exec_stream.is_open.side_effect = [True] * len(updates) + [False]
+        exec_stream.peek_stdout.side_effect = [kind == 'stdout' for kind, _ in updates]
+        exec_stream.peek_stderr.side_effect = [kind == 'stderr' for kind, _ in updates]
+        exec_stream.read_stdout.side_effect = [chunk for kind, chunk in updates if kind == 'stdout']
+        exec_stream.read_stderr.side_effect = [chunk for kind, chunk in updates if kind == 'stderr']
+        return exec_stream
+
+    def test_copy_p2p_file(self):
+        """Test copying the p2p file through an exec stream."""
+        self.assertTrue(self.cable_endpoints.copy_shasta_p2p_file())
+        self.mock_stream.assert_called_once_with(
+            self.mock_core_api.connect_get_namespaced_pod_exec, self.mock_pod.metadata.name, 'services',
+            container='slingshot-fabric-manager',
+            command=['cat', os.path.join(self.cable_endpoints.src_dir, self.cable_endpoints.p2p_file)],
+            stderr=True, stdin=False, stdout=True, tty=False, _preload_content=False
+        )
+        with open(self.dest_file) as f:
+            self.assertEqual(''.join(self.stdout_chunks), f.read())
+
+    def test_copy_p2p_file_separate_api_client(self):
+        """Test that the exec stream uses its own API client rather than the shared client."""
+        self.assertTrue(self.cable_endpoints.copy_shasta_p2p_file())
+        shared_client = self.mock_get_kube_api_client.return_value
+        self.mock_api_client_cls.assert_called_once_with(shared_client.configuration)
+        exec_client = self.mock_api_client_cls.return_value
+        self.assertEqual([mock.call(shared_client), mock.call(exec_client)],
+                         self.mock_core_api_cls.call_args_list)
+        exec_client.close.assert_called_once_with()
+
+    def test_copy_p2p_file_command_failed(self):
+        """Test copying the p2p file when the command in the pod fails."""
+        self.stdout_chunks = []
+        self.stderr_chunks = ['cat: No such file or directory\n']
+        self.returncode = 1
+        with self.assertLogs(level=logging.ERROR) as logs_cm:
+            self.assertFalse(self.cable_endpoints.copy_shasta_p2p_file())
+        self.assertEqual(['Failed to copy p2p file (exit status 1): cat: No such file or directory'],
+                         [record.getMessage() for record in logs_cm.records])
+
+    def test_copy_p2p_file_no_pods(self):
+        """Test copying the p2p file when there is no fabric manager pod."""
+        self.mock_core_api.list_namespaced_pod.return_value.items = []
+        with self.assertLogs(level=logging.INFO):
+            self.assertFalse(self.cable_endpoints.copy_shasta_p2p_file())
+        self.mock_stream.assert_not_called()
+
+    def test_copy_p2p_file_no_config(self):
+        """Test copying the p2p file when the Kubernetes configuration cannot be loaded."""
+        with patch('sat.cli.swap.cable_endpoints.get_kube_api_client', side_effect=ConfigException('no config')):
+            with self.assertLogs(level=logging.ERROR):
+                self.assertFalse(self.cable_endpoints.copy_shasta_p2p_file())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -98,6 +98,15 @@ class TestHMSDiscoveryCronJob(unittest.TestCase):
         with self.assertRaisesRegex(HMSDiscoveryError, 'Failed to get data'):
             _ = self.hdcj.data
 
+    def test_get_watch_source(self):
+        """Test getting the arguments for watching the cronjob."""
+        self.assertEqual(
+            (self.mock_batch_api.list_namespaced_cron_job,
+             (HMSDiscoveryCronJob.HMS_DISCOVERY_NAMESPACE,),
+             {'field_selector': f'metadata.name={HMSDiscoveryCronJob.HMS_DISCOVERY_NAME}'}),
+            self.hdcj.get_watch_source()
+        )
+
     def test_get_last_schedule_time(self):
         """Test get last_schedule_time method."""
         self.assertEqual(
@@ -0,0 +1,185 @@
+#
+# MIT License
+#
+# (C) Copyright 2022 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for sat.product_catalog
+"""
+import json
+import os
+import shutil
+from tempfile import mkdtemp
+import unittest
+from unittest.mock import Mock, patch
+
+from cray_product_catalog.query import ProductCatalogError
+from kubernetes.client import ApiException
+from yaml import safe_dump, safe_load
+
+from sat.product_catalog import (
+    ProductCatalogSnapshot,
+    get_product_catalog,
+    get_version_sort_key
+)
+
+
+class TestGetVersionSortKey(unittest.TestCase):
+    """Tests for sorting versions by semantic versioning precedence"""
+
+    def test_semver_precedence(self):
+        """Test that semantic versions sort by precedence, not as strings"""
+        versions = ['1.10.0', '1.2.0', '1.2.0-beta.11', '1.2.0-beta.2', '1.2.0-alpha',
+                    '1.2.0-alpha.1', '1.2.0+build.5', '0.9.9', '2.0.0-rc.1', 'not-semver']
+        expected = ['not-semver', '0.9.9', '1.2.0-alpha', '1.2.0-alpha.1', '1.2.0-beta.2',
+                    '1.2.0-beta.11', '1.2.0', '1.2.0+build.5', '1.10.0', '2.0.0-rc.1']
+        self.assertEqual(expected, sorted(versions, key=get_version_sort_key))
+
+
+class TestProductCatalogSnapshot(unittest.TestCase):
+    """Tests for the ProductCatalogSnapshot class"""
+
+    def setUp(self):
+        self.product_data = {
+            'cos': {
+                '2.0.9': {'configuration': {'commit': 'abc'}},
+                '2.0.10': {'configuration': {'commit': 'def'}},
+                '2.0.10-beta': {'configuration': {'commit': 'ghi'}},
+            },
+            'uan': {
+                '2.3.0': {}
+            }
+        }
+        self.snapshot = ProductCatalogSnapshot(self.product_data, resource_version='42')
+
+    def test_products(self):
+        """Test that all product versions are present in the snapshot"""
+        self.assertEqual(
+            [('cos', '2.0.9'), ('cos', '2.0.10'), ('cos', '2.0.10-beta'), ('uan', '2.3.0')],
+            [(product.name, product.version) for product in self.snapshot.products]
+        )
+
+    def test_get_product_latest(self):
+        """Test that the latest version of a product is chosen by semantic version"""
+        self.assertEqual('2.0.10', self.snapshot.get_product('cos').version)
+        self.assertEqual('2.3.0', self.snapshot.get_product('uan').version)
+
+    def test_get_product_version(self):
+        """Test getting a specific version of a product"""
+        product = self.snapshot.get_product('cos', '2.0.9')
+        self.assertEqual({'configuration': {'commit': 'abc'}}, product.data)
+
+    def test_get_product_missing(self):
+        """Test getting a product or product version that does not exist"""
+        with self.assertRaisesRegex(ProductCatalogError, 'No installed products with name sma'):
+            self.snapshot.get_product('sma')
+        with self.assertRaisesRegex(ProductCatalogError, 'with name cos and version 3.0.0'):
+            self.snapshot.get_product('cos', '3.0.0')
+
+
+class TestLoadProductCatalogSnapshot(unittest.TestCase):
+    """Tests for loading a ProductCatalogSnapshot from the ConfigMap"""
+
+    def setUp(self):
+        self.product_data = {
+            'cos': {'2.0.9': {'configuration': {'commit': 'abc'}}},
+            'uan': {'2.3.0': {'configuration': {'commit': 'def'}}}
+        }
+        self.config_map = Mock(data={name: safe_dump(versions)
+                                     for name, versions in self.product_data.items()})
+        self.config_map.metadata.resource_version = '100'
+        self.mock_core_v1_api = patch('sat.product_catalog.CoreV1Api').start().return_value
+        self.mock_core_v1_api.read_namespaced_config_map.return_value = self.config_map
+        patch('sat.product_catalog.get_kube_api_client').start()
+        self.mock_safe_load = patch('sat.product_catalog.safe_load', side_effect=safe_load).start()
+
+        self.cache_dir = mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'cache', 'product-catalog.json')
+
+    def tearDown(self):
+        patch.stopall()
+        shutil.rmtree(self.cache_dir)
+
+    def test_load_and_cache(self):
+        """Test that the parsed data is written to the cache file"""
+        snapshot = ProductCatalogSnapshot.load(self.cache_path)
+        self.assertEqual('abc', snapshot.get_product('cos').data['configuration']['commit'])
+        self.assertEqual('100', snapshot.resource_version)
+        with open(self.cache_path) as f:
+            self.assertEqual({'resource_version': '100', 'products': self.product_data}, json.load(f))
+
+    def test_load_from_cache(self):
+        """Test that the YAML is not parsed again when the resourceVersion is unchanged"""
+        ProductCatalogSnapshot.load(self.cache_path)
+        self.mock_safe_load.reset_mock()
+        snapshot = ProductCatalogSnapshot.load(self.cache_path)
+        self.mock_safe_load.assert_not_called()
+        self.assertEqual('def', snapshot.get_product('uan').data['configuration']['commit'])
+
+    def test_load_resource_version_changed(self):
+        """Test that the YAML is parsed again when the resourceVersion changes"""
+        ProductCatalogSnapshot.load(self.cache_path)
+        self.mock_safe_load.reset_mock()
+        self.config_map.metadata.resource_version = '101'
+        self.config_map.data['cos'] = safe_dump({'2.1.0': {}})
+        snapshot = ProductCatalogSnapshot.load(self.cache_path)
+        self.assertEqual(2, self.mock_safe_load.call_count)
+        self.assertEqual('2.1.0', snapshot.get_product('cos').version)
+
+    def test_load_corrupt_cache(self):
+        """Test that an unreadable cache file is ignored"""
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'w') as f:
+            f.write('{not json')
+        snapshot = ProductCatalogSnapshot.load(self.cache_path)
+        self.assertEqual('2.0.9', snapshot.get_product('cos').version)
+
+    def test_load_api_error(self):
+        """Test that a failure to read the ConfigMap raises ProductCatalogError"""
+        self.mock_core_v1_api.read_namespaced_config_map.side_effect = ApiException(reason='Forbidden')
+        with self.assertRaisesRegex(ProductCatalogError, 'Unable to read ConfigMap cray-product-catalog'):
+            ProductCatalogSnapshot.load(self.cache_path)
+
+    def test_load_no_data(self):
+        """Test that a ConfigMap without data raises ProductCatalogError"""
+        self.config_map.data = None
+        with self.assertRaisesRegex(ProductCatalogError, 'No data found in ConfigMap'):
+            ProductCatalogSnapshot.load(self.cache_path)
+
+
+class TestGetProductCatalog(unittest.TestCase):
+    """Tests for the get_product_catalog function"""
+
+    def setUp(self):
+        patch('sat.product_catalog._PRODUCT_CATALOG', None).start()
+        self.mock_load = patch.object(ProductCatalogSnapshot, 'load').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_loaded_once(self):
+        """Test that the product catalog is loaded only once per process"""
+        self.assertIs(get_product_catalog(), get_product_catalog())
+        self.mock_load.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,6 +33,8 @@ from unittest import mock
 import unittest
 from unittest.mock import patch
 
+from kubernetes.config import ConfigException
+
 from sat import util
 from tests.common import ExtendedTestCase
 
@@ -653,5 +655,37 @@ class TestEnsurePermissions(unittest.TestCase):
         self.mock_chmod.assert_called_once_with(self.dirname, 0o700)
 
 
+class TestGetKubeApiClient(unittest.TestCase):
+    """Tests for the get_kube_api_client function."""
+
+    def setUp(self):
+        patch('sat.util._KUBE_API_CLIENT', None).start()
+        self.mock_load_kube_config = patch('sat.util.load_kube_config').start()
+        self.mock_api_client_cls = patch('sat.util.ApiClient').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_config_loaded_once(self):
+        """Test that the Kubernetes configuration is only loaded once."""
+        api_client = util.get_kube_api_client()
+        self.assertIs(api_client, util.get_kube_api_client())
+        self.assertEqual(self.mock_api_client_cls.return_value, api_client)
+        self.mock_load_kube_config.assert_called_once()
+        self.mock_api_client_cls.assert_called_once_with(
+            self.mock_load_kube_config.call_args.kwargs['client_configuration']
+        )
+
+    def test_config_load_failure(self):
+        """Test that a failure to load the configuration raises ConfigException and is retried."""
+        for err in [FileNotFoundError('no such file'), ConfigException('bad config')]:
+            with self.subTest(err=err):
+                self.mock_load_kube_config.side_effect = err
+                with self.assertRaisesRegex(ConfigException, 'Failed to load Kubernetes configuration'):
+                    util.get_kube_api_client()
+        self.mock_load_kube_config.side_effect = None
+        self.assertEqual(self.mock_api_client_cls.return_value, util.get_kube_api_client())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2020 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2020-2022 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -25,16 +25,23 @@
 Unit tests for the sat.waiting module.
 """
 
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import itertools
-from unittest.mock import Mock, patch
+import threading
+from unittest.mock import call, Mock, patch
+
+from kubernetes.client.rest import ApiException
 
 from sat.waiting import (
     DependencyCycleError,
     DependencyGroupMember,
     DependencyGroupWaiter,
     GroupWaiter,
+    KubernetesWatchMixin,
     SimultaneousWaiter,
     Waiter,
+    WaiterScheduler,
     WaitingFailure,
 )
 from tests.common import ExtendedTestCase
@@ -248,12 +255,11 @@ class TestSimulWaiter(WaiterTestCase):
         with self.assertRaises(TypeError):
             SimultaneousWaiter(Mock())
 
-    def test_starts_threads(self):
-        """Test the SimultaneousWaiter starts and cleans up threads"""
-        sw = SimultaneousWaiter([SuccessfulWaiter], 10)
-        sw.wait_for_completion()
-        self.mock_thread.assert_called_once()
-        self.mock_thread.return_value.join.assert_called()
+    def test_does_not_start_threads(self):
+        """Test the SimultaneousWaiter waits for its conditions without starting threads"""
+        sw = SimultaneousWaiter([SuccessfulWaiter, SuccessfulWaiter], 10)
+        self.assertTrue(sw.wait_for_completion())
+        self.mock_thread.assert_not_called()
 
     def test_simul_waiter_completed(self):
         """Test waiting for multiple conditions"""
@@ -267,11 +273,75 @@ class TestSimulWaiter(WaiterTestCase):
         """Test failing to wait for one of multiple simultaneous conditions."""
         self.mock_thread_patcher.stop()
 
-        NotFastEnoughWaiter = get_mock_waiter([False, True])
+        NotFastEnoughWaiter = get_mock_waiter([False, False, True])
         sw = SimultaneousWaiter([NotFastEnoughWaiter, SuccessfulWaiter], 2)
         self.assertFalse(sw.wait_for_completion())
 
 
+class TestWaiterScheduler(WaiterTestCase):
+    """Test the WaiterScheduler class."""
+
+    def test_bad_max_workers(self):
+        """Test that max_workers must be at least one."""
+        with self.assertRaises(ValueError):
+            WaiterScheduler([], max_workers=0)
+
+    def test_all_completed(self):
+        """Test waiting for several waiters which all complete."""
+        EventualWaiter = get_mock_waiter([False, False, True])
+        waiters = [EventualWaiter(10), SuccessfulWaiter(10)]
+        self.assertTrue(WaiterScheduler(waiters).wait_for_completion())
+        self.assertTrue(all(waiter.completed for waiter in waiters))
+        self.mock_thread.assert_not_called()
+
+    def test_one_timed_out(self):
+        """Test that the other waiters complete when one waiter times out."""
+        NeverWaiter = get_mock_waiter(False)
+        waiters = [NeverWaiter(5), SuccessfulWaiter(5)]
+        with self.assertLogs(level='ERROR'):
+            self.assertFalse(WaiterScheduler(waiters).wait_for_completion())
+        self.assertEqual([False, True], [waiter.completed for waiter in waiters])
+
+    def test_polls_interleaved(self):
+        """Test that waiters are polled in the order in which their polls are due."""
+        polls = []
+
+        class RecordingWaiter(Waiter):
+            def __init__(self, name, results, poll_interval):
+                super().__init__(100, poll_interval=poll_interval)
+                self.name = name
+                self.results = iter(results)
+
+            def condition_name(self):
+                return self.name
+
+            def has_completed(self):
+                polls.append(self.name)
+                return next(self.results)
+
+        waiters = [RecordingWaiter('slow', [False, True], 20),
+                   RecordingWaiter('fast', [False, False, False, True], 5)]
+        self.assertTrue(WaiterScheduler(waiters).wait_for_completion())
+        self.assertEqual(['slow', 'fast', 'fast', 'fast', 'slow', 'fast'], polls)
+
+    def test_unexpected_error(self):
+        """Test that an unexpected error in one waiter does not stop the others."""
+        BrokenWaiter = get_mock_waiter(KeyError('oops'))
+        waiters = [BrokenWaiter(10), SuccessfulWaiter(10)]
+        with self.assertLogs(level='ERROR') as logs_cm:
+            self.assertFalse(WaiterScheduler(waiters).wait_for_completion())
+        self.assert_in_element('Unexpected error waiting for condition "Testing Waiter"',
+                               logs_cm.output)
+        self.assertTrue(waiters[1].completed)
+
+    def test_worker_pool(self):
+        """Test running the checks of waiters on a shared pool of threads."""
+        EventualWaiter = get_mock_waiter([False, True])
+        waiters = [EventualWaiter(10)] + [SuccessfulWaiter(10) for _ in range(5)]
+        self.assertTrue(WaiterScheduler(waiters, max_workers=2).wait_for_completion())
+        self.assertTrue(all(waiter.completed for waiter in waiters))
+
+
 class GroupWaiterTestCase(WaiterTestCase):
     """Test case for testing GroupWaiters."""
     def setUp(self):
@@ -288,7 +358,8 @@ class TestGroupWaiter(GroupWaiterTestCase):
         instance = SuccessfulWaiter(self.members, 10)
 
         self.assertEqual(len(instance.wait_for_completion()), 0)
-        self.mock_time_sleep.assert_called()
+        # No need to sleep once all members have completed
+        self.mock_time_sleep.assert_not_called()
 
     def test_wait_for_completion_all_time_out(self):
         """Test generic waiting for completion when all members time out"""
@@ -325,6 +396,217 @@ class TestGroupWaiter(GroupWaiterTestCase):
         instance.wait_for_completion()
         mock_on_retry.assert_called_once()
 
+    def test_members_have_completed_default(self):
+        """Test the default batch check calls member_has_completed for each member"""
+        SometimesFailingWaiter = get_mock_group_waiter(lambda m: m != 'baz')
+        instance = SometimesFailingWaiter(self.members, 10)
+        self.assertEqual({'foo', 'bar'}, instance.members_have_completed(set(self.members)))
+
+    def test_members_have_completed_batch_override(self):
+        """Test that an overridden batch check is called once per polling cycle"""
+        BatchWaiter = get_mock_group_waiter(True)
+        instance = BatchWaiter(self.members, 10)
+        with patch.object(instance, 'members_have_completed',
+                          side_effect=[set(), {'foo'}, {'bar', 'baz'}]) as mock_batch, \
+                patch.object(instance, 'member_has_completed') as mock_member_has_completed:
+            self.assertEqual(set(), instance.wait_for_completion())
+
+        mock_batch.assert_has_calls([call(set(self.members)), call(set(self.members)),
+                                     call({'bar', 'baz'})])
+        mock_member_has_completed.assert_not_called()
+
+
+class TestAdaptivePolling(ExtendedTestCase):
+    """Tests for adaptive poll intervals and statistics of Waiters"""
+    def setUp(self):
+        self.now = 0
+        patch('sat.waiting.time.monotonic', side_effect=lambda: self.now).start()
+        self.mock_time_sleep = patch('sat.waiting.time.sleep', side_effect=self.fake_sleep).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_sleep(self, seconds):
+        self.now += seconds
+
+    def get_sleep_durations(self):
+        return [c[0][0] for c in self.mock_time_sleep.call_args_list]
+
+    def test_fixed_interval_by_default(self):
+        """Test that the poll interval does not change without max_poll_interval"""
+        EventualWaiter = get_mock_waiter([False, False, False, True])
+        EventualWaiter(100, poll_interval=2).wait_for_completion()
+        self.assertEqual([2, 2, 2], self.get_sleep_durations())
+
+    def test_backoff_without_progress(self):
+        """Test that the poll interval grows up to max_poll_interval without progress"""
+        EventualWaiter = get_mock_waiter([False] * 5 + [True])
+        waiter = EventualWaiter(100, poll_interval=1, max_poll_interval=5)
+        self.assertTrue(waiter.wait_for_completion())
+        self.assertEqual([1, 2, 4, 5, 5], self.get_sleep_durations())
+        self.assertEqual(6, waiter.poll_count)
+        self.assertEqual(17, waiter.first_completion_time)
+
+    def test_interval_reset_on_progress(self):
+        """Test that the poll interval is reset when group members complete"""
+        completions = iter([set(), set(), {'foo'}, set(), {'bar'}])
+
+        class ProgressWaiter(get_mock_group_waiter(False)):
+            def members_have_completed(self, members):
+                return next(completions)
+
+        waiter = ProgressWaiter(['foo', 'bar'], 100, max_poll_interval=10)
+        self.assertEqual(set(), waiter.wait_for_completion())
+        self.assertEqual([1, 2, 1, 2], self.get_sleep_durations())
+        self.assertEqual(5, waiter.poll_count)
+        self.assertEqual(3, waiter.first_completion_time)
+        self.assertEqual(6, waiter.last_completion_time)
+
+    def test_last_poll_at_deadline(self):
+        """Test that polling does not sleep past the timeout, and polls at the deadline"""
+        NeverWaiter = get_mock_waiter(False)
+        waiter = NeverWaiter(10, poll_interval=4)
+        self.assertFalse(waiter.wait_for_completion())
+        self.assertEqual([4, 4, 2], self.get_sleep_durations())
+        self.assertEqual(10, self.now)
+        self.assertEqual(4, waiter.poll_count)
+        self.assertIsNone(waiter.first_completion_time)
+
+    def test_max_poll_interval_less_than_poll_interval(self):
+        """Test that max_poll_interval cannot be less than poll_interval"""
+        with self.assertRaises(ValueError):
+            SuccessfulWaiter(10, poll_interval=5, max_poll_interval=1)
+
+    def test_statistics_logged(self):
+        """Test that the poll count and completion times are logged"""
+        EventualWaiter = get_mock_waiter([False, True])
+        with self.assertLogs(level='DEBUG') as cm:
+            EventualWaiter(10).wait_for_completion()
+        self.assert_in_element('Polled condition "Testing Waiter" 2 times; first completion '
+                               'after 1.0 seconds', cm.output)
+
+
+class WatchedWaiter(KubernetesWatchMixin, Waiter):
+    """A Waiter which completes when it receives a 'done' object from a watch"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.done = False
+        self.resyncs = 0
+        self.list_fn = Mock()
+
+    def condition_name(self):
+        return 'Testing watched Waiter'
+
+    def has_completed(self):
+        return self.done
+
+    def get_watch_source(self):
+        return self.list_fn, ('services',), {'label_selector': 'app=test'}
+
+    def handle_watch_event(self, event_type, obj):
+        self.done = obj == 'done'
+        return self.done
+
+    def resync_watch_state(self):
+        self.resyncs += 1
+        super().resync_watch_state()
+
+
+def generate_watch_events(*objs):
+    """Generate watch events which are MODIFIED events for the given objects."""
+    for obj in objs:
+        if isinstance(obj, Exception):
+            raise obj
+        yield {'type': 'MODIFIED', 'object': obj}
+
+
+class TestKubernetesWatchMixin(ExtendedTestCase):
+    """Tests for Waiters which use a Kubernetes watch stream"""
+    def setUp(self):
+        self.now = 0
+        patch('sat.waiting.time.monotonic', side_effect=lambda: self.now).start()
+        self.mock_time_sleep = patch('sat.waiting.time.sleep', side_effect=self.fake_sleep).start()
+        self.mock_watch = patch('sat.waiting.Watch').start().return_value
+        self.mock_watch.resource_version = '200'
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_sleep(self, seconds):
+        self.now += seconds
+
+    def test_completes_on_event(self):
+        """Test that a watched Waiter completes on an event without sleeping"""
+        self.mock_watch.stream.return_value = generate_watch_events('pending', 'done')
+        waiter = WatchedWaiter(300)
+
+        self.assertTrue(waiter.wait_for_completion())
+        self.mock_watch.stream.assert_called_once_with(waiter.list_fn, 'services',
+                                                       label_selector='app=test',
+                                                       timeout_seconds=60)
+        self.mock_time_sleep.assert_not_called()
+        self.assertEqual('200', waiter.watch_resource_version)
+
+    def test_resumes_from_resource_version(self):
+        """Test that watching resumes from the stored resource version"""
+        self.mock_watch.stream.return_value = generate_watch_events('done')
+        waiter = WatchedWaiter(300)
+        waiter.watch_resource_version = '100'
+
+        self.assertTrue(waiter.wait_for_completion())
+        self.assertEqual('100', self.mock_watch.stream.call_args[1]['resource_version'])
+
+    def test_watch_limited_by_timeout(self):
+        """Test that the watch does not run past the timeout"""
+        def watch_until_timeout(*args, timeout_seconds, **kwargs):
+            self.fake_sleep(timeout_seconds)
+            return generate_watch_events()
+
+        self.mock_watch.stream.side_effect = watch_until_timeout
+        waiter = WatchedWaiter(10.5)
+
+        self.assertFalse(waiter.wait_for_completion())
+        self.assertEqual(11, self.mock_watch.stream.call_args[1]['timeout_seconds'])
+
+    def test_resync_when_resource_version_expired(self):
+        """Test that the watch resynchronizes when the resource version has expired"""
+        self.mock_watch.stream.side_effect = [
+            generate_watch_events(ApiException(status=410)),
+            generate_watch_events('done')
+        ]
+        waiter = WatchedWaiter(300)
+        waiter.watch_resource_version = '100'
+
+        self.assertTrue(waiter.wait_for_completion())
+        self.assertEqual(1, waiter.resyncs)
+        self.assertNotIn('resource_version', self.mock_watch.stream.call_args[1])
+        self.assertTrue(waiter.watching)
+
+    def test_fall_back_to_polling(self):
+        """Test that polling is used when the watch fails"""
+        self.mock_watch.stream.return_value = generate_watch_events(ApiException(status=403))
+        waiter = WatchedWaiter(300, poll_interval=5)
+
+        with patch.object(waiter, 'has_completed', side_effect=[False, False, True]):
+            with self.assertLogs(level='WARNING') as cm:
+                self.assertTrue(waiter.wait_for_completion())
+
+        self.assertFalse(waiter.watching)
+        self.mock_watch.stream.assert_called_once()
+        self.mock_time_sleep.assert_has_calls([call(5), call(5)])
+        self.assert_in_element('falling back to polling', cm.output)
+
+    def test_rejected_by_scheduler(self):
+        """Test that a watched Waiter cannot be scheduled with other Waiters"""
+        with self.assertRaisesRegex(TypeError, 'WatchedWaiter'):
+            WaiterScheduler([SuccessfulWaiter(300), WatchedWaiter(300)])
+        self.mock_watch.stream.assert_not_called()
+
+    def test_rejected_by_simultaneous_waiter(self):
+        """Test that a watched Waiter cannot be combined in a SimultaneousWaiter"""
+        with self.assertRaisesRegex(TypeError, 'WatchedWaiter'):
+            SimultaneousWaiter([SuccessfulWaiter, WatchedWaiter], 300)
+
 
 class TestFailingGroupWaiter(GroupWaiterTestCase):
     """Tests for GroupWaiter when some members fail"""
@@ -350,6 +632,98 @@ class TestFailingGroupWaiter(GroupWaiterTestCase):
         self.assertFalse(set(instance.wait_for_completion()).intersection(self.failed_members))
 
 
+class TestConcurrentGroupWaiter(ExtendedTestCase):
+    """Tests for GroupWaiter when members are checked concurrently"""
+    def setUp(self):
+        self.members = {'foo', 'bar', 'baz', 'qux'}
+        self.release_checks = threading.Event()
+
+    def tearDown(self):
+        self.release_checks.set()
+
+    def test_concurrent_checks_merge_results(self):
+        """Test that completed and failed members are collected from worker threads"""
+        def member_has_completed(member):
+            if member == 'qux':
+                raise WaitingFailure('qux is broken')
+            return member != 'baz'
+
+        ConcurrentWaiter = get_mock_group_waiter(member_has_completed)
+        instance = ConcurrentWaiter(self.members, 10, max_workers=3)
+        with self.assertLogs(level='ERROR') as cm:
+            completed = instance.members_have_completed(set(self.members))
+
+        self.assertEqual({'foo', 'bar'}, completed)
+        self.assertEqual({'qux'}, instance.failed)
+        self.assert_in_element('qux is broken', cm.output)
+
+    def test_concurrent_checks_run_in_parallel(self):
+        """Test that member checks are run at the same time in separate threads"""
+        barrier = threading.Barrier(len(self.members), timeout=5)
+
+        def member_has_completed(member):
+            # Each check waits until all checks have started.
+            barrier.wait()
+            return True
+
+        ConcurrentWaiter = get_mock_group_waiter(member_has_completed)
+        instance = ConcurrentWaiter(self.members, 10, max_workers=len(self.members))
+        self.assertEqual(self.members, instance.members_have_completed(set(self.members)))
+
+    def test_concurrent_check_timeout(self):
+        """Test that checks which do not finish in time are considered incomplete"""
+        def member_has_completed(member):
+            if member == 'baz':
+                self.release_checks.wait()
+            return True
+
+        ConcurrentWaiter = get_mock_group_waiter(member_has_completed)
+        instance = ConcurrentWaiter(self.members, 10, max_workers=len(self.members),
+                                    member_timeout=0.1)
+        with self.assertLogs(level='WARNING') as cm:
+            completed = instance.members_have_completed(set(self.members))
+
+        self.assertEqual({'foo', 'bar', 'qux'}, completed)
+        self.assertEqual(set(), instance.failed)
+        self.assert_in_element('member(s): baz', cm.output)
+
+    def test_running_check_not_resubmitted(self):
+        """Test that a member whose check is still running is not checked again"""
+        calls = Counter()
+
+        def member_has_completed(member):
+            calls[member] += 1
+            if member == 'baz':
+                self.release_checks.wait()
+            return True
+
+        ConcurrentWaiter = get_mock_group_waiter(member_has_completed)
+        instance = ConcurrentWaiter(self.members, 10, max_workers=len(self.members),
+                                    member_timeout=0.1)
+        with self.assertLogs(level='WARNING'):
+            instance.members_have_completed(set(self.members))
+            instance.members_have_completed({'baz'})
+        self.assertEqual(1, calls['baz'])
+
+        self.release_checks.set()
+        self.assertEqual({'baz'}, instance.members_have_completed({'baz'}))
+        self.assertEqual(1, calls['baz'])
+
+    def test_executor_shut_down_after_wait(self):
+        """Test that the pool of threads is kept during the wait and shut down after it"""
+        ConcurrentWaiter = get_mock_group_waiter(True)
+        instance = ConcurrentWaiter(self.members, 10, max_workers=2)
+        with patch('sat.waiting.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as mock_executor_cls:
+            self.assertEqual(set(), instance.wait_for_completion())
+        mock_executor_cls.assert_called_once_with(max_workers=2)
+        self.assertIsNone(instance._executor)
+
+    def test_invalid_max_workers(self):
+        """Test that max_workers must be positive"""
+        with self.assertRaises(ValueError):
+            get_mock_group_waiter(True)(self.members, 10, max_workers=0)
+
+
 class DependentTestMember(DependencyGroupMember):
     def __init__(self, name, *, test_case):
         super().__init__()